@@ -7,6 +7,7 @@ from typing import List, Optional
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from pydantic import BaseModel
 from sqlmodel import Session, select, func
 
 from app.core.database import get_session
@@ -605,3 +606,52 @@ def get_allocation_audit(
         response.transporterName = transporter.name
 
     return response
+
+
+# ============================================================================
+# Allocation Engine Endpoints
+# ============================================================================
+
+class AllocateOrdersRequest(BaseModel):
+    orderIds: List[UUID]
+    shipmentType: ShipmentType = ShipmentType.B2C
+    dryRun: bool = False             # Decide only: no audit rows, no delivery updates
+    assignDeliveries: bool = False   # Set transporterId on the orders' open deliveries
+
+
+@router.post("/allocate")
+def allocate_orders(
+    data: AllocateOrdersRequest,
+    company_filter: CompanyFilter = Depends(),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    _: None = Depends(require_manager())
+):
+    """Pick a carrier for each order with the company's allocation rules and CSR scoring."""
+    from app.services.shipping_allocation import ShippingAllocationEngine
+
+    company_id = company_filter.company_id or current_user.companyId
+    if not company_id:
+        raise HTTPException(status_code=400, detail="No company context")
+    if len(data.orderIds) > 50000:
+        raise HTTPException(status_code=400, detail="At most 50000 orders per request")
+
+    engine = ShippingAllocationEngine(session)
+    facts = engine.load_order_facts(company_id, data.orderIds)
+    decisions = engine.allocate(company_id, facts, data.shipmentType)
+
+    audited = assigned = 0
+    if not data.dryRun:
+        audited = engine.write_audit(company_id, decisions, data.shipmentType, current_user.id)
+        if data.assignDeliveries:
+            assigned = engine.assign_deliveries(decisions)
+        session.commit()
+
+    return {
+        "requested": len(data.orderIds),
+        "found": len(facts),
+        "allocated": sum(d.allocated for d in decisions),
+        "audited": audited,
+        "deliveriesAssigned": assigned,
+        "decisions": [d.as_dict() for d in decisions],
+    }
@@ -62,6 +62,7 @@ class ServiceabilityRequest(PydanticBaseModel):
     origin_pincode: str
     dest_pincode: str
     carrier_code: str = "SHIPROCKET"
+    live: bool = False  # Ask the carrier even if the pincode index covers it
 
 
 class CancelShipmentRequest(PydanticBaseModel):
@@ -242,10 +243,30 @@ async def check_serviceability(
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
-    """Check if delivery is possible between two pincodes."""
+    """
+    Check if delivery is possible between two pincodes.
+    Answered from the serviceability index (destination coverage) when the
+    carrier's pincodes are loaded; otherwise, or with live=true, asks the carrier.
+    """
     if not current_user.companyId:
         raise HTTPException(status_code=400, detail="No company context")
 
+    if not payload.live:
+        from app.services.carriers.serviceability import get_serviceability_index
+
+        transporter = session.exec(
+            select(Transporter).where(Transporter.code == payload.carrier_code.upper())
+        ).first()
+        index = get_serviceability_index(session)
+        if transporter and index.knows(transporter.id):
+            service = index.lookup(transporter.id, payload.dest_pincode)
+            return {
+                "is_serviceable": bool(service and service.allows()),
+                "cod_available": bool(service and service.serviceable and service.cod),
+                "prepaid_available": bool(service and service.serviceable and service.prepaid),
+                "estimated_days": (service.estimated_days if service else None) or 0,
+            }
+
     adapter = get_carrier_for_company(
         session, current_user.companyId, payload.carrier_code
     )
@@ -8,18 +8,20 @@ Endpoints:
 
   POST /api/v1/carrier-webhooks/track        — Manual tracking pull for a single AWB
   POST /api/v1/carrier-webhooks/poll         — Trigger bulk tracking poll (admin/cron)
+  GET  /api/v1/carrier-webhooks/poll/runs/{id} — Bulk poll progress
 
   GET  /api/v1/carrier-webhooks/logs         — View recent webhook events
   GET  /api/v1/carrier-webhooks/stats        — Delivery status statistics
 
 Phase 2 additions:
   - Webhook event logging (CarrierWebhookLog)
-  - Idempotency check (skip duplicate events)
+  - Idempotency check (skip duplicate and out-of-order events, TrackingIngest)
   - Optional signature validation
   - Post-processing analytics trigger on terminal statuses
 """
 import hashlib
 import hmac
+import json
 import logging
 from datetime import datetime, timezone
 from typing import Optional
@@ -33,9 +35,10 @@ from app.core.database import get_session
 from app.core.deps import get_current_user, require_manager, CompanyFilter
 from app.models.user import User
 from app.models.order import Delivery
-from app.models.shipment import CarrierWebhookLog
+from app.models.shipment import CarrierWebhookLog, TrackingPollRun, TrackingPollRunResponse
 from app.models.enums import DeliveryStatus
-from app.services.carriers.pipeline import StatusPipeline
+from app.services.carriers.delhivery import parse_delhivery_datetime
+from app.services.carriers.tracking_ingest import TrackingIngest
 from app.services.carriers.status_mapper import StatusMapper
 
 logger = logging.getLogger(__name__)
@@ -82,9 +85,10 @@ class ManualTrackRequest(PydanticBaseModel):
 
 class BulkPollRequest(PydanticBaseModel):
     """Request to poll tracking for multiple AWBs."""
-    carrier_code: str = "SHIPROCKET"
+    carrier_code: Optional[str] = None  # None = every carrier, per delivery's transporter
     status_filter: Optional[str] = None  # Only poll shipments with this status
     limit: int = 100
+    resume_run_id: Optional[UUID] = None  # Continue an interrupted TrackingPollRun
 
 
 # ============================================================================
@@ -122,23 +126,20 @@ def _log_webhook_event(
     return log_entry
 
 
-def _check_idempotency(
+def _log_skipped_event(
     session: Session,
+    carrier_code: str,
     awb_number: str,
     carrier_status: str,
-    carrier_code: str,
-) -> bool:
-    """Check if this exact (awb, status, carrier) was already processed. Returns True if duplicate."""
-    existing = session.exec(
-        select(CarrierWebhookLog).where(
-            CarrierWebhookLog.awbNumber == awb_number,
-            CarrierWebhookLog.carrierStatus == carrier_status,
-            CarrierWebhookLog.carrierCode == carrier_code,
-            CarrierWebhookLog.isProcessed == True,
-            CarrierWebhookLog.isDuplicate == False,
-        ).limit(1)
-    ).first()
-    return existing is not None
+    raw_payload: dict,
+    verdict: str,
+) -> CarrierWebhookLog:
+    """Log a webhook event TrackingIngest dropped as duplicate or stale."""
+    return _log_webhook_event(
+        session, carrier_code, awb_number, carrier_status, raw_payload,
+        is_duplicate=True, is_processed=False,
+        error_message="Older than the last applied event" if verdict == "stale" else None,
+    )
 
 
 def _validate_webhook_signature(
@@ -228,16 +229,6 @@ async def shiprocket_webhook(
             session.commit()
             return {"status": "ignored", "reason": "Missing awb or status"}
 
-        # Idempotency check
-        if _check_idempotency(session, str(awb), str(status), "SHIPROCKET"):
-            _log_webhook_event(
-                session, "SHIPROCKET", str(awb), str(status), body,
-                is_duplicate=True, is_processed=False,
-            )
-            session.commit()
-            logger.info(f"Duplicate webhook skipped: SHIPROCKET AWB={awb} status={status}")
-            return {"status": "duplicate", "awb": awb}
-
         # Parse timestamp
         timestamp = None
         if timestamp_str:
@@ -254,8 +245,7 @@ async def shiprocket_webhook(
             if StatusMapper.map_shiprocket_status(status) == DeliveryStatus.NDR:
                 ndr_reason = latest_scan.get("sr-status-label", remark)
 
-        result = StatusPipeline.process_tracking_update(
-            session=session,
+        verdict, result = TrackingIngest(session).ingest_one(
             awb_number=str(awb),
             carrier_code="SHIPROCKET",
             carrier_status=status,
@@ -265,6 +255,13 @@ async def shiprocket_webhook(
             ndr_reason_raw=ndr_reason,
         )
 
+        # Idempotency: repeated or out-of-order event
+        if verdict != "processed":
+            _log_skipped_event(session, "SHIPROCKET", str(awb), str(status), body, verdict)
+            session.commit()
+            logger.info(f"{verdict.capitalize()} webhook skipped: SHIPROCKET AWB={awb} status={status}")
+            return {"status": verdict, "awb": awb}
+
         # Log the event
         _log_webhook_event(
             session, "SHIPROCKET", str(awb), str(status), body,
@@ -320,24 +317,33 @@ async def delhivery_webhook(
             session.commit()
             return {"status": "ignored", "reason": "Missing waybill or status"}
 
-        # Idempotency check
-        if _check_idempotency(session, str(awb), str(status), "DELHIVERY"):
-            _log_webhook_event(
-                session, "DELHIVERY", str(awb), str(status), body,
-                is_duplicate=True, is_processed=False,
-            )
-            session.commit()
-            return {"status": "duplicate", "awb": awb}
-
-        result = StatusPipeline.process_tracking_update(
-            session=session,
+        # Status.StatusDateTime orders the event and tells repeats of a
+        # status apart (e.g. a second NDR attempt). Without it, key the event
+        # on the whole scan, so only a retried delivery of it is a duplicate
+        scan = body.get("Status") if isinstance(body.get("Status"), dict) else body
+        timestamp = parse_delhivery_datetime(str(scan.get("StatusDateTime") or ""))
+        event_key = None
+        if timestamp is None:
+            event_key = hashlib.sha1(
+                json.dumps(scan, sort_keys=True, default=str).encode("utf-8")
+            ).hexdigest()
+
+        verdict, result = TrackingIngest(session).ingest_one(
             awb_number=str(awb),
             carrier_code="DELHIVERY",
             carrier_status=status,
             carrier_remark=remark,
             location=location,
+            timestamp=timestamp,
+            event_key=event_key,
         )
 
+        # Idempotency: repeated or out-of-order event
+        if verdict != "processed":
+            _log_skipped_event(session, "DELHIVERY", str(awb), str(status), body, verdict)
+            session.commit()
+            return {"status": verdict, "awb": awb}
+
         _log_webhook_event(
             session, "DELHIVERY", str(awb), str(status), body,
             oms_status=result.get("new_status", ""),
@@ -370,15 +376,6 @@ def generic_webhook(
     """
     raw_payload = payload.model_dump()
 
-    # Idempotency check
-    if _check_idempotency(session, payload.awb_number, payload.status, payload.carrier_code):
-        _log_webhook_event(
-            session, payload.carrier_code, payload.awb_number, payload.status,
-            raw_payload, is_duplicate=True, is_processed=False,
-        )
-        session.commit()
-        return {"status": "duplicate", "awb": payload.awb_number}
-
     timestamp = None
     if payload.timestamp:
         try:
@@ -386,8 +383,7 @@ def generic_webhook(
         except (ValueError, TypeError):
             pass
 
-    result = StatusPipeline.process_tracking_update(
-        session=session,
+    verdict, result = TrackingIngest(session).ingest_one(
         awb_number=payload.awb_number,
         carrier_code=payload.carrier_code,
         carrier_status=payload.status,
@@ -397,6 +393,15 @@ def generic_webhook(
         ndr_reason_raw=payload.ndr_reason,
     )
 
+    # Idempotency: repeated or out-of-order event
+    if verdict != "processed":
+        _log_skipped_event(
+            session, payload.carrier_code, payload.awb_number, payload.status,
+            raw_payload, verdict,
+        )
+        session.commit()
+        return {"status": verdict, "awb": payload.awb_number}
+
     _log_webhook_event(
         session, payload.carrier_code, payload.awb_number, payload.status,
         raw_payload, oms_status=result.get("new_status", ""),
@@ -445,8 +450,7 @@ async def manual_track(
     # Process the latest event through our pipeline
     if tracking.events:
         latest = tracking.events[0]
-        StatusPipeline.process_tracking_update(
-            session=session,
+        TrackingIngest(session).ingest_one(
             awb_number=payload.awb_number,
             carrier_code=payload.carrier_code,
             carrier_status=latest.status_code,
@@ -479,117 +483,62 @@ async def manual_track(
 # ============================================================================
 
 @router.post("/poll")
-async def bulk_poll(
+def bulk_poll(
     payload: BulkPollRequest,
     background_tasks: BackgroundTasks,
     session: Session = Depends(get_session),
-    current_user: User = Depends(require_manager),
+    current_user: User = Depends(get_current_user),
+    _: None = Depends(require_manager()),
 ):
     """
     Trigger bulk tracking poll for all active shipments.
     Runs in background. Typically called by cron every 4 hours.
-    """
-    # Find all active (non-terminal) deliveries with AWB numbers
-    active_statuses = [
-        DeliveryStatus.SHIPPED.value,
-        DeliveryStatus.IN_TRANSIT.value,
-        DeliveryStatus.OUT_FOR_DELIVERY.value,
-        DeliveryStatus.NDR.value,
-        DeliveryStatus.MANIFESTED.value,
-        DeliveryStatus.RTO_INITIATED.value,
-        DeliveryStatus.RTO_IN_TRANSIT.value,
-    ]
-
-    query = select(Delivery).where(
-        Delivery.awbNo.isnot(None),
-        Delivery.status.in_(active_statuses),
-    )
-
-    if payload.status_filter:
-        query = query.where(Delivery.status == payload.status_filter)
-
-    # Filter by company
-    company_filter = CompanyFilter(current_user=current_user)
-    query = company_filter.apply_filter(query, Delivery.companyId)
-
-    deliveries = session.exec(query.limit(payload.limit)).all()
-
-    if not deliveries:
-        return {"status": "no_active_shipments", "count": 0}
 
-    # Group by carrier for efficient polling
-    awb_list = [
-        {"awb": d.awbNo, "delivery_id": str(d.id)}
-        for d in deliveries if d.awbNo
-    ]
+    Each poll is a TrackingPollRun; pass resume_run_id to continue an
+    interrupted run from its last committed page.
+    """
+    from app.services.carriers.tracking_poller import TrackingPollEngine, run_tracking_poll
+
+    company_id = None if current_user.role == "SUPER_ADMIN" else current_user.companyId
+
+    if payload.resume_run_id:
+        run = session.get(TrackingPollRun, payload.resume_run_id)
+        if not run or (company_id and run.companyId != company_id):
+            raise HTTPException(status_code=404, detail="Poll run not found")
+        if run.status == "COMPLETED":
+            raise HTTPException(status_code=400, detail="Poll run already completed")
+    else:
+        run = TrackingPollEngine(session).create_run(
+            company_id=company_id,
+            carrier_code=payload.carrier_code,
+            status_filter=payload.status_filter,
+            max_deliveries=payload.limit,
+        )
 
-    # Start polling in background
-    background_tasks.add_task(
-        _poll_tracking_batch,
-        carrier_code=payload.carrier_code,
-        awb_list=awb_list,
-        company_id=str(current_user.companyId),
-    )
+    background_tasks.add_task(run_tracking_poll, run.id)
 
     return {
         "status": "polling_started",
-        "count": len(awb_list),
-        "carrier": payload.carrier_code,
+        "runId": str(run.id),
+        "carrier": run.carrierCode or "ALL",
+        "limit": run.maxDeliveries,
     }
 
 
-async def _poll_tracking_batch(
-    carrier_code: str,
-    awb_list: list,
-    company_id: str,
+@router.get("/poll/runs/{run_id}", response_model=TrackingPollRunResponse)
+def get_poll_run(
+    run_id: UUID,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    _: None = Depends(require_manager()),
 ):
-    """Background task: poll tracking for a batch of AWBs."""
-    from app.core.database import get_session as get_db_session
-    from app.services.carriers.factory import get_carrier_for_company
-    from uuid import UUID
-
-    logger.info(f"Polling {len(awb_list)} shipments via {carrier_code}")
-
-    gen = get_db_session()
-    session = next(gen)
-
-    try:
-        adapter = get_carrier_for_company(session, UUID(company_id), carrier_code)
-        if not adapter:
-            logger.error(f"No adapter for {carrier_code} + company {company_id}")
-            return
-
-        processed = 0
-        errors = 0
-
-        for item in awb_list:
-            try:
-                tracking = await adapter.track_shipment(item["awb"])
-                if tracking.success and tracking.events:
-                    latest = tracking.events[0]
-                    StatusPipeline.process_tracking_update(
-                        session=session,
-                        awb_number=item["awb"],
-                        carrier_code=carrier_code,
-                        carrier_status=latest.status_code,
-                        carrier_remark=latest.remark,
-                        location=latest.location,
-                        timestamp=latest.timestamp,
-                        ndr_reason_raw=latest.ndr_reason,
-                    )
-                    processed += 1
-            except Exception as e:
-                errors += 1
-                logger.error(f"Poll error for AWB {item['awb']}: {e}")
-
-        session.commit()
-        logger.info(f"Polling complete: {processed} processed, {errors} errors")
-
-    except Exception as e:
-        session.rollback()
-        logger.error(f"Batch polling failed: {e}")
-    finally:
-        session.close()
+    """Progress of a bulk tracking poll."""
+    run = session.get(TrackingPollRun, run_id)
+    if not run or (
+        current_user.role != "SUPER_ADMIN" and run.companyId != current_user.companyId
+    ):
+        raise HTTPException(status_code=404, detail="Poll run not found")
+    return run
 
 
 # ============================================================================
@@ -21,6 +21,9 @@ from app.models.user import User
 
 router = APIRouter(prefix="/detection-rules", tags=["Detection Rules"])
 
+# Changing any of these resets the rule's incremental scan watermark
+RESCAN_FIELDS = ("conditions", "entityType", "ruleType")
+
 
 @router.get("", response_model=List[DetectionRuleResponse])
 def list_detection_rules(
@@ -135,6 +138,12 @@ def update_detection_rule(
         raise HTTPException(status_code=404, detail="Detection rule not found")
 
     update_data = data.model_dump(exclude_unset=True)
+    if any(
+        field in update_data and update_data[field] != getattr(rule, field)
+        for field in RESCAN_FIELDS
+    ):
+        # What the rule matches changed: the next scan covers all rows again
+        rule.scanWatermark = None
     for field, value in update_data.items():
         setattr(rule, field, value)
 
@@ -6,8 +6,10 @@ from datetime import datetime
 from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select, func
+import io
 
 from app.core.database import get_session
 from app.core.deps import get_current_user, require_manager, require_admin, CompanyFilter
@@ -19,6 +21,7 @@ from app.models import (
     VehicleCategory, FTLIndentStatus,
     User
 )
+from app.services.lane_rates import LaneRateService, parse_lane_csv, lanes_to_csv
 
 router = APIRouter(prefix="/ftl", tags=["FTL - Full Truck Load"])
 
@@ -570,51 +573,8 @@ def compare_rates(
     current_user: User = Depends(get_current_user)
 ):
     """Compare FTL rates from all vendors for a lane."""
-    query = select(FTLLaneRate).where(
-        FTLLaneRate.originCity.ilike(f"%{origin_city}%"),
-        FTLLaneRate.destinationCity.ilike(f"%{destination_city}%"),
-        FTLLaneRate.isActive == True,
-        FTLLaneRate.validFrom <= datetime.utcnow(),
-        (FTLLaneRate.validTo.is_(None)) | (FTLLaneRate.validTo >= datetime.utcnow())
-    )
-
-    query = company_filter.apply_filter(query, FTLLaneRate.companyId)
-    if vehicle_type_id:
-        query = query.where(FTLLaneRate.vehicleTypeId == vehicle_type_id)
-
-    query = query.order_by(FTLLaneRate.baseRate)
-    lane_rates = session.exec(query).all()
-
-    # Build comparison result
-    result = []
-    for lr in lane_rates:
-        vendor = session.get(FTLVendor, lr.vendorId)
-        vt = session.get(FTLVehicleTypeMaster, lr.vehicleTypeId)
-
-        total_rate = lr.baseRate
-        if lr.loadingCharges:
-            total_rate += lr.loadingCharges
-        if lr.unloadingCharges:
-            total_rate += lr.unloadingCharges
-        if lr.tollCharges:
-            total_rate += lr.tollCharges
-
-        result.append({
-            "laneRateId": str(lr.id),
-            "vendorId": str(lr.vendorId),
-            "vendorName": vendor.name if vendor else "Unknown",
-            "vendorCode": vendor.code if vendor else "N/A",
-            "vehicleTypeId": str(lr.vehicleTypeId),
-            "vehicleTypeName": vt.name if vt else "Unknown",
-            "capacityKg": vt.capacityKg if vt else 0,
-            "baseRate": float(lr.baseRate),
-            "loadingCharges": float(lr.loadingCharges or 0),
-            "unloadingCharges": float(lr.unloadingCharges or 0),
-            "tollCharges": float(lr.tollCharges or 0),
-            "totalRate": float(total_rate),
-            "transitDays": lr.transitDays,
-            "reliabilityScore": float(vendor.reliabilityScore) if vendor and vendor.reliabilityScore else None
-        })
+    service = LaneRateService(session, company_filter.company_ids)
+    result = service.compare_ftl(origin_city, destination_city, vehicle_type_id)
 
     return {
         "originCity": origin_city,
@@ -624,6 +584,43 @@ def compare_rates(
     }
 
 
+@router.post("/rate-comparison/bulk")
+async def compare_rates_bulk(
+    file: UploadFile = File(...),
+    company_filter: CompanyFilter = Depends(),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Rate a CSV of lanes for B2B quoting: cheapest and fastest FTL option
+    per lane, returned as CSV.
+
+    CSV Format:
+    origin_city, destination_city, vehicle_type (optional: code or name)
+    """
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="File must be a CSV")
+
+    rows, errors = parse_lane_csv(
+        await file.read(),
+        columns=["origin_city", "destination_city", "vehicle_type"],
+        required=["origin_city", "destination_city"],
+    )
+    if not rows:
+        raise HTTPException(status_code=400, detail={"message": "No valid lanes", "errors": errors[:50]})
+
+    lanes = [(row["origin_city"], row["destination_city"], row["vehicle_type"]) for row in rows]
+    results = LaneRateService(session, company_filter.company_ids).compare_ftl_bulk(lanes)
+    return StreamingResponse(
+        io.BytesIO(lanes_to_csv(results).encode()),
+        media_type="text/csv",
+        headers={
+            "Content-Disposition": "attachment; filename=ftl_rate_comparison.csv",
+            "X-Skipped-Rows": str(len(errors)),
+        }
+    )
+
+
 # ============================================================================
 # FTL Indent Endpoints
 # ============================================================================
@@ -6,10 +6,11 @@ from typing import List, Optional
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from pydantic import BaseModel
 from sqlmodel import Session, select, func
 
 from app.core.database import get_session
-from app.core.deps import get_current_user, require_manager, require_admin, CompanyFilter
+from app.core.deps import get_current_user, require_manager, require_admin, require_super_admin, CompanyFilter
 from app.models import (
     RateCard, RateCardCreate, RateCardUpdate, RateCardResponse,
     RateCardSlab, RateCardSlabCreate, RateCardSlabResponse,
@@ -289,6 +290,23 @@ def list_service_pincodes(
     return [ServicePincodeResponse.model_validate(p) for p in pincodes]
 
 
+class ServiceabilityBatchRequest(BaseModel):
+    pincodes: List[str]
+    transporterIds: Optional[List[UUID]] = None
+    paymentMode: Optional[str] = None  # PREPAID / COD; None = either
+
+
+def _coverage_response(transporter_id: UUID, service) -> dict:
+    return {
+        "transporterId": str(transporter_id),
+        "codAvailable": service.cod,
+        "prepaidAvailable": service.prepaid,
+        "reverseAvailable": service.reverse,
+        "zoneCode": service.zone,
+        "estimatedDays": service.estimated_days,
+    }
+
+
 @router.get("/service-pincodes/check/{pincode}")
 def check_pincode_serviceability(
     pincode: str,
@@ -296,31 +314,96 @@ def check_pincode_serviceability(
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    """Check serviceability of a pincode."""
-    query = select(ServicePincode).where(
-        ServicePincode.pincode == pincode,
-        ServicePincode.isServiceable == True
-    )
-    if transporter_id:
-        query = query.where(ServicePincode.transporterId == transporter_id)
+    """Check serviceability of a pincode (served from the in-memory index)."""
+    from app.services.carriers.serviceability import get_serviceability_index
 
-    pincodes = session.exec(query).all()
+    covering = get_serviceability_index(session).check_batch(
+        [pincode], transporter_ids=[transporter_id] if transporter_id else None
+    )[pincode.strip()]
 
     return {
         "pincode": pincode,
-        "serviceable": len(pincodes) > 0,
+        "serviceable": len(covering) > 0,
         "transporters": [
+            _coverage_response(tid, service) for tid, service in covering.items()
+        ]
+    }
+
+
+@router.post("/service-pincodes/check-batch")
+def check_pincodes_serviceability(
+    data: ServiceabilityBatchRequest,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Check serviceability of many pincodes at once (e.g. a whole wave)."""
+    from app.services.carriers.serviceability import get_serviceability_index
+
+    if len(data.pincodes) > 20000:
+        raise HTTPException(status_code=400, detail="At most 20000 pincodes per request")
+
+    results = get_serviceability_index(session).check_batch(
+        data.pincodes, transporter_ids=data.transporterIds, payment_mode=data.paymentMode
+    )
+
+    return {
+        "results": [
             {
-                "transporterId": str(p.transporterId),
-                "codAvailable": p.codAvailable,
-                "prepaidAvailable": p.prepaidAvailable,
-                "zoneCode": p.zoneCode
+                "pincode": pincode,
+                "serviceable": len(covering) > 0,
+                "transporters": [
+                    _coverage_response(tid, service) for tid, service in covering.items()
+                ],
             }
-            for p in pincodes
-        ]
+            for pincode, covering in results.items()
+        ],
+        "unserviceable": [p for p, covering in results.items() if not covering],
     }
 
 
+@router.post("/service-pincodes/sync/{transporter_id}")
+async def sync_service_pincodes(
+    transporter_id: UUID,
+    company_id: Optional[UUID] = Query(None, description="Company whose carrier integration fetches the dump (defaults to the caller's)"),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    _: None = Depends(require_super_admin())
+):
+    """
+    Replace a transporter's service pincodes with the carrier's pincode dump.
+    ServicePincode rows are shared by every company, so this is a platform
+    operation (SUPER_ADMIN); one company's integration only supplies the
+    credentials for the download.
+    """
+    from app.models.transporter import Transporter
+    from app.services.carriers.factory import get_carrier_for_company
+    from app.services.carriers.serviceability import (
+        refresh_serviceability_index, sync_carrier_pincodes,
+    )
+
+    transporter = session.get(Transporter, transporter_id)
+    if not transporter:
+        raise HTTPException(status_code=404, detail="Transporter not found")
+    company_id = company_id or current_user.companyId
+    if not company_id:
+        raise HTTPException(status_code=400, detail="company_id is required")
+
+    adapter = get_carrier_for_company(session, company_id, transporter.code)
+    if not adapter:
+        raise HTTPException(status_code=400, detail=f"No active {transporter.code} integration")
+
+    try:
+        result = await sync_carrier_pincodes(session, transporter.id, adapter)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Pincode dump failed: {e}")
+
+    session.commit()
+    refresh_serviceability_index(session)
+    return result
+
+
 @router.post("/service-pincodes", response_model=ServicePincodeResponse, status_code=status.HTTP_201_CREATED)
 def create_service_pincode(
     data: ServicePincodeCreate,
@@ -349,6 +432,9 @@ def bulk_create_service_pincodes(
         created += 1
 
     session.commit()
+
+    from app.services.carriers.serviceability import refresh_serviceability_index
+    refresh_serviceability_index(session)
     return {"created": created}
 
 
@@ -406,10 +492,14 @@ def get_available_awb(
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    """Get next available AWB for a transporter."""
+    """
+    Peek at the next available AWB for a transporter (does not reserve it;
+    use POST /awb/allocate to take one).
+    """
     query = select(AWB).where(
         AWB.transporterId == transporter_id,
-        AWB.isUsed == False
+        AWB.isUsed == False,
+        (AWB.companyId == None) | (AWB.companyId == current_user.companyId)
     ).limit(1)
 
     awb = session.exec(query).first()
@@ -419,6 +509,66 @@ def get_available_awb(
     return AWBResponse.model_validate(awb)
 
 
+@router.post("/awb/allocate")
+def allocate_awb(
+    transporter_id: UUID,
+    used_for: str,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Atomically take the next AWB for a transporter and mark it used."""
+    from app.services.carriers.awb_pool import AWBAllocator
+
+    if not current_user.companyId:
+        raise HTTPException(status_code=400, detail="No company context")
+
+    allocator = AWBAllocator(session)
+    awb_no = allocator.take(current_user.companyId, transporter_id)
+    if not awb_no:
+        raise HTTPException(status_code=404, detail="No available AWB numbers")
+    if not allocator.record(awb_no, used_for=used_for):
+        raise HTTPException(status_code=409, detail="AWB reservation lost, please retry")
+    session.commit()
+    return {"awbNo": awb_no, "transporterId": str(transporter_id), "usedFor": used_for}
+
+
+@router.post("/awb/replenish/{transporter_id}")
+async def replenish_awbs(
+    transporter_id: UUID,
+    count: int = Query(1000, ge=1, le=10000),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    _: None = Depends(require_admin())
+):
+    """Fetch AWB numbers from the carrier's waybill API into the pool."""
+    from app.models.transporter import Transporter
+    from app.services.carriers.awb_pool import AWBAllocator, replenish_awb_stock
+    from app.services.carriers.factory import get_carrier_for_company
+
+    transporter = session.get(Transporter, transporter_id)
+    if not transporter:
+        raise HTTPException(status_code=404, detail="Transporter not found")
+    if not current_user.companyId:
+        raise HTTPException(status_code=400, detail="No company context")
+
+    adapter = get_carrier_for_company(session, current_user.companyId, transporter.code)
+    if not adapter:
+        raise HTTPException(status_code=400, detail=f"No active {transporter.code} integration")
+
+    try:
+        result = await replenish_awb_stock(
+            session, current_user.companyId, transporter.id, adapter, count
+        )
+    except NotImplementedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Waybill fetch failed: {e}")
+
+    session.commit()
+    result["available"] = AWBAllocator(session).stock(current_user.companyId, transporter.id)
+    return result
+
+
 @router.post("/awb", response_model=AWBResponse, status_code=status.HTTP_201_CREATED)
 def create_awb(
     data: AWBCreate,
@@ -459,18 +609,19 @@ def use_awb(
     current_user: User = Depends(get_current_user)
 ):
     """Mark AWB as used."""
-    awb = session.get(AWB, awb_id)
-    if not awb:
-        raise HTTPException(status_code=404, detail="AWB not found")
-
-    if awb.isUsed:
+    # Conditional update, so two callers can't both claim the same AWB
+    table = AWB.__table__
+    now = datetime.utcnow()
+    row = session.execute(
+        table.update()
+        .where(table.c.id == awb_id, table.c.isUsed.is_(False))
+        .values(isUsed=True, usedAt=now, usedFor=used_for, updatedAt=now)
+        .returning(*table.c)
+    ).first()
+    if not row:
+        if not session.get(AWB, awb_id):
+            raise HTTPException(status_code=404, detail="AWB not found")
         raise HTTPException(status_code=400, detail="AWB already used")
 
-    awb.isUsed = True
-    awb.usedAt = datetime.utcnow()
-    awb.usedFor = used_for
-
-    session.add(awb)
     session.commit()
-    session.refresh(awb)
-    return AWBResponse.model_validate(awb)
+    return AWBResponse.model_validate(row._mapping)
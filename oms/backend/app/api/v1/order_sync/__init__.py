@@ -213,6 +213,32 @@ def get_sync_job(
     return job
 
 
+@router.get("/scheduled-runs/progress")
+def get_scheduled_run_progress(
+    job_type: SyncJobType = SyncJobType.ORDER_PULL,
+    scheduled_at: Optional[datetime] = None,
+    company_filter: CompanyFilter = Depends(),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Live progress of a scheduled sync run (latest by default): queued,
+    running and finished connections with their record counts.
+    """
+    from app.jobs.sync_scheduler import get_run_progress
+
+    progress = get_run_progress(
+        session,
+        job_type,
+        company_ids=None if company_filter.is_super_admin else (company_filter.company_ids or []),
+        scheduled_at=scheduled_at,
+    )
+    if progress is None:
+        raise HTTPException(status_code=404, detail="No scheduled sync run found")
+
+    return progress
+
+
 @router.post("/jobs/{job_id}/cancel")
 def cancel_sync_job(
     job_id: UUID,
@@ -7,7 +7,7 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
-from sqlmodel import Session, select, func
+from sqlmodel import Session, select
 
 from app.core.database import get_session
 from app.core.deps import get_current_user, CompanyFilter
@@ -18,6 +18,7 @@ from app.models import (
     PicklistStatus, OrderStatus,
     AllocationRequest, InventoryAllocation
 )
+from app.services.document_sequence import DocumentSequenceService
 from app.services.inventory_allocation import InventoryAllocationService
 
 router = APIRouter(prefix="/picklists", tags=["Picklists"])
@@ -38,8 +39,7 @@ class GeneratePicklistsResponse(BaseModel):
 
 def generate_picklist_number(session: Session) -> str:
     """Generate unique picklist number."""
-    count = session.exec(select(func.count(Picklist.id))).one()
-    return f"PL-{count + 1:06d}"
+    return DocumentSequenceService(session).picklist_numbers(1)[0]
 
 
 @router.post("", response_model=GeneratePicklistsResponse)
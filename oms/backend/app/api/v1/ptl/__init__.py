@@ -6,8 +6,10 @@ from datetime import datetime
 from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select, func
+import io
 
 from app.core.database import get_session
 from app.core.deps import get_current_user, require_manager, require_admin, CompanyFilter
@@ -17,6 +19,7 @@ from app.models import (
     Transporter,
     User
 )
+from app.services.lane_rates import LaneRateService, parse_lane_csv, lanes_to_csv
 
 router = APIRouter(prefix="/ptl", tags=["PTL - Part Truck Load / B2B"])
 
@@ -400,74 +403,8 @@ def compare_ptl_rates(
     current_user: User = Depends(get_current_user)
 ):
     """Compare PTL rates from all transporters for a lane and weight."""
-    query = select(PTLRateMatrix).where(
-        PTLRateMatrix.originCity.ilike(f"%{origin_city}%"),
-        PTLRateMatrix.destinationCity.ilike(f"%{destination_city}%"),
-        PTLRateMatrix.isActive == True,
-        PTLRateMatrix.validFrom <= datetime.utcnow(),
-        (PTLRateMatrix.validTo.is_(None)) | (PTLRateMatrix.validTo >= datetime.utcnow())
-    )
-
-    query = company_filter.apply_filter(query, PTLRateMatrix.companyId)
-
-    rate_entries = session.exec(query).all()
-
-    # Calculate rates for the given weight
-    result = []
-    for rm in rate_entries:
-        transporter = session.get(Transporter, rm.transporterId)
-
-        # Determine rate per kg based on weight slab
-        rate_per_kg = None
-        if weight_kg <= 50 and rm.rate0to50:
-            rate_per_kg = rm.rate0to50
-        elif weight_kg <= 100 and rm.rate50to100:
-            rate_per_kg = rm.rate50to100
-        elif weight_kg <= 250 and rm.rate100to250:
-            rate_per_kg = rm.rate100to250
-        elif weight_kg <= 500 and rm.rate250to500:
-            rate_per_kg = rm.rate250to500
-        elif weight_kg <= 1000 and rm.rate500to1000:
-            rate_per_kg = rm.rate500to1000
-        elif rm.rate1000plus:
-            rate_per_kg = rm.rate1000plus
-
-        if rate_per_kg is None:
-            continue  # Skip if no rate for this weight
-
-        # Calculate total
-        base_cost = float(rate_per_kg) * weight_kg
-        fod_charge = float(rm.fodCharge or 0)
-        oda_charge = float(rm.odaCharge or 0)
-        total_cost = max(base_cost + fod_charge + oda_charge, float(rm.minimumCharge or 0))
-
-        # Get TAT if available
-        tat_query = select(PTLTATMatrix).where(
-            PTLTATMatrix.originCity.ilike(f"%{origin_city}%"),
-            PTLTATMatrix.destinationCity.ilike(f"%{destination_city}%"),
-            PTLTATMatrix.transporterId == rm.transporterId,
-            PTLTATMatrix.isActive == True
-        )
-        tat_entry = session.exec(tat_query).first()
-
-        result.append({
-            "rateMatrixId": str(rm.id),
-            "transporterId": str(rm.transporterId),
-            "transporterName": transporter.name if transporter else "Unknown",
-            "ratePerKg": float(rate_per_kg),
-            "weightKg": weight_kg,
-            "baseCost": round(base_cost, 2),
-            "fodCharge": fod_charge,
-            "odaCharge": oda_charge,
-            "totalCost": round(total_cost, 2),
-            "minimumCharge": float(rm.minimumCharge or 0),
-            "codPercent": float(rm.codPercent or 0),
-            "transitDays": tat_entry.transitDays if tat_entry else None,
-            "onTimeDeliveryPercent": float(tat_entry.onTimeDeliveryPercent) if tat_entry and tat_entry.onTimeDeliveryPercent else None
-        })
-
-    # Sort by total cost
-    result.sort(key=lambda x: x["totalCost"])
+    service = LaneRateService(session, company_filter.company_ids)
+    result = service.compare_ptl(origin_city, destination_city, weight_kg)
 
     return {
         "originCity": origin_city,
@@ -478,6 +415,53 @@ def compare_ptl_rates(
     }
 
 
+@router.post("/rate-comparison/bulk")
+async def compare_ptl_rates_bulk(
+    file: UploadFile = File(...),
+    company_filter: CompanyFilter = Depends(),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Rate a CSV of lanes for B2B quoting: cheapest and fastest PTL option
+    per lane, returned as CSV.
+
+    CSV Format:
+    origin_city, destination_city, weight_kg
+    """
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="File must be a CSV")
+
+    rows, errors = parse_lane_csv(
+        await file.read(),
+        columns=["origin_city", "destination_city", "weight_kg"],
+        required=["origin_city", "destination_city", "weight_kg"],
+    )
+    lanes = []
+    for row in rows:
+        try:
+            weight_kg = float(row["weight_kg"])
+        except ValueError:
+            weight_kg = 0
+        if weight_kg <= 0:
+            errors.append(f"Invalid weight_kg '{row['weight_kg']}' for {row['origin_city']} -> {row['destination_city']}")
+            continue
+        lanes.append((row["origin_city"], row["destination_city"], weight_kg))
+
+    if not lanes:
+        raise HTTPException(status_code=400, detail={"message": "No valid lanes", "errors": errors[:50]})
+
+    results = LaneRateService(session, company_filter.company_ids).compare_ptl_bulk(lanes)
+    return StreamingResponse(
+        io.BytesIO(lanes_to_csv(results).encode()),
+        media_type="text/csv",
+        headers={
+            "Content-Disposition": "attachment; filename=ptl_rate_comparison.csv",
+            "X-Skipped-Rows": str(len(errors)),
+        }
+    )
+
+
 @router.post("/calculate-rate")
 def calculate_ptl_rate(
     origin_city: str,
@@ -489,66 +473,35 @@ def calculate_ptl_rate(
     current_user: User = Depends(get_current_user)
 ):
     """Calculate PTL shipping rate for a specific transporter."""
-    query = select(PTLRateMatrix).where(
-        PTLRateMatrix.originCity.ilike(f"%{origin_city}%"),
-        PTLRateMatrix.destinationCity.ilike(f"%{destination_city}%"),
-        PTLRateMatrix.transporterId == transporter_id,
-        PTLRateMatrix.isActive == True,
-        PTLRateMatrix.validFrom <= datetime.utcnow(),
-        (PTLRateMatrix.validTo.is_(None)) | (PTLRateMatrix.validTo >= datetime.utcnow())
-    )
-
-    query = company_filter.apply_filter(query, PTLRateMatrix.companyId)
-
-    rm = session.exec(query).first()
-    if not rm:
+    from app.services.lane_rates import city_key, ptl_slab_label
+
+    service = LaneRateService(session, company_filter.company_ids)
+    lane_rates = service.ptl_lane_rates([(origin_city, destination_city)])[
+        (city_key(origin_city), city_key(destination_city))
+    ]
+    rate = next((r for r in lane_rates if r.transporter_id == transporter_id), None)
+    if not rate:
         raise HTTPException(status_code=404, detail="Rate matrix entry not found for this lane and transporter")
 
-    transporter = session.get(Transporter, rm.transporterId)
-
-    # Determine rate per kg based on weight slab
-    rate_per_kg = None
-    weight_slab = ""
-    if weight_kg <= 50:
-        rate_per_kg = rm.rate0to50
-        weight_slab = "0-50 kg"
-    elif weight_kg <= 100:
-        rate_per_kg = rm.rate50to100
-        weight_slab = "50-100 kg"
-    elif weight_kg <= 250:
-        rate_per_kg = rm.rate100to250
-        weight_slab = "100-250 kg"
-    elif weight_kg <= 500:
-        rate_per_kg = rm.rate250to500
-        weight_slab = "250-500 kg"
-    elif weight_kg <= 1000:
-        rate_per_kg = rm.rate500to1000
-        weight_slab = "500-1000 kg"
-    else:
-        rate_per_kg = rm.rate1000plus
-        weight_slab = "1000+ kg"
-
-    if rate_per_kg is None:
-        raise HTTPException(status_code=400, detail=f"No rate configured for weight slab: {weight_slab}")
-
-    # Calculate total
-    base_cost = float(rate_per_kg) * weight_kg
-    fod_charge = float(rm.fodCharge or 0)
-    oda_charge = float(rm.odaCharge or 0)
-    total_cost = max(base_cost + fod_charge + oda_charge, float(rm.minimumCharge or 0))
+    priced = rate.price(weight_kg, strict=True)
+    if priced is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"No rate configured for weight slab: {ptl_slab_label(weight_kg)}"
+        )
 
     return {
         "originCity": origin_city,
         "destinationCity": destination_city,
         "transporterId": str(transporter_id),
-        "transporterName": transporter.name if transporter else "Unknown",
+        "transporterName": priced["transporterName"],
         "weightKg": weight_kg,
-        "weightSlab": weight_slab,
-        "ratePerKg": float(rate_per_kg),
-        "baseCost": round(base_cost, 2),
-        "fodCharge": fod_charge,
-        "odaCharge": oda_charge,
-        "minimumChargeApplied": total_cost == float(rm.minimumCharge or 0),
-        "totalCost": round(total_cost, 2),
-        "codPercent": float(rm.codPercent or 0)
+        "weightSlab": priced["weightSlab"],
+        "ratePerKg": priced["ratePerKg"],
+        "baseCost": priced["baseCost"],
+        "fodCharge": priced["fodCharge"],
+        "odaCharge": priced["odaCharge"],
+        "minimumChargeApplied": priced["minimumChargeApplied"],
+        "totalCost": priced["totalCost"],
+        "codPercent": priced["codPercent"]
     }
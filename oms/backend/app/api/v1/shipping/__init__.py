@@ -6,7 +6,8 @@ from datetime import datetime
 from typing import List, Optional
 from uuid import UUID, uuid4
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlmodel import Session, select, func
 
@@ -16,6 +17,7 @@ from app.models import (
     Order, Delivery, DeliveryResponse, User,
     OrderStatus, DeliveryStatus,
 )
+from app.models.shipment import BulkShipJob, BulkShipJobItem, BulkShipJobResponse
 from app.models.transporter import (
     Transporter, TransporterConfig, Manifest, ManifestCreate, ManifestStatus,
 )
@@ -35,6 +37,7 @@ class RateCheckRequest(BaseModel):
     weightGrams: int = 500
     paymentMode: str = "PREPAID"
     codAmount: float = 0
+    live: bool = False  # Ask carrier APIs even where a rate card can price locally
 
 
 class BulkAssignCarrierRequest(BaseModel):
@@ -55,6 +58,22 @@ class BulkGenerateLabelsRequest(BaseModel):
     deliveryIds: List[str]
 
 
+class BulkShipOrderRequest(BaseModel):
+    orderId: UUID
+    carrierCode: Optional[str] = None  # Falls back to the request's carrierCode, then allocation rules
+    weightGrams: int = 500
+    lengthCm: float = 10
+    breadthCm: float = 10
+    heightCm: float = 10
+
+
+class BulkShipRequest(BaseModel):
+    orders: List[BulkShipOrderRequest]
+    carrierCode: Optional[str] = None
+    createManifests: bool = False
+    fetchLabels: bool = True
+
+
 # ── Rate Check ────────────────────────────────────────────────────────────
 
 
@@ -74,10 +93,172 @@ async def rate_check(
         weight_grams=body.weightGrams,
         payment_mode=body.paymentMode,
         cod_amount=body.codAmount,
+        live=body.live,
     )
     return result
 
 
+# ── Bulk Ship ─────────────────────────────────────────────────────────────
+
+
+def _get_bulk_ship_job(session: Session, job_id: UUID, company_filter: CompanyFilter) -> BulkShipJob:
+    job = session.get(BulkShipJob, job_id)
+    if not job or (company_filter.company_ids is not None and job.companyId not in company_filter.company_ids):
+        raise HTTPException(status_code=404, detail="Bulk ship job not found")
+    return job
+
+
+def _bulk_ship_item(item: BulkShipJobItem) -> dict:
+    return {
+        "seq": item.seq,
+        "orderId": str(item.orderId),
+        "orderNo": item.orderNo,
+        "carrierCode": item.carrierCode,
+        "success": item.success,
+        "awbNo": item.awbNo,
+        "deliveryId": str(item.deliveryId) if item.deliveryId else None,
+        "labelUrl": item.labelUrl,
+        "error": item.error,
+    }
+
+
+@router.post("/bulk-ship", status_code=status.HTTP_202_ACCEPTED)
+def bulk_ship(
+    body: BulkShipRequest,
+    background_tasks: BackgroundTasks,
+    company_filter: CompanyFilter = Depends(),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    _: None = Depends(require_manager()),
+):
+    """
+    Book many orders with their carriers in one background job.
+    Orders are grouped by carrier and booked through batch APIs where the
+    carrier has one; follow progress via /bulk-ship/{jobId}/stream.
+    """
+    from app.services.bulk_shipping import (
+        BULK_SHIP_MAX_ORDERS, BulkShipEngine, BulkShipOrder, run_bulk_ship_job,
+    )
+
+    if not company_filter.company_id:
+        raise HTTPException(status_code=400, detail="No company context")
+    if not body.orders:
+        raise HTTPException(status_code=400, detail="No orders provided")
+    if len(body.orders) > BULK_SHIP_MAX_ORDERS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {BULK_SHIP_MAX_ORDERS} orders per bulk ship job"
+        )
+
+    orders = [
+        BulkShipOrder(
+            order_id=o.orderId,
+            carrier_code=o.carrierCode or body.carrierCode,
+            weight_grams=o.weightGrams,
+            length_cm=o.lengthCm,
+            breadth_cm=o.breadthCm,
+            height_cm=o.heightCm,
+        )
+        for o in body.orders
+    ]
+    job = BulkShipEngine(session).create_job(
+        company_filter.company_id,
+        total=len({o.order_id for o in orders}),
+        create_manifests=body.createManifests,
+        fetch_labels=body.fetchLabels,
+        created_by=current_user.id,
+    )
+    background_tasks.add_task(run_bulk_ship_job, job.id, orders)
+
+    return {"jobId": str(job.id), "status": job.status, "total": job.total}
+
+
+@router.get("/bulk-ship/{job_id}", response_model=BulkShipJobResponse)
+def get_bulk_ship_job(
+    job_id: UUID,
+    company_filter: CompanyFilter = Depends(),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """Progress counters of a bulk ship job."""
+    return _get_bulk_ship_job(session, job_id, company_filter)
+
+
+@router.get("/bulk-ship/{job_id}/items")
+def list_bulk_ship_items(
+    job_id: UUID,
+    after_seq: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    company_filter: CompanyFilter = Depends(),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """Per-order results after `after_seq` (page with the last seq returned)."""
+    job = _get_bulk_ship_job(session, job_id, company_filter)
+    items = session.exec(
+        select(BulkShipJobItem)
+        .where(BulkShipJobItem.jobId == job.id, BulkShipJobItem.seq > after_seq)
+        .order_by(BulkShipJobItem.seq)
+        .limit(limit)
+    ).all()
+    return {
+        "status": job.status,
+        "items": [_bulk_ship_item(i) for i in items],
+        "lastSeq": items[-1].seq if items else after_seq,
+    }
+
+
+@router.get("/bulk-ship/{job_id}/stream")
+def stream_bulk_ship_job(
+    job_id: UUID,
+    company_filter: CompanyFilter = Depends(),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Per-order results as newline-delimited JSON while the job runs,
+    ending with a {"job": {...}} summary line. The summary has
+    "stalled": true if the job stopped sending heartbeats while RUNNING
+    (its worker died), instead of the stream waiting for it forever.
+    """
+    import json
+    import time as _time
+    from datetime import timedelta
+    from app.core.database import engine
+    from app.services.bulk_shipping import BULK_SHIP_STALE_SECONDS
+
+    job_id = _get_bulk_ship_job(session, job_id, company_filter).id
+
+    def lines():
+        last_seq = 0
+        with Session(engine) as stream_session:
+            while True:
+                job = stream_session.get(BulkShipJob, job_id, populate_existing=True)
+                items = stream_session.exec(
+                    select(BulkShipJobItem)
+                    .where(BulkShipJobItem.jobId == job_id, BulkShipJobItem.seq > last_seq)
+                    .order_by(BulkShipJobItem.seq)
+                    .limit(1000)
+                ).all()
+                for item in items:
+                    last_seq = item.seq
+                    yield json.dumps(_bulk_ship_item(item)) + "\n"
+                stalled = job.status == "RUNNING" and (
+                    job.updatedAt.replace(tzinfo=None)
+                    < datetime.utcnow() - timedelta(seconds=BULK_SHIP_STALE_SECONDS)
+                )
+                if not items and (job.status != "RUNNING" or stalled):
+                    summary = BulkShipJobResponse.model_validate(job).model_dump(mode="json")
+                    if stalled:
+                        summary["stalled"] = True
+                    yield json.dumps({"job": summary}) + "\n"
+                    return
+                stream_session.rollback()  # End the snapshot so the next poll sees new commits
+                if not items:
+                    _time.sleep(1)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 # ── Labels ────────────────────────────────────────────────────────────────
 
 
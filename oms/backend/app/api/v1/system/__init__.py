@@ -1,11 +1,12 @@
 """
-System API v1 - Audit Logs, Exceptions, Sequences
+System API v1 - Audit Logs, Exceptions, Sequences, Event Bus Metrics
 """
 from datetime import datetime
 from typing import List, Optional
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import PlainTextResponse
 from sqlmodel import Session, select, func
 
 from app.core.database import get_session
@@ -16,6 +17,7 @@ from app.models import (
     Sequence, SequenceCreate, SequenceResponse,
     User
 )
+from app.services.document_sequence import DocumentSequenceService
 
 router = APIRouter(prefix="/system", tags=["System"])
 
@@ -298,20 +300,42 @@ def get_next_sequence_value(
     current_user: User = Depends(get_current_user)
 ):
     """Get next sequence value and increment."""
-    query = select(Sequence).where(Sequence.name == sequence_name)
-    sequence = session.exec(query).first()
+    # Increment in SQL so concurrent callers never receive the same value
+    sequence = DocumentSequenceService(session).advance(sequence_name)
 
     if not sequence:
         raise HTTPException(status_code=404, detail="Sequence not found")
 
-    # Get current value and increment
-    current = sequence.currentValue
-    sequence.currentValue += sequence.increment
+    current = sequence.currentValue - sequence.increment
 
     # Build formatted value
     value = f"{sequence.prefix or ''}{current:06d}{sequence.suffix or ''}"
 
-    session.add(sequence)
     session.commit()
 
     return {"value": value, "raw_value": current}
+
+
+# ============================================================================
+# Event Bus Metrics Endpoints
+# ============================================================================
+
+@router.get("/event-metrics")
+def get_event_bus_metrics(
+    _: None = Depends(require_admin())
+):
+    """Event dispatcher pool and per-handler metrics. Admin only."""
+    from app.services.event_dispatcher import get_event_metrics
+    return get_event_metrics()
+
+
+@router.get("/event-metrics/prometheus", response_class=PlainTextResponse)
+def get_event_bus_metrics_prometheus(
+    _: None = Depends(require_admin())
+):
+    """Event dispatcher metrics in Prometheus text format. Admin only."""
+    from app.services.event_dispatcher import render_prometheus_metrics
+    return PlainTextResponse(
+        render_prometheus_metrics(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -20,6 +20,7 @@ from app.models import (
     WaveType, WaveStatus, PicklistStatus, OrderStatus,
     AllocationRequest, InventoryAllocation
 )
+from app.services.document_sequence import DocumentSequenceService
 from app.services.inventory_allocation import InventoryAllocationService
 
 router = APIRouter(prefix="/waves", tags=["Waves"])
@@ -115,21 +116,8 @@ def create_wave(
 
         # Auto-generate waveNo if not provided
         if not wave_dict.get("waveNo"):
-            # Get next wave number for today
-            today = datetime.utcnow().strftime("%Y%m%d")
-            # Find the maximum existing wave number for today
-            existing_waves = session.exec(
-                select(Wave.waveNo).where(Wave.waveNo.like(f"WAVE-{today}-%"))
-            ).all()
-            max_num = 0
-            for wn in existing_waves:
-                try:
-                    num = int(wn.split("-")[-1])
-                    if num > max_num:
-                        max_num = num
-                except (ValueError, IndexError):
-                    pass
-            wave_dict["waveNo"] = f"WAVE-{today}-{max_num + 1:03d}"
+            # Next wave number for today from the document sequence
+            wave_dict["waveNo"] = DocumentSequenceService(session).wave_number()
 
         # Set createdById from current user if not provided
         if not wave_dict.get("createdById"):
@@ -561,12 +549,6 @@ def add_order_to_wave(
 # Picklist Generation with FIFO/LIFO/FEFO Allocation
 # ============================================================================
 
-def generate_picklist_number(session: Session) -> str:
-    """Generate unique picklist number."""
-    count = session.exec(select(func.count(Picklist.id))).one()
-    return f"PL-{count + 1:06d}"
-
-
 @router.post("/{wave_id}/generate-picklists")
 def generate_picklists_with_allocation(
     wave_id: UUID,
@@ -579,7 +561,7 @@ def generate_picklists_with_allocation(
 
     This endpoint:
     1. Gets all orders in the wave
-    2. For each order's items, allocates inventory using configured valuation method
+    2. Allocates all order items in one batch using configured valuation method
     3. Creates picklist items with bin locations
     4. Updates order status to ALLOCATED or PARTIALLY_ALLOCATED
 
@@ -632,93 +614,115 @@ def generate_picklists_with_allocation(
             "shortfalls": []
         }
 
-        # Process each order
+        # Prefetch orders and their items for the whole wave
+        order_ids = [wo.orderId for wo in wave_orders]
+        orders = {
+            o.id: o for o in session.exec(select(Order).where(Order.id.in_(order_ids))).all()
+        }
+        items_by_order = {}
+        for order_item in session.exec(
+            select(OrderItem).where(OrderItem.orderId.in_(order_ids))
+        ).all():
+            items_by_order.setdefault(order_item.orderId, []).append(order_item)
+
+        # Create a picklist per order, then allocate the whole wave in one batch
+        # Note: Picklist model doesn't have waveId/locationId - those are tracked via order
+        picklist_orders = []
         for wave_order in wave_orders:
-            order = session.get(Order, wave_order.orderId)
+            order = orders.get(wave_order.orderId)
             if not order:
                 continue
 
             results["orders_processed"] += 1
 
-            # Get order items
-            order_items = session.exec(
-                select(OrderItem).where(OrderItem.orderId == order.id)
-            ).all()
-
-            if not order_items:
-                continue
+            if items_by_order.get(order.id):
+                picklist_orders.append(order)
 
-            # Create a picklist for this order
-            # Note: Picklist model doesn't have waveId/locationId - those are tracked via order
+        picklist_nos = DocumentSequenceService(session).picklist_numbers(len(picklist_orders))
+        picklists = {}
+        requests = []
+        request_items = []
+        for order, picklist_no in zip(picklist_orders, picklist_nos):
             picklist = Picklist(
-                picklistNo=generate_picklist_number(session),
+                picklistNo=picklist_no,
                 orderId=order.id,
                 status=PicklistStatus.PENDING,
                 companyId=company_id,
             )
             session.add(picklist)
-            session.flush()  # Get picklist ID
+            picklists[order.id] = picklist
 
-            order_fully_allocated = True
-            order_has_allocations = False
+        session.flush()  # Get picklist IDs
 
-            # Process each order item
-            for order_item in order_items:
-                # Create allocation request
-                request = AllocationRequest(
+        for order_id, picklist in picklists.items():
+            for order_item in items_by_order[order_id]:
+                requests.append(AllocationRequest(
                     skuId=order_item.skuId,
                     requiredQty=order_item.quantity,
                     locationId=wave.locationId,
-                    orderId=order.id,
+                    orderId=order_id,
                     orderItemId=order_item.id,
                     waveId=wave_id,
                     picklistId=picklist.id,
-                )
-
-                # Allocate inventory
-                result = allocation_service.allocate_inventory(
-                    request=request,
-                    company_id=company_id,
-                    allocated_by_id=current_user.id
-                )
-
-                if result.allocatedQty > 0:
-                    order_has_allocations = True
-                    results["items_allocated"] += len(result.allocations)
-                    results["total_quantity_allocated"] += result.allocatedQty
-
-                    # Create picklist items from allocations
-                    for alloc in result.allocations:
-                        # Get bin code
-                        bin_obj = session.get(Bin, alloc.binId)
-
-                        picklist_item = PicklistItem(
-                            picklistId=picklist.id,
-                            skuId=alloc.skuId,
-                            binId=alloc.binId,
-                            requiredQty=alloc.allocatedQty,
-                            pickedQty=0,
-                            batchNo=None,  # Can be enhanced to pull from allocation
-                        )
-                        session.add(picklist_item)
-
-                if result.shortfallQty > 0:
-                    order_fully_allocated = False
-                    # Get SKU info for shortfall report
-                    sku = session.get(SKU, order_item.skuId)
-                    results["shortfalls"].append({
-                        "order_id": str(order.id),
-                        "order_no": order.orderNo,
-                        "sku_id": str(order_item.skuId),
-                        "sku_code": sku.code if sku else "Unknown",
-                        "required_qty": order_item.quantity,
-                        "allocated_qty": result.allocatedQty,
-                        "shortfall_qty": result.shortfallQty
-                    })
-
-            # Update order status
-            if order_has_allocations:
-                if order_fully_allocated:
+                ))
+                request_items.append(order_item)
+
+        allocation_results = allocation_service.batch_allocate(
+            requests,
+            company_id=company_id,
+            allocated_by_id=current_user.id,
+            commit=False
+        )
+
+        sku_codes = dict(session.exec(
+            select(SKU.id, SKU.code).where(SKU.id.in_({r.skuId for r in requests}))
+        ).all()) if requests else {}
+
+        # Build picklist items and per-order outcome from batch results
+        order_state = {
+            order_id: {"fully_allocated": True, "has_allocations": False}
+            for order_id in picklists
+        }
+        picklist_items = []
+        for order_item, result in zip(request_items, allocation_results):
+            state = order_state[order_item.orderId]
+            picklist = picklists[order_item.orderId]
+
+            if result.allocatedQty > 0:
+                state["has_allocations"] = True
+                results["items_allocated"] += len(result.allocations)
+                results["total_quantity_allocated"] += result.allocatedQty
+
+                # Create picklist items from allocations
+                for alloc in result.allocations:
+                    picklist_items.append(PicklistItem(
+                        picklistId=picklist.id,
+                        skuId=alloc.skuId,
+                        binId=alloc.binId,
+                        requiredQty=alloc.allocatedQty,
+                        pickedQty=0,
+                        batchNo=None,  # Can be enhanced to pull from allocation
+                    ))
+
+            if result.shortfallQty > 0:
+                state["fully_allocated"] = False
+                results["shortfalls"].append({
+                    "order_id": str(order_item.orderId),
+                    "order_no": orders[order_item.orderId].orderNo,
+                    "sku_id": str(order_item.skuId),
+                    "sku_code": sku_codes.get(order_item.skuId, "Unknown"),
+                    "required_qty": order_item.quantity,
+                    "allocated_qty": result.allocatedQty,
+                    "shortfall_qty": result.shortfallQty
+                })
+
+        session.add_all(picklist_items)
+
+        # Update order status
+        for order_id, state in order_state.items():
+            order = orders[order_id]
+            if state["has_allocations"]:
+                if state["fully_allocated"]:
                     order.status = OrderStatus.ALLOCATED
                     results["orders_fully_allocated"] += 1
                 else:
@@ -729,7 +733,7 @@ def generate_picklists_with_allocation(
             else:
                 results["orders_not_allocated"] += 1
                 # Remove empty picklist
-                session.delete(picklist)
+                session.delete(picklists[order_id])
 
         # Update wave status if all orders have allocations
         if results["orders_processed"] > 0:
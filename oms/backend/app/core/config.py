@@ -4,7 +4,7 @@ Loads settings from environment variables with validation
 """
 from pydantic_settings import BaseSettings
 from pydantic import Field
-from typing import Optional
+from typing import Dict, Optional
 from functools import lru_cache
 
 
@@ -50,6 +50,24 @@ class Settings(BaseSettings):
     DB_MAX_OVERFLOW: int = 10
     DB_POOL_TIMEOUT: int = 30
 
+    # Event Dispatcher
+    EVENT_WORKERS: int = 8  # Handler threads (each holds a DB connection while running)
+    EVENT_QUEUE_SIZE: int = 1000  # Queued handler runs before dispatch() applies backpressure
+    EVENT_QUEUE_TIMEOUT: float = 5.0  # Seconds dispatch() waits for a slot before deferring to the outbox
+    EVENT_MAX_RETRIES: int = 3
+    EVENT_RETRY_BACKOFF_SECONDS: float = 1.0
+    EVENT_OUTBOX_ENABLED: bool = False  # Persist deliveries in EventOutbox so they survive restarts (requires migrations/event_outbox.sql)
+
+    # Carrier Rate Quote Cache
+    RATE_CACHE_ENABLED: bool = True
+    RATE_CACHE_SHARED: bool = False  # Also share quotes across processes via the RateQuoteCache table
+    RATE_CACHE_TTL_SECONDS: int = 6 * 3600  # Default per-lane TTL
+    RATE_CACHE_CARRIER_TTL_SECONDS: Dict[str, int] = Field(default_factory=lambda: {
+        "SHIPROCKET": 3 * 3600,  # Aggregator, courier mix changes during the day
+    })  # Per-carrier TTL overrides, JSON in the environment (e.g. {"SHIPROCKET": 10800})
+    RATE_CACHE_STALE_SECONDS: int = 3600  # Serve expired quotes this long while refreshing
+    RATE_CACHE_NEGATIVE_TTL_SECONDS: int = 3600  # Unserviceable lanes
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
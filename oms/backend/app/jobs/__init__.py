@@ -5,6 +5,7 @@ Scheduled tasks for OMS marketplace sync operations
 from .order_sync_job import OrderSyncJob, run_order_sync_all, run_order_sync_connection
 from .inventory_sync_job import InventorySyncJob, run_inventory_push_all, run_inventory_push_connection
 from .settlement_sync_job import SettlementSyncJob, run_settlement_fetch_all, run_settlement_fetch_connection
+from .sync_scheduler import SyncScheduler, get_run_progress
 from .token_refresh_job import TokenRefreshJob, run_token_refresh, run_token_refresh_connection
 
 __all__ = [
@@ -13,6 +14,7 @@ __all__ = [
     "InventorySyncJob",
     "SettlementSyncJob",
     "TokenRefreshJob",
+    "SyncScheduler",
     # Entry point functions
     "run_order_sync_all",
     "run_order_sync_connection",
@@ -22,4 +24,6 @@ __all__ = [
     "run_settlement_fetch_connection",
     "run_token_refresh",
     "run_token_refresh_connection",
+    # Progress
+    "get_run_progress",
 ]
@@ -14,9 +14,9 @@ from app.models import (
     MarketplaceSyncJob,
     SyncJobType,
     SyncJobStatus,
-    ConnectionStatus,
 )
 from app.services.marketplaces import SyncCoordinator
+from .sync_scheduler import SyncScheduler
 
 logger = logging.getLogger(__name__)
 
@@ -37,14 +37,6 @@ class InventorySyncJob:
         try:
             logger.info(f"Starting inventory push for {connection.connectionName} ({connection.id})")
 
-            # Create sync job record
-            job = await self.coordinator.create_sync_job(
-                company_id=connection.companyId,
-                connection_id=connection.id,
-                job_type=SyncJobType.INVENTORY_PUSH,
-                triggered_by="SCHEDULED"
-            )
-
             # Run the push
             result = await self.coordinator.push_inventory(
                 connection_id=connection.id,
@@ -64,38 +56,11 @@ class InventorySyncJob:
             }
 
     async def push_all(self, company_id: Optional[str] = None) -> List[dict]:
-        """Push inventory to all active connections"""
-        results = []
-
-        # Get all active connections
-        query = select(MarketplaceConnection).where(
-            MarketplaceConnection.status == ConnectionStatus.CONNECTED,
-            MarketplaceConnection.isActive == True
-        )
-
-        if company_id:
-            from uuid import UUID
-            query = query.where(MarketplaceConnection.companyId == UUID(company_id))
-
-        connections = self.session.exec(query).all()
-        logger.info(f"Found {len(connections)} active connections for inventory push")
-
-        for connection in connections:
-            # Check if sync is enabled for this connection
-            sync_settings = connection.syncSettings or {}
-            if not sync_settings.get("inventory_sync_enabled", True):
-                logger.info(f"Skipping {connection.connectionName} - inventory sync disabled")
-                continue
-
-            result = await self.push_connection(connection)
-            results.append({
-                "connection_id": str(connection.id),
-                "connection_name": connection.connectionName,
-                "marketplace": connection.marketplace.value,
-                **result
-            })
-
-        return results
+        """Push inventory to all active connections (concurrently, stalest first)"""
+        from uuid import UUID
+
+        scheduler = SyncScheduler(SyncJobType.INVENTORY_PUSH)
+        return await scheduler.run(UUID(company_id) if company_id else None)
 
 
 async def run_inventory_push_all():
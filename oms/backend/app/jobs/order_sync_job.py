@@ -14,9 +14,9 @@ from app.models import (
     MarketplaceSyncJob,
     SyncJobType,
     SyncJobStatus,
-    ConnectionStatus,
 )
 from app.services.marketplaces import SyncCoordinator, AdapterFactory
+from .sync_scheduler import SyncScheduler
 
 logger = logging.getLogger(__name__)
 
@@ -41,14 +41,6 @@ class OrderSyncJob:
 
             logger.info(f"Starting order sync for {connection.connectionName} ({connection.id})")
 
-            # Create sync job record
-            job = await self.coordinator.create_sync_job(
-                company_id=connection.companyId,
-                connection_id=connection.id,
-                job_type=SyncJobType.ORDER_PULL,
-                triggered_by="SCHEDULED"
-            )
-
             # Run the sync
             result = await self.coordinator.sync_orders(
                 connection_id=connection.id,
@@ -68,32 +60,11 @@ class OrderSyncJob:
             }
 
     async def sync_all(self, company_id: Optional[str] = None) -> List[dict]:
-        """Sync orders from all active connections"""
-        results = []
-
-        # Get all active connections
-        query = select(MarketplaceConnection).where(
-            MarketplaceConnection.status == ConnectionStatus.CONNECTED,
-            MarketplaceConnection.isActive == True
-        )
-
-        if company_id:
-            from uuid import UUID
-            query = query.where(MarketplaceConnection.companyId == UUID(company_id))
-
-        connections = self.session.exec(query).all()
-        logger.info(f"Found {len(connections)} active connections for order sync")
-
-        for connection in connections:
-            result = await self.sync_connection(connection)
-            results.append({
-                "connection_id": str(connection.id),
-                "connection_name": connection.connectionName,
-                "marketplace": connection.marketplace.value,
-                **result
-            })
-
-        return results
+        """Sync orders from all active connections (concurrently, stalest first)"""
+        from uuid import UUID
+
+        scheduler = SyncScheduler(SyncJobType.ORDER_PULL)
+        return await scheduler.run(UUID(company_id) if company_id else None)
 
 
 async def run_order_sync_all():
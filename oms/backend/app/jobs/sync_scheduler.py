@@ -0,0 +1,361 @@
+"""
+Sync Scheduler
+Runs the periodic order pull / inventory push across all marketplace
+connections concurrently instead of one connection after another.
+
+- Connections run stalest first: by lastSyncAt for order pulls, by the last
+  finished push for inventory; never-synced connections go first
+- SYNC_CONCURRENCY caps connections in flight overall and
+  MARKETPLACE_SYNC_CONCURRENCY caps each marketplace (their API quotas are
+  per app, shared by every seller we sync)
+- Each connection runs on its own Session and SyncCoordinator, so a slow or
+  failing tenant never holds up (or rolls back) another
+- A run queues one MarketplaceSyncJob per connection up front, all sharing
+  the run's scheduledAt; get_run_progress() reads the run back from them
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import func, update
+from sqlmodel import Session, select
+
+from app.core.database import engine
+from app.models import (
+    MarketplaceConnection,
+    MarketplaceSyncJob,
+    SyncJobType,
+    SyncJobStatus,
+    ConnectionStatus,
+)
+from app.services.marketplaces import SyncCoordinator
+
+logger = logging.getLogger(__name__)
+
+
+# Connections in flight at once (each holds a pooled DB connection while it queries)
+SYNC_CONCURRENCY = 8
+
+# Connections in flight per marketplace
+MARKETPLACE_SYNC_CONCURRENCY: Dict[str, int] = {
+    "AMAZON": 4,
+    "FLIPKART": 4,
+    "SHOPIFY": 6,
+    "MYNTRA": 2,
+}
+DEFAULT_MARKETPLACE_CONCURRENCY = 3
+
+# One connection may not hold its slots longer than this
+SYNC_CONNECTION_TIMEOUT_SECONDS = 600
+
+SCHEDULED_TRIGGER = "SCHEDULED"
+
+_OPEN_STATUSES = [SyncJobStatus.QUEUED, SyncJobStatus.IN_PROGRESS]
+
+
+@dataclass
+class SyncTarget:
+    """One connection queued in a run (plain values, safe across sessions)."""
+    connection_id: UUID
+    connection_name: str
+    marketplace: str
+    job_id: UUID
+
+
+class SyncScheduler:
+    """
+    Concurrent order pull / inventory push over marketplace connections.
+
+    Usage:
+        scheduler = SyncScheduler(SyncJobType.ORDER_PULL)
+        results = await scheduler.run()
+    """
+
+    def __init__(self, job_type: SyncJobType, concurrency: int = SYNC_CONCURRENCY):
+        if job_type not in (SyncJobType.ORDER_PULL, SyncJobType.INVENTORY_PUSH):
+            raise ValueError(f"Unsupported sync job type: {job_type.value}")
+        self.job_type = job_type
+        self.concurrency = concurrency
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def run(self, company_id: Optional[UUID] = None) -> List[dict]:
+        """Sync every active connection (of one company, if given)."""
+        run_at = datetime.utcnow()
+        started = time.perf_counter()
+
+        with Session(engine) as session:
+            targets = self._queue(session, company_id, run_at)
+
+        if not targets:
+            return []
+
+        logger.info(
+            f"Sync run {self.job_type.value} @ {run_at.isoformat()}: "
+            f"{len(targets)} connections, concurrency {self.concurrency}"
+        )
+
+        # Tasks are created stalest first and semaphores wake waiters FIFO,
+        # so slots are handed out in staleness order
+        slots = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._run_one(target, slots) for target in targets))
+
+        success_count = len([r for r in results if r.get("success", False)])
+        logger.info(
+            f"Sync run {self.job_type.value} @ {run_at.isoformat()} finished in "
+            f"{time.perf_counter() - started:.1f}s: "
+            f"{success_count} success, {len(results) - success_count} failed"
+        )
+        return results
+
+    # ========================================================================
+    # Queueing
+    # ========================================================================
+
+    def _queue(
+        self,
+        session: Session,
+        company_id: Optional[UUID],
+        run_at: datetime,
+    ) -> List[SyncTarget]:
+        connections = self._connections(session, company_id)
+
+        if self.job_type == SyncJobType.INVENTORY_PUSH:
+            enabled = []
+            for connection in connections:
+                if (connection.syncSettings or {}).get("inventory_sync_enabled", True):
+                    enabled.append(connection)
+                else:
+                    logger.info(f"Skipping {connection.connectionName} - inventory sync disabled")
+            connections = enabled
+
+        logger.info(f"Found {len(connections)} active connections for {self.job_type.value}")
+
+        jobs = [
+            MarketplaceSyncJob(
+                companyId=connection.companyId,
+                connectionId=connection.id,
+                jobType=self.job_type,
+                status=SyncJobStatus.QUEUED,
+                # Stalest connection gets the highest priority
+                priority=len(connections) - rank,
+                scheduledAt=run_at,
+                triggeredBy=SCHEDULED_TRIGGER,
+            )
+            for rank, connection in enumerate(connections)
+        ]
+        session.add_all(jobs)
+        session.commit()
+
+        return [
+            SyncTarget(
+                connection_id=connection.id,
+                connection_name=connection.connectionName,
+                marketplace=connection.marketplace.value,
+                job_id=job.id,
+            )
+            for connection, job in zip(connections, jobs)
+        ]
+
+    def _connections(
+        self,
+        session: Session,
+        company_id: Optional[UUID],
+    ) -> List[MarketplaceConnection]:
+        """Active connections, stalest first."""
+        query = select(MarketplaceConnection).where(
+            MarketplaceConnection.status == ConnectionStatus.CONNECTED,
+            MarketplaceConnection.isActive == True
+        )
+        if company_id:
+            query = query.where(MarketplaceConnection.companyId == company_id)
+
+        if self.job_type == SyncJobType.INVENTORY_PUSH:
+            last_push = (
+                select(
+                    MarketplaceSyncJob.connectionId,
+                    func.max(MarketplaceSyncJob.completedAt).label("lastPushAt"),
+                )
+                .where(
+                    MarketplaceSyncJob.jobType == SyncJobType.INVENTORY_PUSH,
+                    MarketplaceSyncJob.status.in_([SyncJobStatus.COMPLETED, SyncJobStatus.PARTIAL]),
+                )
+                .group_by(MarketplaceSyncJob.connectionId)
+                .subquery()
+            )
+            query = query.outerjoin(
+                last_push, last_push.c.connectionId == MarketplaceConnection.id
+            )
+            staleness = last_push.c.lastPushAt
+        else:
+            staleness = MarketplaceConnection.lastSyncAt
+
+        return session.exec(
+            query.order_by(staleness.asc().nulls_first(), MarketplaceConnection.createdAt)
+        ).all()
+
+    # ========================================================================
+    # Execution
+    # ========================================================================
+
+    async def _run_one(self, target: SyncTarget, slots: asyncio.Semaphore) -> dict:
+        # Marketplace slot first: a task queued behind its marketplace cap
+        # must not sit on a global slot another marketplace could use
+        async with self._semaphore(target.marketplace):
+            async with slots:
+                with Session(engine) as session:
+                    try:
+                        result = await asyncio.wait_for(
+                            self._sync(SyncCoordinator(session), target),
+                            timeout=SYNC_CONNECTION_TIMEOUT_SECONDS,
+                        )
+                    except asyncio.TimeoutError:
+                        result = {
+                            "success": False,
+                            "error": f"Timed out after {SYNC_CONNECTION_TIMEOUT_SECONDS}s",
+                        }
+                    except Exception as e:
+                        logger.error(
+                            f"{self.job_type.value} failed for {target.connection_name}: {e}",
+                            exc_info=True,
+                        )
+                        result = {"success": False, "error": str(e)}
+
+                    if not result.get("success", False):
+                        session.rollback()
+                        self._close_job(session, target.job_id, result.get("error"))
+
+        logger.info(f"{self.job_type.value} finished for {target.connection_name}: {result}")
+        return {
+            "connection_id": str(target.connection_id),
+            "connection_name": target.connection_name,
+            "marketplace": target.marketplace,
+            **result
+        }
+
+    async def _sync(self, coordinator: SyncCoordinator, target: SyncTarget) -> dict:
+        if self.job_type == SyncJobType.INVENTORY_PUSH:
+            return await coordinator.push_inventory(
+                connection_id=target.connection_id,
+                triggered_by=SCHEDULED_TRIGGER,
+                job_id=target.job_id,
+            )
+        # No from_date: the coordinator resumes from the connection's lastSyncAt
+        return await coordinator.sync_orders(
+            connection_id=target.connection_id,
+            triggered_by=SCHEDULED_TRIGGER,
+            job_id=target.job_id,
+        )
+
+    def _close_job(self, session: Session, job_id: UUID, error: Optional[str]):
+        """Fail a job the coordinator left open (early return, timeout, crash)."""
+        now = datetime.utcnow()
+        session.execute(
+            update(MarketplaceSyncJob.__table__)
+            .where(
+                MarketplaceSyncJob.__table__.c.id == job_id,
+                MarketplaceSyncJob.__table__.c.status.in_([s.value for s in _OPEN_STATUSES]),
+            )
+            .values(
+                status=SyncJobStatus.FAILED.value,
+                completedAt=now,
+                updatedAt=now,
+                errorLog={"error": error or "Sync failed"},
+            )
+        )
+        session.commit()
+
+    def _semaphore(self, marketplace: str) -> asyncio.Semaphore:
+        if marketplace not in self._semaphores:
+            self._semaphores[marketplace] = asyncio.Semaphore(
+                MARKETPLACE_SYNC_CONCURRENCY.get(marketplace, DEFAULT_MARKETPLACE_CONCURRENCY)
+            )
+        return self._semaphores[marketplace]
+
+
+# ============================================================================
+# Progress
+# ============================================================================
+
+def get_run_progress(
+    session: Session,
+    job_type: SyncJobType,
+    company_ids: Optional[List[UUID]] = None,
+    scheduled_at: Optional[datetime] = None,
+) -> Optional[dict]:
+    """
+    Live view of one scheduled run (the latest one by default), read from
+    its MarketplaceSyncJob rows. None if there has been no scheduled run.
+    """
+    def scoped(query):
+        query = query.where(
+            MarketplaceSyncJob.jobType == job_type,
+            MarketplaceSyncJob.triggeredBy == SCHEDULED_TRIGGER,
+        )
+        if company_ids is not None:
+            query = query.where(MarketplaceSyncJob.companyId.in_(company_ids))
+        return query
+
+    if scheduled_at is None:
+        scheduled_at = session.exec(
+            scoped(select(func.max(MarketplaceSyncJob.scheduledAt)))
+        ).one()
+        if scheduled_at is None:
+            return None
+
+    rows = session.exec(
+        scoped(
+            select(MarketplaceSyncJob, MarketplaceConnection)
+            .join(MarketplaceConnection, MarketplaceConnection.id == MarketplaceSyncJob.connectionId)
+        )
+        .where(MarketplaceSyncJob.scheduledAt == scheduled_at)
+        .order_by(MarketplaceSyncJob.priority.desc())
+    ).all()
+    if not rows:
+        return None
+
+    by_status: Dict[str, int] = {}
+    connections = []
+    last_completed: Optional[datetime] = None
+    for job, connection in rows:
+        by_status[job.status.value] = by_status.get(job.status.value, 0) + 1
+        if job.completedAt and (last_completed is None or job.completedAt > last_completed):
+            last_completed = job.completedAt
+        connections.append({
+            "jobId": str(job.id),
+            "connectionId": str(connection.id),
+            "connectionName": connection.connectionName,
+            "marketplace": connection.marketplace.value,
+            "status": job.status.value,
+            "recordsProcessed": job.recordsProcessed,
+            "recordsSuccess": job.recordsSuccess,
+            "recordsFailed": job.recordsFailed,
+            "startedAt": job.startedAt,
+            "completedAt": job.completedAt,
+            "error": (job.errorLog or {}).get("error"),
+        })
+
+    jobs = [job for job, _ in rows]
+    queued = by_status.get(SyncJobStatus.QUEUED.value, 0)
+    running = by_status.get(SyncJobStatus.IN_PROGRESS.value, 0)
+    finished = queued + running == 0
+    return {
+        "jobType": job_type.value,
+        "scheduledAt": scheduled_at,
+        "total": len(rows),
+        "queued": queued,
+        "running": running,
+        "done": len(rows) - queued - running,
+        "byStatus": by_status,
+        "finished": finished,
+        "recordsProcessed": sum(job.recordsProcessed for job in jobs),
+        "recordsSuccess": sum(job.recordsSuccess for job in jobs),
+        "recordsFailed": sum(job.recordsFailed for job in jobs),
+        "elapsedSeconds": round(
+            ((last_completed if finished and last_completed else datetime.utcnow()) - scheduled_at).total_seconds(), 1
+        ),
+        "connections": connections,
+    }
@@ -65,6 +65,10 @@ async def lifespan(app: FastAPI):
     logger.info("Shutting down CJDQuick OMS API...")
     shutdown_scheduler()
     logger.info("Scheduler stopped")
+    from app.services.event_dispatcher import shutdown_dispatcher
+    shutdown_dispatcher()
+    from app.services.carriers.http_client import close_http_clients
+    await close_http_clients()
 
 
 app = FastAPI(
@@ -679,6 +679,8 @@ from .system import (
     Sequence,
     SequenceCreate,
     SequenceResponse,
+    EventOutbox,
+    EventOutboxResponse,
     Session,
     SessionCreate,
     SessionResponse,
@@ -711,6 +713,12 @@ from .shipment import (
     ShipmentStats,
     CarrierWebhookLog,
     CarrierWebhookLogResponse,
+    TrackingPollRun,
+    TrackingPollRunResponse,
+    RateQuoteCache,
+    BulkShipJob,
+    BulkShipJobItem,
+    BulkShipJobResponse,
 )
 
 # B2B Logistics models and schemas
@@ -1647,6 +1655,8 @@ __all__ = [
     "Sequence",
     "SequenceCreate",
     "SequenceResponse",
+    "EventOutbox",
+    "EventOutboxResponse",
     # Session
     "Session",
     "SessionCreate",
@@ -1666,6 +1676,12 @@ __all__ = [
     # CarrierWebhookLog (Phase 2)
     "CarrierWebhookLog",
     "CarrierWebhookLogResponse",
+    "TrackingPollRun",
+    "TrackingPollRunResponse",
+    "RateQuoteCache",
+    "BulkShipJob",
+    "BulkShipJobItem",
+    "BulkShipJobResponse",
     # B2B Logistics Enums
     "LRStatus",
     "VehicleType",
@@ -132,6 +132,8 @@ class DetectionRule(BaseModel, table=True):
 
     # Execution tracking
     lastExecutedAt: Optional[datetime] = Field(default=None)
+    # Scheduler's incremental scan position: rows unchanged since this are skipped
+    scanWatermark: Optional[datetime] = Field(default=None)
     executionCount: int = Field(default=0, sa_column=Column(Integer, default=0))
     exceptionsCreated: int = Field(default=0, sa_column=Column(Integer, default=0))
 
@@ -291,6 +291,8 @@ class AWBBase(SQLModel):
     """AWB base fields"""
     awbNo: str = Field(unique=True, index=True)
     transporterId: UUID = Field(foreign_key="Transporter.id", index=True)
+    # Company whose carrier account issued the AWB; None = shared uploaded stock
+    companyId: Optional[UUID] = Field(default=None, foreign_key="Company.id", index=True)
     isUsed: bool = Field(default=False)
     usedAt: Optional[datetime] = None
     usedFor: Optional[str] = None
@@ -292,6 +292,10 @@ class Delivery(BaseModel, table=True):
     shipDate: Optional[datetime] = Field(default=None)
     deliveryDate: Optional[datetime] = Field(default=None)
 
+    # Last carrier event applied (dedup / out-of-order guard, see TrackingIngest)
+    lastEventAt: Optional[datetime] = Field(default=None)
+    lastEventFingerprint: Optional[str] = Field(default=None)
+
     # POD (Proof of Delivery)
     podImage: Optional[str] = Field(default=None)
     podSignature: Optional[str] = Field(default=None)
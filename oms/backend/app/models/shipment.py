@@ -315,3 +315,136 @@ class CarrierWebhookLogResponse(ResponseBase):
     processingResult: Optional[dict] = None
     companyId: Optional[UUID] = None
     createdAt: datetime
+
+
+# ============================================================================
+# Tracking Poll Runs
+# ============================================================================
+
+class TrackingPollRun(BaseModel, table=True):
+    """
+    One bulk tracking poll over active deliveries.
+    Deliveries are polled in id order; `cursor` is the last Delivery.id
+    whose result has been committed, so an interrupted run can resume.
+    """
+    __tablename__ = "TrackingPollRun"
+
+    companyId: Optional[UUID] = Field(
+        default=None,
+        sa_column=Column(PG_UUID(as_uuid=True), ForeignKey("Company.id"), index=True)
+    )
+    carrierCode: Optional[str] = Field(default=None)  # None = all carriers
+    statusFilter: Optional[str] = Field(default=None)
+    maxDeliveries: int = Field(default=100)
+    status: str = Field(default="RUNNING", sa_column=Column(String, default="RUNNING", index=True))
+    cursor: Optional[UUID] = Field(default=None, sa_column=Column(PG_UUID(as_uuid=True)))
+    scanned: int = Field(default=0)
+    processed: int = Field(default=0)
+    errors: int = Field(default=0)
+    lastError: Optional[str] = Field(default=None)
+    startedAt: Optional[datetime] = Field(default=None)
+    completedAt: Optional[datetime] = Field(default=None)
+
+
+class TrackingPollRunResponse(ResponseBase):
+    """Response schema for tracking poll runs."""
+    id: UUID
+    companyId: Optional[UUID] = None
+    carrierCode: Optional[str] = None
+    statusFilter: Optional[str] = None
+    maxDeliveries: int
+    status: str
+    scanned: int
+    processed: int
+    errors: int
+    lastError: Optional[str] = None
+    startedAt: Optional[datetime] = None
+    completedAt: Optional[datetime] = None
+    createdAt: datetime
+
+
+# ============================================================================
+# Bulk Ship Jobs
+# ============================================================================
+
+class BulkShipJob(BaseModel, table=True):
+    """
+    One bulk shipment booking run (see services/bulk_shipping.py).
+    Per-order outcomes are appended to BulkShipJobItem as each carrier
+    batch is committed, so progress can be streamed while the job runs.
+    """
+    __tablename__ = "BulkShipJob"
+
+    companyId: UUID = Field(
+        sa_column=Column(PG_UUID(as_uuid=True), ForeignKey("Company.id"), nullable=False, index=True)
+    )
+    status: str = Field(default="RUNNING", sa_column=Column(String, default="RUNNING", index=True))
+    total: int = Field(default=0)
+    shipped: int = Field(default=0)
+    failed: int = Field(default=0)
+    createManifests: bool = Field(default=False)
+    fetchLabels: bool = Field(default=True)
+    manifestIds: Optional[list] = Field(default=None, sa_column=Column(JSON))
+    lastError: Optional[str] = Field(default=None)
+    createdById: Optional[UUID] = Field(
+        default=None,
+        sa_column=Column(PG_UUID(as_uuid=True), ForeignKey("User.id"))
+    )
+    startedAt: Optional[datetime] = Field(default=None)
+    completedAt: Optional[datetime] = Field(default=None)
+
+
+class BulkShipJobItem(BaseModel, table=True):
+    """Outcome of one order in a BulkShipJob; `seq` orders items for streaming."""
+    __tablename__ = "BulkShipJobItem"
+
+    jobId: UUID = Field(
+        sa_column=Column(PG_UUID(as_uuid=True), ForeignKey("BulkShipJob.id"), nullable=False, index=True)
+    )
+    seq: int
+    orderId: UUID = Field(sa_column=Column(PG_UUID(as_uuid=True), nullable=False))
+    orderNo: Optional[str] = Field(default=None)
+    carrierCode: Optional[str] = Field(default=None)
+    success: bool = Field(default=False)
+    awbNo: Optional[str] = Field(default=None)
+    deliveryId: Optional[UUID] = Field(default=None, sa_column=Column(PG_UUID(as_uuid=True)))
+    labelUrl: Optional[str] = Field(default=None)
+    error: Optional[str] = Field(default=None)
+
+
+class BulkShipJobResponse(ResponseBase):
+    """Response schema for bulk ship jobs."""
+    id: UUID
+    companyId: UUID
+    status: str
+    total: int
+    shipped: int
+    failed: int
+    createManifests: bool
+    fetchLabels: bool
+    manifestIds: Optional[list] = None
+    lastError: Optional[str] = None
+    startedAt: Optional[datetime] = None
+    completedAt: Optional[datetime] = None
+    createdAt: datetime
+
+
+# ============================================================================
+# Rate Quote Cache
+# ============================================================================
+
+class RateQuoteCache(BaseModel, table=True):
+    """
+    Shared tier of the carrier rate quote cache (see services/carriers/rate_cache.py).
+    One row per lane; `quotes` is empty for unserviceable lanes.
+    """
+    __tablename__ = "RateQuoteCache"
+
+    cacheKey: str = Field(sa_column=Column(String, unique=True, nullable=False))
+    companyId: UUID = Field(
+        sa_column=Column(PG_UUID(as_uuid=True), ForeignKey("Company.id"), nullable=False, index=True)
+    )
+    carrierCode: str = Field(sa_column=Column(String, nullable=False))
+    quotes: Optional[list] = Field(default=None, sa_column=Column(JSON))
+    expiresAt: datetime
+    staleUntil: datetime = Field(index=True)
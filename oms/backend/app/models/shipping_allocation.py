@@ -119,6 +119,7 @@ class FTLLaneRate(BaseModel, CompanyMixin, ActiveMixin, table=True):
     __tablename__ = "FTLLaneRate"
     __table_args__ = (
         Index('ix_ftl_lane_rate_lookup', 'originCity', 'destinationCity', 'vehicleTypeId', 'vendorId'),
+        Index('ix_ftl_lane_rate_lane_key', 'originKey', 'destinationKey'),
     )
 
     # Lane definition
@@ -127,6 +128,10 @@ class FTLLaneRate(BaseModel, CompanyMixin, ActiveMixin, table=True):
     destinationCity: str = Field(max_length=100, index=True)
     destinationState: Optional[str] = Field(default=None, max_length=100)
 
+    # Normalized city names, set on write (see app/services/lane_rates.py)
+    originKey: Optional[str] = Field(default=None, max_length=100)
+    destinationKey: Optional[str] = Field(default=None, max_length=100)
+
     # Distance (optional, for reference)
     distanceKm: Optional[int] = Field(default=None)
 
@@ -310,6 +315,7 @@ class PTLRateMatrix(BaseModel, CompanyMixin, ActiveMixin, table=True):
     __tablename__ = "PTLRateMatrix"
     __table_args__ = (
         Index('ix_ptl_rate_matrix_lookup', 'originCity', 'destinationCity', 'transporterId'),
+        Index('ix_ptl_rate_matrix_lane_key', 'originKey', 'destinationKey'),
     )
 
     # Lane definition
@@ -318,6 +324,10 @@ class PTLRateMatrix(BaseModel, CompanyMixin, ActiveMixin, table=True):
     destinationCity: str = Field(max_length=100, index=True)
     destinationState: Optional[str] = Field(default=None, max_length=100)
 
+    # Normalized city names, set on write (see app/services/lane_rates.py)
+    originKey: Optional[str] = Field(default=None, max_length=100)
+    destinationKey: Optional[str] = Field(default=None, max_length=100)
+
     # Weight slabs (rates per kg)
     rate0to50: Optional[Decimal] = Field(
         default=None,
@@ -387,6 +397,7 @@ class PTLTATMatrix(BaseModel, CompanyMixin, ActiveMixin, table=True):
     __tablename__ = "PTLTATMatrix"
     __table_args__ = (
         Index('ix_ptl_tat_matrix_lookup', 'originCity', 'destinationCity', 'transporterId'),
+        Index('ix_ptl_tat_matrix_lane_key', 'originKey', 'destinationKey'),
     )
 
     # Lane definition
@@ -395,6 +406,10 @@ class PTLTATMatrix(BaseModel, CompanyMixin, ActiveMixin, table=True):
     destinationCity: str = Field(max_length=100, index=True)
     destinationState: Optional[str] = Field(default=None, max_length=100)
 
+    # Normalized city names, set on write (see app/services/lane_rates.py)
+    originKey: Optional[str] = Field(default=None, max_length=100)
+    destinationKey: Optional[str] = Field(default=None, max_length=100)
+
     # TAT in days
     transitDays: int = Field(default=3)
 
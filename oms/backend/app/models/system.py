@@ -1,5 +1,5 @@
 """
-System Models: Audit Log, Exception, Sequence, Session, Brand User
+System Models: Audit Log, Exception, Sequence, Event Outbox, Session, Brand User
 """
 from typing import Optional, List
 from uuid import UUID
@@ -147,6 +147,33 @@ class SequenceResponse(SequenceBase):
     id: UUID
 
 
+# ============================================================================
+# Event Outbox (durable queue for the in-process event dispatcher)
+# ============================================================================
+
+class EventOutboxBase(SQLModel):
+    """Event outbox base fields - one row per (event, handler) delivery"""
+    eventType: str = Field(index=True)
+    handler: str
+    payload: dict = Field(default_factory=dict, sa_column=Column(JSON))
+    status: str = Field(default="PENDING", index=True)  # PENDING, FAILED
+    attempts: int = Field(default=0)
+    nextAttemptAt: datetime = Field(default_factory=datetime.utcnow, index=True)
+    lastError: Optional[str] = None
+
+
+class EventOutbox(EventOutboxBase, BaseModel, table=True):
+    """Pending/failed event handler deliveries; rows are deleted on success"""
+    __tablename__ = "EventOutbox"
+
+
+class EventOutboxResponse(EventOutboxBase):
+    """Event outbox response schema"""
+    id: UUID
+    createdAt: datetime
+    updatedAt: datetime
+
+
 # ============================================================================
 # Session
 # ============================================================================
@@ -7,7 +7,7 @@ LanePerformance, and PincodePerformance tables for analytics dashboards.
 import logging
 from datetime import datetime, timezone, timedelta
 from decimal import Decimal
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Iterable, Set, Tuple
 from uuid import UUID
 
 from sqlmodel import Session, select, func, col
@@ -25,6 +25,9 @@ from app.models.enums import DeliveryStatus, ShipmentType
 
 logger = logging.getLogger(__name__)
 
+# Lane origin until deliveries carry their pickup city
+_DEFAULT_ORIGIN_CITY = "WAREHOUSE"
+
 # Terminal delivered statuses
 _DELIVERED = {DeliveryStatus.DELIVERED.value}
 _RTO = {DeliveryStatus.RTO_DELIVERED.value, DeliveryStatus.RTO_INITIATED.value, DeliveryStatus.RTO_IN_TRANSIT.value}
@@ -85,19 +88,21 @@ class AnalyticsAggregator:
         period_start: datetime,
         period_end: datetime,
         shipment_type: ShipmentType = ShipmentType.B2C,
+        transporter_ids: Optional[Set[UUID]] = None,
     ) -> int:
         """
         Aggregate carrier performance from Delivery + Shipment tables.
-        Groups by transporterId. Returns count of records upserted.
+        Groups by transporterId; `transporter_ids` limits it to those
+        carriers. Returns count of records upserted.
         """
         # ---- Gather Delivery stats ----
         delivery_stats = _query_delivery_carrier_stats(
-            session, company_id, period_start, period_end
+            session, company_id, period_start, period_end, transporter_ids
         )
 
         # ---- Gather Shipment stats ----
         shipment_stats = _query_shipment_carrier_stats(
-            session, company_id, period_start, period_end
+            session, company_id, period_start, period_end, transporter_ids
         )
 
         # ---- Merge by transporterId ----
@@ -195,14 +200,19 @@ class AnalyticsAggregator:
         period_start: datetime,
         period_end: datetime,
         shipment_type: ShipmentType = ShipmentType.B2C,
+        lanes: Optional[Set[Tuple[str, str, UUID]]] = None,
     ) -> int:
         """
         Aggregate lane performance by origin_city + destination_city + transporterId.
+        `lanes` limits it to those (origin, destination, transporter) keys.
         Returns count of records upserted.
         """
         lane_stats = _query_delivery_lane_stats(
-            session, company_id, period_start, period_end
+            session, company_id, period_start, period_end,
+            {key[2] for key in lanes} if lanes is not None else None,
         )
+        if lanes is not None:
+            lane_stats = {key: m for key, m in lane_stats.items() if key in lanes}
 
         count = 0
         for key, m in lane_stats.items():
@@ -270,14 +280,19 @@ class AnalyticsAggregator:
         company_id: UUID,
         period_start: datetime,
         period_end: datetime,
+        pincodes: Optional[Set[Tuple[str, UUID]]] = None,
     ) -> int:
         """
         Aggregate pincode performance by pincode + transporterId.
+        `pincodes` limits it to those (pincode, transporter) keys.
         Returns count of records upserted.
         """
         pincode_stats = _query_shipment_pincode_stats(
-            session, company_id, period_start, period_end
+            session, company_id, period_start, period_end,
+            {key[1] for key in pincodes} if pincodes is not None else None,
         )
+        if pincodes is not None:
+            pincode_stats = {key: m for key, m in pincode_stats.items() if key in pincodes}
 
         count = 0
         for key, m in pincode_stats.items():
@@ -348,16 +363,25 @@ class AnalyticsAggregator:
         company_id: UUID,
         period_start: datetime,
         period_end: datetime,
+        transporter_ids: Optional[Set[UUID]] = None,
+        lanes: Optional[Set[Tuple[str, str, UUID]]] = None,
+        pincodes: Optional[Set[Tuple[str, UUID]]] = None,
     ) -> Dict[str, int]:
-        """Run all 3 aggregations for a company + period."""
+        """
+        Run all 3 aggregations for a company + period, optionally limited
+        to the carrier / lane / pincode keys of delivery_scope().
+        """
         carrier_count = AnalyticsAggregator.aggregate_carrier_performance(
-            session, company_id, period_start, period_end, ShipmentType.B2C
+            session, company_id, period_start, period_end, ShipmentType.B2C,
+            transporter_ids=transporter_ids,
         )
         lane_count = AnalyticsAggregator.aggregate_lane_performance(
-            session, company_id, period_start, period_end, ShipmentType.B2C
+            session, company_id, period_start, period_end, ShipmentType.B2C,
+            lanes=lanes,
         )
         pincode_count = AnalyticsAggregator.aggregate_pincode_performance(
-            session, company_id, period_start, period_end
+            session, company_id, period_start, period_end,
+            pincodes=pincodes,
         )
 
         session.commit()
@@ -367,6 +391,32 @@ class AnalyticsAggregator:
             "pincode_records": pincode_count,
         }
 
+    @staticmethod
+    def delivery_scope(session: Session, delivery_ids: Iterable[UUID]) -> Dict[str, set]:
+        """
+        Carrier, lane and pincode keys touched by the given deliveries, as
+        aggregate_all() keyword arguments.
+        """
+        rows = session.exec(
+            select(Delivery.transporterId, Order.shippingAddress)
+            .outerjoin(Order, Order.id == Delivery.orderId)
+            .where(
+                Delivery.id.in_(list(delivery_ids)),
+                Delivery.transporterId.isnot(None),
+            )
+        ).all()
+
+        scope: Dict[str, set] = {"transporter_ids": set(), "lanes": set(), "pincodes": set()}
+        for transporter_id, address in rows:
+            scope["transporter_ids"].add(transporter_id)
+            if not isinstance(address, dict):
+                continue
+            if address.get("city"):
+                scope["lanes"].add((_DEFAULT_ORIGIN_CITY, address["city"], transporter_id))
+            if address.get("pincode"):
+                scope["pincodes"].add((str(address["pincode"]), transporter_id))
+        return scope
+
     @staticmethod
     def aggregate_for_delivery(
         session: Session,
@@ -381,13 +431,14 @@ class AnalyticsAggregator:
         ).first()
         if not delivery or not delivery.transporterId:
             return {"carrier_records": 0, "lane_records": 0, "pincode_records": 0}
+        scope = AnalyticsAggregator.delivery_scope(session, [delivery_id])
 
         now = datetime.now(timezone.utc)
         period_start = now - timedelta(days=30)
         period_end = now
 
         return AnalyticsAggregator.aggregate_all(
-            session, delivery.companyId, period_start, period_end
+            session, delivery.companyId, period_start, period_end, **scope
         )
 
 
@@ -400,16 +451,18 @@ def _query_delivery_carrier_stats(
     company_id: UUID,
     period_start: datetime,
     period_end: datetime,
+    transporter_ids: Optional[Set[UUID]] = None,
 ) -> Dict[UUID, Dict[str, Any]]:
     """Query Delivery table for per-carrier aggregated stats."""
-    deliveries = session.exec(
-        select(Delivery).where(
-            Delivery.companyId == company_id,
-            Delivery.transporterId.isnot(None),
-            Delivery.createdAt >= period_start,
-            Delivery.createdAt <= period_end,
-        )
-    ).all()
+    query = select(Delivery).where(
+        Delivery.companyId == company_id,
+        Delivery.transporterId.isnot(None),
+        Delivery.createdAt >= period_start,
+        Delivery.createdAt <= period_end,
+    )
+    if transporter_ids is not None:
+        query = query.where(Delivery.transporterId.in_(list(transporter_ids)))
+    deliveries = session.exec(query).all()
 
     stats: Dict[UUID, Dict[str, Any]] = {}
     for d in deliveries:
@@ -449,16 +502,18 @@ def _query_shipment_carrier_stats(
     company_id: UUID,
     period_start: datetime,
     period_end: datetime,
+    transporter_ids: Optional[Set[UUID]] = None,
 ) -> Dict[UUID, Dict[str, Any]]:
     """Query Shipment table for per-carrier aggregated stats."""
-    shipments = session.exec(
-        select(Shipment).where(
-            Shipment.companyId == company_id,
-            Shipment.transporterId.isnot(None),
-            Shipment.createdAt >= period_start,
-            Shipment.createdAt <= period_end,
-        )
-    ).all()
+    query = select(Shipment).where(
+        Shipment.companyId == company_id,
+        Shipment.transporterId.isnot(None),
+        Shipment.createdAt >= period_start,
+        Shipment.createdAt <= period_end,
+    )
+    if transporter_ids is not None:
+        query = query.where(Shipment.transporterId.in_(list(transporter_ids)))
+    shipments = session.exec(query).all()
 
     stats: Dict[UUID, Dict[str, Any]] = {}
     for sh in shipments:
@@ -498,20 +553,22 @@ def _query_delivery_lane_stats(
     company_id: UUID,
     period_start: datetime,
     period_end: datetime,
+    transporter_ids: Optional[Set[UUID]] = None,
 ) -> Dict[tuple, Dict[str, Any]]:
     """Query Delivery+Order for per-lane stats (origin city + dest city + carrier)."""
     # Join Delivery with Order to get shipping address
     from sqlalchemy.orm import joinedload
 
-    deliveries = session.exec(
-        select(Delivery).where(
-            Delivery.companyId == company_id,
-            Delivery.transporterId.isnot(None),
-            Delivery.orderId.isnot(None),
-            Delivery.createdAt >= period_start,
-            Delivery.createdAt <= period_end,
-        )
-    ).all()
+    query = select(Delivery).where(
+        Delivery.companyId == company_id,
+        Delivery.transporterId.isnot(None),
+        Delivery.orderId.isnot(None),
+        Delivery.createdAt >= period_start,
+        Delivery.createdAt <= period_end,
+    )
+    if transporter_ids is not None:
+        query = query.where(Delivery.transporterId.in_(list(transporter_ids)))
+    deliveries = session.exec(query).all()
 
     stats: Dict[tuple, Dict[str, Any]] = {}
     for d in deliveries:
@@ -528,7 +585,7 @@ def _query_delivery_lane_stats(
             dest_city = order.shippingAddress.get("city", "")
 
         # Origin from location or default
-        origin_city = "WAREHOUSE"  # Default; could be enriched from location
+        origin_city = _DEFAULT_ORIGIN_CITY  # Default; could be enriched from location
 
         if not dest_city or not d.transporterId:
             continue
@@ -560,16 +617,18 @@ def _query_shipment_pincode_stats(
     company_id: UUID,
     period_start: datetime,
     period_end: datetime,
+    transporter_ids: Optional[Set[UUID]] = None,
 ) -> Dict[tuple, Dict[str, Any]]:
     """Query Shipment for per-pincode + carrier stats."""
-    shipments = session.exec(
-        select(Shipment).where(
-            Shipment.companyId == company_id,
-            Shipment.transporterId.isnot(None),
-            Shipment.createdAt >= period_start,
-            Shipment.createdAt <= period_end,
-        )
-    ).all()
+    query = select(Shipment).where(
+        Shipment.companyId == company_id,
+        Shipment.transporterId.isnot(None),
+        Shipment.createdAt >= period_start,
+        Shipment.createdAt <= period_end,
+    )
+    if transporter_ids is not None:
+        query = query.where(Shipment.transporterId.in_(list(transporter_ids)))
+    shipments = session.exec(query).all()
 
     stats: Dict[tuple, Dict[str, Any]] = {}
     for sh in shipments:
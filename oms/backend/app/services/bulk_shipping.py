@@ -0,0 +1,638 @@
+"""
+Bulk Ship Engine — Books thousands of orders with carriers in one job.
+
+ShippingService.ship_order books one order per carrier call and commits
+each one. For manifest cut-offs a BulkShipJob instead:
+1. Loads the job's orders, their locations and transporters in a few
+   queries; orders without a carrier are allocated with the
+   ShippingAllocationEngine
+2. Groups orders by (carrier, pickup location) and takes their AWBs from
+   the AWB pool in one claim per group
+3. Books each group in chunks of the carrier's batch size
+   (adapter.bulk_ship_size, e.g. 100 per Delhivery CMU call; one order
+   per call for carriers without a batch API). Chunks of all carriers run
+   concurrently, bounded per carrier by a semaphore and the tracking
+   poller's token-bucket rate limits
+4. Fetches labels per chunk with the carrier's multi-AWB label API
+5. As each chunk finishes, writes its Delivery rows, order status, AWB
+   usage and BulkShipJobItem results with batched statements and commits,
+   so results can be streamed while the job runs. A chunk that fails to
+   persist is rolled back on its own; the other chunks carry on
+6. Optionally opens one Manifest per carrier for the shipped deliveries
+
+Pooled AWBs of bookings that didn't clearly succeed are quarantined, not
+returned to the pool (the carrier may have booked them). While the job
+runs its updatedAt is touched every BULK_SHIP_HEARTBEAT_SECONDS, so
+readers can tell a stalled job from a slow one.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import insert, update
+from sqlmodel import Session, select
+
+from app.models import Order, Location, Delivery, OrderStatus, DeliveryStatus
+from app.models.shipment import BulkShipJob, BulkShipJobItem
+from app.models.transporter import Transporter, Manifest, ManifestStatus
+from app.services.carriers.awb_pool import AWBAllocator
+from app.services.carriers.base import CarrierAdapter, ShipmentRequest, ShipmentResponse
+from app.services.carriers.factory import get_carrier_for_company
+from app.services.carriers.tracking_poller import (
+    CARRIER_RATE_LIMITS, DEFAULT_RATE_LIMIT, TokenBucket,
+)
+from app.services.shipping_service import SHIPPABLE_STATUSES, build_shipment_request
+
+logger = logging.getLogger(__name__)
+
+
+BULK_SHIP_MAX_ORDERS = 10000
+
+# Max in-flight booking calls per carrier
+BULK_SHIP_CONCURRENCY = 5
+
+# Orders loaded per IN (...) query
+BULK_SHIP_LOAD_CHUNK = 1000
+
+# A RUNNING job whose updatedAt is older than BULK_SHIP_STALE_SECONDS has stalled
+BULK_SHIP_HEARTBEAT_SECONDS = 30
+BULK_SHIP_STALE_SECONDS = 300
+
+
+@dataclass
+class BulkShipOrder:
+    """One order to book; carrier_code None = pick one with the allocation engine."""
+    order_id: UUID
+    carrier_code: Optional[str] = None
+    weight_grams: int = 500
+    length_cm: float = 10
+    breadth_cm: float = 10
+    height_cm: float = 10
+
+
+@dataclass
+class PreparedShipment:
+    # Plain values only: the session commits (and expires ORM objects) after every chunk
+    spec: BulkShipOrder
+    order_no: Optional[str]
+    location_id: Optional[UUID]
+    carrier_code: str
+    transporter_id: Optional[UUID]
+    request: Optional[ShipmentRequest]  # None for orders that failed before booking
+    pooled_awb: Optional[str] = None
+
+
+@dataclass
+class BookingOutcome:
+    shipment: PreparedShipment
+    response: ShipmentResponse
+    label_url: Optional[str] = None
+
+
+def _chunks(values: list, size: int):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+class BulkShipEngine:
+    """
+    Runs a BulkShipJob.
+
+    Usage:
+        engine = BulkShipEngine(session)
+        job = engine.create_job(company_id, len(orders), create_manifests=True)
+        await engine.run(job, orders)
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+        self.allocator = AWBAllocator(session)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._seq = 0
+
+    def create_job(
+        self,
+        company_id: UUID,
+        total: int,
+        create_manifests: bool = False,
+        fetch_labels: bool = True,
+        created_by: Optional[UUID] = None,
+    ) -> BulkShipJob:
+        job = BulkShipJob(
+            companyId=company_id,
+            status="RUNNING",
+            total=total,
+            createManifests=create_manifests,
+            fetchLabels=fetch_labels,
+            createdById=created_by,
+            startedAt=datetime.utcnow(),
+        )
+        self.session.add(job)
+        self.session.commit()
+        self.session.refresh(job)
+        return job
+
+    async def run(self, job: BulkShipJob, orders: List[BulkShipOrder]) -> BulkShipJob:
+        started = time.perf_counter()
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        tasks: Dict[asyncio.Task, List[PreparedShipment]] = {}
+        try:
+            prepared = self._prepare(job, orders)
+
+            for (carrier_code, _), group in self._group(prepared).items():
+                adapter = get_carrier_for_company(self.session, job.companyId, carrier_code)
+                if not adapter:
+                    self._persist(job, [
+                        BookingOutcome(s, ShipmentResponse(
+                            success=False,
+                            error=f"Carrier {carrier_code} not configured or no credentials for this company",
+                        ))
+                        for s in group
+                    ])
+                    continue
+                self._assign_pooled_awbs(job.companyId, adapter, group)
+                for chunk in _chunks(group, adapter.bulk_ship_size or 1):
+                    lost = set(self.allocator.mark_sent([
+                        (s.pooled_awb, s.order_no) for s in chunk if s.pooled_awb
+                    ]))
+                    for s in chunk:
+                        if s.pooled_awb in lost:
+                            # Reclaimed under us: book without it, like an empty pool
+                            s.pooled_awb = None
+                            s.request.awb_number = ""
+                    task = asyncio.create_task(
+                        self._book_chunk(adapter, carrier_code, chunk, job.fetchLabels)
+                    )
+                    tasks[task] = chunk
+
+            # Persist each chunk as soon as it is booked, in its own transaction
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    chunk = tasks.pop(task)
+                    try:
+                        outcomes = task.result()
+                    except Exception as e:
+                        outcomes = [
+                            BookingOutcome(s, ShipmentResponse(
+                                success=False, error=f"Carrier API error: {e}"
+                            ))
+                            for s in chunk
+                        ]
+                    try:
+                        self._persist(job, outcomes)
+                    except Exception as e:
+                        self._persist_failed(job, outcomes, e)
+
+            if job.createManifests:
+                job.manifestIds = self._create_manifests(job)
+
+            job.status = "COMPLETED"
+        except Exception as e:
+            logger.error(f"Bulk ship job {job.id} failed: {e}")
+            self.session.rollback()
+            job.status = "FAILED"
+            job.lastError = str(e)[:500]
+        finally:
+            heartbeat.cancel()
+            await self._abandon(job, tasks)
+
+        job.completedAt = datetime.utcnow()
+        self.session.add(job)
+        self.session.commit()
+        logger.info(
+            f"Bulk ship job {job.id}: {job.shipped} shipped, {job.failed} failed "
+            f"of {job.total} in {time.perf_counter() - started:.1f}s"
+        )
+        return job
+
+    # ========================================================================
+    # Preparation
+    # ========================================================================
+
+    def _prepare(self, job: BulkShipJob, specs: List[BulkShipOrder]) -> List[PreparedShipment]:
+        """Load orders, locations and transporters in bulk; fail what can't be shipped."""
+        company_id = job.companyId
+        orders: Dict[UUID, Order] = {}
+        ids = list(dict.fromkeys(s.order_id for s in specs))
+        for chunk in _chunks(ids, BULK_SHIP_LOAD_CHUNK):
+            for order in self.session.exec(
+                select(Order).where(Order.id.in_(chunk), Order.companyId == company_id)
+            ).all():
+                orders[order.id] = order
+
+        failures: List[BookingOutcome] = []
+        shippable: List[BulkShipOrder] = []
+        seen = set()
+        for spec in specs:
+            if spec.order_id in seen:
+                continue
+            seen.add(spec.order_id)
+            order = orders.get(spec.order_id)
+            error = None
+            if not order:
+                error = "Order not found"
+            elif order.status not in SHIPPABLE_STATUSES:
+                error = (
+                    f"Order in {order.status.value} status cannot be shipped. "
+                    f"Must be PACKED/INVOICED/MANIFESTED."
+                )
+            if error:
+                failures.append(self._failure(spec, order, spec.carrier_code, error))
+            else:
+                shippable.append(spec)
+
+        # Orders without a carrier: let the allocation rules pick one
+        unassigned = [s for s in shippable if not s.carrier_code]
+        if unassigned:
+            from app.services.shipping_allocation import ShippingAllocationEngine
+
+            engine = ShippingAllocationEngine(self.session)
+            facts = engine.load_order_facts(company_id, [s.order_id for s in unassigned])
+            decisions = {d.order_id: d for d in engine.allocate(company_id, facts)}
+            for spec in unassigned:
+                decision = decisions.get(spec.order_id)
+                if decision and decision.allocated:
+                    spec.carrier_code = decision.transporter_code
+                else:
+                    error = (decision.error if decision else None) or "No carrier could be allocated"
+                    failures.append(self._failure(spec, orders[spec.order_id], None, error))
+            shippable = [s for s in shippable if s.carrier_code]
+
+        codes = {s.carrier_code.upper() for s in shippable}
+        transporters = {
+            t.code: t.id for t in self.session.exec(
+                select(Transporter).where(Transporter.code.in_(list(codes)))
+            ).all()
+        } if codes else {}
+        location_ids = {orders[s.order_id].locationId for s in shippable}
+        locations = {
+            loc.id: loc for loc in self.session.exec(
+                select(Location).where(Location.id.in_(list(location_ids)))
+            ).all()
+        } if location_ids else {}
+
+        prepared: List[PreparedShipment] = []
+        for spec in shippable:
+            order = orders[spec.order_id]
+            code = spec.carrier_code.upper()
+            location = locations.get(order.locationId)
+            if not location:
+                failures.append(self._failure(spec, order, code, "Order location not found"))
+                continue
+            prepared.append(PreparedShipment(
+                spec=spec,
+                order_no=order.orderNo,
+                location_id=order.locationId,
+                carrier_code=code,
+                transporter_id=transporters.get(code),
+                request=build_shipment_request(
+                    order, location, company_id,
+                    weight_grams=spec.weight_grams,
+                    length_cm=spec.length_cm,
+                    breadth_cm=spec.breadth_cm,
+                    height_cm=spec.height_cm,
+                ),
+            ))
+
+        if failures:
+            self._persist(job, failures)
+        return prepared
+
+    @staticmethod
+    def _failure(
+        spec: BulkShipOrder, order: Optional[Order], carrier_code: Optional[str], error: str
+    ) -> BookingOutcome:
+        shipment = PreparedShipment(
+            spec=spec,
+            order_no=order.orderNo if order else None,
+            location_id=order.locationId if order else None,
+            carrier_code=carrier_code or "",
+            transporter_id=None, request=None,
+        )
+        return BookingOutcome(shipment, ShipmentResponse(success=False, error=error))
+
+    @staticmethod
+    def _group(prepared: List[PreparedShipment]) -> Dict[Tuple[str, UUID], List[PreparedShipment]]:
+        """Batch booking APIs take one pickup location per call."""
+        groups: Dict[Tuple[str, UUID], List[PreparedShipment]] = defaultdict(list)
+        for shipment in prepared:
+            groups[(shipment.carrier_code, shipment.location_id)].append(shipment)
+        return groups
+
+    def _assign_pooled_awbs(
+        self, company_id: UUID, adapter: CarrierAdapter, group: List[PreparedShipment]
+    ):
+        transporter_id = group[0].transporter_id
+        if not adapter.uses_awb_pool or not transporter_id:
+            return
+        for shipment, awb_no in zip(
+            group, self.allocator.take_many(company_id, transporter_id, len(group))
+        ):
+            shipment.pooled_awb = awb_no
+            shipment.request.awb_number = awb_no
+
+    # ========================================================================
+    # Carrier calls
+    # ========================================================================
+
+    async def _book_chunk(
+        self,
+        adapter: CarrierAdapter,
+        carrier_code: str,
+        chunk: List[PreparedShipment],
+        fetch_labels: bool,
+    ) -> List[BookingOutcome]:
+        """One rate-limited booking call (batch or single), then its labels."""
+        requests = [s.request for s in chunk]
+        async with self._semaphore(carrier_code):
+            await self._bucket(carrier_code).acquire()
+            try:
+                if adapter.bulk_ship_size:
+                    responses = await adapter.create_shipments(requests)
+                else:
+                    responses = [await adapter.create_shipment(requests[0])]
+            except Exception as e:
+                logger.error(f"Bulk booking error for {carrier_code} ({len(chunk)} orders): {e}")
+                responses = [
+                    ShipmentResponse(success=False, error=f"Carrier API error: {e}")
+                    for _ in chunk
+                ]
+
+            outcomes = [BookingOutcome(s, r) for s, r in zip(chunk, responses)]
+            missing = [
+                o.response.awb_number for o in outcomes
+                if fetch_labels and o.response.success and o.response.awb_number
+                and not o.response.label_url
+            ]
+            if missing:
+                await self._bucket(carrier_code).acquire()
+                try:
+                    labels = await adapter.get_labels(missing)
+                except Exception as e:
+                    logger.warning(f"Bulk label fetch failed for {carrier_code}: {e}")
+                    labels = {}
+                for outcome in outcomes:
+                    outcome.label_url = outcome.response.label_url or labels.get(outcome.response.awb_number)
+        return outcomes
+
+    def _bucket(self, carrier_code: str) -> TokenBucket:
+        if carrier_code not in self._buckets:
+            self._buckets[carrier_code] = TokenBucket(
+                CARRIER_RATE_LIMITS.get(carrier_code, DEFAULT_RATE_LIMIT)
+            )
+        return self._buckets[carrier_code]
+
+    def _semaphore(self, carrier_code: str) -> asyncio.Semaphore:
+        if carrier_code not in self._semaphores:
+            self._semaphores[carrier_code] = asyncio.Semaphore(BULK_SHIP_CONCURRENCY)
+        return self._semaphores[carrier_code]
+
+    async def _abandon(self, job: BulkShipJob, tasks: Dict[asyncio.Task, List[PreparedShipment]]):
+        """
+        Cancel the chunks a failed job leaves behind and quarantine their AWBs
+        (their bookings may have reached the carrier but were never saved).
+        """
+        if not tasks:
+            return
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        shipments = [s for chunk in tasks.values() for s in chunk]
+        logger.error(
+            f"Bulk ship job {job.id}: abandoned {len(tasks)} chunks ({len(shipments)} orders)"
+        )
+        try:
+            self.allocator.quarantine(
+                [s.pooled_awb for s in shipments if s.pooled_awb], f"BULK:{job.id}"
+            )
+        except Exception as e:
+            logger.error(f"Bulk ship job {job.id}: could not quarantine abandoned AWBs: {e}")
+        job.failed += len(shipments)
+        tasks.clear()
+
+    # ========================================================================
+    # Persistence
+    # ========================================================================
+
+    def _persist(self, job: BulkShipJob, outcomes: List[BookingOutcome]):
+        """Write one chunk's deliveries, order updates, AWB usage and job items; commit."""
+        now = datetime.utcnow()
+        deliveries, items, shipped_order_ids, events = [], [], [], []
+        used_awbs: List[Tuple[str, str]] = []
+        unconfirmed_awbs: List[str] = []
+
+        for outcome in outcomes:
+            shipment, response = outcome.shipment, outcome.response
+            order_id = shipment.spec.order_id
+            if shipment.pooled_awb:
+                if response.success and response.awb_number == shipment.pooled_awb:
+                    used_awbs.append((shipment.pooled_awb, shipment.order_no))
+                else:
+                    # Sent to the carrier without a confirmed booking
+                    unconfirmed_awbs.append(shipment.pooled_awb)
+
+            self._seq += 1
+            delivery_id = None
+            if response.success:
+                delivery_id = uuid4()
+                spec = shipment.spec
+                deliveries.append({
+                    "id": delivery_id,
+                    "deliveryNo": f"DLV-{now.strftime('%Y%m%d%H%M%S')}-{job.id.hex[:4].upper()}{self._seq:05d}",
+                    "orderId": order_id,
+                    "companyId": job.companyId,
+                    "transporterId": shipment.transporter_id,
+                    "status": DeliveryStatus.SHIPPED.value,
+                    "awbNo": response.awb_number,
+                    "trackingUrl": response.tracking_url,
+                    "labelUrl": outcome.label_url or None,
+                    "weight": Decimal(str(spec.weight_grams / 1000)),
+                    "length": Decimal(str(spec.length_cm)),
+                    "width": Decimal(str(spec.breadth_cm)),
+                    "height": Decimal(str(spec.height_cm)),
+                    "boxes": 1,
+                    "shipDate": now,
+                    "createdAt": now,
+                    "updatedAt": now,
+                })
+                shipped_order_ids.append(order_id)
+                events.append({
+                    "deliveryId": str(delivery_id),
+                    "orderId": str(order_id),
+                    "companyId": str(job.companyId),
+                    "carrierCode": shipment.carrier_code,
+                    "awbNumber": response.awb_number or "",
+                    "weightGrams": spec.weight_grams,
+                    "transporterId": str(shipment.transporter_id) if shipment.transporter_id else "",
+                })
+
+            items.append({
+                "id": uuid4(),
+                "jobId": job.id,
+                "seq": self._seq,
+                "orderId": order_id,
+                "orderNo": shipment.order_no,
+                "carrierCode": shipment.carrier_code or None,
+                "success": response.success,
+                "awbNo": response.awb_number or None,
+                "deliveryId": delivery_id,
+                "labelUrl": outcome.label_url or None,
+                "error": None if response.success else (response.error or "Carrier rejected shipment")[:500],
+                "createdAt": now,
+                "updatedAt": now,
+            })
+
+        self.allocator.quarantine(unconfirmed_awbs, f"BULK:{job.id}")
+
+        if deliveries:
+            self.session.execute(insert(Delivery), deliveries)
+            orders = Order.__table__
+            self.session.execute(
+                update(orders)
+                .where(orders.c.id.in_(shipped_order_ids))
+                .values(status=OrderStatus.SHIPPED.value, updatedAt=now)
+            )
+            self.allocator.record_many(used_awbs)
+        if items:
+            self.session.execute(insert(BulkShipJobItem), items)
+
+        job.shipped += len(deliveries)
+        job.failed += len(items) - len(deliveries)
+        self.session.add(job)
+        self.session.commit()
+
+        if events:
+            # Same event as ShippingService.ship_order (freight calculation)
+            from app.services.event_dispatcher import dispatch
+            for payload in events:
+                dispatch("shipment.created", payload)
+
+    def _persist_failed(self, job: BulkShipJob, outcomes: List[BookingOutcome], error: Exception):
+        """
+        Roll back a chunk that couldn't be written and record its orders as
+        failed items. Its bookings stand at the carrier, so its AWBs are
+        quarantined and the booked ones kept on the items (awbNo, error)
+        for reconciliation.
+        """
+        self.session.rollback()
+        booked = [
+            o.response.awb_number for o in outcomes
+            if o.response.success and o.response.awb_number
+        ]
+        logger.error(
+            f"Bulk ship job {job.id}: could not save {len(outcomes)} results: {error}; "
+            f"booked AWBs: {booked}"
+        )
+        self.allocator.quarantine(
+            [o.shipment.pooled_awb for o in outcomes if o.shipment.pooled_awb], f"BULK:{job.id}"
+        )
+
+        now = datetime.utcnow()
+        items = []
+        for outcome in outcomes:
+            shipment, response = outcome.shipment, outcome.response
+            self._seq += 1
+            if response.success:
+                message = (
+                    f"Booked with the carrier as {response.awb_number} "
+                    f"but could not be saved: {error}"
+                )
+            else:
+                message = response.error or "Carrier rejected shipment"
+            items.append({
+                "id": uuid4(),
+                "jobId": job.id,
+                "seq": self._seq,
+                "orderId": shipment.spec.order_id,
+                "orderNo": shipment.order_no,
+                "carrierCode": shipment.carrier_code or None,
+                "success": False,
+                "awbNo": response.awb_number or shipment.pooled_awb or None,
+                "deliveryId": None,
+                "labelUrl": outcome.label_url or None,
+                "error": message[:500],
+                "createdAt": now,
+                "updatedAt": now,
+            })
+        try:
+            self.session.execute(insert(BulkShipJobItem), items)
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"Bulk ship job {job.id}: could not save failure items either: {e}")
+
+        job.failed += len(outcomes)
+        job.lastError = f"Could not save {len(outcomes)} results: {error}"[:500]
+        self.session.add(job)
+        self.session.commit()
+
+    async def _heartbeat(self, job_id: UUID):
+        """Touch the job's updatedAt while it runs, on a connection of its own."""
+        table = BulkShipJob.__table__
+        while True:
+            await asyncio.sleep(BULK_SHIP_HEARTBEAT_SECONDS)
+            try:
+                with self.session.get_bind().begin() as connection:
+                    connection.execute(
+                        update(table)
+                        .where(table.c.id == job_id)
+                        .values(updatedAt=datetime.utcnow())
+                    )
+            except Exception as e:
+                logger.warning(f"Bulk ship job {job_id} heartbeat failed: {e}")
+
+    def _create_manifests(self, job: BulkShipJob) -> List[str]:
+        """One OPEN manifest per transporter for this job's shipped deliveries."""
+        rows = self.session.exec(
+            select(Delivery.id, Delivery.transporterId)
+            .join(BulkShipJobItem, BulkShipJobItem.deliveryId == Delivery.id)
+            .where(BulkShipJobItem.jobId == job.id, Delivery.transporterId.is_not(None))
+        ).all()
+        by_transporter: Dict[UUID, List[UUID]] = defaultdict(list)
+        for delivery_id, transporter_id in rows:
+            by_transporter[transporter_id].append(delivery_id)
+
+        manifest_ids = []
+        now = datetime.utcnow()
+        for transporter_id, delivery_ids in by_transporter.items():
+            manifest = Manifest(
+                manifestNo=f"MAN-{now.strftime('%Y%m%d%H%M%S')}-{str(uuid4())[:4].upper()}",
+                transporterId=transporter_id,
+                companyId=job.companyId,
+                status=ManifestStatus.OPEN,
+            )
+            self.session.add(manifest)
+            self.session.flush()
+            table = Delivery.__table__
+            for chunk in _chunks(delivery_ids, BULK_SHIP_LOAD_CHUNK):
+                self.session.execute(
+                    update(table)
+                    .where(table.c.id.in_(chunk))
+                    .values(manifestId=manifest.id, status=DeliveryStatus.MANIFESTED.value, updatedAt=now)
+                )
+            manifest_ids.append(str(manifest.id))
+        return manifest_ids
+
+
+def run_bulk_ship_job(job_id: UUID, orders: List[BulkShipOrder]):
+    """
+    Run a BulkShipJob on its own session and event loop.
+    Sync entry point for BackgroundTasks.
+    """
+    from app.core.database import engine as db_engine
+
+    with Session(db_engine) as session:
+        job = session.get(BulkShipJob, job_id)
+        if not job:
+            logger.error(f"Bulk ship job {job_id} not found")
+            return
+        asyncio.run(BulkShipEngine(session).run(job, orders))
@@ -0,0 +1,487 @@
+"""
+AWB Pool — Atomic allocation of pre-loaded AWB numbers.
+
+AWB rows (uploaded in bulk or fetched from the carrier) are handed out
+without two processes ever getting the same number:
+- The pool is per (company, transporter). AWBs fetched from a carrier's
+  waybill API carry the companyId of the account that fetched them and
+  are only handed to that company's shipments; rows without a company
+  (uploaded stock) are shared.
+- Each process claims blocks of AWB_BLOCK_SIZE unused rows per pool
+  with one UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED)
+  RETURNING, on a short transaction of its own. Claimed rows are marked
+  used with a "POOL:<host>:<pid>" reservation in usedFor.
+- take() serves from the in-memory block (no DB round trip to pick the
+  number). Right before the booking call, mark_sent() commits the AWB as
+  "SENT:<reference>" on a short transaction of its own; record() then
+  writes the real usedFor through the caller's session, so the AWB is
+  tied to the shipment in the same commit. Both only touch rows still
+  reserved by this process: a number whose reservation was reclaimed
+  meanwhile is reported by mark_sent() and must not be booked.
+- Once an AWB has been sent to the carrier it never goes back to the
+  pool: if the booking didn't clearly succeed with it (rejection, timeout,
+  error) the carrier may still have booked or burnt it, so quarantine()
+  parks it as "QUARANTINE:<reference>". Only AWBs that never left the
+  process are release()d.
+- Blocks are held at most AWB_POOL_HOLD_SECONDS, then handed back.
+  Reservations older than AWB_RESERVATION_TIMEOUT_HOURS (a process that
+  died holding a block) are reset by the scheduler
+  (reclaim_stale_awb_reservations). AWBs still "SENT:" after that long
+  (the booking's commit failed, or the process died mid-booking) are
+  quarantined instead, since the carrier may hold them.
+- When a pool's unused stock drops below AWB_STOCK_LOW_WATERMARK,
+  an "awb.stock_low" event is raised, and ShippingService tops the stock
+  up from the carrier's waybill API (replenish_awb_stock) in the background.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional, Set, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import bindparam, case, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session
+
+from app.models import AWB
+from .base import CarrierAdapter
+
+logger = logging.getLogger(__name__)
+
+
+AWB_BLOCK_SIZE = 50
+AWB_POOL_HOLD_SECONDS = 3600
+AWB_STOCK_LOW_WATERMARK = 500
+AWB_REPLENISH_COUNT = 1000
+AWB_RESERVATION_TIMEOUT_HOURS = 24
+AWB_EMPTY_RECHECK_SECONDS = 60       # Don't re-query a transporter with no stock on every shipment
+AWB_REPLENISH_COOLDOWN_SECONDS = 300
+RESERVATION_PREFIX = "POOL:"
+SENT_PREFIX = "SENT:"
+QUARANTINE_PREFIX = "QUARANTINE:"
+
+_reservation_tag = f"{RESERVATION_PREFIX}{socket.gethostname()}:{os.getpid()}"
+
+
+# (companyId, transporterId)
+PoolKey = Tuple[UUID, UUID]
+
+
+@dataclass
+class AWBBlock:
+    """AWB numbers claimed by this process for one (company, transporter)."""
+    numbers: Deque[str] = field(default_factory=deque)
+    claimed_at: float = 0.0
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() - self.claimed_at > AWB_POOL_HOLD_SECONDS
+
+
+# ── Process-local pool ─────────────────────────────────────────────────
+_pool: Dict[PoolKey, AWBBlock] = {}
+_pool_lock = threading.Lock()
+_empty_until: Dict[PoolKey, float] = {}
+_low_stock: Set[PoolKey] = set()  # Pools whose stock fell below the watermark
+_replenish_after: Dict[PoolKey, float] = {}
+_replenishing: Set[PoolKey] = set()
+
+
+def pooled_count(company_id: UUID, transporter_id: UUID) -> int:
+    with _pool_lock:
+        block = _pool.get((company_id, transporter_id))
+        return len(block.numbers) if block else 0
+
+
+def _available(table, company_id: UUID, transporter_id: UUID):
+    """Unused rows a company may take: its own and shared (uploaded) stock."""
+    return (
+        (table.c.transporterId == transporter_id)
+        & table.c.isUsed.is_(False)
+        & (table.c.companyId.is_(None) | (table.c.companyId == company_id))
+    )
+
+
+class AWBAllocator:
+    """
+    Hands out AWB numbers from the AWB table, one block claim per
+    AWB_BLOCK_SIZE shipments.
+
+    Usage:
+        allocator = AWBAllocator(session)
+        awb_no = allocator.take(company_id, transporter_id)
+        if allocator.mark_sent([(awb_no, order.orderNo)]):
+            ... reservation lost: take another number ...
+        ... booking call ...
+        if carrier_booked_it:
+            allocator.record(awb_no, used_for=order.orderNo)
+        elif sent_to_carrier:
+            allocator.quarantine([awb_no], order.orderNo)
+        else:
+            allocator.release(company_id, transporter_id, awb_no)
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def take(self, company_id: UUID, transporter_id: UUID) -> Optional[str]:
+        """Next AWB of the company's pool for `transporter_id`, or None if it is empty."""
+        return self._next((company_id, transporter_id))
+
+    def mark_sent(self, sent: List[Tuple[str, str]]) -> List[str]:
+        """
+        Commit (awb_no, reference) pairs as "SENT:<reference>" on a
+        transaction of their own, before the AWBs go out in a booking call.
+        If the caller's commit never lands, the reclaim job then knows the
+        carrier may have these numbers and quarantines them instead of
+        freeing them.
+        Returns the numbers that are no longer reserved by this process
+        (reclaimed, or claimed elsewhere since); they must not be used.
+        """
+        if not sent:
+            return []
+        table = AWB.__table__
+        now = datetime.utcnow()
+        used_for = {awb_no: f"{SENT_PREFIX}{reference}" for awb_no, reference in sent}
+        with self.session.get_bind().begin() as connection:
+            marked = set(connection.execute(
+                update(table)
+                .where(table.c.awbNo.in_(used_for), table.c.usedFor == _reservation_tag)
+                .values(
+                    usedFor=case(used_for, value=table.c.awbNo), usedAt=now, updatedAt=now
+                )
+                .returning(table.c.awbNo)
+            ).scalars())
+        lost = [awb_no for awb_no in used_for if awb_no not in marked]
+        if lost:
+            logger.warning(f"AWB reservations lost before booking, not using: {lost}")
+        return lost
+
+    def record(self, awb_no: str, used_for: str) -> bool:
+        """
+        Tie a taken AWB to its shipment through the caller's session, so
+        it is committed (or rolled back) together with the shipment.
+        Only applies while the AWB is still reserved by this process or
+        marked sent for `used_for`; returns False otherwise.
+        """
+        table = AWB.__table__
+        now = datetime.utcnow()
+        return self.session.execute(
+            update(table)
+            .where(
+                table.c.awbNo == awb_no,
+                table.c.usedFor.in_((_reservation_tag, f"{SENT_PREFIX}{used_for}")),
+            )
+            .values(usedFor=used_for, usedAt=now, updatedAt=now)
+        ).rowcount == 1
+
+    def record_many(self, used: List[Tuple[str, str]]):
+        """record() for many (awb_no, used_for) pairs in one executemany."""
+        if not used:
+            return
+        table = AWB.__table__
+        now = datetime.utcnow()
+        self.session.execute(
+            update(table)
+            .where(
+                table.c.awbNo == bindparam("b_awb"),
+                (table.c.usedFor == _reservation_tag) | (table.c.usedFor == bindparam("b_sent")),
+            )
+            .values(usedFor=bindparam("b_used_for"), usedAt=now, updatedAt=now),
+            [
+                {"b_awb": awb_no, "b_used_for": used_for, "b_sent": f"{SENT_PREFIX}{used_for}"}
+                for awb_no, used_for in used
+            ],
+        )
+
+    def take_many(self, company_id: UUID, transporter_id: UUID, count: int) -> List[str]:
+        """
+        Up to `count` AWBs, claimed in as few round trips as possible.
+        The numbers keep their pool reservation until record() is called.
+        """
+        key = (company_id, transporter_id)
+        numbers: List[str] = []
+        expired: List[str] = []
+        with _pool_lock:
+            block = _pool.get(key)
+            if block and block.expired and block.numbers:
+                expired = list(block.numbers)
+                block.numbers.clear()
+            while block and block.numbers and len(numbers) < count:
+                numbers.append(block.numbers.popleft())
+        if expired:
+            self._unreserve(expired)
+        if len(numbers) < count:
+            numbers.extend(self._claim(key, count - len(numbers)))
+        return numbers
+
+    def release(self, company_id: UUID, transporter_id: UUID, awb_no: str):
+        """
+        Put back an AWB that was never sent to the carrier (the shipment
+        failed before the booking call). Anything the carrier has seen goes
+        to quarantine() instead.
+        """
+        with _pool_lock:
+            block = _pool.setdefault(
+                (company_id, transporter_id), AWBBlock(claimed_at=time.monotonic())
+            )
+            block.numbers.appendleft(awb_no)
+
+    def quarantine(self, numbers: List[str], reference: str):
+        """
+        Take AWBs that were sent to the carrier without a confirmed booking
+        out of circulation, on a transaction of their own (so a rollback of
+        the caller's can't put them back). They stay used, as
+        "QUARANTINE:<reference>", until someone checks them with the carrier.
+        """
+        if not numbers:
+            return
+        table = AWB.__table__
+        now = datetime.utcnow()
+        with self.session.get_bind().begin() as connection:
+            connection.execute(
+                update(table)
+                .where(
+                    table.c.awbNo.in_(numbers),
+                    (table.c.usedFor == _reservation_tag) | table.c.usedFor.like(f"{SENT_PREFIX}%"),
+                )
+                .values(usedFor=f"{QUARANTINE_PREFIX}{reference}", usedAt=now, updatedAt=now)
+            )
+        logger.warning(f"Quarantined {len(numbers)} AWBs after unconfirmed bookings ({reference})")
+
+    def needs_replenishment(self, company_id: UUID, transporter_id: UUID) -> bool:
+        """
+        True if a block claim saw the pool's unused stock below the watermark
+        and no top-up was attempted in the last AWB_REPLENISH_COOLDOWN_SECONDS.
+        """
+        key = (company_id, transporter_id)
+        with _pool_lock:
+            if key not in _low_stock or key in _replenishing:
+                return False
+            now = time.monotonic()
+            if _replenish_after.get(key, 0) > now:
+                return False
+            _replenish_after[key] = now + AWB_REPLENISH_COOLDOWN_SECONDS
+            return True
+
+    def stock(self, company_id: UUID, transporter_id: UUID) -> int:
+        """Unused AWBs the company can take (not counting blocks held in memory)."""
+        table = AWB.__table__
+        return self.session.execute(
+            select(func.count()).select_from(table)
+            .where(_available(table, company_id, transporter_id))
+        ).scalar() or 0
+
+    # ========================================================================
+    # Block claims
+    # ========================================================================
+
+    def _next(self, key: PoolKey) -> Optional[str]:
+        expired: List[str] = []
+        with _pool_lock:
+            block = _pool.get(key)
+            if block and block.expired and block.numbers:
+                expired = list(block.numbers)
+                block.numbers.clear()
+            if block and block.numbers:
+                return block.numbers.popleft()
+            if _empty_until.get(key, 0) > time.monotonic():
+                return None
+        if expired:
+            self._unreserve(expired)
+
+        numbers = self._claim(key, AWB_BLOCK_SIZE)
+        if not numbers:
+            with _pool_lock:
+                _empty_until[key] = time.monotonic() + AWB_EMPTY_RECHECK_SECONDS
+            return None
+        awb_no = numbers.pop(0)
+        with _pool_lock:
+            block = _pool.setdefault(key, AWBBlock())
+            block.numbers.extend(numbers)
+            block.claimed_at = time.monotonic()
+        return awb_no
+
+    def _claim(self, key: PoolKey, size: int) -> List[str]:
+        """
+        Mark up to `size` unused AWBs of the pool as reserved by this process
+        and return them. Runs on its own connection and commits immediately;
+        concurrent claimers skip each other's locked rows.
+        """
+        company_id, transporter_id = key
+        table = AWB.__table__
+        now = datetime.utcnow()
+        candidates = (
+            select(table.c.id)
+            .where(_available(table, company_id, transporter_id))
+            .order_by(table.c.createdAt)
+            .limit(size)
+            .with_for_update(skip_locked=True)
+        )
+        with self.session.get_bind().begin() as connection:
+            numbers = list(connection.execute(
+                update(table)
+                .where(table.c.id.in_(candidates))
+                .values(isUsed=True, usedAt=now, usedFor=_reservation_tag, updatedAt=now)
+                .returning(table.c.awbNo)
+            ).scalars())
+            remaining = connection.execute(
+                select(func.count()).select_from(table)
+                .where(_available(table, company_id, transporter_id))
+            ).scalar() or 0
+
+        if remaining < AWB_STOCK_LOW_WATERMARK:
+            self._alert_low_stock(key, remaining)
+        else:
+            with _pool_lock:
+                _low_stock.discard(key)
+        return numbers
+
+    def _unreserve(self, numbers: List[str]):
+        """Hand expired block numbers back to the table."""
+        table = AWB.__table__
+        with self.session.get_bind().begin() as connection:
+            connection.execute(
+                update(table)
+                .where(table.c.awbNo.in_(numbers), table.c.usedFor == _reservation_tag)
+                .values(isUsed=False, usedAt=None, usedFor=None, updatedAt=datetime.utcnow())
+            )
+
+    @staticmethod
+    def _alert_low_stock(key: PoolKey, remaining: int):
+        with _pool_lock:
+            if key in _low_stock:
+                return
+            _low_stock.add(key)
+        company_id, transporter_id = key
+        logger.warning(
+            f"AWB stock low for transporter {transporter_id}, company {company_id}: "
+            f"{remaining} unused (watermark {AWB_STOCK_LOW_WATERMARK})"
+        )
+        from app.services.event_dispatcher import dispatch
+        dispatch("awb.stock_low", {
+            "companyId": str(company_id),
+            "transporterId": str(transporter_id),
+            "remaining": remaining,
+            "watermark": AWB_STOCK_LOW_WATERMARK,
+        })
+
+
+# ============================================================================
+# Replenishment and cleanup
+# ============================================================================
+
+async def replenish_awb_stock(
+    session: Session,
+    company_id: UUID,
+    transporter_id: UUID,
+    adapter: CarrierAdapter,
+    count: int = AWB_REPLENISH_COUNT,
+) -> dict:
+    """
+    Fetch `count` AWBs from the carrier's waybill API in bulk and add
+    them to the AWB table as `company_id`'s stock (`adapter` must use that
+    company's carrier account; numbers already present are skipped).
+    Raises NotImplementedError for carriers without a bulk waybill API.
+    Does not commit.
+    """
+    key = (company_id, transporter_id)
+    with _pool_lock:
+        if key in _replenishing:
+            return {"fetched": 0, "inserted": 0, "skipped": "already running"}
+        _replenishing.add(key)
+    try:
+        numbers = await adapter.fetch_waybills(count)
+        numbers = list(dict.fromkeys(n.strip() for n in numbers if n and n.strip()))
+        inserted = 0
+        if numbers:
+            now = datetime.utcnow()
+            table = AWB.__table__
+            inserted = session.execute(
+                pg_insert(table)
+                .values([
+                    {
+                        "id": uuid4(), "awbNo": n, "transporterId": transporter_id,
+                        "companyId": company_id, "isUsed": False, "createdAt": now, "updatedAt": now,
+                    }
+                    for n in numbers
+                ])
+                .on_conflict_do_nothing(index_elements=[table.c.awbNo])
+            ).rowcount
+        if inserted:
+            with _pool_lock:
+                _low_stock.discard(key)
+                _empty_until.pop(key, None)
+        logger.info(
+            f"Replenished AWB stock for transporter {transporter_id}, company {company_id}: "
+            f"{len(numbers)} fetched, {inserted} new"
+        )
+        return {"fetched": len(numbers), "inserted": inserted}
+    finally:
+        with _pool_lock:
+            _replenishing.discard(key)
+
+
+async def replenish_in_background(company_id: UUID, transporter_id: UUID, carrier_code: str):
+    """Top up a company's AWB stock for a transporter on a session of its own (fire-and-forget)."""
+    from app.core.database import engine
+    from .factory import get_carrier_for_company
+
+    try:
+        with Session(engine) as session:
+            adapter = get_carrier_for_company(session, company_id, carrier_code)
+            if not adapter:
+                return
+            await replenish_awb_stock(session, company_id, transporter_id, adapter)
+            session.commit()
+    except NotImplementedError:
+        logger.info(f"{carrier_code} has no bulk waybill API; AWB stock must be uploaded")
+    except Exception as e:
+        logger.warning(f"AWB replenishment failed for {carrier_code}: {e}")
+
+
+def reclaim_stale_awb_reservations() -> int:
+    """
+    Reset pool reservations older than AWB_RESERVATION_TIMEOUT_HOURS
+    (scheduler job). Live processes hand blocks back well before that.
+    AWBs left "SENT:" that long were sent to the carrier but never tied to
+    a shipment, so they are quarantined rather than handed out again.
+    """
+    from app.core.database import engine
+
+    table = AWB.__table__
+    now = datetime.utcnow()
+    cutoff = now - timedelta(hours=AWB_RESERVATION_TIMEOUT_HOURS)
+    with engine.begin() as connection:
+        reclaimed = connection.execute(
+            update(table)
+            .where(
+                table.c.isUsed.is_(True),
+                table.c.usedFor.like(f"{RESERVATION_PREFIX}%"),
+                table.c.usedAt < cutoff,
+            )
+            .values(isUsed=False, usedAt=None, usedFor=None, updatedAt=now)
+        ).rowcount
+        quarantined = connection.execute(
+            update(table)
+            .where(
+                table.c.isUsed.is_(True),
+                table.c.usedFor.like(f"{SENT_PREFIX}%"),
+                table.c.usedAt < cutoff,
+            )
+            .values(
+                usedFor=QUARANTINE_PREFIX + func.substr(table.c.usedFor, len(SENT_PREFIX) + 1),
+                usedAt=now,
+                updatedAt=now,
+            )
+        ).rowcount
+    if reclaimed:
+        logger.info(f"Reclaimed {reclaimed} stale AWB pool reservations")
+    if quarantined:
+        logger.warning(f"Quarantined {quarantined} AWBs sent to carriers but never recorded")
+    return reclaimed
@@ -3,12 +3,19 @@ Carrier Adapter — Abstract Base Class
 Every courier partner adapter (Shiprocket, Delhivery, BlueDart, etc.)
 implements this interface so the rest of the OMS is carrier-agnostic.
 """
+import logging
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 from uuid import UUID
 
+import httpx
+
+from .http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
 
 # ============================================================================
 # Data Transfer Objects (carrier-agnostic)
@@ -53,6 +60,7 @@ class ShipmentRequest:
     items: List[PackageItem] = field(default_factory=list)
     product_description: str = ""
     seller_gstin: str = ""
+    awb_number: str = ""  # Pre-assigned from the AWB pool; adapters fetch one when empty
 
 
 @dataclass
@@ -103,6 +111,7 @@ class RateQuote:
     cod_charges: float = 0
     estimated_days: int = 0
     service_type: str = ""  # e.g., "Surface", "Express", "Air"
+    source: str = "CARRIER_API"  # or "RATE_CARD" (priced locally, see rate_engine.py)
 
 
 @dataclass
@@ -124,6 +133,20 @@ class ServiceabilityResponse:
     error: str = ""
 
 
+@dataclass
+class PincodeCoverage:
+    """One row of a carrier's pincode dump (see CarrierAdapter.pincode_dump)."""
+    pincode: str
+    is_serviceable: bool = True
+    cod_available: bool = False
+    prepaid_available: bool = False
+    reverse_available: bool = False
+    zone_code: Optional[str] = None
+    estimated_days: Optional[int] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+
+
 # ============================================================================
 # Abstract Carrier Adapter
 # ============================================================================
@@ -136,6 +159,14 @@ class CarrierAdapter(ABC):
 
     carrier_code: str = ""
     carrier_name: str = ""
+    # Default API root; adapters with a configurable host set self._base_url
+    base_url: str = ""
+    # Max AWBs per bulk_track() call; 0 = carrier has no bulk tracking API
+    bulk_track_size: int = 0
+    # Max shipments per create_shipments() call; 0 = carrier has no batch booking API
+    bulk_ship_size: int = 0
+    # True if create_shipment takes a pre-assigned AWB (ShipmentRequest.awb_number)
+    uses_awb_pool: bool = False
 
     def __init__(self, credentials: Dict[str, Any]):
         """
@@ -144,6 +175,11 @@ class CarrierAdapter(ABC):
         """
         self.credentials = credentials
 
+    @property
+    def _client(self) -> httpx.AsyncClient:
+        """Pooled HTTP client shared by all adapters calling the same host."""
+        return get_http_client(getattr(self, "_base_url", None) or self.base_url)
+
     @abstractmethod
     async def authenticate(self) -> bool:
         """
@@ -208,6 +244,49 @@ class CarrierAdapter(ABC):
         """
         raise NotImplementedError(f"{self.carrier_name} does not support NDR actions via API")
 
+    async def bulk_track(self, awb_numbers: List[str]) -> List[TrackingResponse]:
+        """
+        Track up to `bulk_track_size` AWBs in one API call.
+        Optional — only carriers with bulk_track_size > 0 implement it.
+        """
+        raise NotImplementedError(f"{self.carrier_name} does not support bulk tracking via API")
+
+    async def create_shipments(self, requests: List[ShipmentRequest]) -> List[ShipmentResponse]:
+        """
+        Book up to `bulk_ship_size` shipments in one API call.
+        Returns one ShipmentResponse per request, in request order.
+        Optional — only carriers with bulk_ship_size > 0 implement it.
+        """
+        raise NotImplementedError(f"{self.carrier_name} does not support batch booking via API")
+
+    async def get_labels(self, awb_numbers: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Label URLs for several AWBs. Default: one get_label() call per AWB;
+        carriers with a multi-AWB label API override this.
+        """
+        labels: Dict[str, Optional[str]] = {}
+        for awb in awb_numbers:
+            try:
+                labels[awb] = await self.get_label(awb)
+            except Exception as e:
+                logger.warning(f"{self.carrier_name} label fetch failed for {awb}: {e}")
+                labels[awb] = None
+        return labels
+
+    async def pincode_dump(self) -> List[PincodeCoverage]:
+        """
+        Every pincode the carrier serves, in one call.
+        Optional — only carriers with a pincode dump API implement it.
+        """
+        raise NotImplementedError(f"{self.carrier_name} does not support pincode dumps via API")
+
+    async def fetch_waybills(self, count: int) -> List[str]:
+        """
+        `count` fresh AWB numbers in one call, to stock the AWB pool.
+        Optional — only carriers with a bulk waybill API implement it.
+        """
+        raise NotImplementedError(f"{self.carrier_name} does not support bulk waybill fetch via API")
+
     async def request_pickup(self, shipment_ids: List[str]) -> Dict[str, Any]:
         """Request carrier pickup for shipments. Optional — not all carriers support it."""
         raise NotImplementedError(f"{self.carrier_name} does not support pickup request via API")
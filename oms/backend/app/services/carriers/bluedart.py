@@ -54,7 +54,6 @@ class BlueDartAdapter(CarrierAdapter):
         self._base_url = credentials.get(
             "base_url", "https://apigateway.bluedart.com"
         )
-        self._client = httpx.AsyncClient(timeout=30.0)
 
     # ========================================================================
     # Authentication
@@ -17,15 +17,36 @@ from typing import Dict, Any, List, Optional
 import httpx
 
 from .base import (
-    CarrierAdapter, ShipmentRequest, ShipmentResponse,
+    Address, CarrierAdapter, ShipmentRequest, ShipmentResponse,
     TrackingResponse, TrackingEvent, RateResponse, RateQuote,
-    ServiceabilityResponse,
+    ServiceabilityResponse, PincodeCoverage,
 )
 from .status_mapper import StatusMapper
 
 logger = logging.getLogger(__name__)
 
 
+def parse_delhivery_datetime(dt_string: str) -> Optional[datetime]:
+    """
+    Parse a Delhivery scan / status datetime (ScanDateTime, StatusDateTime).
+    Returns None if the string is empty or in no known format.
+    """
+    if not dt_string:
+        return None
+    for fmt in (
+        "%Y-%m-%dT%H:%M:%S%z",
+        "%Y-%m-%dT%H:%M:%S",
+        "%Y-%m-%d %H:%M:%S",
+        "%Y-%m-%dT%H:%M:%S.%f%z",
+        "%Y-%m-%dT%H:%M:%S.%f",
+    ):
+        try:
+            return datetime.strptime(dt_string, fmt)
+        except ValueError:
+            continue
+    return None
+
+
 class DelhiveryAdapter(CarrierAdapter):
     """
     Delhivery carrier adapter.
@@ -40,6 +61,9 @@ class DelhiveryAdapter(CarrierAdapter):
 
     carrier_code = "DELHIVERY"
     carrier_name = "Delhivery"
+    bulk_track_size = 50  # packages API accepts up to 50 comma-separated waybills
+    bulk_ship_size = 100  # CMU create accepts a list of shipments per call
+    uses_awb_pool = True
 
     def __init__(self, credentials: Dict[str, Any]):
         super().__init__(credentials)
@@ -49,7 +73,6 @@ class DelhiveryAdapter(CarrierAdapter):
         self._api_token = credentials.get("api_token", "")
         self._pickup_location = credentials.get("pickup_location", "")
         self._client_name = credentials.get("client_name", "")
-        self._client = httpx.AsyncClient(timeout=30.0)
 
     # ========================================================================
     # Auth helpers
@@ -107,73 +130,14 @@ class DelhiveryAdapter(CarrierAdapter):
           2. POST order to /api/cmu/create.json as form data
         """
         try:
-            # Step 1: Fetch a fresh AWB number (optional -- Delhivery can
-            # auto-assign if waybill is left empty, but pre-fetching gives us
-            # the AWB immediately in the response).
-            awb_number = await self._fetch_waybill()
+            # Step 1: Use the AWB from our pool, else fetch a fresh one
+            # (optional -- Delhivery can auto-assign if waybill is left
+            # empty, but pre-fetching gives us the AWB immediately in the
+            # response).
+            awb_number = request.awb_number or await self._fetch_waybill()
 
             # Step 2: Build and submit the order
-            pickup_name = (
-                request.pickup.name
-                or self._pickup_location
-                or "Primary"
-            )
-
-            # Determine payment mode string for Delhivery
-            payment_mode = "COD" if request.payment_mode == "COD" else "Pre-paid"
-
-            # Build product description from items
-            product_desc = request.product_description
-            if not product_desc and request.items:
-                product_desc = ", ".join(
-                    f"{item.name} x{item.quantity}" for item in request.items
-                )
-            product_desc = product_desc or "Package"
-
-            # Collect HSN/GSTIN from first item or request
-            hsn_code = ""
-            if request.items:
-                hsn_code = request.items[0].hsn_code or ""
-
-            shipment_data = {
-                "shipments": [
-                    {
-                        "order": request.order_id,
-                        "waybill": awb_number or "",
-                        "name": request.delivery.name,
-                        "phone": request.delivery.phone,
-                        "add": request.delivery.address_line1,
-                        "add2": request.delivery.address_line2,
-                        "city": request.delivery.city,
-                        "state": request.delivery.state,
-                        "pin": request.delivery.pincode,
-                        "country": request.delivery.country or "India",
-                        "payment_mode": payment_mode,
-                        "products_desc": product_desc,
-                        "cod_amount": str(request.cod_amount) if request.payment_mode == "COD" else "0",
-                        "total_amount": str(request.invoice_value or request.cod_amount),
-                        "weight": str(request.weight_grams),
-                        "seller_gst_tin": request.seller_gstin or "",
-                        "hsn_code": hsn_code,
-                    }
-                ],
-                "pickup_location": {
-                    "name": pickup_name,
-                },
-            }
-
-            form_data = {
-                "format": "json",
-                "data": json.dumps(shipment_data),
-            }
-
-            resp = await self._client.post(
-                f"{self._base_url}/api/cmu/create.json",
-                data=form_data,
-                headers=self._form_headers(),
-            )
-            resp.raise_for_status()
-            data = resp.json()
+            data = await self._cmu_create(request.pickup, [(request, awb_number)])
 
             # Parse response -- Delhivery returns:
             # {"packages": [{"waybill": "...", "status": "Success", ...}], ...}
@@ -185,33 +149,7 @@ class DelhiveryAdapter(CarrierAdapter):
                     error=f"No packages in Delhivery response: {data}",
                     raw_response=data,
                 )
-
-            pkg = packages[0]
-            pkg_status = pkg.get("status", "").lower()
-            remarks = pkg.get("remarks", [])
-            returned_awb = pkg.get("waybill", awb_number or "")
-
-            if pkg_status == "success" or returned_awb:
-                tracking_url = (
-                    f"https://www.delhivery.com/track/package/{returned_awb}"
-                    if returned_awb
-                    else ""
-                )
-                return ShipmentResponse(
-                    success=True,
-                    awb_number=str(returned_awb),
-                    carrier_order_id=str(pkg.get("refnum", request.order_id)),
-                    tracking_url=tracking_url,
-                    label_url="",  # Labels fetched separately via get_label
-                    raw_response=data,
-                )
-            else:
-                error_msg = "; ".join(remarks) if remarks else f"Order failed: {pkg}"
-                return ShipmentResponse(
-                    success=False,
-                    error=error_msg,
-                    raw_response=data,
-                )
+            return self._package_response(packages[0], request, awb_number, data)
 
         except httpx.HTTPStatusError as e:
             logger.error(
@@ -226,6 +164,147 @@ class DelhiveryAdapter(CarrierAdapter):
             logger.error(f"Delhivery create_shipment failed: {e}")
             return ShipmentResponse(success=False, error=str(e))
 
+    async def create_shipments(self, requests: List[ShipmentRequest]) -> List[ShipmentResponse]:
+        """
+        Book several shipments in one /api/cmu/create.json call.
+        All requests must share a pickup location (CMU takes one per call).
+        AWBs missing from the requests are fetched in one bulk waybill call;
+        if that fails, Delhivery auto-assigns them.
+        """
+        if not requests:
+            return []
+        try:
+            missing = sum(1 for r in requests if not r.awb_number)
+            fetched: List[str] = []
+            if missing:
+                try:
+                    fetched = await self.fetch_waybills(missing)
+                except Exception as e:
+                    logger.warning(f"Delhivery bulk AWB fetch failed (non-fatal): {e}")
+            fetched_iter = iter(fetched)
+            shipments = [
+                (r, r.awb_number or next(fetched_iter, "")) for r in requests
+            ]
+
+            data = await self._cmu_create(requests[0].pickup, shipments)
+            packages = data.get("packages", [])
+            by_ref = {str(p.get("refnum", "")): p for p in packages if p.get("refnum")}
+
+            responses = []
+            for i, (request, awb_number) in enumerate(shipments):
+                pkg = by_ref.get(request.order_id)
+                if pkg is None and len(packages) == len(shipments):
+                    pkg = packages[i]
+                if pkg is None:
+                    responses.append(ShipmentResponse(
+                        success=False,
+                        error="Order missing from Delhivery response",
+                        raw_response=data,
+                    ))
+                    continue
+                responses.append(self._package_response(pkg, request, awb_number, data))
+            return responses
+
+        except httpx.HTTPStatusError as e:
+            logger.error(
+                f"Delhivery create_shipments HTTP error: "
+                f"{e.response.status_code} - {e.response.text}"
+            )
+            error = f"HTTP {e.response.status_code}: {e.response.text}"
+        except Exception as e:
+            logger.error(f"Delhivery create_shipments failed: {e}")
+            error = str(e)
+        return [ShipmentResponse(success=False, error=error) for _ in requests]
+
+    def _shipment_payload(self, request: ShipmentRequest, awb_number: Optional[str]) -> Dict[str, Any]:
+        """One entry of the CMU "shipments" list."""
+        # Determine payment mode string for Delhivery
+        payment_mode = "COD" if request.payment_mode == "COD" else "Pre-paid"
+
+        # Build product description from items
+        product_desc = request.product_description
+        if not product_desc and request.items:
+            product_desc = ", ".join(
+                f"{item.name} x{item.quantity}" for item in request.items
+            )
+        product_desc = product_desc or "Package"
+
+        # Collect HSN/GSTIN from first item or request
+        hsn_code = ""
+        if request.items:
+            hsn_code = request.items[0].hsn_code or ""
+
+        return {
+            "order": request.order_id,
+            "waybill": awb_number or "",
+            "name": request.delivery.name,
+            "phone": request.delivery.phone,
+            "add": request.delivery.address_line1,
+            "add2": request.delivery.address_line2,
+            "city": request.delivery.city,
+            "state": request.delivery.state,
+            "pin": request.delivery.pincode,
+            "country": request.delivery.country or "India",
+            "payment_mode": payment_mode,
+            "products_desc": product_desc,
+            "cod_amount": str(request.cod_amount) if request.payment_mode == "COD" else "0",
+            "total_amount": str(request.invoice_value or request.cod_amount),
+            "weight": str(request.weight_grams),
+            "seller_gst_tin": request.seller_gstin or "",
+            "hsn_code": hsn_code,
+        }
+
+    async def _cmu_create(self, pickup: Address, shipments: List[tuple]) -> Dict[str, Any]:
+        """POST (request, awb) pairs to /api/cmu/create.json; returns the parsed response."""
+        pickup_name = pickup.name or self._pickup_location or "Primary"
+        shipment_data = {
+            "shipments": [self._shipment_payload(r, awb) for r, awb in shipments],
+            "pickup_location": {
+                "name": pickup_name,
+            },
+        }
+        form_data = {
+            "format": "json",
+            "data": json.dumps(shipment_data),
+        }
+        resp = await self._client.post(
+            f"{self._base_url}/api/cmu/create.json",
+            data=form_data,
+            headers=self._form_headers(),
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    @staticmethod
+    def _package_response(
+        pkg: Dict[str, Any], request: ShipmentRequest, awb_number: Optional[str], data: Dict[str, Any]
+    ) -> ShipmentResponse:
+        """ShipmentResponse for one entry of the CMU "packages" list."""
+        pkg_status = pkg.get("status", "").lower()
+        remarks = pkg.get("remarks", [])
+        returned_awb = pkg.get("waybill", awb_number or "")
+
+        if pkg_status == "success" or returned_awb:
+            tracking_url = (
+                f"https://www.delhivery.com/track/package/{returned_awb}"
+                if returned_awb
+                else ""
+            )
+            return ShipmentResponse(
+                success=True,
+                awb_number=str(returned_awb),
+                carrier_order_id=str(pkg.get("refnum", request.order_id)),
+                tracking_url=tracking_url,
+                label_url="",  # Labels fetched separately via get_label
+                raw_response=data,
+            )
+        error_msg = "; ".join(remarks) if remarks else f"Order failed: {pkg}"
+        return ShipmentResponse(
+            success=False,
+            error=error_msg,
+            raw_response=data,
+        )
+
     async def _fetch_waybill(self) -> Optional[str]:
         """
         Pre-fetch a single AWB number from Delhivery.
@@ -254,6 +333,22 @@ class DelhiveryAdapter(CarrierAdapter):
             logger.warning(f"Delhivery AWB fetch failed (non-fatal): {e}")
             return None
 
+    async def fetch_waybills(self, count: int) -> List[str]:
+        """
+        Fetch up to `count` AWB numbers in one call via
+        /waybill/api/bulk/json/ (comma-separated in the response).
+        """
+        resp = await self._client.get(
+            f"{self._base_url}/waybill/api/bulk/json/",
+            params={"cl": self._client_name, "count": count},
+            headers=self._headers(),
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        if isinstance(data, list):
+            return [str(w).strip() for w in data if str(w).strip()]
+        return [w.strip() for w in str(data or "").split(",") if w.strip()]
+
     # ========================================================================
     # Shipment Cancellation
     # ========================================================================
@@ -314,33 +409,8 @@ class DelhiveryAdapter(CarrierAdapter):
                     raw_response=data,
                 )
 
-            shipment = shipment_data_list[0].get("Shipment", {})
-            if not shipment:
-                return TrackingResponse(
-                    success=False,
-                    awb_number=awb_number,
-                    error="Empty Shipment object in response",
-                    raw_response=data,
-                )
-
-            # Parse current status
-            status_obj = shipment.get("Status", {})
-            current_raw_status = status_obj.get("Status", "")
-            current_oms_status = StatusMapper.map_delhivery_status(current_raw_status)
-
-            # Parse EDD
-            edd = shipment.get("ExpectedDeliveryDate")
-
-            # Parse scan history
-            events = self._parse_tracking_events(shipment)
-
-            return TrackingResponse(
-                success=True,
-                awb_number=awb_number,
-                current_status=current_oms_status.value,
-                edd=edd,
-                events=events,
-                raw_response=data,
+            return self._to_tracking_response(
+                awb_number, shipment_data_list[0].get("Shipment", {}), data
             )
 
         except httpx.HTTPStatusError as e:
@@ -359,6 +429,86 @@ class DelhiveryAdapter(CarrierAdapter):
                 success=False, awb_number=awb_number, error=str(e)
             )
 
+    async def bulk_track(self, awb_numbers: List[str]) -> List[TrackingResponse]:
+        """
+        Track up to 50 AWBs in one call: /api/v1/packages/json/?waybill=a,b,c.
+        Returns one TrackingResponse per requested AWB, in request order.
+        """
+        if not awb_numbers:
+            return []
+
+        try:
+            resp = await self._client.get(
+                f"{self._base_url}/api/v1/packages/json/",
+                params={
+                    "waybill": ",".join(awb_numbers),
+                    "token": self._api_token,
+                },
+                headers=self._headers(),
+            )
+            resp.raise_for_status()
+            data = resp.json()
+
+            by_awb: Dict[str, TrackingResponse] = {}
+            for shipment_data in data.get("ShipmentData", []):
+                shipment = shipment_data.get("Shipment", {})
+                awb = str(shipment.get("AWB", ""))
+                if awb:
+                    by_awb[awb] = self._to_tracking_response(awb, shipment, shipment_data)
+
+            return [
+                by_awb.get(awb) or TrackingResponse(
+                    success=False,
+                    awb_number=awb,
+                    error="No ShipmentData in response",
+                )
+                for awb in awb_numbers
+            ]
+
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Delhivery bulk tracking HTTP error: {e.response.status_code}")
+            error = f"HTTP {e.response.status_code}: {e.response.text}"
+        except Exception as e:
+            logger.error(f"Delhivery bulk tracking failed: {e}")
+            error = str(e)
+
+        return [
+            TrackingResponse(success=False, awb_number=awb, error=error)
+            for awb in awb_numbers
+        ]
+
+    def _to_tracking_response(
+        self, awb_number: str, shipment: Dict[str, Any], raw: Dict[str, Any]
+    ) -> TrackingResponse:
+        """Normalize one Delhivery Shipment object into a TrackingResponse."""
+        if not shipment:
+            return TrackingResponse(
+                success=False,
+                awb_number=awb_number,
+                error="Empty Shipment object in response",
+                raw_response=raw,
+            )
+
+        # Parse current status
+        status_obj = shipment.get("Status", {})
+        current_raw_status = status_obj.get("Status", "")
+        current_oms_status = StatusMapper.map_delhivery_status(current_raw_status)
+
+        # Parse EDD
+        edd = shipment.get("ExpectedDeliveryDate")
+
+        # Parse scan history
+        events = self._parse_tracking_events(shipment)
+
+        return TrackingResponse(
+            success=True,
+            awb_number=awb_number,
+            current_status=current_oms_status.value,
+            edd=edd,
+            events=events,
+            raw_response=raw,
+        )
+
     def _parse_tracking_events(self, shipment: Dict[str, Any]) -> List[TrackingEvent]:
         """
         Parse the Scans array from a Delhivery tracking response into
@@ -414,19 +564,11 @@ class DelhiveryAdapter(CarrierAdapter):
         """
         if not dt_string:
             return datetime.now(timezone.utc)
-        for fmt in (
-            "%Y-%m-%dT%H:%M:%S%z",
-            "%Y-%m-%dT%H:%M:%S",
-            "%Y-%m-%d %H:%M:%S",
-            "%Y-%m-%dT%H:%M:%S.%f%z",
-            "%Y-%m-%dT%H:%M:%S.%f",
-        ):
-            try:
-                return datetime.strptime(dt_string, fmt)
-            except ValueError:
-                continue
-        logger.warning(f"Could not parse Delhivery datetime: {dt_string}")
-        return datetime.now(timezone.utc)
+        parsed = parse_delhivery_datetime(dt_string)
+        if parsed is None:
+            logger.warning(f"Could not parse Delhivery datetime: {dt_string}")
+            return datetime.now(timezone.utc)
+        return parsed
 
     # ========================================================================
     # Rate Calculator
@@ -573,6 +715,41 @@ class DelhiveryAdapter(CarrierAdapter):
             logger.warning(f"Delhivery pincode check failed for {pincode}: {e}")
             return None
 
+    async def pincode_dump(self) -> List[PincodeCoverage]:
+        """
+        Full pincode list: /c/api/pin-codes/json/ without filter_codes.
+        Feeds the ServicePincode table / serviceability index, so order-time
+        checks don't need one _check_pincode call per pincode.
+        """
+        resp = await self._client.get(
+            f"{self._base_url}/c/api/pin-codes/json/",
+            params={"token": self._api_token},
+            headers=self._headers(),
+            timeout=120.0,
+        )
+        resp.raise_for_status()
+
+        coverage = []
+        for entry in resp.json().get("delivery_codes", []):
+            postal = entry.get("postal_code", {})
+            pincode = str(postal.get("pin", "")).strip()
+            if not pincode:
+                continue
+            is_prepaid = postal.get("pre_paid", "N") == "Y"
+            is_cod = postal.get("cash", "N") == "Y"
+            max_days = postal.get("max_days")
+            coverage.append(PincodeCoverage(
+                pincode=pincode,
+                is_serviceable=is_prepaid or is_cod,
+                cod_available=is_cod,
+                prepaid_available=is_prepaid,
+                reverse_available=postal.get("pickup", "N") == "Y",
+                estimated_days=int(max_days) if max_days else None,
+                city=postal.get("district") or None,
+                state=postal.get("state_code") or None,
+            ))
+        return coverage
+
     # ========================================================================
     # Label (Packing Slip)
     # ========================================================================
@@ -604,6 +781,31 @@ class DelhiveryAdapter(CarrierAdapter):
             logger.error(f"Delhivery get_label failed for {awb_number}: {e}")
             return None
 
+    async def get_labels(self, awb_numbers: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Label URLs for several AWBs. packing_slip takes comma-separated
+        waybills, so one HEAD check per 50 AWBs covers the whole batch.
+        """
+        labels: Dict[str, Optional[str]] = {}
+        for i in range(0, len(awb_numbers), 50):
+            chunk = awb_numbers[i:i + 50]
+            try:
+                resp = await self._client.head(
+                    f"{self._base_url}/api/p/packing_slip"
+                    f"?wbns={','.join(chunk)}&token={self._api_token}",
+                    headers=self._headers(),
+                )
+                available = resp.status_code == 200
+            except Exception as e:
+                logger.error(f"Delhivery bulk label check failed: {e}")
+                available = False
+            for awb in chunk:
+                labels[awb] = (
+                    f"{self._base_url}/api/p/packing_slip?wbns={awb}&token={self._api_token}"
+                    if available else None
+                )
+        return labels
+
     # ========================================================================
     # NDR Actions
     # ========================================================================
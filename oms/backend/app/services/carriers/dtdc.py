@@ -61,7 +61,6 @@ class DTDCAdapter(CarrierAdapter):
         self._token: Optional[str] = None
         self._token_expiry: Optional[datetime] = None
         self._base_url = credentials.get("base_url", "https://api.dtdc.com")
-        self._client = httpx.AsyncClient(timeout=30.0)
 
     # ========================================================================
     # Authentication
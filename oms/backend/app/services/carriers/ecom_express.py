@@ -59,13 +59,13 @@ class EcomExpressAdapter(CarrierAdapter):
 
     carrier_code = "ECOM_EXPRESS"
     carrier_name = "Ecom Express"
+    bulk_track_size = 50
 
     def __init__(self, credentials: Dict[str, Any]):
         super().__init__(credentials)
         self._base_url = credentials.get(
             "base_url", "https://api.ecomexpress.in"
         )
-        self._client = httpx.AsyncClient(timeout=30.0)
 
     def _auth_form_data(self) -> Dict[str, str]:
         """
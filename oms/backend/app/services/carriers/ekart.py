@@ -81,7 +81,6 @@ class EkartAdapter(CarrierAdapter):
         self._api_key: str = credentials.get("api_key", "")
         self._client_id: str = credentials.get("client_id", "")
         self._base_url = credentials.get("base_url", "https://api.ekartlogistics.com/api/v1")
-        self._client = httpx.AsyncClient(timeout=30.0)
 
     # ========================================================================
     # Authentication
@@ -1,11 +1,24 @@
 """
 Carrier Factory — Returns the appropriate CarrierAdapter based on transporter code.
 Reads credentials from TransporterConfig for the given company + transporter.
+
+Adapters returned by get_carrier_for_company are cached per
+(companyId, carrierCode) for ADAPTER_CACHE_TTL_SECONDS (LRU, at most
+ADAPTER_CACHE_MAX_SIZE entries), so polling loops skip the Transporter /
+TransporterConfig lookups and reuse tokens the adapter obtained in
+authenticate(). Entries are dropped as soon as a TransporterConfig or
+Transporter row is inserted, updated or deleted through the ORM in this
+process; changes made elsewhere are picked up when the TTL expires.
 """
 import logging
-from typing import Optional, Dict, Any
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
 from uuid import UUID
 
+from sqlalchemy import event
+from sqlalchemy.orm import Session as SASession, object_session
 from sqlmodel import Session, select
 
 from app.models.transporter import Transporter, TransporterConfig
@@ -34,6 +47,66 @@ CARRIER_REGISTRY: Dict[str, type] = {
 }
 
 
+# ── Adapter cache ──────────────────────────────────────────────────────
+ADAPTER_CACHE_TTL_SECONDS = 600
+ADAPTER_CACHE_MAX_SIZE = 512
+
+# (companyId, carrierCode) -> (expires at, adapter or None)
+_adapter_cache: "OrderedDict[Tuple[UUID, str], Tuple[float, Optional[CarrierAdapter]]]" = OrderedDict()
+_adapter_cache_lock = threading.Lock()
+
+
+def invalidate_carrier_cache(company_id: Optional[UUID] = None):
+    """Drop cached adapters for one company, or for all companies."""
+    with _adapter_cache_lock:
+        if company_id is None:
+            _adapter_cache.clear()
+            return
+        for key in [k for k in _adapter_cache if k[0] == company_id]:
+            del _adapter_cache[key]
+
+
+def _cache_get(key: Tuple[UUID, str]):
+    with _adapter_cache_lock:
+        entry = _adapter_cache.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] < time.monotonic():
+            del _adapter_cache[key]
+            return False, None
+        _adapter_cache.move_to_end(key)
+        return True, entry[1]
+
+
+def _cache_put(key: Tuple[UUID, str], adapter: Optional[CarrierAdapter]):
+    with _adapter_cache_lock:
+        _adapter_cache[key] = (time.monotonic() + ADAPTER_CACHE_TTL_SECONDS, adapter)
+        _adapter_cache.move_to_end(key)
+        while len(_adapter_cache) > ADAPTER_CACHE_MAX_SIZE:
+            _adapter_cache.popitem(last=False)
+
+
+def _on_config_change(mapper, connection, target):
+    """Invalidate now, and again after commit (a concurrent lookup may have
+    re-cached the old row between flush and commit)."""
+    company_id = getattr(target, "companyId", None)
+    invalidate_carrier_cache(company_id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("carrier_cache_invalidate", set()).add(company_id)
+
+
+def _on_commit(session):
+    for company_id in session.info.pop("carrier_cache_invalidate", ()):
+        invalidate_carrier_cache(company_id)
+
+
+for _model in (TransporterConfig, Transporter):
+    for _event_name in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event_name, _on_config_change)
+event.listen(SASession, "after_commit", _on_commit)
+
+
 def get_carrier_adapter(
     carrier_code: str,
     credentials: Dict[str, Any],
@@ -56,7 +129,13 @@ def get_carrier_for_company(
     """
     Get a carrier adapter for a specific company.
     Looks up TransporterConfig to get credentials.
+    The adapter instance (and any auth token it holds) is cached.
     """
+    cache_key = (company_id, carrier_code.upper())
+    hit, adapter = _cache_get(cache_key)
+    if hit:
+        return adapter
+
     # Find the transporter by code
     transporter = session.exec(
         select(Transporter).where(Transporter.code == carrier_code.upper())
@@ -78,9 +157,12 @@ def get_carrier_for_company(
         logger.warning(
             f"No active config/credentials for {carrier_code} + company {company_id}"
         )
+        _cache_put(cache_key, None)
         return None
 
-    return get_carrier_adapter(carrier_code, config.credentials)
+    adapter = get_carrier_adapter(carrier_code, config.credentials)
+    _cache_put(cache_key, adapter)
+    return adapter
 
 
 def list_available_carriers() -> list:
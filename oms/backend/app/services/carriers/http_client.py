@@ -0,0 +1,149 @@
+"""
+Shared HTTP client registry for carrier adapters.
+
+Carrier adapters used to create a fresh httpx.AsyncClient per instance, so
+every rate check / tracking call paid a new TCP+TLS handshake and the
+clients were never closed. Adapters now borrow pooled clients from here:
+- One client per carrier origin (scheme://host:port), with connection
+  limits and keep-alive, HTTP/2 when the `h2` package is installed
+- Clients are also keyed by event loop: httpx connections are bound to the
+  loop that opened them, and sync code paths run carrier calls through
+  asyncio.run() (a new loop each time). Clients of closed loops are
+  closed and dropped on the next lookup.
+- Pooled clients never store cookies: they are shared by every company, so
+  a session cookie set for one tenant's carrier account must not be sent
+  with another tenant's calls.
+- close_http_clients() closes the current loop's clients (app shutdown)
+"""
+import asyncio
+import http.cookiejar
+import logging
+import threading
+import weakref
+from typing import Dict, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+HTTP_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=30.0,
+)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_ENABLED = True
+except ImportError:
+    HTTP2_ENABLED = False
+
+class _RejectAllCookiesPolicy(http.cookiejar.DefaultCookiePolicy):
+    """Cookie policy that refuses to store any response cookie."""
+
+    def set_ok(self, cookie, request):
+        return False
+
+
+def _cookieless_jar() -> http.cookiejar.CookieJar:
+    return http.cookiejar.CookieJar(policy=_RejectAllCookiesPolicy())
+
+
+# (origin, id(loop)) -> (weak ref to loop, client)
+_clients: Dict[Tuple[str, int], Tuple[weakref.ref, httpx.AsyncClient]] = {}
+_clients_lock = threading.Lock()
+
+
+def _origin(base_url: str) -> str:
+    url = httpx.URL(base_url or "")
+    if not url.host:
+        return ""
+    return f"{url.scheme}://{url.host}" + (f":{url.port}" if url.port else "")
+
+
+# Close tasks for clients of dead loops, kept so they aren't collected early
+_closing_tasks: "set[asyncio.Task]" = set()
+
+
+def _prune_closed_loops() -> list:
+    """
+    Forget clients whose event loop is gone (caller holds the lock) and
+    return them so the caller can close them.
+    """
+    dead = []
+    for key, (loop_ref, client) in list(_clients.items()):
+        loop = loop_ref()
+        if loop is None or loop.is_closed():
+            del _clients[key]
+            dead.append((key, client))
+    return dead
+
+
+async def _aclose_clients(clients: list):
+    for key, client in clients:
+        try:
+            await client.aclose()
+        except Exception as e:
+            # Connections bound to a closed loop can fail to shut down
+            # cleanly; the sockets are released either way.
+            logger.debug(f"Error closing stale HTTP client for {key[0]}: {e}")
+
+
+def _close_in_background(loop: asyncio.AbstractEventLoop, clients: list):
+    if not clients:
+        return
+    task = loop.create_task(_aclose_clients(clients))
+    _closing_tasks.add(task)
+    task.add_done_callback(_closing_tasks.discard)
+
+
+def get_http_client(base_url: str) -> httpx.AsyncClient:
+    """
+    Pooled AsyncClient for requests to `base_url`'s origin on the running
+    event loop. Must be called from a coroutine (adapters call it lazily
+    through CarrierAdapter._client).
+    """
+    loop = asyncio.get_running_loop()
+    key = (_origin(base_url), id(loop))
+
+    with _clients_lock:
+        entry = _clients.get(key)
+        if entry and entry[0]() is loop and not entry[1].is_closed:
+            return entry[1]
+
+        dead = _prune_closed_loops()
+        client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=HTTP_LIMITS,
+            http2=HTTP2_ENABLED,
+            cookies=_cookieless_jar(),
+        )
+        _clients[key] = (weakref.ref(loop), client)
+        logger.debug(f"Created pooled HTTP client for {key[0] or 'default'}")
+
+    _close_in_background(loop, dead)
+    return client
+
+
+async def close_http_clients():
+    """Close all pooled clients that belong to the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        owned = [
+            (key, client) for key, (loop_ref, client) in _clients.items()
+            if loop_ref() is loop
+        ]
+        for key, _ in owned:
+            del _clients[key]
+        dead = _prune_closed_loops()
+
+    await _aclose_clients(dead)
+    for key, client in owned:
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing HTTP client for {key[0]}: {e}")
+    if owned:
+        logger.info(f"Closed {len(owned)} pooled carrier HTTP client(s)")
@@ -7,12 +7,17 @@ When a tracking update arrives (via webhook or polling):
 3. If delivered → update Order.status
 4. Trigger detection engine for exception creation
 5. Log everything for audit
+
+process_bulk_tracking does the same for a batch of updates (poller) with
+set-based reads and writes: one IN query per table, executemany updates and
+bulk inserts, events dispatched once the batch is written.
 """
 import logging
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID, uuid4
 
+from sqlalchemy import bindparam, func, insert, update
 from sqlmodel import Session, select
 
 from app.models.order import Order, Delivery
@@ -26,6 +31,69 @@ from .status_mapper import StatusMapper
 logger = logging.getLogger(__name__)
 
 
+# Delivery status → parent Order status
+ORDER_STATUS_BY_DELIVERY_STATUS = {
+    DeliveryStatus.SHIPPED: OrderStatus.SHIPPED,
+    DeliveryStatus.IN_TRANSIT: OrderStatus.SHIPPED,
+    DeliveryStatus.OUT_FOR_DELIVERY: OrderStatus.SHIPPED,
+    DeliveryStatus.DELIVERED: OrderStatus.DELIVERED,
+    DeliveryStatus.NDR: OrderStatus.SHIPPED,  # Keep as shipped
+    DeliveryStatus.RTO_INITIATED: OrderStatus.SHIPPED,
+    DeliveryStatus.RTO_IN_TRANSIT: OrderStatus.SHIPPED,
+    DeliveryStatus.RTO_DELIVERED: OrderStatus.RTO_DELIVERED,
+    DeliveryStatus.CANCELLED: OrderStatus.CANCELLED,
+}
+
+OPEN_NDR_STATUSES = [NDRStatus.OPEN.value, NDRStatus.ACTION_REQUESTED.value]
+
+# Max values per IN (...) list in the bulk path
+BULK_CHUNK_SIZE = 1000
+
+
+def _chunks(values: list, size: int = BULK_CHUNK_SIZE):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _new_ndr_code() -> str:
+    return f"NDR-{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}-{uuid4().hex[:8]}"
+
+
+def _escalate_ndr(attempt_number: int, priority, risk_score: Optional[int]) -> Tuple:
+    """Priority and risk score for an NDR after `attempt_number` attempts."""
+    if attempt_number >= 3:
+        return NDRPriority.CRITICAL, min(100, (risk_score or 50) + 20)
+    if attempt_number >= 2:
+        return NDRPriority.HIGH, min(100, (risk_score or 30) + 15)
+    return priority, risk_score
+
+
+def _delivery_event(delivery, new_status: DeliveryStatus, carrier_code: str) -> Optional[Tuple[str, dict]]:
+    """Event (type, payload) a delivery status change emits, if any."""
+    base = {
+        "deliveryId": str(delivery.id),
+        "orderId": str(delivery.orderId) if delivery.orderId else "",
+        "companyId": str(delivery.companyId),
+    }
+    if new_status == DeliveryStatus.DELIVERED:
+        return "delivery.delivered", {
+            **base,
+            "transporterId": str(delivery.transporterId) if delivery.transporterId else "",
+        }
+    if new_status == DeliveryStatus.RTO_DELIVERED:
+        return "delivery.rto_delivered", {
+            **base,
+            "transporterId": str(delivery.transporterId) if delivery.transporterId else "",
+        }
+    if new_status == DeliveryStatus.SHIPPED:
+        return "delivery.shipped", {
+            **base,
+            "awbNumber": delivery.awbNo or "",
+            "carrierCode": carrier_code,
+        }
+    return None
+
+
 class StatusPipeline:
     """
     Processes a carrier status update and cascades it through the OMS.
@@ -125,28 +193,9 @@ class StatusPipeline:
         # 6. Dispatch events for downstream automation
         from app.services.event_dispatcher import dispatch
 
-        if new_status == DeliveryStatus.DELIVERED:
-            dispatch("delivery.delivered", {
-                "deliveryId": str(delivery.id),
-                "orderId": str(delivery.orderId) if delivery.orderId else "",
-                "companyId": str(delivery.companyId),
-                "transporterId": str(delivery.transporterId) if delivery.transporterId else "",
-            })
-        elif new_status == DeliveryStatus.RTO_DELIVERED:
-            dispatch("delivery.rto_delivered", {
-                "deliveryId": str(delivery.id),
-                "orderId": str(delivery.orderId) if delivery.orderId else "",
-                "companyId": str(delivery.companyId),
-                "transporterId": str(delivery.transporterId) if delivery.transporterId else "",
-            })
-        elif new_status == DeliveryStatus.SHIPPED:
-            dispatch("delivery.shipped", {
-                "deliveryId": str(delivery.id),
-                "orderId": str(delivery.orderId) if delivery.orderId else "",
-                "companyId": str(delivery.companyId),
-                "awbNumber": delivery.awbNo or "",
-                "carrierCode": carrier_code,
-            })
+        event = _delivery_event(delivery, new_status, carrier_code)
+        if event:
+            dispatch(*event)
 
         # Legacy signal for analytics aggregation
         if new_status in (DeliveryStatus.DELIVERED, DeliveryStatus.RTO_DELIVERED):
@@ -173,7 +222,7 @@ class StatusPipeline:
         existing_ndr = session.exec(
             select(NDR).where(
                 NDR.deliveryId == delivery.id,
-                NDR.status.in_([NDRStatus.OPEN.value, NDRStatus.ACTION_REQUESTED.value]),
+                NDR.status.in_(OPEN_NDR_STATUSES),
             )
         ).first()
 
@@ -189,12 +238,9 @@ class StatusPipeline:
             existing_ndr.carrierNDRCode = carrier_status
 
             # Escalate priority if multiple attempts
-            if existing_ndr.attemptNumber >= 3:
-                existing_ndr.priority = NDRPriority.CRITICAL
-                existing_ndr.riskScore = min(100, (existing_ndr.riskScore or 50) + 20)
-            elif existing_ndr.attemptNumber >= 2:
-                existing_ndr.priority = NDRPriority.HIGH
-                existing_ndr.riskScore = min(100, (existing_ndr.riskScore or 30) + 15)
+            existing_ndr.priority, existing_ndr.riskScore = _escalate_ndr(
+                existing_ndr.attemptNumber, existing_ndr.priority, existing_ndr.riskScore
+            )
 
             session.add(existing_ndr)
             logger.info(
@@ -204,7 +250,7 @@ class StatusPipeline:
 
         else:
             # Create new NDR
-            ndr_code = f"NDR-{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}-{str(uuid4())[:4]}"
+            ndr_code = _new_ndr_code()
             ndr = NDR(
                 ndrCode=ndr_code,
                 deliveryId=delivery.id,
@@ -237,7 +283,7 @@ class StatusPipeline:
                 status=AIActionStatus.EXECUTED,
                 approvalRequired=False,
                 executedAt=datetime.now(timezone.utc),
-                executedResult=f"NDR created: {ndr_code}",
+                executionResult=f"NDR created: {ndr_code}",
             )
             session.add(ai_action)
 
@@ -267,20 +313,7 @@ class StatusPipeline:
         if not order:
             return False
 
-        # Map delivery status → order status
-        status_map = {
-            DeliveryStatus.SHIPPED: OrderStatus.SHIPPED,
-            DeliveryStatus.IN_TRANSIT: OrderStatus.SHIPPED,
-            DeliveryStatus.OUT_FOR_DELIVERY: OrderStatus.SHIPPED,
-            DeliveryStatus.DELIVERED: OrderStatus.DELIVERED,
-            DeliveryStatus.NDR: OrderStatus.SHIPPED,  # Keep as shipped
-            DeliveryStatus.RTO_INITIATED: OrderStatus.SHIPPED,
-            DeliveryStatus.RTO_IN_TRANSIT: OrderStatus.SHIPPED,
-            DeliveryStatus.RTO_DELIVERED: OrderStatus.RETURNED,
-            DeliveryStatus.CANCELLED: OrderStatus.CANCELLED,
-        }
-
-        new_order_status = status_map.get(delivery_status)
+        new_order_status = ORDER_STATUS_BY_DELIVERY_STATUS.get(delivery_status)
         if new_order_status and new_order_status != order.status:
             order.status = new_order_status
             session.add(order)
@@ -289,6 +322,10 @@ class StatusPipeline:
 
         return False
 
+    # ========================================================================
+    # Bulk path (poller)
+    # ========================================================================
+
     @staticmethod
     def process_bulk_tracking(
         session: Session,
@@ -296,25 +333,301 @@ class StatusPipeline:
     ) -> dict:
         """
         Process multiple tracking updates at once (from poller).
-        Each update: { awb, carrier_code, status, remark, location, timestamp }
+        Each update: { awb, carrier_code, status, remark, location, timestamp, ndr_reason }
+
+        Same rules as process_tracking_update, applied in list order (several
+        updates for one AWB are folded in memory), but with one IN query per
+        table and one executemany / bulk insert per kind of write. Writes go
+        straight to the tables: Delivery/Order/NDR instances already loaded
+        in `session` are not refreshed.
         """
-        results = {"processed": 0, "errors": 0, "ndrs_created": 0}
-        for update in updates:
+        results = {"processed": 0, "errors": 0, "not_found": 0, "ndrs_created": 0}
+        if not updates:
+            return results
+        now = datetime.now(timezone.utc)
+
+        # 1. Load every delivery in the batch (first match per AWB, as above)
+        session.flush()
+        deliveries: Dict[str, object] = {}
+        awbs = sorted({u["awb"] for u in updates if u.get("awb")})
+        for chunk in _chunks(awbs):
+            rows = session.exec(
+                select(
+                    Delivery.id, Delivery.awbNo, Delivery.status, Delivery.orderId,
+                    Delivery.companyId, Delivery.transporterId,
+                ).where(Delivery.awbNo.in_(chunk))
+            ).all()
+            for row in rows:
+                deliveries.setdefault(row.awbNo, row)
+        current_status: Dict[str, DeliveryStatus] = {}
+        for awb, row in deliveries.items():
             try:
-                r = StatusPipeline.process_tracking_update(
-                    session=session,
-                    awb_number=update["awb"],
-                    carrier_code=update["carrier_code"],
-                    carrier_status=update["status"],
-                    carrier_remark=update.get("remark", ""),
-                    location=update.get("location", ""),
-                    ndr_reason_raw=update.get("ndr_reason", ""),
-                )
-                results["processed"] += 1
-                if r.get("ndr_created"):
-                    results["ndrs_created"] += 1
+                current_status[awb] = DeliveryStatus(row.status)
+            except ValueError:
+                # Left out: its updates are counted as errors below
+                logger.warning(f"Delivery {awb} has unknown status {row.status!r}, skipping")
+
+        # 2. Fold updates in memory
+        delivery_changes: Dict[UUID, dict] = {}
+        order_targets: Dict[UUID, OrderStatus] = {}
+        ndr_hits: List[Tuple[object, dict, datetime]] = []
+        events: List[Tuple[str, dict]] = []
+
+        for update_ in updates:
+            awb = update_.get("awb")
+            delivery = deliveries.get(awb)
+            if not delivery:
+                results["not_found"] += 1
+                continue
+            if awb not in current_status:
+                results["errors"] += 1
+                continue
+            try:
+                carrier_code = update_["carrier_code"]
+                new_status = StatusMapper.map_status(carrier_code, update_["status"])
             except Exception as e:
                 results["errors"] += 1
-                logger.error(f"Failed processing {update.get('awb')}: {e}")
+                logger.error(f"Failed processing {awb}: {e}")
+                continue
+
+            results["processed"] += 1
+            timestamp = update_.get("timestamp") or now
+            old_status = current_status[awb]
+
+            # Don't regress status
+            if StatusMapper.is_terminal(old_status) and not StatusMapper.is_terminal(new_status):
+                continue
+
+            if new_status != old_status:
+                current_status[awb] = new_status
+                change = delivery_changes.setdefault(delivery.id, {
+                    "b_id": delivery.id, "b_ship_date": None, "b_delivery_date": None,
+                })
+                change["b_status"] = new_status.value
+                change["b_remarks"] = f"{update_['status']}: {update_.get('remark', '')}"
+                if new_status == DeliveryStatus.SHIPPED:
+                    change["b_ship_date"] = change["b_ship_date"] or timestamp
+                elif new_status in (DeliveryStatus.DELIVERED, DeliveryStatus.RTO_DELIVERED):
+                    change["b_delivery_date"] = timestamp
+
+                if delivery.orderId and new_status in ORDER_STATUS_BY_DELIVERY_STATUS:
+                    order_targets[delivery.orderId] = ORDER_STATUS_BY_DELIVERY_STATUS[new_status]
+
+                event = _delivery_event(delivery, new_status, carrier_code)
+                if event:
+                    events.append(event)
+
+            if StatusMapper.is_ndr(new_status):
+                ndr_hits.append((delivery, update_, timestamp))
+
+        # 3. Write deliveries, orders and NDRs
+        StatusPipeline._bulk_update_deliveries(session, delivery_changes, now)
+        StatusPipeline._bulk_update_orders(session, order_targets, now)
+        ndr_events = StatusPipeline._bulk_handle_ndrs(session, ndr_hits, now)
+        results["ndrs_created"] = len(ndr_events)
+
+        logger.info(
+            f"Bulk tracking: {len(updates)} updates, {len(delivery_changes)} deliveries "
+            f"changed, {results['ndrs_created']} NDRs created"
+        )
+
+        # 4. Dispatch events for downstream automation
+        from app.services.event_dispatcher import dispatch
+
+        for event_type, payload in events + ndr_events:
+            dispatch(event_type, payload)
 
         return results
+
+    @staticmethod
+    def _bulk_update_deliveries(session: Session, changes: Dict[UUID, dict], now: datetime):
+        """One executemany UPDATE for all changed deliveries."""
+        if not changes:
+            return
+        table = Delivery.__table__
+        session.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                status=bindparam("b_status"),
+                remarks=bindparam("b_remarks"),
+                shipDate=func.coalesce(
+                    table.c.shipDate, bindparam("b_ship_date", type_=table.c.shipDate.type)
+                ),
+                deliveryDate=func.coalesce(
+                    bindparam("b_delivery_date", type_=table.c.deliveryDate.type),
+                    table.c.deliveryDate,
+                ),
+                updatedAt=now,
+            ),
+            list(changes.values()),
+        )
+
+    @staticmethod
+    def _bulk_update_orders(session: Session, targets: Dict[UUID, OrderStatus], now: datetime):
+        """Move parent orders to their new status, skipping ones already there."""
+        if not targets:
+            return
+        current: Dict[UUID, str] = {}
+        for chunk in _chunks(list(targets)):
+            current.update(session.exec(
+                select(Order.id, Order.status).where(Order.id.in_(chunk))
+            ).all())
+
+        rows = [
+            {"b_id": order_id, "b_status": status.value}
+            for order_id, status in targets.items()
+            if order_id in current and current[order_id] != status
+        ]
+        if not rows:
+            return
+        table = Order.__table__
+        session.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(status=bindparam("b_status"), updatedAt=now),
+            rows,
+        )
+        logger.info(f"Bulk tracking: {len(rows)} orders moved to new status")
+
+    @staticmethod
+    def _bulk_handle_ndrs(
+        session: Session,
+        hits: List[Tuple[object, dict, datetime]],
+        now: datetime,
+    ) -> List[Tuple[str, dict]]:
+        """
+        Record NDR attempts for a batch: bump open NDRs, bulk-insert new ones
+        with their AI classification log. Returns the ndr.created events.
+        """
+        if not hits:
+            return []
+
+        # Open NDR per delivery (first match, as in _handle_ndr)
+        open_ndrs: Dict[UUID, dict] = {}
+        delivery_ids = list({delivery.id for delivery, _, _ in hits})
+        for chunk in _chunks(delivery_ids):
+            rows = session.exec(
+                select(NDR.id, NDR.deliveryId, NDR.attemptNumber, NDR.priority, NDR.riskScore)
+                .where(NDR.deliveryId.in_(chunk), NDR.status.in_(OPEN_NDR_STATUSES))
+            ).all()
+            for row in rows:
+                open_ndrs.setdefault(row.deliveryId, {
+                    "b_id": row.id,
+                    "b_attempt": row.attemptNumber or 1,
+                    "b_priority": row.priority,
+                    "b_risk": row.riskScore,
+                })
+
+        ndr_updates: Dict[UUID, dict] = {}
+        new_ndrs: Dict[UUID, dict] = {}
+        ai_actions: List[dict] = []
+        events: List[Tuple[str, dict]] = []
+
+        for delivery, update_, timestamp in hits:
+            carrier_code = update_["carrier_code"]
+            carrier_status = update_["status"]
+            carrier_remark = update_.get("remark", "")
+
+            existing = open_ndrs.get(delivery.id)
+            if existing:
+                existing["b_attempt"] += 1
+                existing["b_priority"], existing["b_risk"] = _escalate_ndr(
+                    existing["b_attempt"], existing["b_priority"], existing["b_risk"]
+                )
+                existing.update(b_date=timestamp, b_remark=carrier_remark, b_code=carrier_status)
+                if existing["b_id"] not in new_ndrs:
+                    ndr_updates[existing["b_id"]] = existing
+                continue
+
+            ndr_reason = StatusMapper.map_ndr_reason(
+                carrier_code, update_.get("ndr_reason") or carrier_remark or carrier_status
+            )
+            ndr_id = uuid4()
+            ndr_code = _new_ndr_code()
+            new_ndrs[ndr_id] = {
+                "id": ndr_id,
+                "ndrCode": ndr_code,
+                "deliveryId": delivery.id,
+                "orderId": delivery.orderId,
+                "companyId": delivery.companyId,
+                "attemptDate": timestamp,
+                "attemptNumber": 1,
+                "reason": ndr_reason.value,
+                "carrierNDRCode": carrier_status,
+                "carrierRemark": carrier_remark,
+                "status": NDRStatus.OPEN.value,
+                "priority": NDRPriority.MEDIUM.value,
+                "riskScore": 30,
+                "createdAt": now,
+                "updatedAt": now,
+            }
+            # Later hits for this delivery in the batch bump the new row
+            open_ndrs[delivery.id] = {
+                "b_id": ndr_id, "b_attempt": 1,
+                "b_priority": NDRPriority.MEDIUM, "b_risk": 30,
+            }
+            ai_actions.append({
+                "id": uuid4(),
+                "actionType": AIActionType.NDR_CLASSIFICATION.value,
+                "entityType": "NDR",
+                "entityId": str(ndr_id),
+                "ndrId": ndr_id,
+                "companyId": delivery.companyId,
+                "decision": f"Auto-classified as {ndr_reason.value}",
+                "reasoning": f"Carrier ({carrier_code}) reported: {carrier_remark or carrier_status}",
+                "confidence": 0.85,
+                "riskLevel": "MEDIUM",
+                "impactScore": 30,
+                "status": AIActionStatus.EXECUTED.value,
+                "approvalRequired": False,
+                "executedAt": now,
+                "executionResult": f"NDR created: {ndr_code}",
+                "createdAt": now,
+                "updatedAt": now,
+            })
+            events.append(("ndr.created", {
+                "ndrId": str(ndr_id),
+                "deliveryId": str(delivery.id),
+                "orderId": str(delivery.orderId) if delivery.orderId else "",
+                "companyId": str(delivery.companyId),
+            }))
+
+        # Fold repeat attempts on new NDRs into their insert rows
+        for row in new_ndrs.values():
+            state = open_ndrs[row["deliveryId"]]
+            if state["b_attempt"] > 1:
+                row.update(
+                    attemptNumber=state["b_attempt"],
+                    attemptDate=state["b_date"],
+                    carrierRemark=state["b_remark"],
+                    carrierNDRCode=state["b_code"],
+                    priority=NDRPriority(state["b_priority"]).value,
+                    riskScore=state["b_risk"],
+                )
+
+        if new_ndrs:
+            session.execute(insert(NDR), list(new_ndrs.values()))
+            session.execute(insert(AIActionLog), ai_actions)
+        if ndr_updates:
+            table = NDR.__table__
+            session.execute(
+                update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values(
+                    attemptNumber=bindparam("b_attempt"),
+                    attemptDate=bindparam("b_date"),
+                    carrierRemark=bindparam("b_remark"),
+                    carrierNDRCode=bindparam("b_code"),
+                    priority=bindparam("b_priority"),
+                    riskScore=bindparam("b_risk"),
+                    updatedAt=now,
+                ),
+                [
+                    {**row, "b_priority": NDRPriority(row["b_priority"]).value}
+                    for row in ndr_updates.values()
+                ],
+            )
+            logger.info(f"Bulk tracking: {len(ndr_updates)} open NDRs got a new attempt")
+
+        return events
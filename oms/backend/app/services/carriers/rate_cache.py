@@ -0,0 +1,309 @@
+"""
+Rate Quote Cache — Tiered cache in front of carrier rate APIs.
+
+Quotes for the same lane barely move within hours, so ShippingService.get_rates
+asks each carrier at most once per lane per TTL:
+- Lane key: (company, carrier, origin pincode, dest pincode, weight slab,
+  payment mode, COD amount slab). Carriers are always quoted at the top of
+  the slab, so a cached quote never under-prices a parcel in it.
+- Tier 1: in-process LRU. Tier 2 (RATE_CACHE_SHARED): the RateQuoteCache
+  table, shared by all workers and instances.
+- Fresh for the carrier's TTL (RATE_CACHE_CARRIER_TTL_SECONDS, else
+  RATE_CACHE_TTL_SECONDS); after that the stale quote is still served
+  for RATE_CACHE_STALE_SECONDS while one background refresh runs.
+- Unserviceable lanes (carrier answered, no quotes) are cached for
+  RATE_CACHE_NEGATIVE_TTL_SECONDS; carrier errors for RATE_ERROR_TTL_SECONDS
+  so a failing API isn't hammered by every order in a batch.
+- Entries of a company are dropped when its TransporterConfig changes: at
+  once in the process that made the change (and in the shared tier), and
+  within RATE_CACHE_CONFIG_CHECK_SECONDS in every other process, which
+  re-reads a cheap (count, max updatedAt) stamp of the company's
+  TransporterConfig rows that often.
+- All timestamps are timezone-aware UTC (TIMESTAMPTZ columns).
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models.base import utc_now
+from app.models.shipment import RateQuoteCache
+from app.models.transporter import TransporterConfig
+from .base import RateQuote
+
+logger = logging.getLogger(__name__)
+
+
+RATE_CACHE_MAX_SIZE = 20_000
+RATE_WEIGHT_SLAB_GRAMS = 500
+RATE_COD_SLAB = 500
+RATE_ERROR_TTL_SECONDS = 60
+RATE_CACHE_CONFIG_CHECK_SECONDS = 30
+
+
+def weight_slab(weight_grams: int) -> int:
+    """Top of the weight slab `weight_grams` falls in."""
+    return max(1, math.ceil(weight_grams / RATE_WEIGHT_SLAB_GRAMS)) * RATE_WEIGHT_SLAB_GRAMS
+
+
+def cod_slab(payment_mode: str, cod_amount: float) -> float:
+    """Top of the COD amount slab (0 for prepaid)."""
+    if payment_mode != "COD" or not cod_amount:
+        return 0
+    return math.ceil(cod_amount / RATE_COD_SLAB) * RATE_COD_SLAB
+
+
+def lane_key(
+    company_id: UUID,
+    carrier_code: str,
+    origin_pincode: str,
+    dest_pincode: str,
+    weight_grams: int,
+    payment_mode: str,
+    cod_amount: float,
+) -> str:
+    return ":".join(str(p) for p in (
+        company_id, carrier_code.upper(), origin_pincode.strip(), dest_pincode.strip(),
+        weight_slab(weight_grams), payment_mode.upper(), int(cod_slab(payment_mode, cod_amount)),
+    ))
+
+
+@dataclass
+class CachedRates:
+    """Quotes for one lane. Empty quotes = unserviceable (or carrier error)."""
+    quotes: List[RateQuote]
+    expires_at: float      # epoch seconds
+    stale_until: float     # epoch seconds
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def is_servable(self) -> bool:
+        return time.time() < self.stale_until
+
+
+# ── Tier 1: in-process LRU ─────────────────────────────────────────────
+_memory: "OrderedDict[str, CachedRates]" = OrderedDict()
+_memory_lock = threading.Lock()
+_refreshing: set = set()
+
+# Company id -> (checked at (monotonic), TransporterConfig stamp)
+_config_stamps: Dict[str, Tuple[float, Optional[tuple]]] = {}
+
+
+def _memory_get(key: str) -> Optional[CachedRates]:
+    with _memory_lock:
+        entry = _memory.get(key)
+        if entry is None:
+            return None
+        if not entry.is_servable:
+            del _memory[key]
+            return None
+        _memory.move_to_end(key)
+        return entry
+
+
+def _memory_put(key: str, entry: CachedRates):
+    with _memory_lock:
+        _memory[key] = entry
+        _memory.move_to_end(key)
+        while len(_memory) > RATE_CACHE_MAX_SIZE:
+            _memory.popitem(last=False)
+
+
+def invalidate_rate_cache(company_id: Optional[UUID] = None):
+    """Drop in-process entries for one company, or for all companies."""
+    with _memory_lock:
+        if company_id is None:
+            _memory.clear()
+            return
+        prefix = f"{company_id}:"
+        for key in [k for k in _memory if k.startswith(prefix)]:
+            del _memory[key]
+
+
+def _on_config_change(mapper, connection, target):
+    invalidate_rate_cache(getattr(target, "companyId", None))
+    if settings.RATE_CACHE_SHARED and getattr(target, "companyId", None):
+        table = RateQuoteCache.__table__
+        connection.execute(table.delete().where(table.c.companyId == target.companyId))
+
+
+for _event_name in ("after_insert", "after_update", "after_delete"):
+    event.listen(TransporterConfig, _event_name, _on_config_change)
+
+
+class RateCache:
+    """
+    Lane-level quote cache used by ShippingService.get_rates.
+
+    Usage:
+        cache = RateCache(session)
+        key = lane_key(company_id, "DELHIVERY", "110001", "560001", 750, "PREPAID", 0)
+        entry = cache.get(key)
+        if entry is None or not entry.is_fresh:
+            cache.put(key, company_id, "DELHIVERY", quotes)
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def get(self, key: str) -> Optional[CachedRates]:
+        """Servable entry for `key` (fresh or stale), memory first."""
+        if not settings.RATE_CACHE_ENABLED:
+            return None
+        self._check_config(key.split(":", 1)[0])
+        entry = _memory_get(key)
+        if entry is None and settings.RATE_CACHE_SHARED:
+            entry = self._shared_get(key)
+            if entry is not None:
+                _memory_put(key, entry)
+        return entry
+
+    def put(
+        self,
+        key: str,
+        company_id: UUID,
+        carrier_code: str,
+        quotes: Optional[List[RateQuote]],
+    ) -> Optional[CachedRates]:
+        """
+        Store the carrier's answer for a lane. `quotes=None` means the
+        carrier call failed; it is remembered only for RATE_ERROR_TTL_SECONDS.
+        """
+        if not settings.RATE_CACHE_ENABLED:
+            return None
+        if quotes is None:
+            ttl, stale = RATE_ERROR_TTL_SECONDS, 0
+        elif not quotes:
+            ttl, stale = settings.RATE_CACHE_NEGATIVE_TTL_SECONDS, 0
+        else:
+            ttl = settings.RATE_CACHE_CARRIER_TTL_SECONDS.get(
+                carrier_code.upper(), settings.RATE_CACHE_TTL_SECONDS
+            )
+            stale = settings.RATE_CACHE_STALE_SECONDS
+
+        now = time.time()
+        entry = CachedRates(quotes=list(quotes or []), expires_at=now + ttl, stale_until=now + ttl + stale)
+        _memory_put(key, entry)
+        if settings.RATE_CACHE_SHARED and quotes is not None:
+            self._shared_put(key, company_id, carrier_code, entry)
+        return entry
+
+    def _check_config(self, company: str):
+        """
+        Drop the company's in-process entries if its TransporterConfig rows
+        changed in another process. Checked at most every
+        RATE_CACHE_CONFIG_CHECK_SECONDS per company, on its own connection.
+        """
+        now = time.monotonic()
+        with _memory_lock:
+            checked_at, previous = _config_stamps.get(company, (None, None))
+            if checked_at is not None and now - checked_at < RATE_CACHE_CONFIG_CHECK_SECONDS:
+                return
+            # Claim the check so concurrent lookups don't repeat it
+            _config_stamps[company] = (now, previous)
+
+        table = TransporterConfig.__table__
+        try:
+            with self.session.get_bind().connect() as connection:
+                stamp = tuple(connection.execute(
+                    select(func.count(), func.max(table.c.updatedAt))
+                    .where(table.c.companyId == UUID(company))
+                ).one())
+        except Exception as e:
+            logger.warning(f"Rate cache config check failed for company {company}: {e}")
+            return
+
+        with _memory_lock:
+            _config_stamps[company] = (now, stamp)
+        if previous is not None and stamp != previous:
+            logger.info(f"Carrier config of company {company} changed, dropping cached rates")
+            invalidate_rate_cache(UUID(company))
+
+    @staticmethod
+    def claim_refresh(key: str) -> bool:
+        """True if the caller should refresh a stale `key` (one refresher per key)."""
+        with _memory_lock:
+            if key in _refreshing:
+                return False
+            _refreshing.add(key)
+            return True
+
+    @staticmethod
+    def release_refresh(key: str):
+        with _memory_lock:
+            _refreshing.discard(key)
+
+    # ========================================================================
+    # Tier 2: RateQuoteCache table
+    # ========================================================================
+
+    def _shared_get(self, key: str) -> Optional[CachedRates]:
+        """Read on its own connection, so a failure can't abort the caller's transaction."""
+        table = RateQuoteCache.__table__
+        try:
+            with self.session.get_bind().connect() as connection:
+                row = connection.execute(
+                    select(table.c.quotes, table.c.expiresAt, table.c.staleUntil)
+                    .where(table.c.cacheKey == key)
+                    .where(table.c.staleUntil > utc_now())
+                ).first()
+        except Exception as e:
+            logger.warning(f"Shared rate cache read failed for {key}: {e}")
+            return None
+        if not row:
+            return None
+        return CachedRates(
+            quotes=[RateQuote(**q) for q in (row.quotes or [])],
+            expires_at=row.expiresAt.timestamp(),
+            stale_until=row.staleUntil.timestamp(),
+        )
+
+    def _shared_put(self, key: str, company_id: UUID, carrier_code: str, entry: CachedRates):
+        """Upsert on its own short transaction (never the caller's)."""
+        table = RateQuoteCache.__table__
+        values = {
+            "cacheKey": key,
+            "companyId": company_id,
+            "carrierCode": carrier_code.upper(),
+            "quotes": [asdict(q) for q in entry.quotes],
+            "expiresAt": datetime.fromtimestamp(entry.expires_at, timezone.utc),
+            "staleUntil": datetime.fromtimestamp(entry.stale_until, timezone.utc),
+            "updatedAt": utc_now(),
+        }
+        statement = pg_insert(table).values(**values)
+        try:
+            with self.session.get_bind().begin() as connection:
+                connection.execute(statement.on_conflict_do_update(
+                    index_elements=[table.c.cacheKey],
+                    set_={k: statement.excluded[k] for k in values if k != "cacheKey"},
+                ))
+        except Exception as e:
+            logger.warning(f"Shared rate cache write failed for {key}: {e}")
+
+
+def purge_expired_rate_quotes() -> int:
+    """Delete shared entries past their stale window (scheduler job)."""
+    from app.core.database import engine
+
+    table = RateQuoteCache.__table__
+    with engine.begin() as connection:
+        deleted = connection.execute(
+            table.delete().where(table.c.staleUntil < utc_now())
+        ).rowcount
+    if deleted:
+        logger.info(f"Purged {deleted} expired rate quote cache entries")
+    return deleted
@@ -0,0 +1,333 @@
+"""
+Rate Card Engine — Prices shipments locally from the company's rate cards.
+
+Active RateCards (with their RateCardSlabs) are compiled once per company
+into in-memory indexes, so a quote is a few dict lookups and a bisect:
+- Slabs are indexed by (origin pincode, destination pincode), by zone and
+  as a catch-all; the most specific index with a slab for the weight wins
+- The destination zone comes from the serviceability index
+  (serviceability.py, ServicePincode.zoneCode)
+- Freight = slab rate (plus additionalWeightRate per kg beyond the last
+  slab), floored at minCharge, plus baseCost and awbCharges, plus
+  fuelSurcharge % on top; COD = codChargesPercent of the COD amount,
+  floored at codChargesMin and capped at codChargesCap
+- A transporter may have several active cards (separate COD and prepaid
+  cards, a future-dated revision). All are compiled; a quote uses the
+  first card that covers the payment mode and date and has a slab for
+  the lane, company-specific cards before global ones (companyId NULL),
+  newest first
+
+ShippingService.get_rates prices carriers with a rate card here and only
+calls carrier APIs for the others, or when asked to verify (live=True).
+Compiled tables are rebuilt after RATE_ENGINE_TTL_SECONDS, or as soon as a
+RateCard or RateCardSlab row changes in this process.
+"""
+import bisect
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, or_
+from sqlmodel import Session, select
+
+from app.models import RateCard, RateCardSlab
+from app.models.transporter import Transporter
+from .base import RateQuote
+from .serviceability import get_serviceability_index
+
+logger = logging.getLogger(__name__)
+
+
+RATE_ENGINE_TTL_SECONDS = 300
+RATE_CARD_SOURCE = "RATE_CARD"
+
+
+def _num(value: Optional[Decimal]) -> float:
+    return float(value) if value is not None else 0.0
+
+
+@dataclass(frozen=True)
+class Slab:
+    from_kg: float
+    to_kg: float
+    rate: float
+    additional_rate: Optional[float]
+    min_charge: float
+
+
+@dataclass
+class SlabTable:
+    """Weight slabs of one lane/zone, sorted by upper weight (kg)."""
+    upper: List[float] = field(default_factory=list)
+    slabs: List[Slab] = field(default_factory=list)
+
+    def add(self, slab: Slab):
+        i = bisect.bisect_left(self.upper, slab.to_kg)
+        self.upper.insert(i, slab.to_kg)
+        self.slabs.insert(i, slab)
+
+    def freight(self, weight_kg: float) -> Optional[float]:
+        """Slab freight for `weight_kg`, or None if no slab covers it."""
+        if not self.slabs:
+            return None
+        i = bisect.bisect_left(self.upper, weight_kg)
+        if i < len(self.slabs):
+            slab = self.slabs[i]
+            if weight_kg < slab.from_kg:
+                return None
+            freight = slab.rate
+        else:
+            # Beyond the heaviest slab: extend it if it has an additional rate
+            slab = self.slabs[-1]
+            if slab.additional_rate is None:
+                return None
+            freight = slab.rate + math.ceil(weight_kg - slab.to_kg) * slab.additional_rate
+        return max(freight, slab.min_charge)
+
+
+@dataclass
+class CompiledRateCard:
+    """One active rate card, ready to price (plain values, safe to share across sessions)."""
+    carrier_code: str
+    carrier_name: str
+    name: str
+    card_type: str
+    effective_from: Optional[datetime]
+    effective_to: Optional[datetime]
+    fixed_charges: float  # baseCost + awbCharges
+    fuel_percent: float
+    cod_percent: float
+    cod_min: float
+    cod_cap: Optional[float]
+    by_pair: Dict[Tuple[str, str], SlabTable] = field(default_factory=dict)
+    by_zone: Dict[str, SlabTable] = field(default_factory=dict)
+    default: SlabTable = field(default_factory=SlabTable)
+
+    @classmethod
+    def from_card(cls, card: RateCard, transporter: Transporter) -> "CompiledRateCard":
+        return cls(
+            carrier_code=transporter.code,
+            carrier_name=transporter.name,
+            name=card.name,
+            card_type=(card.type or "BOTH").upper(),
+            effective_from=card.effectiveFrom.replace(tzinfo=None) if card.effectiveFrom else None,
+            effective_to=card.effectiveTo.replace(tzinfo=None) if card.effectiveTo else None,
+            fixed_charges=_num(card.baseCost) + _num(card.awbCharges),
+            fuel_percent=_num(card.fuelSurcharge),
+            cod_percent=_num(card.codChargesPercent),
+            cod_min=_num(card.codChargesMin),
+            cod_cap=_num(card.codChargesCap) if card.codChargesCap is not None else None,
+        )
+
+    def covers(self, payment_mode: str, at: datetime) -> bool:
+        if self.card_type != "BOTH" and self.card_type != payment_mode:
+            return False
+        if self.effective_from and self.effective_from > at:
+            return False
+        if self.effective_to and self.effective_to < at:
+            return False
+        return True
+
+    def quote(
+        self,
+        origin_pincode: str,
+        dest_pincode: str,
+        zone: Optional[str],
+        weight_kg: float,
+        payment_mode: str,
+        cod_amount: float,
+    ) -> Optional[RateQuote]:
+        freight = None
+        for table in (
+            self.by_pair.get((origin_pincode, dest_pincode)),
+            self.by_zone.get(zone) if zone else None,
+            self.default,
+        ):
+            if table is not None:
+                freight = table.freight(weight_kg)
+                if freight is not None:
+                    break
+        if freight is None:
+            return None
+
+        total = freight + self.fixed_charges
+        total += total * self.fuel_percent / 100
+
+        cod_charges = 0.0
+        if payment_mode == "COD":
+            cod_charges = max(cod_amount * self.cod_percent / 100, self.cod_min)
+            if self.cod_cap is not None:
+                cod_charges = min(cod_charges, self.cod_cap)
+
+        return RateQuote(
+            carrier_code=self.carrier_code,
+            carrier_name=self.carrier_name,
+            rate=round(total, 2),
+            cod_charges=round(cod_charges, 2),
+            service_type=self.name,
+            source=RATE_CARD_SOURCE,
+        )
+
+
+@dataclass
+class CompanyRates:
+    """Compiled rate cards of one company."""
+    cards: Dict[UUID, List[CompiledRateCard]]  # transporterId -> cards, in preference order
+    expires_at: float
+
+
+# ── Compiled cache ─────────────────────────────────────────────────────
+_compiled: Dict[UUID, CompanyRates] = {}
+_compiled_lock = threading.Lock()
+
+
+def invalidate_rate_engine(company_id: Optional[UUID] = None):
+    """Drop compiled rate cards for one company, or for all companies."""
+    with _compiled_lock:
+        if company_id is None:
+            _compiled.clear()
+        else:
+            _compiled.pop(company_id, None)
+
+
+def _on_rate_data_change(mapper, connection, target):
+    # Global cards and slabs don't know their companies: rebuild all
+    company_id = getattr(target, "companyId", None) if isinstance(target, RateCard) else None
+    invalidate_rate_engine(company_id)
+
+
+for _model in (RateCard, RateCardSlab):
+    for _event_name in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event_name, _on_rate_data_change)
+
+
+class RateCardEngine:
+    """
+    Local rate quotes from compiled rate cards.
+
+    Usage:
+        engine = RateCardEngine(session)
+        quotes = engine.quote(company_id, transporter_id, "110001", "560001", 750)
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def has_card(self, company_id: UUID, transporter_id: UUID) -> bool:
+        return transporter_id in self._rates(company_id).cards
+
+    def quote(
+        self,
+        company_id: UUID,
+        transporter_id: UUID,
+        origin_pincode: str,
+        dest_pincode: str,
+        weight_grams: int,
+        payment_mode: str = "PREPAID",
+        cod_amount: float = 0,
+    ) -> Optional[List[RateQuote]]:
+        """
+        Quotes for one transporter from its rate card.
+        None if the transporter has no usable card or no slab for the lane
+        (ask the carrier instead); [] if its ServicePincode marks the
+        destination unserviceable for this payment mode.
+        """
+        payment_mode = payment_mode.upper()
+        now = datetime.utcnow()
+        candidates = [
+            card for card in self._rates(company_id).cards.get(transporter_id, ())
+            if card.covers(payment_mode, now)
+        ]
+        if not candidates:
+            return None
+
+        dest_pincode = dest_pincode.strip()
+        service = get_serviceability_index(self.session).lookup(transporter_id, dest_pincode)
+        if service and not service.allows(payment_mode):
+            return []
+
+        quote = None
+        for card in candidates:
+            quote = card.quote(
+                origin_pincode.strip(), dest_pincode, service.zone if service else None,
+                weight_grams / 1000, payment_mode, cod_amount,
+            )
+            if quote is not None:
+                break
+        if quote is None:
+            return None
+        quote.estimated_days = (service.estimated_days if service else None) or 0
+        return [quote]
+
+    # ========================================================================
+    # Compilation
+    # ========================================================================
+
+    def _rates(self, company_id: UUID) -> CompanyRates:
+        with _compiled_lock:
+            rates = _compiled.get(company_id)
+        if rates is not None and rates.expires_at > time.monotonic():
+            return rates
+
+        rates = self._compile(company_id)
+        with _compiled_lock:
+            _compiled[company_id] = rates
+        return rates
+
+    def _compile(self, company_id: UUID) -> CompanyRates:
+        started = time.perf_counter()
+
+        rows = self.session.exec(
+            select(RateCard, Transporter)
+            .join(Transporter, RateCard.transporterId == Transporter.id)
+            .where(
+                RateCard.status == "ACTIVE",
+                or_(RateCard.companyId == company_id, RateCard.companyId.is_(None)),
+            )
+            # Preference order: company cards before global ones, newest first
+            .order_by(RateCard.companyId.is_(None), RateCard.createdAt.desc())
+        ).all()
+
+        cards: Dict[UUID, List[CompiledRateCard]] = {}
+        by_id: Dict[UUID, CompiledRateCard] = {}
+        for card, transporter in rows:
+            compiled = CompiledRateCard.from_card(card, transporter)
+            cards.setdefault(card.transporterId, []).append(compiled)
+            by_id[card.id] = compiled
+
+        if by_id:
+            for slab in self.session.exec(
+                select(RateCardSlab).where(RateCardSlab.rateCardId.in_(list(by_id)))
+            ).all():
+                compiled = by_id[slab.rateCardId]
+                entry = Slab(
+                    from_kg=_num(slab.fromWeight),
+                    to_kg=_num(slab.toWeight),
+                    rate=_num(slab.rate),
+                    additional_rate=_num(slab.additionalWeightRate) if slab.additionalWeightRate is not None else None,
+                    min_charge=_num(slab.minCharge),
+                )
+                if slab.fromPincode and slab.toPincode:
+                    table = compiled.by_pair.setdefault(
+                        (slab.fromPincode.strip(), slab.toPincode.strip()), SlabTable()
+                    )
+                elif slab.zone:
+                    table = compiled.by_zone.setdefault(slab.zone, SlabTable())
+                else:
+                    table = compiled.default
+                table.add(entry)
+
+        logger.info(
+            f"Compiled {len(by_id)} rate cards of {len(cards)} transporters for company {company_id} "
+            f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+        return CompanyRates(
+            cards=cards,
+            expires_at=time.monotonic() + RATE_ENGINE_TTL_SECONDS,
+        )
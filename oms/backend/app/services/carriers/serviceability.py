@@ -0,0 +1,400 @@
+"""
+Serviceability Index — In-memory pincode coverage of every transporter.
+
+ServicePincode rows (uploaded, or synced from carrier pincode dumps) are
+compiled into one compact table per transporter:
+- pincodes as a sorted array of 32-bit ints, looked up with bisect
+- parallel arrays for flags (serviceable / COD / prepaid / reverse),
+  zone code (index into a small per-transporter string table) and TAT
+~19k pincodes cost well under 200 KB per transporter, so a whole wave can
+be checked against every transporter without any I/O.
+
+The index is process-wide. It is rebuilt lazily on the first lookup after
+a ServicePincode row changes in this process (bulk upload, carrier sync,
+edits), and after SERVICEABILITY_INDEX_TTL_SECONDS for changes made by
+other processes.
+
+A transporter without ServicePincode rows is "unknown" (lookup returns
+None), not unserviceable: callers fall back to the carrier API.
+"""
+import bisect
+import logging
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import bindparam, event, func, insert, update
+from sqlalchemy.orm import Session as SASession, object_session
+from sqlmodel import Session, select
+
+from app.models import ServicePincode
+from .base import CarrierAdapter, PincodeCoverage
+
+logger = logging.getLogger(__name__)
+
+
+SERVICEABILITY_INDEX_TTL_SECONDS = 900
+
+FLAG_SERVICEABLE = 1
+FLAG_COD = 2
+FLAG_PREPAID = 4
+FLAG_REVERSE = 8
+
+_NO_DAYS = 255  # array('B') sentinel for estimatedDays NULL
+
+
+@dataclass(frozen=True)
+class PincodeService:
+    """Coverage of one pincode by one transporter."""
+    zone: Optional[str]
+    estimated_days: Optional[int]
+    serviceable: bool
+    cod: bool
+    prepaid: bool
+    reverse: bool
+
+    def allows(self, payment_mode: Optional[str] = None) -> bool:
+        """Serviceable, and (if given) for this payment mode."""
+        if not self.serviceable:
+            return False
+        if payment_mode is None:
+            return True
+        return self.cod if payment_mode.upper() == "COD" else self.prepaid
+
+
+def _pin(pincode) -> Optional[int]:
+    pincode = str(pincode).strip()
+    return int(pincode) if len(pincode) == 6 and pincode.isdigit() else None
+
+
+class TransporterPincodes:
+    """Coverage of one transporter: sorted pincodes plus parallel arrays."""
+
+    __slots__ = ("pincodes", "flags", "zones", "days", "zone_names")
+
+    def __init__(self, rows: Iterable[tuple]):
+        """rows: (pincode int, flags, zone code, estimated days), sorted by pincode."""
+        self.pincodes = array("I")
+        self.flags = bytearray()
+        self.zones = array("H")
+        self.days = array("B")
+        self.zone_names: List[Optional[str]] = [None]
+        zone_ids: Dict[str, int] = {}
+
+        for pincode, flags, zone, days in rows:
+            if self.pincodes and self.pincodes[-1] == pincode:
+                # Duplicate upload of the same pincode: the later row wins
+                self.pincodes.pop()
+                self.flags.pop()
+                self.zones.pop()
+                self.days.pop()
+            zone_id = 0
+            if zone:
+                zone_id = zone_ids.get(zone)
+                if zone_id is None:
+                    zone_id = zone_ids[zone] = len(self.zone_names)
+                    self.zone_names.append(zone)
+            self.pincodes.append(pincode)
+            self.flags.append(flags)
+            self.zones.append(zone_id)
+            self.days.append(min(days, _NO_DAYS - 1) if days is not None else _NO_DAYS)
+
+    def __len__(self) -> int:
+        return len(self.pincodes)
+
+    def _position(self, pincode: int) -> int:
+        i = bisect.bisect_left(self.pincodes, pincode)
+        if i < len(self.pincodes) and self.pincodes[i] == pincode:
+            return i
+        return -1
+
+    def get(self, pincode) -> Optional[PincodeService]:
+        """Coverage of `pincode`, or None if the transporter doesn't list it."""
+        pin = _pin(pincode)
+        i = self._position(pin) if pin is not None else -1
+        if i < 0:
+            return None
+        flags = self.flags[i]
+        days = self.days[i]
+        return PincodeService(
+            zone=self.zone_names[self.zones[i]],
+            estimated_days=None if days == _NO_DAYS else days,
+            serviceable=bool(flags & FLAG_SERVICEABLE),
+            cod=bool(flags & FLAG_COD),
+            prepaid=bool(flags & FLAG_PREPAID),
+            reverse=bool(flags & FLAG_REVERSE),
+        )
+
+
+class ServiceabilityIndex:
+    """
+    Snapshot of every transporter's coverage. Immutable once built, so it
+    can be read from any thread without locking.
+    """
+
+    def __init__(self, transporters: Dict[UUID, TransporterPincodes], expires_at: float):
+        self.transporters = transporters
+        self.expires_at = expires_at
+        self.built_at = datetime.utcnow()
+
+    def knows(self, transporter_id: UUID) -> bool:
+        """True if the transporter has pincode coverage loaded."""
+        return transporter_id in self.transporters
+
+    def lookup(self, transporter_id: UUID, pincode: str) -> Optional[PincodeService]:
+        table = self.transporters.get(transporter_id)
+        return table.get(pincode) if table is not None else None
+
+    def is_serviceable(
+        self, transporter_id: UUID, pincode: str, payment_mode: Optional[str] = None
+    ) -> Optional[bool]:
+        """True / False from the index; None if the transporter isn't indexed."""
+        table = self.transporters.get(transporter_id)
+        if table is None:
+            return None
+        service = table.get(pincode)
+        return service is not None and service.allows(payment_mode)
+
+    def check_batch(
+        self,
+        pincodes: Iterable[str],
+        transporter_ids: Optional[Iterable[UUID]] = None,
+        payment_mode: Optional[str] = None,
+    ) -> Dict[str, Dict[UUID, PincodeService]]:
+        """
+        pincode -> {transporterId: coverage} for every indexed transporter
+        (or only `transporter_ids`) that serves it, for `payment_mode` if given.
+        """
+        tables = (
+            [(t, self.transporters[t]) for t in transporter_ids if t in self.transporters]
+            if transporter_ids is not None
+            else list(self.transporters.items())
+        )
+        result: Dict[str, Dict[UUID, PincodeService]] = {}
+        for pincode in pincodes:
+            pincode = str(pincode).strip()
+            if pincode in result:
+                continue
+            covering = {}
+            for transporter_id, table in tables:
+                service = table.get(pincode)
+                if service is not None and service.allows(payment_mode):
+                    covering[transporter_id] = service
+            result[pincode] = covering
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "transporters": len(self.transporters),
+            "pincodes": sum(len(t) for t in self.transporters.values()),
+            "builtAt": self.built_at.isoformat(),
+        }
+
+
+# ── Process-wide index ─────────────────────────────────────────────────
+_index: Optional[ServiceabilityIndex] = None
+_index_lock = threading.Lock()   # guards _index / _stale
+_build_lock = threading.Lock()   # one rebuild at a time
+_stale = True
+
+
+def invalidate_serviceability_index():
+    """Rebuild the index on its next use."""
+    global _stale
+    with _index_lock:
+        _stale = True
+
+
+def _on_pincode_change(mapper, connection, target):
+    """Invalidate now, and again after commit (a concurrent rebuild may have
+    read the old rows between flush and commit)."""
+    invalidate_serviceability_index()
+    session = object_session(target)
+    if session is not None:
+        session.info["serviceability_invalidate"] = True
+
+
+def _on_commit(session):
+    if session.info.pop("serviceability_invalidate", False):
+        invalidate_serviceability_index()
+
+
+for _event_name in ("after_insert", "after_update", "after_delete"):
+    event.listen(ServicePincode, _event_name, _on_pincode_change)
+event.listen(SASession, "after_commit", _on_commit)
+
+
+def get_serviceability_index(session: Session) -> ServiceabilityIndex:
+    """Current index, (re)built from ServicePincode if stale or expired."""
+    global _index, _stale
+    with _index_lock:
+        index, stale = _index, _stale
+    if index is not None and not stale and index.expires_at > time.monotonic():
+        return index
+
+    with _build_lock:
+        with _index_lock:
+            index, stale = _index, _stale
+            if index is not None and not stale and index.expires_at > time.monotonic():
+                return index
+            _stale = False
+        index = _build(session)
+        with _index_lock:
+            _index = index
+        return index
+
+
+def refresh_serviceability_index(session: Session) -> ServiceabilityIndex:
+    """Rebuild now (after a bulk upload / carrier sync), so the next wave is warm."""
+    invalidate_serviceability_index()
+    return get_serviceability_index(session)
+
+
+def _build(session: Session) -> ServiceabilityIndex:
+    started = time.perf_counter()
+    rows = session.exec(
+        select(
+            ServicePincode.transporterId, ServicePincode.pincode,
+            ServicePincode.isServiceable, ServicePincode.codAvailable,
+            ServicePincode.prepaidAvailable, ServicePincode.reverseAvailable,
+            ServicePincode.zoneCode, ServicePincode.estimatedDays,
+        ).order_by(ServicePincode.transporterId, ServicePincode.updatedAt)
+    ).all()
+
+    by_transporter: Dict[UUID, list] = {}
+    skipped = 0
+    for row in rows:
+        pin = _pin(row.pincode)
+        if pin is None:
+            skipped += 1
+            continue
+        flags = (
+            (FLAG_SERVICEABLE if row.isServiceable else 0)
+            | (FLAG_COD if row.codAvailable else 0)
+            | (FLAG_PREPAID if row.prepaidAvailable else 0)
+            | (FLAG_REVERSE if row.reverseAvailable else 0)
+        )
+        by_transporter.setdefault(row.transporterId, []).append(
+            (pin, flags, row.zoneCode or None, row.estimatedDays)
+        )
+
+    transporters = {
+        # Stable sort keeps updatedAt order within a pincode: latest row wins
+        transporter_id: TransporterPincodes(sorted(entries, key=lambda e: e[0]))
+        for transporter_id, entries in by_transporter.items()
+    }
+    index = ServiceabilityIndex(
+        transporters, expires_at=time.monotonic() + SERVICEABILITY_INDEX_TTL_SECONDS
+    )
+    logger.info(
+        f"Built serviceability index: {index.stats()['pincodes']} pincodes for "
+        f"{len(transporters)} transporters in {(time.perf_counter() - started) * 1000:.0f}ms"
+        + (f" ({skipped} invalid pincodes skipped)" if skipped else "")
+    )
+    return index
+
+
+# ============================================================================
+# Carrier pincode dumps
+# ============================================================================
+
+# Kept when the carrier's dump leaves them out (None)
+_OPTIONAL_DUMP_FIELDS = ("zoneCode", "estimatedDays", "city", "state")
+
+
+async def sync_carrier_pincodes(
+    session: Session, transporter_id: UUID, adapter: CarrierAdapter
+) -> dict:
+    """
+    Load the carrier's pincode dump into ServicePincode for `transporter_id`:
+    existing pincodes are updated, new ones inserted, and pincodes the
+    carrier no longer lists are marked unserviceable. Zone, TAT, city and
+    state are only overwritten where the dump supplies them (Delhivery's,
+    for one, has no zones). Caller commits.
+    """
+    coverage: List[PincodeCoverage] = await adapter.pincode_dump()
+    dump: Dict[str, PincodeCoverage] = {}
+    for entry in coverage:
+        if _pin(entry.pincode) is not None:
+            dump[entry.pincode.strip()] = entry
+
+    existing = {
+        row.pincode.strip(): row.id
+        for row in session.exec(
+            select(ServicePincode.id, ServicePincode.pincode)
+            .where(ServicePincode.transporterId == transporter_id)
+        ).all()
+    }
+
+    now = datetime.utcnow()
+    table = ServicePincode.__table__
+
+    def values(entry: PincodeCoverage) -> dict:
+        return {
+            "isServiceable": entry.is_serviceable,
+            "codAvailable": entry.cod_available,
+            "prepaidAvailable": entry.prepaid_available,
+            "reverseAvailable": entry.reverse_available,
+            "zoneCode": entry.zone_code,
+            "estimatedDays": entry.estimated_days,
+            "city": entry.city,
+            "state": entry.state,
+            "updatedAt": now,
+        }
+
+    updates = [
+        {"b_id": existing[pincode], **{f"b_{k}": v for k, v in values(entry).items()}}
+        for pincode, entry in dump.items() if pincode in existing
+    ]
+    if updates:
+        columns = list(values(next(iter(dump.values()))))
+        session.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values({
+                k: (
+                    func.coalesce(bindparam(f"b_{k}", type_=table.c[k].type), table.c[k])
+                    if k in _OPTIONAL_DUMP_FIELDS
+                    else bindparam(f"b_{k}", type_=table.c[k].type)
+                )
+                for k in columns
+            }),
+            updates,
+        )
+
+    inserts = [
+        {
+            "id": uuid4(), "pincode": pincode, "transporterId": transporter_id,
+            "createdAt": now, **values(entry),
+        }
+        for pincode, entry in dump.items() if pincode not in existing
+    ]
+    if inserts:
+        session.execute(insert(ServicePincode), inserts)
+
+    dropped = [existing[p] for p in existing if p not in dump]
+    if dropped and dump:
+        session.execute(
+            update(table)
+            .where(table.c.id.in_(dropped))
+            .values(isServiceable=False, updatedAt=now)
+        )
+
+    # Core statements bypass the mapper events
+    session.info["serviceability_invalidate"] = True
+    invalidate_serviceability_index()
+
+    logger.info(
+        f"Synced {len(dump)} pincodes for transporter {transporter_id}: "
+        f"{len(inserts)} new, {len(updates)} updated, {len(dropped)} dropped"
+    )
+    return {
+        "received": len(coverage),
+        "inserted": len(inserts),
+        "updated": len(updates),
+        "unlisted": len(dropped) if dump else 0,
+    }
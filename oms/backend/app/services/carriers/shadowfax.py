@@ -74,7 +74,6 @@ class ShadowfaxAdapter(CarrierAdapter):
         self._api_token: str = credentials.get("api_token", "")
         self._base_url = credentials.get("base_url", "https://franchise-api.shadowfax.in/api/v2")
         self._client_code = credentials.get("client_code", "")
-        self._client = httpx.AsyncClient(timeout=30.0)
 
     # ========================================================================
     # Authentication
@@ -12,8 +12,6 @@ import logging
 from datetime import datetime, timezone
 from typing import Dict, Any, List, Optional
 
-import httpx
-
 from .base import (
     CarrierAdapter, ShipmentRequest, ShipmentResponse,
     TrackingResponse, TrackingEvent, RateResponse, RateQuote,
@@ -40,12 +38,12 @@ class ShiprocketAdapter(CarrierAdapter):
 
     carrier_code = "SHIPROCKET"
     carrier_name = "Shiprocket"
+    base_url = BASE_URL
 
     def __init__(self, credentials: Dict[str, Any]):
         super().__init__(credentials)
         self._token: Optional[str] = None
         self._token_expiry: Optional[datetime] = None
-        self._client = httpx.AsyncClient(timeout=30.0)
 
     async def _get_token(self) -> str:
         """Get or refresh the JWT bearer token."""
@@ -0,0 +1,268 @@
+"""
+Tracking Ingest — Dedup and ordering in front of the StatusPipeline.
+
+Webhook retries and repeated polls deliver the same carrier event many
+times, and carriers don't guarantee delivery order. Every event is
+fingerprinted as (carrier, awb, carrier status, carrier timestamp) and
+dropped before it reaches the pipeline when it:
+1. repeats an event earlier in the same batch
+2. was applied recently by this process (bounded LRU seen-set, filled
+   only once the applying transaction commits)
+3. is the last event applied to its delivery (Delivery.lastEventFingerprint)
+4. is older than the last event applied to its delivery (Delivery.lastEventAt),
+   so a late IN_TRANSIT after DELIVERED costs no write at all
+
+Surviving events are applied in carrier-timestamp order. Events without a
+carrier timestamp (e.g. Delhivery push) can't be ordered and are only deduped;
+callers pass an `event_key` for them (e.g. a digest of the carrier's scan
+payload) so that a legitimate repeat of a status, such as a second NDR
+attempt, isn't mistaken for a retry of the first.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, event, func, update
+from sqlalchemy.orm import Session as SASession
+from sqlmodel import Session, select
+
+from app.models.order import Delivery
+from .pipeline import StatusPipeline, _chunks
+
+logger = logging.getLogger(__name__)
+
+
+# ── Seen-set ───────────────────────────────────────────────────────────
+TRACKING_SEEN_CACHE_SIZE = 100_000
+
+_seen: "OrderedDict[str, None]" = OrderedDict()
+_seen_lock = threading.Lock()
+
+# session.info key holding fingerprints applied in the open transaction
+_PENDING_KEY = "tracking_ingest_seen"
+
+
+def event_fingerprint(
+    carrier_code: str,
+    awb_number: str,
+    carrier_status: str,
+    timestamp: Optional[datetime],
+    event_key: Optional[str] = None,
+) -> str:
+    """Stable identity of one carrier tracking event."""
+    parts = [
+        carrier_code.upper(),
+        awb_number,
+        str(carrier_status).strip().upper(),
+        _as_utc(timestamp).isoformat() if timestamp else "",
+    ]
+    if event_key:
+        parts.append(event_key)
+    raw = "|".join(parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _seen_recently(fingerprint: str) -> bool:
+    with _seen_lock:
+        if fingerprint in _seen:
+            _seen.move_to_end(fingerprint)
+            return True
+        return False
+
+
+def _remember(fingerprints: Iterable[str]):
+    with _seen_lock:
+        for fingerprint in fingerprints:
+            _seen[fingerprint] = None
+            _seen.move_to_end(fingerprint)
+        while len(_seen) > TRACKING_SEEN_CACHE_SIZE:
+            _seen.popitem(last=False)
+
+
+def _on_commit(session):
+    _remember(session.info.pop(_PENDING_KEY, ()))
+
+
+def _on_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+event.listen(SASession, "after_commit", _on_commit)
+event.listen(SASession, "after_rollback", _on_rollback)
+
+
+class TrackingIngest:
+    """
+    Entry point for carrier tracking events (webhooks and poller).
+
+    Usage:
+        ingest = TrackingIngest(session)
+        summary = ingest.ingest(updates)            # batch, poller
+        verdict, result = ingest.ingest_one(...)    # single event, webhooks
+        session.commit()
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def ingest(self, updates: list) -> dict:
+        """
+        Filter a batch of updates and apply the rest through
+        StatusPipeline.process_bulk_tracking.
+        Each update: { awb, carrier_code, status, remark, location, timestamp,
+        ndr_reason, event_key (optional) }
+        """
+        summary = {"received": len(updates), "duplicates": 0, "stale": 0}
+        fresh, found = self._filter(updates, summary)
+        summary.update(StatusPipeline.process_bulk_tracking(self.session, fresh))
+        self._record(fresh, found)
+        return summary
+
+    def ingest_one(
+        self,
+        awb_number: str,
+        carrier_code: str,
+        carrier_status: str,
+        carrier_remark: str = "",
+        location: str = "",
+        timestamp: Optional[datetime] = None,
+        ndr_reason_raw: str = "",
+        event_key: Optional[str] = None,
+    ) -> Tuple[str, dict]:
+        """
+        Single event through StatusPipeline.process_tracking_update.
+        Returns ("processed", pipeline result), or ("duplicate" | "stale", {})
+        when the event was dropped.
+        """
+        summary = {"duplicates": 0, "stale": 0}
+        fresh, found = self._filter([{
+            "awb": awb_number,
+            "carrier_code": carrier_code,
+            "status": carrier_status,
+            "timestamp": timestamp,
+            "event_key": event_key,
+        }], summary)
+        if not fresh:
+            return ("duplicate" if summary["duplicates"] else "stale"), {}
+
+        result = StatusPipeline.process_tracking_update(
+            session=self.session,
+            awb_number=awb_number,
+            carrier_code=carrier_code,
+            carrier_status=carrier_status,
+            carrier_remark=carrier_remark,
+            location=location,
+            timestamp=fresh[0]["timestamp"],
+            ndr_reason_raw=ndr_reason_raw,
+        )
+        self._record(fresh, found)
+        return "processed", result
+
+    # ========================================================================
+    # Filtering
+    # ========================================================================
+
+    def _filter(self, updates: list, summary: dict) -> Tuple[List[dict], Set[str]]:
+        """
+        Drop duplicate and stale events; return the rest in carrier-timestamp
+        order, plus the AWBs that have a Delivery.
+        """
+        candidates: List[dict] = []
+        batch_seen: Set[str] = set()
+        for update_ in updates:
+            timestamp = update_.get("timestamp")
+            timestamp = _as_utc(timestamp) if timestamp else None
+            fingerprint = event_fingerprint(
+                update_["carrier_code"], update_["awb"], update_["status"], timestamp,
+                update_.get("event_key"),
+            )
+            if fingerprint in batch_seen or _seen_recently(fingerprint):
+                summary["duplicates"] += 1
+                continue
+            batch_seen.add(fingerprint)
+            candidates.append({**update_, "timestamp": timestamp, "fingerprint": fingerprint})
+
+        last_events = self._last_events({u["awb"] for u in candidates})
+
+        fresh: List[dict] = []
+        for update_ in candidates:
+            last_at, last_fingerprint = last_events.get(update_["awb"], (None, None))
+            if update_["fingerprint"] == last_fingerprint:
+                summary["duplicates"] += 1
+            elif update_["timestamp"] and last_at and update_["timestamp"] < last_at:
+                summary["stale"] += 1
+            else:
+                fresh.append(update_)
+
+        # Oldest first; events without a carrier timestamp last, in arrival order
+        earliest = datetime.min.replace(tzinfo=timezone.utc)
+        fresh.sort(key=lambda u: (u["timestamp"] is None, u["timestamp"] or earliest))
+
+        dropped = summary["duplicates"] + summary["stale"]
+        if dropped:
+            logger.info(
+                f"Tracking ingest: dropped {summary['duplicates']} duplicate and "
+                f"{summary['stale']} stale of {len(updates)} events"
+            )
+        return fresh, set(last_events)
+
+    def _last_events(self, awbs: Set[str]) -> Dict[str, Tuple[Optional[datetime], Optional[str]]]:
+        """AWB -> (lastEventAt, lastEventFingerprint) for deliveries that exist."""
+        last_events = {}
+        for chunk in _chunks(sorted(awbs)):
+            rows = self.session.exec(
+                select(Delivery.awbNo, Delivery.lastEventAt, Delivery.lastEventFingerprint)
+                .where(Delivery.awbNo.in_(chunk))
+            ).all()
+            for row in rows:
+                last_events.setdefault(row.awbNo, (
+                    _as_utc(row.lastEventAt) if row.lastEventAt else None,
+                    row.lastEventFingerprint,
+                ))
+        return last_events
+
+    # ========================================================================
+    # Recording
+    # ========================================================================
+
+    def _record(self, applied: List[dict], found: Set[str]):
+        """
+        Store each delivery's latest applied event, and queue the applied
+        fingerprints for the in-memory seen-set (added on commit).
+        """
+        applied = [u for u in applied if u["awb"] in found]
+        if not applied:
+            return
+
+        latest: Dict[str, dict] = {}
+        for update_ in applied:
+            latest[update_["awb"]] = update_
+
+        table = Delivery.__table__
+        self.session.execute(
+            update(table)
+            .where(table.c.awbNo == bindparam("b_awb"))
+            .values(
+                lastEventFingerprint=bindparam("b_fingerprint"),
+                lastEventAt=func.greatest(
+                    table.c.lastEventAt,
+                    bindparam("b_event_at", type_=table.c.lastEventAt.type),
+                ),
+            ),
+            [
+                {"b_awb": awb, "b_fingerprint": u["fingerprint"], "b_event_at": u["timestamp"]}
+                for awb, u in latest.items()
+            ],
+        )
+        self.session.info.setdefault(_PENDING_KEY, set()).update(
+            u["fingerprint"] for u in applied
+        )
@@ -0,0 +1,286 @@
+"""
+Tracking Poll Engine — Pulls tracking for active deliveries from carrier APIs.
+
+Replaces the one-AWB-at-a-time poll loop:
+1. Deliveries are read in pages, in Delivery.id order
+2. Each page is grouped by (company, carrier) and fanned out concurrently,
+   bounded per carrier by a semaphore and a token-bucket rate limit
+3. Carriers with a bulk tracking API (bulk_track_size > 0) get one call
+   per chunk of AWBs instead of one call per AWB
+4. Results go through TrackingIngest (dedup, out-of-order guard) and
+   StatusPipeline.process_bulk_tracking, and the page is
+   committed together with the run's cursor (TrackingPollRun), so an
+   interrupted run resumes after the last committed page
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlmodel import Session, select
+
+from app.models.enums import DeliveryStatus
+from app.models.order import Delivery
+from app.models.shipment import TrackingPollRun
+from app.models.transporter import Transporter
+from .base import CarrierAdapter, TrackingResponse
+from .factory import get_carrier_for_company
+from .tracking_ingest import TrackingIngest
+
+logger = logging.getLogger(__name__)
+
+
+# Requests per second each carrier API tolerates (per poller process)
+CARRIER_RATE_LIMITS: Dict[str, float] = {
+    "DELHIVERY": 10.0,
+    "SHIPROCKET": 4.0,
+    "XPRESSBEES": 5.0,
+    "SHADOWFAX": 5.0,
+    "EKART": 5.0,
+    "BLUEDART": 5.0,
+    "DTDC": 5.0,
+    "ECOM_EXPRESS": 5.0,
+}
+DEFAULT_RATE_LIMIT = 5.0
+
+# Max in-flight requests per carrier
+CARRIER_CONCURRENCY = 10
+
+# Deliveries per committed page (checkpoint granularity)
+POLL_PAGE_SIZE = 500
+
+ACTIVE_DELIVERY_STATUSES = [
+    DeliveryStatus.SHIPPED.value,
+    DeliveryStatus.IN_TRANSIT.value,
+    DeliveryStatus.OUT_FOR_DELIVERY.value,
+    DeliveryStatus.NDR.value,
+    DeliveryStatus.MANIFESTED.value,
+    DeliveryStatus.RTO_INITIATED.value,
+    DeliveryStatus.RTO_IN_TRANSIT.value,
+]
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class TrackingPollEngine:
+    """
+    Runs a TrackingPollRun to completion (or resumes one).
+
+    Usage:
+        engine = TrackingPollEngine(session)
+        run = engine.create_run(company_id=..., carrier_code=None, max_deliveries=50000)
+        await engine.run(run)
+    """
+
+    def __init__(self, session: Session, page_size: int = POLL_PAGE_SIZE):
+        self.session = session
+        self.page_size = page_size
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def create_run(
+        self,
+        company_id: Optional[UUID] = None,
+        carrier_code: Optional[str] = None,
+        status_filter: Optional[str] = None,
+        max_deliveries: int = 100,
+    ) -> TrackingPollRun:
+        """Persist a new run so it can be resumed if the process dies."""
+        run = TrackingPollRun(
+            companyId=company_id,
+            carrierCode=carrier_code.upper() if carrier_code else None,
+            statusFilter=status_filter,
+            maxDeliveries=max_deliveries,
+            status="RUNNING",
+            startedAt=datetime.utcnow(),
+        )
+        self.session.add(run)
+        self.session.commit()
+        self.session.refresh(run)
+        return run
+
+    async def run(self, run: TrackingPollRun) -> TrackingPollRun:
+        """Poll page by page from the run's cursor until done."""
+        if run.status != "RUNNING":
+            run.status = "RUNNING"
+            run.completedAt = None
+        logger.info(
+            f"Tracking poll {run.id}: starting at cursor {run.cursor} "
+            f"({run.scanned}/{run.maxDeliveries} scanned)"
+        )
+
+        try:
+            while run.scanned < run.maxDeliveries:
+                page = self._next_page(run)
+                if not page:
+                    break
+                results = await self._track_page(page)
+                self._commit_page(run, page, results)
+
+            run.status = "COMPLETED"
+            run.completedAt = datetime.utcnow()
+            self.session.add(run)
+            self.session.commit()
+            logger.info(
+                f"Tracking poll {run.id} complete: {run.scanned} scanned, "
+                f"{run.processed} processed, {run.errors} errors"
+            )
+        except Exception as e:
+            self.session.rollback()
+            run = self.session.get(TrackingPollRun, run.id)
+            run.status = "FAILED"
+            run.lastError = str(e)[:1000]
+            self.session.add(run)
+            self.session.commit()
+            logger.error(f"Tracking poll {run.id} failed at cursor {run.cursor}: {e}")
+
+        return run
+
+    # ========================================================================
+    # Paging
+    # ========================================================================
+
+    def _next_page(self, run: TrackingPollRun) -> list:
+        """Next page of (id, awbNo, companyId, carrier code) after the cursor."""
+        query = (
+            select(Delivery.id, Delivery.awbNo, Delivery.companyId, Transporter.code)
+            .join(Transporter, Delivery.transporterId == Transporter.id)
+            .where(
+                Delivery.awbNo.isnot(None),
+                Delivery.status.in_(ACTIVE_DELIVERY_STATUSES),
+            )
+        )
+        if run.companyId:
+            query = query.where(Delivery.companyId == run.companyId)
+        if run.carrierCode:
+            query = query.where(Transporter.code == run.carrierCode)
+        if run.statusFilter:
+            query = query.where(Delivery.status == run.statusFilter)
+        if run.cursor:
+            query = query.where(Delivery.id > run.cursor)
+
+        limit = min(self.page_size, run.maxDeliveries - run.scanned)
+        return list(self.session.exec(query.order_by(Delivery.id).limit(limit)).all())
+
+    def _commit_page(self, run: TrackingPollRun, page: list, results: Dict[str, TrackingResponse]):
+        """Apply a page's tracking results and advance the cursor in one commit."""
+        updates = []
+        failed = 0
+        for row in page:
+            tracking = results.get(row.awbNo)
+            if not tracking or not tracking.success:
+                failed += 1
+                continue
+            if not tracking.events:
+                continue
+            latest = tracking.events[0]
+            updates.append({
+                "awb": row.awbNo,
+                "carrier_code": row.code,
+                "status": latest.status_code,
+                "remark": latest.remark,
+                "location": latest.location,
+                "timestamp": latest.timestamp,
+                "ndr_reason": latest.ndr_reason,
+            })
+
+        summary = TrackingIngest(self.session).ingest(updates)
+
+        run.cursor = page[-1].id
+        run.scanned += len(page)
+        run.processed += summary["processed"]
+        run.errors += failed + summary["errors"]
+        self.session.add(run)
+        self.session.commit()
+
+    # ========================================================================
+    # Carrier fan-out
+    # ========================================================================
+
+    async def _track_page(self, page: list) -> Dict[str, TrackingResponse]:
+        """Track every AWB on the page, concurrently across carriers."""
+        groups: Dict[Tuple[UUID, str], List[str]] = defaultdict(list)
+        for row in page:
+            groups[(row.companyId, row.code)].append(row.awbNo)
+
+        tasks = []
+        for (company_id, carrier_code), awbs in groups.items():
+            adapter = get_carrier_for_company(self.session, company_id, carrier_code)
+            if not adapter:
+                continue
+            size = adapter.bulk_track_size or 1
+            for i in range(0, len(awbs), size):
+                tasks.append(self._track_chunk(adapter, carrier_code, awbs[i:i + size]))
+
+        results: Dict[str, TrackingResponse] = {}
+        for responses in await asyncio.gather(*tasks):
+            for tracking in responses:
+                results[tracking.awb_number] = tracking
+        return results
+
+    async def _track_chunk(
+        self, adapter: CarrierAdapter, carrier_code: str, awbs: List[str]
+    ) -> List[TrackingResponse]:
+        """One rate-limited carrier call for a single AWB or a bulk chunk."""
+        async with self._semaphore(carrier_code):
+            await self._bucket(carrier_code).acquire()
+            try:
+                if adapter.bulk_track_size:
+                    return await adapter.bulk_track(awbs)
+                return [await adapter.track_shipment(awbs[0])]
+            except Exception as e:
+                logger.error(f"Poll error for {carrier_code} AWBs {awbs[:3]}...: {e}")
+                return [
+                    TrackingResponse(success=False, awb_number=awb, error=str(e))
+                    for awb in awbs
+                ]
+
+    def _bucket(self, carrier_code: str) -> TokenBucket:
+        if carrier_code not in self._buckets:
+            self._buckets[carrier_code] = TokenBucket(
+                CARRIER_RATE_LIMITS.get(carrier_code, DEFAULT_RATE_LIMIT)
+            )
+        return self._buckets[carrier_code]
+
+    def _semaphore(self, carrier_code: str) -> asyncio.Semaphore:
+        if carrier_code not in self._semaphores:
+            self._semaphores[carrier_code] = asyncio.Semaphore(CARRIER_CONCURRENCY)
+        return self._semaphores[carrier_code]
+
+
+def run_tracking_poll(run_id: UUID):
+    """
+    Run (or resume) a TrackingPollRun on its own session and event loop.
+    Sync entry point for BackgroundTasks / scheduler threads.
+    """
+    from app.core.database import engine as db_engine
+
+    with Session(db_engine) as session:
+        run = session.get(TrackingPollRun, run_id)
+        if not run:
+            logger.error(f"Tracking poll run {run_id} not found")
+            return
+        asyncio.run(TrackingPollEngine(session).run(run))
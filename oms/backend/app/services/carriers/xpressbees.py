@@ -10,8 +10,6 @@ import logging
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, List, Optional
 
-import httpx
-
 from .base import (
     CarrierAdapter, ShipmentRequest, ShipmentResponse,
     TrackingResponse, TrackingEvent, RateResponse, RateQuote,
@@ -68,13 +66,13 @@ class XpressbeesAdapter(CarrierAdapter):
 
     carrier_code = "XPRESSBEES"
     carrier_name = "Xpressbees"
+    uses_awb_pool = True
 
     def __init__(self, credentials: Dict[str, Any]):
         super().__init__(credentials)
         self._token: Optional[str] = None
         self._token_expiry: Optional[datetime] = None
         self._base_url = credentials.get("base_url", "https://ship.xpressbees.com/api")
-        self._client = httpx.AsyncClient(timeout=30.0)
 
     # ========================================================================
     # Authentication
@@ -137,8 +135,8 @@ class XpressbeesAdapter(CarrierAdapter):
         try:
             headers = await self._headers()
 
-            # Step 1: Fetch an AWB number
-            awb_number = await self._fetch_awb(headers)
+            # Step 1: Use the AWB from our pool, else fetch one
+            awb_number = request.awb_number or await self._fetch_awb(headers)
 
             # Step 2: Build and submit shipment payload
             payload = self._build_shipment_payload(request, awb_number)
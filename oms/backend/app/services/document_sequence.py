@@ -0,0 +1,242 @@
+"""
+Document Sequence Service
+Central, concurrency-safe generator for document numbers (allocation,
+picklist, wave, putaway task, marketplace order numbers).
+
+Counters live in the existing "Sequence" table, one row per key.
+- Keys are namespaced per document type and, where numbering is
+  per-tenant, per company: "PL", "ALLOC", "ORDER:<companyId>:AMZ", ...
+- Values are claimed with a single INSERT ... ON CONFLICT DO UPDATE
+  ... RETURNING on a short transaction of its own, so callers never hold
+  the counter row lock for the length of their business transaction.
+- Each process claims blocks of `block_size` values and hands them out
+  from memory; with block_size > 1 numbers stay unique and increasing per
+  process, but a restart can leave unused numbers from the last block.
+  Use block_size=1 where consecutive numbering matters more than speed.
+- The first time a key is used, its counter is seeded from the existing
+  documents (via the caller's `seed` callable) so new numbers never
+  collide with numbers issued by the old count(*)-based generators.
+"""
+import logging
+import re
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import BigInteger, cast, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session, select, func
+
+from app.models import (
+    Sequence, InventoryAllocation, Picklist, Wave, PutawayTask, Order,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Default number of values claimed from the DB per round trip
+DEFAULT_BLOCK_SIZE = 20
+
+# Process-local pre-allocated blocks: key -> (next value, last value in block)
+_blocks: Dict[str, Tuple[int, int]] = {}
+# One lock per key, held across the block claim; _blocks_lock only guards
+# the lock table, so keys (companies, prefixes) never wait on each other
+_key_locks: Dict[str, threading.Lock] = {}
+_blocks_lock = threading.Lock()
+
+
+def _key_lock(key: str) -> threading.Lock:
+    with _blocks_lock:
+        lock = _key_locks.get(key)
+        if lock is None:
+            lock = _key_locks[key] = threading.Lock()
+        return lock
+
+
+def sequence_key(*parts) -> str:
+    """Build a sequence key, e.g. sequence_key("ORDER", company_id, "AMZ")."""
+    return ":".join(str(p) for p in parts)
+
+
+class DocumentSequenceService:
+    """
+    Hands out document numbers from per-key counters in the Sequence table.
+
+    Usage:
+        sequences = DocumentSequenceService(session)
+        picklist_nos = sequences.picklist_numbers(len(orders))
+        n = sequences.next_value(sequence_key("GRN", company_id), seed=...)
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    # ========================================================================
+    # Document numbers
+    # ========================================================================
+
+    def allocation_numbers(self, count: int) -> List[str]:
+        """ALLOC-00000001 style numbers (global)."""
+        values = self.next_values(
+            "ALLOC", count,
+            seed=lambda: self._max_suffix(InventoryAllocation.allocationNo, "ALLOC-"),
+        )
+        return [f"ALLOC-{n:08d}" for n in values]
+
+    def picklist_numbers(self, count: int) -> List[str]:
+        """PL-000001 style numbers (global)."""
+        values = self.next_values(
+            "PL", count,
+            seed=lambda: self._max_suffix(Picklist.picklistNo, "PL-"),
+        )
+        return [f"PL-{n:06d}" for n in values]
+
+    def wave_number(self) -> str:
+        """WAVE-YYYYMMDD-001 style number, restarting every day."""
+        prefix = f"WAVE-{datetime.utcnow().strftime('%Y%m%d')}-"
+        n = self.next_value(
+            sequence_key("WAVE", prefix[5:-1]),
+            seed=lambda: self._max_suffix(Wave.waveNo, prefix),
+            block_size=1,
+        )
+        return f"{prefix}{n:03d}"
+
+    def putaway_task_number(self, company_id: UUID) -> str:
+        """PUT-YYYYMMDD-0001 style number per company, restarting every day."""
+        prefix = f"PUT-{datetime.utcnow().strftime('%Y%m%d')}-"
+        n = self.next_value(
+            sequence_key("PUT", company_id, prefix[4:-1]),
+            seed=lambda: self._max_suffix(
+                PutawayTask.taskNo, prefix, PutawayTask.companyId == company_id
+            ),
+        )
+        return f"{prefix}{n:04d}"
+
+    def marketplace_order_number(self, company_id: UUID, prefix: str) -> str:
+        """AMZ-00001 style number per company and channel prefix."""
+        return self.marketplace_order_numbers(company_id, prefix, 1)[0]
+
+    def marketplace_order_numbers(self, company_id: UUID, prefix: str, count: int) -> List[str]:
+        """`count` AMZ-00001 style numbers per company and channel prefix."""
+        values = self.next_values(
+            sequence_key("ORDER", company_id, prefix), count,
+            seed=lambda: self._max_suffix(
+                Order.orderNo, f"{prefix}-", Order.companyId == company_id
+            ),
+        )
+        return [f"{prefix}-{n:05d}" for n in values]
+
+    def _max_suffix(self, column, prefix: str, *criteria) -> int:
+        """
+        Highest numeric suffix among existing `<prefix><digits>` values.
+        Only runs once per key, when its counter row is first created.
+        """
+        pattern = f"^{re.escape(prefix)}[0-9]+$"
+        result = self.session.exec(
+            select(func.max(cast(func.substring(column, len(prefix) + 1), BigInteger)))
+            .where(column.op("~")(pattern))
+            .where(*criteria)
+        ).one()
+        return result or 0
+
+    # ========================================================================
+    # Raw counters
+    # ========================================================================
+
+    def next_value(
+        self,
+        key: str,
+        seed: Optional[Callable[[], int]] = None,
+        block_size: int = DEFAULT_BLOCK_SIZE
+    ) -> int:
+        """Next number for `key`."""
+        return self.next_values(key, 1, seed=seed, block_size=block_size)[0]
+
+    def next_values(
+        self,
+        key: str,
+        count: int,
+        seed: Optional[Callable[[], int]] = None,
+        block_size: int = DEFAULT_BLOCK_SIZE
+    ) -> List[int]:
+        """
+        `count` numbers for `key`, in increasing order. Served from the
+        in-memory block when possible; otherwise claims a new block large
+        enough for the whole request in one DB round trip.
+        """
+        if count <= 0:
+            return []
+
+        with _key_lock(key):
+            values: List[int] = []
+            next_value, last_value = _blocks.get(key, (1, 0))
+            take = min(count, last_value - next_value + 1)
+            if take > 0:
+                values.extend(range(next_value, next_value + take))
+                next_value += take
+
+            if len(values) < count:
+                needed = count - len(values)
+                claim = max(block_size, needed)
+                last_value = self._claim(key, claim, seed)
+                next_value = last_value - claim + 1
+                values.extend(range(next_value, next_value + needed))
+                next_value += needed
+
+            _blocks[key] = (next_value, last_value)
+
+        return values
+
+    def advance(self, name: str) -> Optional[Sequence]:
+        """
+        Atomically add a Sequence row's own `increment` to its currentValue.
+        Returns the row as it is after the update, or None if it doesn't exist.
+        Used by the admin /system/sequences/{name}/next endpoint.
+        """
+        table = Sequence.__table__
+        row = self.session.execute(
+            update(table)
+            .where(table.c.name == name)
+            .values(currentValue=table.c.currentValue + table.c.increment)
+            .returning(*table.c)
+        ).first()
+        return Sequence.model_validate(row._mapping) if row else None
+
+    def _claim(
+        self,
+        key: str,
+        size: int,
+        seed: Optional[Callable[[], int]]
+    ) -> int:
+        """
+        Reserve `size` values for `key` and return the last one.
+        Runs on its own connection and commits immediately.
+        """
+        table = Sequence.__table__
+        with self.session.get_bind().begin() as connection:
+            last_value = connection.execute(
+                update(table)
+                .where(table.c.name == key)
+                .values(currentValue=table.c.currentValue + size)
+                .returning(table.c.currentValue)
+            ).scalar()
+            if last_value is not None:
+                return last_value
+
+            # First use of this key: start after existing documents
+            start = seed() if seed else 0
+            logger.info(f"Seeding document sequence '{key}' at {start}")
+            statement = pg_insert(table).values(
+                id=uuid4(),
+                name=key,
+                prefix=key.split(":", 1)[0],
+                currentValue=start + size,
+                increment=1,
+            )
+            return connection.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[table.c.name],
+                    set_={"currentValue": table.c.currentValue + size},
+                ).returning(table.c.currentValue)
+            ).scalar()
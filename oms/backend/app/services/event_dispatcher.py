@@ -3,11 +3,49 @@ EventDispatcher — Lightweight in-process event bus for CJDQuick OMS.
 
 Design:
 - Singleton registry of event_type → handler functions
-- Handlers run in background (via BackgroundTasks or thread pool)
+- Handlers run on a bounded worker pool (EVENT_WORKERS threads)
 - Each handler gets its OWN DB session (isolated from endpoint transaction)
 - Errors in one handler never crash the endpoint or other handlers
+- Failed handlers are retried with exponential backoff, each attempt in
+  a fresh session (EVENT_MAX_RETRIES, EVENT_RETRY_BACKOFF_SECONDS)
 - No external infrastructure required (no Redis/RabbitMQ)
 
+Backpressure:
+- At most EVENT_WORKERS + EVENT_QUEUE_SIZE handler runs are in flight.
+  When full, dispatch() from a plain thread waits up to
+  EVENT_QUEUE_TIMEOUT seconds for a slot. Callers on the asyncio event
+  loop and workers that dispatch follow-up events never wait (the loop
+  would stall; the pool could be full of workers waiting on each other).
+- With EVENT_OUTBOX_ENABLED, a run that gets no slot is deferred to the
+  outbox (PENDING, due now) and relay_outbox() delivers it once the pool
+  has room, so events are slowed down, never dropped and never run on
+  the caller's thread. Without the outbox (or if the outbox write fails)
+  it is queued on the pool past the cap.
+
+Durable outbox (EVENT_OUTBOX_ENABLED):
+- dispatch() first writes one EventOutbox row per handler, then runs it.
+  Rows are deleted on success and marked FAILED when retries run out.
+- Each row carries a lease (nextAttemptAt). If the process dies before
+  the handler finishes, relay_outbox() (scheduled job) picks the row up
+  again once the lease expires, so events survive restarts.
+
+Micro-batching (opt-in per handler):
+- @on(event, batch=True) handlers receive a LIST of payloads instead of
+  one. Payloads are buffered for `window` seconds (or until `max_size`
+  are waiting) and delivered in a single handler run.
+- `key` names payload fields to coalesce on: within a window only the
+  latest payload per key is kept, e.g. key=("companyId", "skuId") turns
+  hundreds of inventory.updated events into one per SKU.
+- Buffered payloads live in memory until the window closes; with the
+  outbox enabled, each flushed batch is persisted as one outbox row.
+
+Metrics:
+- Per (event type, handler): dispatch/completion/failure/retry counts,
+  in-flight runs, p50/p95/p99 latency over the last LATENCY_SAMPLE_SIZE
+  runs and the last error; plus pool queue depth. Exposed as JSON via
+  get_event_metrics() and in Prometheus text format via
+  render_prometheus_metrics() (admin endpoints under /system/event-metrics).
+
 Usage:
     from app.services.event_dispatcher import dispatch, dispatch_sync, on
 
@@ -16,48 +54,521 @@ Usage:
         # payload has orderId, companyId, etc.
         ...
 
+    @on("inventory.updated", batch=True, window=5.0, key=("companyId", "skuId"))
+    def handle_push_inventory(payloads: list, session):
+        ...
+
     # In an endpoint, after commit:
     dispatch("order.confirmed", {"orderId": str(order.id), "companyId": str(order.companyId)})
 """
+import asyncio
+import json
 import logging
 import threading
-from typing import Callable, Dict, List, Any
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Any, Optional, Sequence, Tuple
+from uuid import UUID, uuid4
+
+from app.core.config import settings
 
 logger = logging.getLogger("event_dispatcher")
 
 # ── Global Registry ──────────────────────────────────────────────────────
 _handlers: Dict[str, List[Callable]] = {}
+_handlers_by_key: Dict[str, Callable] = {}
+_batchers: Dict[Tuple[str, Callable], "_Batcher"] = {}
+
+# ── Worker Pool ──────────────────────────────────────────────────────────
+WORKER_THREAD_PREFIX = "event-worker"
+
+_executor: Optional[ThreadPoolExecutor] = None
+_slots: Optional[threading.BoundedSemaphore] = None
+_pool_lock = threading.Lock()
+
+# ── Outbox ───────────────────────────────────────────────────────────────
+# How long a delivery may run (including retries) before the relay
+# assumes its process died and runs it again
+OUTBOX_LEASE_SECONDS = 300
+OUTBOX_RELAY_BATCH = 500
+
+# ── Metrics ──────────────────────────────────────────────────────────────
+# Handler runs kept per handler for latency percentiles
+LATENCY_SAMPLE_SIZE = 1000
+LATENCY_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _HandlerStats:
+    """Counters and recent latencies for one (event type, handler) pair."""
+
+    def __init__(self):
+        self.dispatched = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.in_flight = 0
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLE_SIZE)
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[datetime] = None
 
+    def record_latency(self, seconds: float):
+        self.latencies.append(seconds)
+        self.latency_sum += seconds
+        self.latency_count += 1
 
-def on(event_type: str):
-    """Decorator to register a handler for an event type."""
+    def quantiles(self) -> Dict[float, Optional[float]]:
+        """Nearest-rank percentiles (seconds) over the recent samples."""
+        samples = sorted(self.latencies)
+        if not samples:
+            return {q: None for q in LATENCY_QUANTILES}
+        return {
+            q: samples[min(int(q * len(samples)), len(samples) - 1)]
+            for q in LATENCY_QUANTILES
+        }
+
+
+_stats: Dict[Tuple[str, str], _HandlerStats] = {}
+_pool_stats = {"queued": 0, "running": 0, "inline": 0, "deferred": 0}
+_stats_lock = threading.Lock()
+
+
+def _stats_for(event_type: str, handler: Callable) -> _HandlerStats:
+    key = (event_type, handler.__name__)
+    stats = _stats.get(key)
+    if stats is None:
+        with _stats_lock:
+            stats = _stats.setdefault(key, _HandlerStats())
+    return stats
+
+
+def handler_key(fn: Callable) -> str:
+    """Stable name of a handler, used to find it again from an outbox row."""
+    return f"{fn.__module__}.{fn.__qualname__}"
+
+
+def on(
+    event_type: str,
+    batch: bool = False,
+    window: float = 2.0,
+    max_size: int = 500,
+    key: Optional[Sequence[str]] = None
+):
+    """
+    Decorator to register a handler for an event type.
+    With batch=True the handler receives a list of payloads collected over
+    `window` seconds (or `max_size` payloads), coalesced on the `key` fields.
+    """
     def decorator(fn: Callable):
         if event_type not in _handlers:
             _handlers[event_type] = []
         _handlers[event_type].append(fn)
-        logger.debug(f"Registered handler {fn.__name__} for event '{event_type}'")
+        _handlers_by_key[handler_key(fn)] = fn
+        if batch:
+            _batchers[(event_type, fn)] = _Batcher(fn, event_type, window, max_size, key)
+        logger.debug(f"Registered {'batched ' if batch else ''}handler {fn.__name__} for event '{event_type}'")
         return fn
     return decorator
 
 
-def _safe_run_handler(handler: Callable, event_type: str, payload: dict):
-    """Run a single handler with its own DB session, isolated error handling."""
+class _Batcher:
+    """Collects payloads for one batched handler and flushes them as a list."""
+
+    def __init__(
+        self,
+        handler: Callable,
+        event_type: str,
+        window: float,
+        max_size: int,
+        key: Optional[Sequence[str]]
+    ):
+        self.handler = handler
+        self.event_type = event_type
+        self.window = window
+        self.max_size = max_size
+        self.key = tuple(key) if key else None
+        self._buffer: Dict[Any, dict] = {}
+        self._seq = 0
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def add(self, payload: dict):
+        with self._lock:
+            if self.key:
+                buffer_key = tuple(payload.get(field) for field in self.key)
+                # Latest payload wins, but keeps the slot of the first one
+                self._buffer[buffer_key] = payload
+            else:
+                self._seq += 1
+                self._buffer[self._seq] = payload
+
+            if len(self._buffer) >= self.max_size:
+                payloads = self._take()
+            else:
+                payloads = None
+                if self._timer is None:
+                    self._timer = threading.Timer(self.window, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+        if payloads:
+            self._deliver(payloads)
+
+    def flush(self):
+        """Deliver whatever is buffered now (timer expiry, shutdown)."""
+        with self._lock:
+            payloads = self._take()
+        if payloads:
+            self._deliver(payloads)
+
+    def _take(self) -> List[dict]:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        payloads = list(self._buffer.values())
+        self._buffer = {}
+        return payloads
+
+    def _deliver(self, payloads: List[dict]):
+        logger.info(f"[{self.event_type}] Flushing batch of {len(payloads)} to {self.handler.__name__}")
+        outbox_id = None
+        if settings.EVENT_OUTBOX_ENABLED:
+            outbox_id = _outbox_enqueue(self.event_type, [self.handler], payloads)[0]
+        _submit(self.handler, self.event_type, payloads, outbox_id=outbox_id)
+
+
+def _retry_delay(attempt: int) -> float:
+    """Backoff delay (seconds) after failed attempt number `attempt` (1-based)."""
+    return settings.EVENT_RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1))
+
+
+def _safe_run_handler(
+    handler: Callable,
+    event_type: str,
+    payload: Any,
+    outbox_id: Optional[UUID] = None,
+    max_retries: int = 0,
+    attempts: int = 0
+) -> bool:
+    """
+    Run a single handler with its own DB session, isolated error handling.
+    Retries up to `max_retries` times (fresh session each attempt).
+    `attempts` is the number of attempts already made (outbox redelivery).
+    Returns True if the handler eventually succeeded.
+    """
     from app.core.database import engine
     from sqlmodel import Session
 
     handler_name = handler.__name__
+    retries_left = max_retries
+    stats = _stats_for(event_type, handler)
+    with _stats_lock:
+        stats.in_flight += 1
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                with Session(engine) as session:
+                    handler(payload, session)
+                    session.commit()
+                with _stats_lock:
+                    stats.record_latency(time.perf_counter() - started)
+                    stats.completed += 1
+                logger.info(f"[{event_type}] {handler_name} completed")
+                if outbox_id:
+                    _outbox_delete(outbox_id)
+                return True
+            except Exception as e:
+                attempts += 1
+                with _stats_lock:
+                    stats.record_latency(time.perf_counter() - started)
+                    stats.last_error = str(e)[:1000]
+                    stats.last_error_at = datetime.utcnow()
+                    if retries_left <= 0:
+                        stats.failed += 1
+                    else:
+                        stats.retries += 1
+
+                if retries_left <= 0:
+                    logger.error(f"[{event_type}] {handler_name} FAILED: {e}", exc_info=True)
+                    if outbox_id:
+                        _outbox_update(outbox_id, status="FAILED", attempts=attempts, lastError=str(e)[:1000])
+                    return False
+
+                retries_left -= 1
+                delay = _retry_delay(attempts)
+                logger.warning(
+                    f"[{event_type}] {handler_name} failed (attempt {attempts}), "
+                    f"retrying in {delay:.1f}s: {e}"
+                )
+                if outbox_id:
+                    _outbox_update(
+                        outbox_id,
+                        attempts=attempts,
+                        lastError=str(e)[:1000],
+                        nextAttemptAt=datetime.utcnow() + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+                    )
+                time.sleep(delay)
+    finally:
+        with _stats_lock:
+            stats.in_flight -= 1
+
+
+# ── Worker pool ──────────────────────────────────────────────────────────
+
+def _get_pool():
+    """Lazily create the shared worker pool and its slot semaphore."""
+    global _executor, _slots
+    with _pool_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.EVENT_WORKERS,
+                thread_name_prefix=WORKER_THREAD_PREFIX,
+            )
+            _slots = threading.BoundedSemaphore(settings.EVENT_WORKERS + settings.EVENT_QUEUE_SIZE)
+        return _executor, _slots
+
+
+def _run_and_release(slots: Optional[threading.BoundedSemaphore], *args, **kwargs):
+    with _stats_lock:
+        _pool_stats["queued"] -= 1
+        _pool_stats["running"] += 1
+    try:
+        _safe_run_handler(*args, **kwargs)
+    finally:
+        with _stats_lock:
+            _pool_stats["running"] -= 1
+        if slots is not None:
+            slots.release()
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def _submit(
+    handler: Callable,
+    event_type: str,
+    payload: Any,
+    outbox_id: Optional[UUID] = None,
+    attempts: int = 0,
+    wait: bool = True
+):
+    """
+    Queue one handler run on the pool. When the pool is full, the run is
+    deferred to the outbox for relay_outbox() if the outbox is enabled
+    (see module docstring).
+    """
+    max_retries = max(settings.EVENT_MAX_RETRIES - attempts, 0)
+    executor, slots = _get_pool()
+    stats = _stats_for(event_type, handler)
+    with _stats_lock:
+        stats.dispatched += 1
+
+    if (
+        not wait
+        or threading.current_thread().name.startswith(WORKER_THREAD_PREFIX)
+        or _on_event_loop()
+    ):
+        acquired = slots.acquire(blocking=False)
+    else:
+        acquired = slots.acquire(timeout=settings.EVENT_QUEUE_TIMEOUT)
+
+    if acquired:
+        with _stats_lock:
+            _pool_stats["queued"] += 1
+        try:
+            executor.submit(
+                _run_and_release, slots, handler, event_type, payload,
+                outbox_id=outbox_id, max_retries=max_retries, attempts=attempts,
+            )
+            return
+        except RuntimeError:
+            # Pool already shut down (app stopping) - run inline
+            with _stats_lock:
+                _pool_stats["queued"] -= 1
+                _pool_stats["inline"] += 1
+            slots.release()
+            _safe_run_handler(
+                handler, event_type, payload,
+                outbox_id=outbox_id, max_retries=max_retries, attempts=attempts,
+            )
+            return
+
+    deferred = False
+    if outbox_id:
+        deferred = _outbox_update(outbox_id, nextAttemptAt=datetime.utcnow())
+    elif settings.EVENT_OUTBOX_ENABLED:
+        deferred = _outbox_enqueue(event_type, [handler], payload, due_now=True)[0] is not None
+
+    if deferred:
+        logger.warning(f"[{event_type}] Event queue full, deferred {handler.__name__} to the outbox")
+        with _stats_lock:
+            _pool_stats["deferred"] += 1
+        return
+
+    # No outbox either: queue past the cap rather than block or drop
+    logger.warning(f"[{event_type}] Event queue full, queueing {handler.__name__} past capacity")
+    with _stats_lock:
+        _pool_stats["queued"] += 1
+    executor.submit(
+        _run_and_release, None, handler, event_type, payload,
+        outbox_id=outbox_id, max_retries=max_retries, attempts=attempts,
+    )
+
+
+def shutdown_dispatcher(wait: bool = True):
+    """
+    Flush pending batches and stop the worker pool.
+    Called from the app lifespan on shutdown.
+    """
+    global _executor, _slots
+    for batcher in list(_batchers.values()):
+        batcher.flush()
+    with _pool_lock:
+        executor, _executor, _slots = _executor, None, None
+    if executor:
+        executor.shutdown(wait=wait)
+        logger.info("Event dispatcher worker pool stopped")
+
+
+# ── Outbox ───────────────────────────────────────────────────────────────
+
+def _outbox_enqueue(
+    event_type: str,
+    handlers: List[Callable],
+    payload: Any,
+    due_now: bool = False
+) -> List[Optional[UUID]]:
+    """
+    Persist one outbox row per handler in a short transaction of its own.
+    Returns the row ids; all None if the outbox write failed (the event
+    is still delivered in-process). `due_now` rows are picked up by the
+    next relay_outbox() run instead of after a lease.
+    """
+    from app.core.database import engine
+    from sqlalchemy import insert
+    from app.models.system import EventOutbox
+
+    ids = [uuid4() for _ in handlers]
+    now = datetime.utcnow()
     try:
-        with Session(engine) as session:
-            handler(payload, session)
-            session.commit()
-        logger.info(f"[{event_type}] {handler_name} completed")
+        stored_payload = json.loads(json.dumps(payload, default=str))
+        with engine.begin() as connection:
+            connection.execute(
+                insert(EventOutbox.__table__),
+                [
+                    {
+                        "id": outbox_id,
+                        "eventType": event_type,
+                        "handler": handler_key(handler),
+                        "payload": stored_payload,
+                        "status": "PENDING",
+                        "attempts": 0,
+                        "nextAttemptAt": now if due_now else now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+                        "createdAt": now,
+                        "updatedAt": now,
+                    }
+                    for outbox_id, handler in zip(ids, handlers)
+                ],
+            )
+        return ids
     except Exception as e:
-        logger.error(f"[{event_type}] {handler_name} FAILED: {e}", exc_info=True)
+        logger.error(f"[{event_type}] Outbox write failed, delivering without outbox: {e}")
+        return [None] * len(handlers)
+
+
+def _outbox_update(outbox_id: UUID, **values) -> bool:
+    from app.core.database import engine
+    from sqlalchemy import update
+    from app.models.system import EventOutbox
+
+    table = EventOutbox.__table__
+    try:
+        with engine.begin() as connection:
+            connection.execute(
+                update(table)
+                .where(table.c.id == outbox_id)
+                .values(updatedAt=datetime.utcnow(), **values)
+            )
+        return True
+    except Exception as e:
+        logger.error(f"Outbox update failed for {outbox_id}: {e}")
+        return False
+
+
+def _outbox_delete(outbox_id: UUID):
+    from app.core.database import engine
+    from sqlalchemy import delete
+    from app.models.system import EventOutbox
+
+    table = EventOutbox.__table__
+    try:
+        with engine.begin() as connection:
+            connection.execute(delete(table).where(table.c.id == outbox_id))
+    except Exception as e:
+        logger.error(f"Outbox delete failed for {outbox_id}: {e}")
+
+
+def relay_outbox(limit: int = OUTBOX_RELAY_BATCH) -> int:
+    """
+    Redeliver PENDING outbox rows whose lease expired (process restarted
+    or crashed mid-handler). Rows are claimed with FOR UPDATE SKIP LOCKED
+    and re-leased before running, so concurrent relays never double-run.
+    Returns the number of deliveries resubmitted.
+    """
+    from app.core.database import engine
+    from sqlalchemy import select, update
+    from app.models.system import EventOutbox
+
+    table = EventOutbox.__table__
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        rows = connection.execute(
+            select(table.c.id, table.c.eventType, table.c.handler, table.c.payload, table.c.attempts)
+            .where(table.c.status == "PENDING", table.c.nextAttemptAt <= now)
+            .order_by(table.c.nextAttemptAt)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            return 0
+        connection.execute(
+            update(table)
+            .where(table.c.id.in_([row.id for row in rows]))
+            .values(nextAttemptAt=now + timedelta(seconds=OUTBOX_LEASE_SECONDS), updatedAt=now)
+        )
+
+    relayed = 0
+    for row in rows:
+        handler = _handlers_by_key.get(row.handler)
+        if not handler:
+            _outbox_update(row.id, status="FAILED", lastError=f"Handler {row.handler} is not registered")
+            continue
+        if row.attempts > settings.EVENT_MAX_RETRIES:
+            _outbox_update(row.id, status="FAILED")
+            continue
+        payload = row.payload if row.payload is not None else {}
+        # No waiting: rows the pool has no room for are deferred to the next run
+        _submit(handler, row.eventType, payload, outbox_id=row.id, attempts=row.attempts, wait=False)
+        relayed += 1
+
+    logger.info(f"Outbox relay: resubmitted {relayed} of {len(rows)} expired deliveries")
+    return relayed
 
 
+# ── Dispatch ─────────────────────────────────────────────────────────────
+
 def dispatch(event_type: str, payload: dict):
     """
-    Dispatch an event asynchronously (fire-and-forget via threads).
+    Dispatch an event asynchronously (fire-and-forget via the worker pool).
     Called from endpoints after session.commit().
     """
     handlers = _handlers.get(event_type, [])
@@ -66,13 +577,23 @@ def dispatch(event_type: str, payload: dict):
         return
 
     logger.info(f"Dispatching '{event_type}' to {len(handlers)} handler(s)")
+    immediate = []
     for handler in handlers:
-        thread = threading.Thread(
-            target=_safe_run_handler,
-            args=(handler, event_type, payload),
-            daemon=True,
-        )
-        thread.start()
+        batcher = _batchers.get((event_type, handler))
+        if batcher:
+            batcher.add(payload)
+        else:
+            immediate.append(handler)
+    if not immediate:
+        return
+
+    if settings.EVENT_OUTBOX_ENABLED:
+        outbox_ids = _outbox_enqueue(event_type, immediate, payload)
+    else:
+        outbox_ids = [None] * len(immediate)
+
+    for handler, outbox_id in zip(immediate, outbox_ids):
+        _submit(handler, event_type, payload, outbox_id=outbox_id)
 
 
 def dispatch_sync(event_type: str, payload: dict):
@@ -86,7 +607,13 @@ def dispatch_sync(event_type: str, payload: dict):
 
     logger.info(f"Dispatching (sync) '{event_type}' to {len(handlers)} handler(s)")
     for handler in handlers:
-        _safe_run_handler(handler, event_type, payload)
+        stats = _stats_for(event_type, handler)
+        with _stats_lock:
+            stats.dispatched += 1
+        if (event_type, handler) in _batchers:
+            _safe_run_handler(handler, event_type, [payload])
+        else:
+            _safe_run_handler(handler, event_type, payload)
 
 
 def get_registered_events() -> Dict[str, List[str]]:
@@ -95,3 +622,97 @@ def get_registered_events() -> Dict[str, List[str]]:
         event_type: [h.__name__ for h in handlers]
         for event_type, handlers in _handlers.items()
     }
+
+
+# ── Metrics ──────────────────────────────────────────────────────────────
+
+def get_event_metrics() -> Dict[str, Any]:
+    """Snapshot of pool and per-handler metrics (for the admin endpoint)."""
+    with _stats_lock:
+        handlers = []
+        for (event_type, handler_name), stats in sorted(_stats.items()):
+            quantiles = stats.quantiles()
+            handlers.append({
+                "eventType": event_type,
+                "handler": handler_name,
+                "dispatched": stats.dispatched,
+                "completed": stats.completed,
+                "failed": stats.failed,
+                "retries": stats.retries,
+                "inFlight": stats.in_flight,
+                "p50Ms": _to_ms(quantiles[0.5]),
+                "p95Ms": _to_ms(quantiles[0.95]),
+                "p99Ms": _to_ms(quantiles[0.99]),
+                "lastError": stats.last_error,
+                "lastErrorAt": stats.last_error_at.isoformat() if stats.last_error_at else None,
+            })
+        pool = {
+            "workers": settings.EVENT_WORKERS,
+            "queueCapacity": settings.EVENT_QUEUE_SIZE,
+            "queued": _pool_stats["queued"],
+            "running": _pool_stats["running"],
+            "inlineRuns": _pool_stats["inline"],
+            "deferredRuns": _pool_stats["deferred"],
+            "pendingBatches": sum(len(b._buffer) for b in _batchers.values()),
+        }
+    return {"pool": pool, "handlers": handlers}
+
+
+def render_prometheus_metrics() -> str:
+    """Event bus metrics in Prometheus text exposition format (v0.0.4)."""
+    lines: List[str] = []
+
+    def metric(name: str, metric_type: str, help_text: str, samples: List[Tuple[str, Any]]):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            lines.append(f"{name}{labels} {value}")
+
+    with _stats_lock:
+        items = sorted(_stats.items())
+        labelled = [(_labels(event=e, handler=h), stats) for (e, h), stats in items]
+
+        metric("oms_event_handler_dispatched_total", "counter",
+               "Handler runs dispatched.", [(labels, st.dispatched) for labels, st in labelled])
+        metric("oms_event_handler_completed_total", "counter",
+               "Handler runs completed successfully.", [(labels, st.completed) for labels, st in labelled])
+        metric("oms_event_handler_failures_total", "counter",
+               "Handler runs that failed after all retries.", [(labels, st.failed) for labels, st in labelled])
+        metric("oms_event_handler_retries_total", "counter",
+               "Handler attempts that failed and were retried.", [(labels, st.retries) for labels, st in labelled])
+        metric("oms_event_handler_in_flight", "gauge",
+               "Handler runs currently executing.", [(labels, st.in_flight) for labels, st in labelled])
+
+        lines.append("# HELP oms_event_handler_latency_seconds Handler attempt latency.")
+        lines.append("# TYPE oms_event_handler_latency_seconds summary")
+        for (event_type, handler_name), stats in items:
+            for q, value in stats.quantiles().items():
+                if value is not None:
+                    labels = _labels(event=event_type, handler=handler_name, quantile=q)
+                    lines.append(f"oms_event_handler_latency_seconds{labels} {value:.6f}")
+            labels = _labels(event=event_type, handler=handler_name)
+            lines.append(f"oms_event_handler_latency_seconds_sum{labels} {stats.latency_sum:.6f}")
+            lines.append(f"oms_event_handler_latency_seconds_count{labels} {stats.latency_count}")
+
+        metric("oms_event_queue_depth", "gauge",
+               "Handler runs waiting for a worker.", [("", _pool_stats["queued"])])
+        metric("oms_event_workers_busy", "gauge",
+               "Workers currently running a handler.", [("", _pool_stats["running"])])
+        metric("oms_event_inline_runs_total", "counter",
+               "Handler runs executed inline because the worker pool was stopped.", [("", _pool_stats["inline"])])
+        metric("oms_event_deferred_runs_total", "counter",
+               "Handler runs deferred to the outbox because the queue was full.", [("", _pool_stats["deferred"])])
+
+    return "\n".join(lines) + "\n"
+
+
+def _to_ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def _labels(**labels) -> str:
+    """Prometheus label set, e.g. {event="order.confirmed",handler="..."}."""
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
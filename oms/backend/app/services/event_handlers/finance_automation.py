@@ -314,36 +314,45 @@ def handle_weight_discrepancy(payload: dict, session: Session):
 
 # ── T36-37: delivery.delivered / rto_delivered → guaranteed analytics ────
 
-@on("delivery.delivered")
-def handle_guaranteed_analytics_delivered(payload: dict, session: Session):
-    """Run analytics aggregation on delivery completion."""
-    _run_analytics(payload, session)
-
-
-@on("delivery.rto_delivered")
-def handle_guaranteed_analytics_rto(payload: dict, session: Session):
-    """Run analytics aggregation on RTO delivery."""
-    _run_analytics(payload, session)
-
-
-def _run_analytics(payload: dict, session: Session):
-    """Aggregate delivery analytics for the company."""
+@on("delivery.delivered", batch=True, window=30.0)
+def handle_guaranteed_analytics_delivered(payloads: list, session: Session):
+    """Run analytics aggregation on delivery completion (once per company per window)."""
+    _run_analytics(payloads, session)
+
+
+@on("delivery.rto_delivered", batch=True, window=30.0)
+def handle_guaranteed_analytics_rto(payloads: list, session: Session):
+    """Run analytics aggregation on RTO delivery (once per company per window)."""
+    _run_analytics(payloads, session)
+
+
+def _run_analytics(payloads: list, session: Session):
+    """
+    Re-aggregate the last 30 days of delivery analytics for each company
+    in the batch, limited to the distinct carrier / lane / pincode keys of
+    its deliveries (as AnalyticsAggregator.aggregate_for_delivery does for one).
+    The batch is not coalesced: every delivery of the window is here, and
+    each company is still aggregated once.
+    """
+    from collections import defaultdict
+    from datetime import timedelta, timezone
     from app.services.analytics_aggregator import AnalyticsAggregator
 
-    company_id = payload.get("companyId")
-    delivery_id = payload.get("deliveryId")
-    transporter_id = payload.get("transporterId")
-
-    if not company_id:
-        return
-
-    try:
-        aggregator = AnalyticsAggregator(session)
-        aggregator.aggregate_delivery(
-            company_id=UUID(company_id),
-            delivery_id=UUID(delivery_id) if delivery_id else None,
-            transporter_id=UUID(transporter_id) if transporter_id else None,
-        )
-        logger.info(f"Analytics aggregated for delivery {delivery_id}")
-    except Exception as e:
-        logger.warning(f"Analytics aggregation failed (will retry via scheduler): {e}")
+    deliveries_by_company = defaultdict(set)
+    for p in payloads:
+        if p.get("companyId") and p.get("deliveryId"):
+            deliveries_by_company[p["companyId"]].add(UUID(p["deliveryId"]))
+    now = datetime.now(timezone.utc)
+
+    for company_id, delivery_ids in deliveries_by_company.items():
+        try:
+            scope = AnalyticsAggregator.delivery_scope(session, delivery_ids)
+            if not scope["transporter_ids"]:
+                continue
+            AnalyticsAggregator.aggregate_all(
+                session, UUID(company_id), now - timedelta(days=30), now, **scope
+            )
+            logger.info(f"Analytics aggregated for company {company_id}")
+        except Exception as e:
+            session.rollback()
+            logger.warning(f"Analytics aggregation failed (will retry via scheduler): {e}")
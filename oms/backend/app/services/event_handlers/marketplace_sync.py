@@ -5,6 +5,7 @@ T18: delivery.shipped → push tracking to marketplace
 T19: return.processed → push return status to marketplace
 T20: inventory.updated → push inventory to marketplace channel
 """
+import asyncio
 import logging
 from uuid import UUID
 
@@ -59,7 +60,6 @@ def handle_push_tracking(payload: dict, session: Session):
         from app.services.marketplaces.adapter_factory import get_adapter
         adapter = get_adapter(connection)
         if adapter and hasattr(adapter, "update_fulfillment"):
-            import asyncio
             asyncio.run(adapter.update_fulfillment(
                 order_ref=order.externalOrderNo or order.orderNo,
                 awb=awb_number,
@@ -120,7 +120,6 @@ def handle_push_return_status(payload: dict, session: Session):
         from app.services.marketplaces.adapter_factory import get_adapter
         adapter = get_adapter(connection)
         if adapter and hasattr(adapter, "update_return"):
-            import asyncio
             asyncio.run(adapter.update_return(
                 return_ref=ret.returnNo,
                 status=ret.status.value if hasattr(ret.status, "value") else str(ret.status),
@@ -132,24 +131,28 @@ def handle_push_return_status(payload: dict, session: Session):
 
 # ── T20: inventory.updated → push inventory to channel ──────────────────
 
-@on("inventory.updated")
-def handle_push_inventory(payload: dict, session: Session):
-    """Trigger immediate inventory push for the specific SKU+location."""
-    company_id = UUID(payload["companyId"])
-    sku_id = payload.get("skuId")
-    location_id = payload.get("locationId")
-
-    if not sku_id:
-        return
-
-    try:
-        from app.services.inventory.push_engine import InventoryPushEngine
-        engine = InventoryPushEngine(session)
-        engine.push_sku(
-            company_id=company_id,
-            sku_id=UUID(sku_id),
-            location_id=UUID(location_id) if location_id else None,
-        )
-        logger.info(f"Immediate inventory push for SKU {sku_id}")
-    except Exception as e:
-        logger.warning(f"Inventory push failed for SKU {sku_id}: {e}")
+@on("inventory.updated", batch=True, window=5.0, key=("companyId", "skuId"))
+def handle_push_inventory(payloads: list, session: Session):
+    """
+    Push inventory for the SKUs changed in the last window, one marketplace
+    push per company covering all of its changed SKUs.
+    """
+    sku_ids_by_company = {}
+    for payload in payloads:
+        sku_id = payload.get("skuId")
+        if not sku_id or not payload.get("companyId"):
+            continue
+        sku_ids_by_company.setdefault(UUID(payload["companyId"]), set()).add(UUID(sku_id))
+
+    from app.services.inventory.push_engine import InventoryPushEngine
+    engine = InventoryPushEngine(session)
+    for company_id, sku_ids in sku_ids_by_company.items():
+        try:
+            asyncio.run(engine.push_to_all_channels(
+                company_id=company_id,
+                sku_ids=list(sku_ids),
+                triggered_by="INVENTORY_CHANGE",
+            ))
+            logger.info(f"Immediate inventory push for {len(sku_ids)} SKU(s) of company {company_id}")
+        except Exception as e:
+            logger.warning(f"Inventory push failed for company {company_id}: {e}")
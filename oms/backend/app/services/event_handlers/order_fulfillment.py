@@ -49,25 +49,30 @@ def handle_order_confirmed(payload: dict, session: Session):
     allocation_service = InventoryAllocationService(session)
     all_allocated = True
 
-    for item in order_items:
-        already = item.allocatedQty or 0
-        remaining = item.quantity - already
-        if remaining <= 0:
-            continue
-
-        request = AllocationRequest(
+    pending = [
+        item for item in order_items
+        if item.quantity - (item.allocatedQty or 0) > 0
+    ]
+    requests = [
+        AllocationRequest(
             skuId=item.skuId,
-            requiredQty=remaining,
+            requiredQty=item.quantity - (item.allocatedQty or 0),
             locationId=order.locationId,
             orderId=order.id,
             orderItemId=item.id,
         )
+        for item in pending
+    ]
+    results = allocation_service.batch_allocate(
+        requests,
+        company_id=company_id,
+        allocated_by_id=None,
+        commit=False,
+    )
 
-        result = allocation_service.allocate_inventory(
-            request=request,
-            company_id=company_id,
-            allocated_by_id=None,
-        )
+    for item, request, result in zip(pending, requests, results):
+        already = item.allocatedQty or 0
+        remaining = request.requiredQty
 
         item.allocatedQty = already + result.allocatedQty
         if result.allocatedQty >= remaining:
@@ -108,6 +113,7 @@ def handle_order_allocated(payload: dict, session: Session):
     from app.models import (
         Wave, WaveOrder, WaveStatus, WaveType, Location,
     )
+    from app.services.document_sequence import DocumentSequenceService
 
     order_id = UUID(payload["orderId"])
     company_id = UUID(payload["companyId"])
@@ -123,21 +129,8 @@ def handle_order_allocated(payload: dict, session: Session):
     ).first()
 
     if not wave:
-        today = datetime.utcnow().strftime("%Y%m%d")
-        existing = session.exec(
-            select(Wave.waveNo).where(Wave.waveNo.like(f"WAVE-{today}-%"))
-        ).all()
-        max_num = 0
-        for wn in existing:
-            try:
-                num = int(wn.split("-")[-1])
-                if num > max_num:
-                    max_num = num
-            except (ValueError, IndexError):
-                pass
-
         wave = Wave(
-            waveNo=f"WAVE-{today}-{max_num + 1:03d}",
+            waveNo=DocumentSequenceService(session).wave_number(),
             locationId=location_id,
             companyId=company_id,
             status=WaveStatus.DRAFT,
@@ -199,6 +192,7 @@ def handle_wave_released(payload: dict, session: Session):
         PicklistStatus, OrderStatus, WaveStatus, Location,
         AllocationRequest, Bin, SKU,
     )
+    from app.services.document_sequence import DocumentSequenceService
     from app.services.inventory_allocation import InventoryAllocationService
 
     wave_id = UUID(payload["waveId"])
@@ -216,60 +210,74 @@ def handle_wave_released(payload: dict, session: Session):
 
     allocation_service = InventoryAllocationService(session)
 
-    for wo in wave_orders:
-        order = session.get(Order, wo.orderId)
-        if not order:
-            continue
-
-        order_items = session.exec(
-            select(OrderItem).where(OrderItem.orderId == order.id)
-        ).all()
-        if not order_items:
-            continue
-
-        # Generate picklist number
-        pl_count = session.exec(select(func.count(Picklist.id))).one()
+    order_ids = [wo.orderId for wo in wave_orders]
+    orders = {
+        o.id: o for o in session.exec(select(Order).where(Order.id.in_(order_ids))).all()
+    }
+    items_by_order = {}
+    for item in session.exec(
+        select(OrderItem).where(OrderItem.orderId.in_(order_ids))
+    ).all():
+        items_by_order.setdefault(item.orderId, []).append(item)
+
+    # One picklist per order, numbered from the document sequence
+    picklist_order_ids = [
+        wo.orderId for wo in wave_orders
+        if wo.orderId in orders and items_by_order.get(wo.orderId)
+    ]
+    picklist_nos = DocumentSequenceService(session).picklist_numbers(len(picklist_order_ids))
+    picklists = {}
+    for order_id, picklist_no in zip(picklist_order_ids, picklist_nos):
         picklist = Picklist(
-            picklistNo=f"PL-{pl_count + 1:06d}",
-            orderId=order.id,
+            picklistNo=picklist_no,
+            orderId=order_id,
             status=PicklistStatus.PENDING,
             companyId=company_id,
         )
         session.add(picklist)
-        session.flush()
+        picklists[order_id] = picklist
+    session.flush()
 
-        has_items = False
-        for item in order_items:
-            request = AllocationRequest(
-                skuId=item.skuId,
-                requiredQty=item.quantity,
-                locationId=wave.locationId,
-                orderId=order.id,
-                orderItemId=item.id,
-                waveId=wave_id,
-                picklistId=picklist.id,
-            )
-            result = allocation_service.allocate_inventory(
-                request=request,
-                company_id=company_id,
-                allocated_by_id=None,
-            )
-
-            if result.allocatedQty > 0:
-                has_items = True
-                for alloc in result.allocations:
-                    pi = PicklistItem(
-                        picklistId=picklist.id,
-                        skuId=alloc.skuId,
-                        binId=alloc.binId,
-                        requiredQty=alloc.allocatedQty,
-                        pickedQty=0,
-                    )
-                    session.add(pi)
+    # Allocate the whole wave in one batch
+    requests = [
+        AllocationRequest(
+            skuId=item.skuId,
+            requiredQty=item.quantity,
+            locationId=wave.locationId,
+            orderId=order_id,
+            orderItemId=item.id,
+            waveId=wave_id,
+            picklistId=picklist.id,
+        )
+        for order_id, picklist in picklists.items()
+        for item in items_by_order[order_id]
+    ]
+    results = allocation_service.batch_allocate(
+        requests,
+        company_id=company_id,
+        allocated_by_id=None,
+        commit=False,
+    )
+
+    has_items = set()
+    for request, result in zip(requests, results):
+        if result.allocatedQty > 0:
+            has_items.add(request.orderId)
+            for alloc in result.allocations:
+                pi = PicklistItem(
+                    picklistId=request.picklistId,
+                    skuId=alloc.skuId,
+                    binId=alloc.binId,
+                    requiredQty=alloc.allocatedQty,
+                    pickedQty=0,
+                )
+                session.add(pi)
 
-        if not has_items:
+    for order_id, picklist in picklists.items():
+        if order_id not in has_items:
             session.delete(picklist)
         else:
+            order = orders[order_id]
             order.status = OrderStatus.PICKLIST_GENERATED
             order.updatedAt = datetime.utcnow()
             session.add(order)
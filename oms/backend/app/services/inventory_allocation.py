@@ -2,11 +2,14 @@
 Inventory Allocation Service
 Implements FIFO/LIFO/FEFO allocation strategies for inventory picking
 """
+import time
+from collections import defaultdict
 from datetime import datetime
 from decimal import Decimal
-from typing import List, Optional, Tuple
-from uuid import UUID
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID, uuid4
 
+from sqlalchemy import insert, tuple_, update
 from sqlmodel import Session, select, func
 
 from app.models import (
@@ -16,7 +19,15 @@ from app.models import (
     BulkAllocationRequest, BulkAllocationResult,
     ChannelInventory, Order,
 )
+from app.services.document_sequence import DocumentSequenceService
 from app.services.fifo_sequence import FifoSequenceService
+from app.services.inventory_reservation import (
+    InventoryReservationService,
+    RESERVATION_RETRIES,
+    can_back_off,
+    retry_backoff,
+    sort_by_valuation_method,
+)
 
 
 class InventoryAllocationService:
@@ -28,13 +39,12 @@ class InventoryAllocationService:
     def __init__(self, session: Session):
         self.session = session
         self.fifo_service = FifoSequenceService(session)
+        self.reservation = InventoryReservationService(session)
+        self.sequences = DocumentSequenceService(session)
 
     def generate_allocation_no(self) -> str:
         """Generate unique allocation number."""
-        count = self.session.exec(
-            select(func.count(InventoryAllocation.id))
-        ).one()
-        return f"ALLOC-{count + 1:08d}"
+        return self.sequences.allocation_numbers(1)[0]
 
     def get_valuation_method(
         self,
@@ -73,99 +83,6 @@ class InventoryAllocationService:
         # Ultimate fallback - FIFO is the industry standard
         return "FIFO"
 
-    def get_available_inventory(
-        self,
-        sku_id: UUID,
-        location_id: UUID,
-        valuation_method: str,
-        preferred_bin_id: Optional[UUID] = None
-    ) -> List[Inventory]:
-        """
-        Get available inventory records ordered by valuation method.
-        - FIFO: Order by fifoSequence ASC (oldest first)
-        - LIFO: Order by fifoSequence DESC (newest first)
-        - FEFO: Order by expiryDate ASC (earliest expiry first)
-        """
-        # Base query for available inventory
-        query = (
-            select(Inventory)
-            .where(Inventory.skuId == sku_id)
-            .where(Inventory.locationId == location_id)
-            .where((Inventory.quantity - Inventory.reservedQty) > 0)
-        )
-
-        # Prefer specific bin if provided
-        if preferred_bin_id:
-            # Get inventory from preferred bin first, then others
-            preferred = self.session.exec(
-                query.where(Inventory.binId == preferred_bin_id)
-            ).all()
-            others = self.session.exec(
-                query.where(Inventory.binId != preferred_bin_id)
-            ).all()
-            inventory_records = list(preferred) + list(others)
-        else:
-            inventory_records = list(self.session.exec(query).all())
-
-        # Sort by valuation method
-        if valuation_method == "FIFO":
-            inventory_records.sort(key=lambda x: x.fifoSequence or 0)
-        elif valuation_method == "LIFO":
-            inventory_records.sort(key=lambda x: x.fifoSequence or 0, reverse=True)
-        elif valuation_method == "FEFO":
-            # Sort by expiry date (earliest first), nulls last
-            inventory_records.sort(
-                key=lambda x: (x.expiryDate is None, x.expiryDate or datetime.max)
-            )
-        # WAC doesn't require specific ordering, use FIFO as default
-
-        return inventory_records
-
-    def get_channel_inventory(
-        self,
-        sku_id: UUID,
-        location_id: UUID,
-        channel: str,
-        valuation_method: str,
-        preferred_bin_id: Optional[UUID] = None
-    ) -> List[ChannelInventory]:
-        """
-        Get channel-specific inventory records ordered by valuation method.
-        Used for channel-wise allocation before falling back to general inventory.
-        """
-        # Base query for available channel inventory
-        query = (
-            select(ChannelInventory)
-            .where(ChannelInventory.skuId == sku_id)
-            .where(ChannelInventory.locationId == location_id)
-            .where(ChannelInventory.channel == channel)
-            .where((ChannelInventory.quantity - ChannelInventory.reservedQty) > 0)
-        )
-
-        # Prefer specific bin if provided
-        if preferred_bin_id:
-            preferred = self.session.exec(
-                query.where(ChannelInventory.binId == preferred_bin_id)
-            ).all()
-            others = self.session.exec(
-                query.where(ChannelInventory.binId != preferred_bin_id)
-            ).all()
-            channel_records = list(preferred) + list(others)
-        else:
-            channel_records = list(self.session.exec(query).all())
-
-        # Sort by valuation method
-        if valuation_method == "FIFO":
-            channel_records.sort(key=lambda x: x.fifoSequence or 0)
-        elif valuation_method == "LIFO":
-            channel_records.sort(key=lambda x: x.fifoSequence or 0, reverse=True)
-        elif valuation_method == "FEFO":
-            channel_records.sort(
-                key=lambda x: (x.expiryDate is None, x.expiryDate or datetime.max)
-            )
-
-        return channel_records
-
     def get_order_channel(self, order_id: Optional[UUID]) -> Optional[str]:
         """Get channel from order if order_id is provided."""
         if not order_id:
@@ -179,44 +96,6 @@ class InventoryAllocationService:
             return channel.value if hasattr(channel, 'value') else str(channel)
         return None
 
-    def allocate_from_channel_inventory(
-        self,
-        sku_id: UUID,
-        location_id: UUID,
-        channel: str,
-        required_qty: int,
-        valuation_method: str,
-        preferred_bin_id: Optional[UUID] = None
-    ) -> Tuple[int, List[ChannelInventory]]:
-        """
-        Allocate from channel-specific inventory.
-        Returns (allocated_qty, list of channel_inventory records used)
-        """
-        channel_inventory = self.get_channel_inventory(
-            sku_id, location_id, channel, valuation_method, preferred_bin_id
-        )
-
-        allocated_qty = 0
-        used_records = []
-
-        for ch_inv in channel_inventory:
-            if required_qty <= 0:
-                break
-
-            available = ch_inv.quantity - ch_inv.reservedQty
-            if available <= 0:
-                continue
-
-            qty_to_reserve = min(available, required_qty)
-            ch_inv.reservedQty += qty_to_reserve
-            self.session.add(ch_inv)
-
-            allocated_qty += qty_to_reserve
-            required_qty -= qty_to_reserve
-            used_records.append(ch_inv)
-
-        return (allocated_qty, used_records)
-
     def allocate_inventory(
         self,
         request: AllocationRequest,
@@ -232,141 +111,7 @@ class InventoryAllocationService:
         2. Then from UNALLOCATED channel pool
         3. Finally from general inventory if needed
         """
-        # Determine valuation method
-        valuation_method = request.valuationMethod or self.get_valuation_method(
-            request.skuId, request.locationId, company_id
-        )
-
-        allocations: List[InventoryAllocationBrief] = []
-        allocated_qty = 0
-        remaining_qty = request.requiredQty
-
-        # Get order channel if order_id is provided
-        order_channel = self.get_order_channel(request.orderId)
-
-        # ================================================================
-        # STEP 1: Try to allocate from channel-specific inventory first
-        # ================================================================
-        if order_channel and remaining_qty > 0:
-            channel_allocated, _ = self.allocate_from_channel_inventory(
-                request.skuId,
-                request.locationId,
-                order_channel,
-                remaining_qty,
-                valuation_method,
-                request.preferredBinId
-            )
-            allocated_qty += channel_allocated
-            remaining_qty -= channel_allocated
-
-        # ================================================================
-        # STEP 2: Try UNALLOCATED channel pool if still need more
-        # ================================================================
-        if remaining_qty > 0:
-            unalloc_allocated, _ = self.allocate_from_channel_inventory(
-                request.skuId,
-                request.locationId,
-                "UNALLOCATED",
-                remaining_qty,
-                valuation_method,
-                request.preferredBinId
-            )
-            allocated_qty += unalloc_allocated
-            remaining_qty -= unalloc_allocated
-
-        # ================================================================
-        # STEP 3: Allocate from general inventory (unified pool)
-        # ================================================================
-        # Get available inventory from unified Inventory table
-        available_inventory = self.get_available_inventory(
-            request.skuId,
-            request.locationId,
-            valuation_method,
-            request.preferredBinId
-        )
-
-        for inventory in available_inventory:
-            if remaining_qty <= 0:
-                break
-
-            available = inventory.quantity - inventory.reservedQty
-            if available <= 0:
-                continue
-
-            # Determine how much to allocate from this inventory record
-            qty_to_allocate = min(available, remaining_qty)
-
-            # Create allocation record
-            allocation = InventoryAllocation(
-                allocationNo=self.generate_allocation_no(),
-                orderId=request.orderId,
-                orderItemId=request.orderItemId,
-                waveId=request.waveId,
-                picklistId=request.picklistId,
-                picklistItemId=request.picklistItemId,
-                skuId=request.skuId,
-                inventoryId=inventory.id,
-                binId=inventory.binId,
-                batchNo=inventory.batchNo,
-                lotNo=inventory.lotNo,
-                allocatedQty=qty_to_allocate,
-                valuationMethod=valuation_method,
-                fifoSequence=inventory.fifoSequence,
-                expiryDate=inventory.expiryDate,
-                costPrice=inventory.costPrice,
-                status="ALLOCATED",
-                allocatedById=allocated_by_id,
-                allocatedAt=datetime.utcnow(),
-                locationId=request.locationId,
-                companyId=company_id,
-            )
-            self.session.add(allocation)
-
-            # Update reserved quantity on inventory
-            inventory.reservedQty += qty_to_allocate
-            self.session.add(inventory)
-
-            # Track allocation
-            allocated_qty += qty_to_allocate
-            remaining_qty -= qty_to_allocate
-
-            # Get bin code for response
-            bin_obj = self.session.exec(
-                select(Bin).where(Bin.id == inventory.binId)
-            ).first()
-
-            # Get SKU code for response
-            sku_obj = self.session.exec(
-                select(SKU).where(SKU.id == request.skuId)
-            ).first()
-
-            allocations.append(InventoryAllocationBrief(
-                id=allocation.id,
-                allocationNo=allocation.allocationNo,
-                skuId=allocation.skuId,
-                skuCode=sku_obj.code if sku_obj else None,
-                binId=allocation.binId,
-                binCode=bin_obj.code if bin_obj else None,
-                allocatedQty=allocation.allocatedQty,
-                pickedQty=0,
-                status=allocation.status,
-                valuationMethod=allocation.valuationMethod,
-                fifoSequence=allocation.fifoSequence,
-            ))
-
-        # Commit changes
-        self.session.commit()
-
-        shortfall = request.requiredQty - allocated_qty
-        return AllocationResult(
-            success=shortfall == 0,
-            skuId=request.skuId,
-            requestedQty=request.requiredQty,
-            allocatedQty=allocated_qty,
-            shortfallQty=shortfall,
-            allocations=allocations,
-            message=None if shortfall == 0 else f"Shortfall of {shortfall} units"
-        )
+        return self.batch_allocate([request], company_id, allocated_by_id)[0]
 
     def bulk_allocate(
         self,
@@ -376,11 +121,8 @@ class InventoryAllocationService:
     ) -> BulkAllocationResult:
         """
         Allocate inventory for multiple SKUs at once.
+        Runs through batch_allocate so the whole request is one transaction.
         """
-        results: List[AllocationResult] = []
-        total_requested = 0
-        total_allocated = 0
-
         for item in request.items:
             # Override location from bulk request
             item.locationId = request.locationId
@@ -389,10 +131,9 @@ class InventoryAllocationService:
             if request.waveId and not item.waveId:
                 item.waveId = request.waveId
 
-            result = self.allocate_inventory(item, company_id, allocated_by_id)
-            results.append(result)
-            total_requested += result.requestedQty
-            total_allocated += result.allocatedQty
+        results = self.batch_allocate(request.items, company_id, allocated_by_id)
+        total_requested = sum(r.requestedQty for r in results)
+        total_allocated = sum(r.allocatedQty for r in results)
 
         total_shortfall = total_requested - total_allocated
         return BulkAllocationResult(
@@ -404,6 +145,344 @@ class InventoryAllocationService:
             message=None if total_shortfall == 0 else f"Total shortfall of {total_shortfall} units"
         )
 
+    # ========================================================================
+    # Batch Allocation (set-based)
+    # ========================================================================
+
+    def batch_allocate(
+        self,
+        requests: List[AllocationRequest],
+        company_id: UUID,
+        allocated_by_id: Optional[UUID] = None,
+        commit: bool = True
+    ) -> List[AllocationResult]:
+        """
+        Allocate a whole wave / order set in one pass.
+
+        Same priority rules as allocate_inventory (order channel pool, then
+        UNALLOCATED pool, then general inventory), but:
+        - SKU/Location valuation overrides, order channels, candidate
+          Inventory/ChannelInventory rows, bins and SKU codes are each
+          prefetched with a single query for all (sku, location) pairs
+        - candidate rows are locked FOR UPDATE SKIP LOCKED, so parallel
+          allocation workers take disjoint bins; if a request comes up short
+          while other workers hold matching stock, the pass is rolled back
+          to its savepoint (releasing its row locks) and retried with backoff
+        - FIFO/LIFO/FEFO consumption runs in memory; requests are served in
+          the order given, so earlier requests win on contention
+        - allocations are inserted and reservedQty incremented with bulk
+          statements, committed once (or left to the caller if commit=False)
+
+        Returns one AllocationResult per request, in request order.
+        """
+        if not requests:
+            return []
+
+        pairs = {(r.skuId, r.locationId) for r in requests}
+        methods = self._prefetch_valuation_methods(pairs)
+        order_channels = self._prefetch_order_channels(
+            {r.orderId for r in requests if r.orderId}
+        )
+        channels = set(order_channels.values()) | {"UNALLOCATED"}
+        now = datetime.utcnow()
+
+        def lock_candidates(for_pairs: Set[Tuple[UUID, UUID]]) -> None:
+            # Remaining availability per row id, shared across all requests
+            for row in self._lock_inventory_candidates(for_pairs, locked_ids):
+                inventory_pool[(row.skuId, row.locationId)].append(row)
+                available[row.id] = row.quantity - row.reservedQty
+                locked_ids.add(row.id)
+            for row in self._lock_channel_candidates(for_pairs, channels, locked_ids):
+                channel_pool[(row.skuId, row.locationId, row.channel)].append(row)
+                available[row.id] = row.quantity - row.reservedQty
+                locked_ids.add(row.id)
+
+        def consume(state: dict) -> None:
+            request = state["request"]
+            valuation_method = request.valuationMethod or methods.get(
+                (request.skuId, request.locationId), "FIFO"
+            )
+
+            # STEP 1 + 2: channel-specific pool, then UNALLOCATED pool
+            order_channel = order_channels.get(request.orderId)
+            for channel in ([order_channel] if order_channel else []) + ["UNALLOCATED"]:
+                for row in self._order_candidates(
+                    channel_pool.get((request.skuId, request.locationId, channel), []),
+                    valuation_method,
+                    request.preferredBinId
+                ):
+                    if state["remaining"] <= 0:
+                        return
+                    qty = min(available[row.id], state["remaining"])
+                    if qty <= 0:
+                        continue
+                    available[row.id] -= qty
+                    channel_deltas[row.id] += qty
+                    state["allocated"] += qty
+                    state["remaining"] -= qty
+
+            # STEP 3: general inventory, creates allocation records
+            for row in self._order_candidates(
+                inventory_pool.get((request.skuId, request.locationId), []),
+                valuation_method,
+                request.preferredBinId
+            ):
+                if state["remaining"] <= 0:
+                    return
+                qty = min(available[row.id], state["remaining"])
+                if qty <= 0:
+                    continue
+                available[row.id] -= qty
+                inventory_deltas[row.id] += qty
+                state["allocated"] += qty
+                state["remaining"] -= qty
+
+                state["rows"].append({
+                    "id": uuid4(),
+                    "orderId": request.orderId,
+                    "orderItemId": request.orderItemId,
+                    "waveId": request.waveId,
+                    "picklistId": request.picklistId,
+                    "picklistItemId": request.picklistItemId,
+                    "skuId": request.skuId,
+                    "inventoryId": row.id,
+                    "binId": row.binId,
+                    "batchNo": row.batchNo,
+                    "lotNo": row.lotNo,
+                    "allocatedQty": qty,
+                    "pickedQty": 0,
+                    "valuationMethod": valuation_method,
+                    "fifoSequence": row.fifoSequence,
+                    "expiryDate": row.expiryDate,
+                    "costPrice": row.costPrice,
+                    "status": "ALLOCATED",
+                    "allocatedById": allocated_by_id,
+                    "allocatedAt": now,
+                    "locationId": request.locationId,
+                    "companyId": company_id,
+                    "createdAt": now,
+                    "updatedAt": now,
+                })
+
+        for attempt in range(RESERVATION_RETRIES + 1):
+            savepoint = self.session.begin_nested()
+            inventory_pool: Dict[Tuple[UUID, UUID], list] = defaultdict(list)
+            channel_pool: Dict[Tuple[UUID, UUID, str], list] = defaultdict(list)
+            available: Dict[UUID, int] = {}
+            locked_ids: Set[UUID] = set()
+            inventory_deltas: Dict[UUID, int] = defaultdict(int)
+            channel_deltas: Dict[UUID, int] = defaultdict(int)
+            states = [
+                {"request": r, "remaining": r.requiredQty, "allocated": 0, "rows": []}
+                for r in requests
+            ]
+
+            lock_candidates(pairs)
+            for state in states:
+                consume(state)
+
+            # Retry short requests while other workers hold matching stock,
+            # without keeping our own row locks during the backoff
+            short_pairs = {
+                (st["request"].skuId, st["request"].locationId)
+                for st in states if st["remaining"] > 0
+            }
+            if (
+                short_pairs
+                and attempt < RESERVATION_RETRIES
+                and can_back_off()
+                and self._has_locked_stock(short_pairs, channels, locked_ids)
+            ):
+                savepoint.rollback()
+                time.sleep(retry_backoff(attempt))
+                continue
+            break
+
+        allocation_rows = [row for st in states for row in st["rows"]]
+
+        # Number allocations in one go from the document sequence
+        for row, allocation_no in zip(
+            allocation_rows, self.sequences.allocation_numbers(len(allocation_rows))
+        ):
+            row["allocationNo"] = allocation_no
+
+        # Flush pending ORM state first (e.g. picklists the allocations reference)
+        self.session.flush()
+        if allocation_rows:
+            self.session.execute(insert(InventoryAllocation), allocation_rows)
+        self.reservation.apply_reserved_deltas(Inventory, inventory_deltas)
+        self.reservation.apply_reserved_deltas(ChannelInventory, channel_deltas)
+        savepoint.commit()
+        if commit:
+            self.session.commit()
+
+        # Build responses from prefetched lookups
+        bin_codes = self._prefetch_codes(Bin, {row["binId"] for row in allocation_rows})
+        sku_codes = self._prefetch_codes(SKU, {r.skuId for r in requests})
+
+        results: List[AllocationResult] = []
+        for state in states:
+            request = state["request"]
+            shortfall = request.requiredQty - state["allocated"]
+            results.append(AllocationResult(
+                success=shortfall == 0,
+                skuId=request.skuId,
+                requestedQty=request.requiredQty,
+                allocatedQty=state["allocated"],
+                shortfallQty=shortfall,
+                allocations=[
+                    InventoryAllocationBrief(
+                        id=row["id"],
+                        allocationNo=row["allocationNo"],
+                        skuId=row["skuId"],
+                        skuCode=sku_codes.get(row["skuId"]),
+                        binId=row["binId"],
+                        binCode=bin_codes.get(row["binId"]),
+                        allocatedQty=row["allocatedQty"],
+                        pickedQty=0,
+                        status=row["status"],
+                        valuationMethod=row["valuationMethod"],
+                        fifoSequence=row["fifoSequence"],
+                    )
+                    for row in state["rows"]
+                ],
+                message=None if shortfall == 0 else f"Shortfall of {shortfall} units"
+            ))
+
+        return results
+
+    def _prefetch_valuation_methods(
+        self,
+        pairs: Set[Tuple[UUID, UUID]]
+    ) -> Dict[Tuple[UUID, UUID], str]:
+        """
+        Resolve valuation method for every (sku, location) pair.
+        Same priority as get_valuation_method: SKU > Location > FIFO.
+        """
+        sku_methods: Dict[UUID, str] = {}
+        location_methods: Dict[UUID, str] = {}
+
+        try:
+            for sku in self.session.exec(
+                select(SKU).where(SKU.id.in_({sku_id for sku_id, _ in pairs}))
+            ).all():
+                if hasattr(sku, 'valuationMethod') and sku.valuationMethod:
+                    sku_methods[sku.id] = sku.valuationMethod
+        except Exception:
+            pass  # Column might not exist
+
+        try:
+            for location in self.session.exec(
+                select(Location).where(Location.id.in_({loc_id for _, loc_id in pairs}))
+            ).all():
+                if hasattr(location, 'valuationMethod') and location.valuationMethod:
+                    location_methods[location.id] = location.valuationMethod
+        except Exception:
+            pass  # Column might not exist
+
+        return {
+            (sku_id, loc_id): sku_methods.get(sku_id) or location_methods.get(loc_id) or "FIFO"
+            for sku_id, loc_id in pairs
+        }
+
+    def _prefetch_order_channels(self, order_ids: Set[UUID]) -> Dict[UUID, str]:
+        """Get channel for each order in one query."""
+        if not order_ids:
+            return {}
+        rows = self.session.exec(
+            select(Order.id, Order.channel).where(Order.id.in_(order_ids))
+        ).all()
+        return {
+            order_id: channel.value if hasattr(channel, 'value') else str(channel)
+            for order_id, channel in rows
+            if channel
+        }
+
+    def _lock_inventory_candidates(
+        self,
+        pairs: Set[Tuple[UUID, UUID]],
+        exclude_ids: Set[UUID]
+    ) -> list:
+        """
+        Lock all available Inventory rows for the (sku, location) pairs.
+        Rows are plain column tuples, not ORM instances, so the bulk
+        reservedQty update later can't be clobbered by a stale flush.
+        """
+        return self.reservation.lock_available(
+            Inventory,
+            tuple_(Inventory.skuId, Inventory.locationId).in_(list(pairs)),
+            columns=(
+                Inventory.id, Inventory.skuId, Inventory.locationId, Inventory.binId,
+                Inventory.batchNo, Inventory.lotNo, Inventory.fifoSequence,
+                Inventory.expiryDate, Inventory.costPrice,
+                Inventory.quantity, Inventory.reservedQty,
+            ),
+            exclude_ids=exclude_ids,
+        )
+
+    def _lock_channel_candidates(
+        self,
+        pairs: Set[Tuple[UUID, UUID]],
+        channels: Set[str],
+        exclude_ids: Set[UUID]
+    ) -> list:
+        """Lock all available ChannelInventory rows for the pairs and channels."""
+        return self.reservation.lock_available(
+            ChannelInventory,
+            tuple_(ChannelInventory.skuId, ChannelInventory.locationId).in_(list(pairs)),
+            ChannelInventory.channel.in_(channels),
+            columns=(
+                ChannelInventory.id, ChannelInventory.skuId,
+                ChannelInventory.locationId, ChannelInventory.channel,
+                ChannelInventory.binId, ChannelInventory.fifoSequence,
+                ChannelInventory.expiryDate,
+                ChannelInventory.quantity, ChannelInventory.reservedQty,
+            ),
+            exclude_ids=exclude_ids,
+        )
+
+    def _has_locked_stock(
+        self,
+        pairs: Set[Tuple[UUID, UUID]],
+        channels: Set[str],
+        exclude_ids: Set[UUID]
+    ) -> bool:
+        """True if matching free stock exists in rows we could not lock."""
+        return self.reservation.has_locked_stock(
+            Inventory,
+            tuple_(Inventory.skuId, Inventory.locationId).in_(list(pairs)),
+            exclude_ids=exclude_ids,
+        ) or self.reservation.has_locked_stock(
+            ChannelInventory,
+            tuple_(ChannelInventory.skuId, ChannelInventory.locationId).in_(list(pairs)),
+            ChannelInventory.channel.in_(channels),
+            exclude_ids=exclude_ids,
+        )
+
+    @staticmethod
+    def _order_candidates(
+        rows: list,
+        valuation_method: str,
+        preferred_bin_id: Optional[UUID] = None
+    ) -> list:
+        """Preferred bin first, then sorted by valuation method."""
+        if preferred_bin_id:
+            ordered = (
+                [r for r in rows if r.binId == preferred_bin_id]
+                + [r for r in rows if r.binId != preferred_bin_id]
+            )
+        else:
+            ordered = list(rows)
+        return sort_by_valuation_method(ordered, valuation_method)
+
+    def _prefetch_codes(self, model, ids: Set[UUID]) -> Dict[UUID, str]:
+        """Map id -> code for SKU/Bin rows in one query."""
+        if not ids:
+            return {}
+        return dict(self.session.exec(
+            select(model.id, model.code).where(model.id.in_(ids))
+        ).all())
+
     def deallocate(
         self,
         allocation_id: UUID,
@@ -426,14 +505,10 @@ class InventoryAllocationService:
         if allocation.status == "PICKED":
             return False  # Cannot deallocate picked inventory
 
-        # Restore reserved quantity on inventory
-        inventory = self.session.exec(
-            select(Inventory).where(Inventory.id == allocation.inventoryId)
-        ).first()
-
-        if inventory:
-            inventory.reservedQty = max(0, inventory.reservedQty - allocation.allocatedQty)
-            self.session.add(inventory)
+        # Restore reserved quantity on inventory (decrement in SQL)
+        self.reservation.release_rows(
+            Inventory, {allocation.inventoryId: allocation.allocatedQty}
+        )
 
         # Update allocation status
         allocation.status = "CANCELLED"
@@ -508,22 +583,25 @@ class InventoryAllocationService:
         if allocation.status != "ALLOCATED":
             return False
 
-        # Get inventory record
-        inventory = self.session.exec(
-            select(Inventory).where(Inventory.id == allocation.inventoryId)
-        ).first()
-
-        if not inventory:
-            return False
-
         # Validate picked quantity
         if picked_qty > allocation.allocatedQty:
             picked_qty = allocation.allocatedQty
 
-        # Update inventory - reduce quantity and reserved
-        inventory.quantity -= picked_qty
-        inventory.reservedQty = max(0, inventory.reservedQty - allocation.allocatedQty)
-        self.session.add(inventory)
+        # Update inventory - reduce quantity and reserved, in SQL so a
+        # concurrent reservation on the same row is never overwritten
+        inventory_table = Inventory.__table__
+        updated = self.session.execute(
+            update(inventory_table)
+            .where(inventory_table.c.id == allocation.inventoryId)
+            .values(
+                quantity=inventory_table.c.quantity - picked_qty,
+                reservedQty=func.greatest(
+                    inventory_table.c.reservedQty - allocation.allocatedQty, 0
+                ),
+            )
+        )
+        if updated.rowcount == 0:
+            return False
 
         # Update allocation
         allocation.pickedQty = picked_qty
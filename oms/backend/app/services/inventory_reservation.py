@@ -0,0 +1,276 @@
+"""
+Inventory Reservation Service
+Concurrency-safe reserve/release primitives for Inventory.reservedQty
+
+Every reservation path (allocation engine, marketplace order pipeline,
+webhook cancellations) goes through here so that two workers can never
+over-reserve the same bin:
+- Candidate rows are read with SELECT ... FOR UPDATE SKIP LOCKED, so
+  parallel workers lock disjoint rows instead of queueing on each other
+- reservedQty is only ever changed with an in-SQL increment guarded by
+  0 <= reservedQty + delta <= quantity, never a Python read-modify-write
+- If stock exists but is locked by another worker, the reservation is
+  rolled back to its savepoint (releasing the locks it took) and retried
+  with exponential backoff before reporting a shortfall. Callers on an
+  event-loop thread don't back off: they report the shortfall at once
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import bindparam, func, update
+from sqlmodel import Session, select
+
+from app.models import Inventory
+
+
+# Retry rounds when candidate stock is locked by a concurrent worker
+RESERVATION_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 0.05
+
+
+def sort_by_valuation_method(records: list, valuation_method: str) -> list:
+    """
+    Sort inventory-like records in consumption order (in place).
+    - FIFO: fifoSequence ASC (oldest first)
+    - LIFO: fifoSequence DESC (newest first)
+    - FEFO: expiryDate ASC (earliest expiry first), nulls last
+    WAC doesn't require specific ordering, records keep their current order.
+    """
+    if valuation_method == "FIFO":
+        records.sort(key=lambda x: x.fifoSequence or 0)
+    elif valuation_method == "LIFO":
+        records.sort(key=lambda x: x.fifoSequence or 0, reverse=True)
+    elif valuation_method == "FEFO":
+        records.sort(
+            key=lambda x: (x.expiryDate is None, x.expiryDate or datetime.max)
+        )
+    return records
+
+
+def retry_backoff(attempt: int) -> float:
+    """Backoff delay (seconds) before retry round `attempt` (0-based)."""
+    return RETRY_BACKOFF_SECONDS * (2 ** attempt)
+
+
+def can_back_off() -> bool:
+    """
+    False on a thread running an event loop (e.g. under the async
+    OrderPipeline.process_order), where a blocking sleep would stall every
+    coroutine; such callers take the shortfall instead of retrying.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return True
+    return False
+
+
+class InventoryReservationService:
+    """
+    Row-locking reservation primitives for Inventory and ChannelInventory.
+    Works on plain column rows (not ORM instances) so a later flush can
+    never overwrite a concurrent worker's reservedQty with a stale value.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    # ========================================================================
+    # Locking reads
+    # ========================================================================
+
+    def lock_available(
+        self,
+        model,
+        *criteria,
+        columns: Optional[Iterable] = None,
+        exclude_ids: Optional[Set[UUID]] = None,
+        skip_locked: bool = True
+    ) -> list:
+        """
+        Lock and return rows of `model` with free quantity matching `criteria`.
+        Rows already locked by another transaction are skipped.
+        """
+        query = (
+            select(*(columns or (model.id, model.quantity, model.reservedQty)))
+            .where(*criteria)
+            .where((model.quantity - model.reservedQty) > 0)
+        )
+        if exclude_ids:
+            query = query.where(model.id.notin_(exclude_ids))
+        query = query.with_for_update(skip_locked=skip_locked)
+        return list(self.session.exec(query).all())
+
+    def has_locked_stock(
+        self,
+        model,
+        *criteria,
+        exclude_ids: Optional[Set[UUID]] = None
+    ) -> bool:
+        """
+        True if free stock matching `criteria` exists outside `exclude_ids`,
+        i.e. rows a previous SKIP LOCKED read could not see.
+        """
+        query = (
+            select(model.id)
+            .where(*criteria)
+            .where((model.quantity - model.reservedQty) > 0)
+        )
+        if exclude_ids:
+            query = query.where(model.id.notin_(exclude_ids))
+        return self.session.exec(query.limit(1)).first() is not None
+
+    # ========================================================================
+    # Writes
+    # ========================================================================
+
+    def adjust_reserved(self, model, row_id: UUID, delta: int) -> bool:
+        """
+        Atomically add `delta` to reservedQty of one row.
+        Returns False (and changes nothing) if the result would leave
+        0 <= reservedQty <= quantity - the caller lost a race.
+        """
+        table = model.__table__
+        new_reserved = table.c.reservedQty + delta
+        result = self.session.execute(
+            update(table)
+            .where(table.c.id == row_id)
+            .where(new_reserved >= 0)
+            .where(new_reserved <= table.c.quantity)
+            .values(reservedQty=new_reserved)
+        )
+        return result.rowcount == 1
+
+    def apply_reserved_deltas(self, model, deltas: Dict[UUID, int]) -> None:
+        """
+        Bulk-increment reservedQty for rows locked by lock_available.
+        One executemany UPDATE; the increment happens in SQL.
+        """
+        if not deltas:
+            return
+        table = model.__table__
+        self.session.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(reservedQty=table.c.reservedQty + bindparam("b_qty")),
+            [{"b_id": row_id, "b_qty": qty} for row_id, qty in deltas.items()]
+        )
+
+    def release_rows(self, model, deltas: Dict[UUID, int]) -> None:
+        """
+        Bulk-decrement reservedQty (never below zero) for the given rows.
+        Used when cancelling allocations that know their exact inventory row.
+        """
+        if not deltas:
+            return
+        table = model.__table__
+        self.session.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(reservedQty=func.greatest(table.c.reservedQty - bindparam("b_qty"), 0)),
+            [{"b_id": row_id, "b_qty": qty} for row_id, qty in deltas.items()]
+        )
+
+    # ========================================================================
+    # SKU-level reserve / release
+    # ========================================================================
+
+    def reserve(
+        self,
+        sku_id: UUID,
+        qty: int,
+        company_id: Optional[UUID] = None,
+        location_id: Optional[UUID] = None,
+        valuation_method: str = "FIFO"
+    ) -> int:
+        """
+        Reserve up to `qty` units of a SKU across Inventory rows in
+        valuation order. Retries while stock is held by other workers;
+        each round runs in a savepoint that is rolled back (undoing its
+        partial reservation and releasing its row locks) before waiting.
+        Returns the quantity actually reserved.
+        """
+        criteria = self._sku_criteria(sku_id, company_id, location_id)
+
+        for attempt in range(RESERVATION_RETRIES + 1):
+            savepoint = self.session.begin_nested()
+            remaining = qty
+            rows = self.lock_available(
+                Inventory,
+                *criteria,
+                columns=(
+                    Inventory.id, Inventory.quantity, Inventory.reservedQty,
+                    Inventory.fifoSequence, Inventory.expiryDate,
+                ),
+            )
+
+            for row in sort_by_valuation_method(rows, valuation_method):
+                if remaining <= 0:
+                    break
+                amount = min(row.quantity - row.reservedQty, remaining)
+                if amount > 0 and self.adjust_reserved(Inventory, row.id, amount):
+                    remaining -= amount
+
+            if (
+                remaining > 0
+                and attempt < RESERVATION_RETRIES
+                and can_back_off()
+                and self.has_locked_stock(
+                    Inventory, *criteria, exclude_ids={row.id for row in rows}
+                )
+            ):
+                savepoint.rollback()
+                time.sleep(retry_backoff(attempt))
+                continue
+            savepoint.commit()
+            break
+
+        return qty - remaining
+
+    def release(
+        self,
+        sku_id: UUID,
+        qty: int,
+        company_id: Optional[UUID] = None,
+        location_id: Optional[UUID] = None
+    ) -> int:
+        """
+        Release up to `qty` reserved units of a SKU, newest stock first.
+        Waits for row locks rather than skipping - a release must not
+        miss rows just because an allocator is looking at them.
+        Returns the quantity actually released.
+        """
+        remaining = qty
+
+        rows = self.session.exec(
+            select(Inventory.id, Inventory.reservedQty)
+            .where(*self._sku_criteria(sku_id, company_id, location_id))
+            .where(Inventory.reservedQty > 0)
+            .order_by(Inventory.fifoSequence.desc().nulls_last())
+            .with_for_update()
+        ).all()
+
+        for row in rows:
+            if remaining <= 0:
+                break
+            amount = min(row.reservedQty, remaining)
+            if self.adjust_reserved(Inventory, row.id, -amount):
+                remaining -= amount
+
+        return qty - remaining
+
+    @staticmethod
+    def _sku_criteria(
+        sku_id: UUID,
+        company_id: Optional[UUID],
+        location_id: Optional[UUID]
+    ) -> List:
+        criteria = [Inventory.skuId == sku_id]
+        if company_id:
+            criteria.append(Inventory.companyId == company_id)
+        if location_id:
+            criteria.append(Inventory.locationId == location_id)
+        return criteria
@@ -0,0 +1,416 @@
+"""
+Lane Rate Service — PTL and FTL rate comparison over city-to-city lanes.
+
+Lanes are matched on normalized city keys (originKey / destinationKey),
+not with leading-wildcard ILIKE scans:
+- city_key() lowercases, collapses punctuation/whitespace and maps common
+  alternate names ("Bangalore" -> "bengaluru"); keys are set on every ORM
+  write of PTLRateMatrix, PTLTATMatrix and FTLLaneRate
+- all lanes of a request are loaded in one query per chunk of lanes, with
+  the transporter (PTL) or vendor and vehicle type (FTL) and the PTL TAT
+  joined in, instead of 2N+1 lookups
+- PTL slab pricing is compiled once per rate row and reused for every
+  weight on that lane, so a 10k-lane CSV costs a handful of queries
+"""
+import bisect
+import csv
+import io
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, event, or_, tuple_
+from sqlmodel import Session, select
+
+from app.models import (
+    FTLLaneRate, FTLVehicleTypeMaster, FTLVendor,
+    PTLRateMatrix, PTLTATMatrix, Transporter,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Max lanes per IN (...) query
+LANE_CHUNK_SIZE = 500
+
+# Max lanes per bulk CSV
+BULK_LANE_LIMIT = 10_000
+
+# PTL weight slabs: upper bound (kg), label, PTLRateMatrix column
+PTL_SLAB_BOUNDS = (50, 100, 250, 500, 1000)
+PTL_SLAB_LABELS = ("0-50 kg", "50-100 kg", "100-250 kg", "250-500 kg", "500-1000 kg", "1000+ kg")
+PTL_SLAB_FIELDS = (
+    "rate0to50", "rate50to100", "rate100to250", "rate250to500", "rate500to1000", "rate1000plus",
+)
+
+# Alternate city names -> key used for matching (applied after normalization)
+CITY_ALIASES: Dict[str, str] = {
+    "bangalore": "bengaluru",
+    "bombay": "mumbai",
+    "new bombay": "navi mumbai",
+    "calcutta": "kolkata",
+    "madras": "chennai",
+    "gurgaon": "gurugram",
+    "new delhi": "delhi",
+    "poona": "pune",
+    "baroda": "vadodara",
+    "mysore": "mysuru",
+    "mangalore": "mangaluru",
+    "trivandrum": "thiruvananthapuram",
+    "cochin": "kochi",
+    "vizag": "visakhapatnam",
+    "pondicherry": "puducherry",
+    "allahabad": "prayagraj",
+}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def city_key(city: Optional[str]) -> str:
+    """Normalized lane key of a city name."""
+    key = _NON_ALNUM.sub(" ", (city or "").lower()).strip()
+    return CITY_ALIASES.get(key, key)
+
+
+def _set_lane_keys(mapper, connection, target):
+    target.originKey = city_key(target.originCity)
+    target.destinationKey = city_key(target.destinationCity)
+
+
+for _model in (PTLRateMatrix, PTLTATMatrix, FTLLaneRate):
+    event.listen(_model, "before_insert", _set_lane_keys)
+    event.listen(_model, "before_update", _set_lane_keys)
+
+
+def ptl_slab_label(weight_kg: float) -> str:
+    return PTL_SLAB_LABELS[bisect.bisect_left(PTL_SLAB_BOUNDS, weight_kg)]
+
+
+def _num(value) -> float:
+    return float(value) if value is not None else 0.0
+
+
+def _chunks(values: list, size: int = LANE_CHUNK_SIZE):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+# ============================================================================
+# PTL
+# ============================================================================
+
+@dataclass
+class PTLLaneRate:
+    """One PTLRateMatrix row with its transporter and TAT, ready to price."""
+    rate_matrix_id: UUID
+    transporter_id: UUID
+    transporter_name: str
+    transporter_code: str
+    rates: Tuple[Optional[float], ...]  # per kg, indexed like PTL_SLAB_FIELDS
+    minimum_charge: float
+    fod_charge: float
+    oda_charge: float
+    cod_percent: float
+    transit_days: Optional[int] = None
+    on_time_percent: Optional[float] = None
+
+    def slab(self, weight_kg: float, strict: bool = False) -> Optional[int]:
+        """
+        Slab index used for `weight_kg`. Not strict: the weight's own slab,
+        else the next heavier slab with a rate, else 1000+ (comparison
+        behaviour). Strict: only the weight's own slab.
+        """
+        own = bisect.bisect_left(PTL_SLAB_BOUNDS, weight_kg)
+        if strict:
+            return own if self.rates[own] is not None else None
+        for i in range(own, len(self.rates)):
+            if self.rates[i] is not None:
+                return i
+        return None
+
+    def price(self, weight_kg: float, strict: bool = False) -> Optional[dict]:
+        slab = self.slab(weight_kg, strict)
+        if slab is None:
+            return None
+        rate_per_kg = self.rates[slab]
+        base_cost = rate_per_kg * weight_kg
+        total_cost = max(base_cost + self.fod_charge + self.oda_charge, self.minimum_charge)
+        return {
+            "rateMatrixId": str(self.rate_matrix_id),
+            "transporterId": str(self.transporter_id),
+            "transporterName": self.transporter_name,
+            "weightKg": weight_kg,
+            "weightSlab": PTL_SLAB_LABELS[slab],
+            "ratePerKg": rate_per_kg,
+            "baseCost": round(base_cost, 2),
+            "fodCharge": self.fod_charge,
+            "odaCharge": self.oda_charge,
+            "minimumCharge": self.minimum_charge,
+            "minimumChargeApplied": total_cost == self.minimum_charge,
+            "totalCost": round(total_cost, 2),
+            "codPercent": self.cod_percent,
+            "transitDays": self.transit_days,
+            "onTimeDeliveryPercent": self.on_time_percent,
+        }
+
+
+class LaneRateService:
+    """
+    Rate comparison for PTL (per kg slabs) and FTL (per vehicle) lanes.
+
+    Usage:
+        service = LaneRateService(session, company_filter.company_ids)
+        rates = service.compare_ptl("Delhi", "Bangalore", 120)
+        results = service.compare_ptl_bulk([("Delhi", "Mumbai", 80), ...])
+    """
+
+    def __init__(self, session: Session, company_ids: Optional[List[UUID]] = None):
+        self.session = session
+        # None = no company filter (super admin)
+        self.company_ids = company_ids
+
+    def _company_clause(self, column):
+        return column.in_(self.company_ids) if self.company_ids else None
+
+    # ── PTL ──────────────────────────────────────────────────────────────
+
+    def ptl_lane_rates(
+        self, lanes: Iterable[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], List[PTLLaneRate]]:
+        """(origin key, destination key) -> active PTL rates, for every lane given."""
+        keys = sorted({(city_key(o), city_key(d)) for o, d in lanes})
+        result: Dict[Tuple[str, str], List[PTLLaneRate]] = {key: [] for key in keys}
+        if not keys:
+            return result
+
+        now = datetime.utcnow()
+        tat_join = [
+            PTLTATMatrix.originKey == PTLRateMatrix.originKey,
+            PTLTATMatrix.destinationKey == PTLRateMatrix.destinationKey,
+            PTLTATMatrix.transporterId == PTLRateMatrix.transporterId,
+            PTLTATMatrix.isActive == True,
+        ]
+        company_clause = self._company_clause(PTLTATMatrix.companyId)
+        if company_clause is not None:
+            tat_join.append(company_clause)
+
+        seen = set()
+        for chunk in _chunks(keys):
+            query = (
+                select(
+                    PTLRateMatrix, Transporter.name, Transporter.code,
+                    PTLTATMatrix.transitDays, PTLTATMatrix.onTimeDeliveryPercent,
+                )
+                .join(Transporter, Transporter.id == PTLRateMatrix.transporterId)
+                .outerjoin(PTLTATMatrix, and_(*tat_join))
+                .where(
+                    tuple_(PTLRateMatrix.originKey, PTLRateMatrix.destinationKey).in_(chunk),
+                    PTLRateMatrix.isActive == True,
+                    PTLRateMatrix.validFrom <= now,
+                    or_(PTLRateMatrix.validTo.is_(None), PTLRateMatrix.validTo >= now),
+                )
+            )
+            company_clause = self._company_clause(PTLRateMatrix.companyId)
+            if company_clause is not None:
+                query = query.where(company_clause)
+
+            for rm, name, code, transit_days, on_time in self.session.exec(query).all():
+                if rm.id in seen:
+                    continue  # Several TAT rows for the lane: first one wins
+                seen.add(rm.id)
+                result[(rm.originKey, rm.destinationKey)].append(PTLLaneRate(
+                    rate_matrix_id=rm.id,
+                    transporter_id=rm.transporterId,
+                    transporter_name=name,
+                    transporter_code=code,
+                    rates=tuple(
+                        float(getattr(rm, f)) if getattr(rm, f) is not None else None
+                        for f in PTL_SLAB_FIELDS
+                    ),
+                    minimum_charge=_num(rm.minimumCharge),
+                    fod_charge=_num(rm.fodCharge),
+                    oda_charge=_num(rm.odaCharge),
+                    cod_percent=_num(rm.codPercent),
+                    transit_days=transit_days,
+                    on_time_percent=float(on_time) if on_time else None,
+                ))
+        return result
+
+    def compare_ptl(self, origin_city: str, destination_city: str, weight_kg: float) -> List[dict]:
+        """Priced PTL options for one lane and weight, cheapest first."""
+        rates = self.ptl_lane_rates([(origin_city, destination_city)])
+        return self._price_ptl(rates[(city_key(origin_city), city_key(destination_city))], weight_kg)
+
+    def compare_ptl_bulk(self, lanes: List[Tuple[str, str, float]]) -> List[dict]:
+        """
+        Cheapest and fastest PTL option per (origin, destination, weight),
+        in input order. All lanes are loaded up front.
+        """
+        rates = self.ptl_lane_rates((o, d) for o, d, _ in lanes)
+        results = []
+        for origin, destination, weight_kg in lanes:
+            options = self._price_ptl(rates[(city_key(origin), city_key(destination))], weight_kg)
+            results.append(_summarize(
+                {"originCity": origin, "destinationCity": destination, "weightKg": weight_kg},
+                options, cost_field="totalCost", name_field="transporterName",
+            ))
+        return results
+
+    @staticmethod
+    def _price_ptl(lane_rates: List[PTLLaneRate], weight_kg: float) -> List[dict]:
+        priced = [p for p in (r.price(weight_kg) for r in lane_rates) if p is not None]
+        priced.sort(key=lambda x: x["totalCost"])
+        return priced
+
+    # ── FTL ──────────────────────────────────────────────────────────────
+
+    def ftl_lane_rates(
+        self,
+        lanes: Iterable[Tuple[str, str]],
+        vehicle_type_id: Optional[UUID] = None,
+    ) -> Dict[Tuple[str, str], List[dict]]:
+        """(origin key, destination key) -> active FTL lane rates with vendor and vehicle."""
+        keys = sorted({(city_key(o), city_key(d)) for o, d in lanes})
+        result: Dict[Tuple[str, str], List[dict]] = {key: [] for key in keys}
+        if not keys:
+            return result
+
+        now = datetime.utcnow()
+        for chunk in _chunks(keys):
+            query = (
+                select(
+                    FTLLaneRate,
+                    FTLVendor.name, FTLVendor.code, FTLVendor.reliabilityScore,
+                    FTLVehicleTypeMaster.name, FTLVehicleTypeMaster.code,
+                    FTLVehicleTypeMaster.capacityKg,
+                )
+                .outerjoin(FTLVendor, FTLVendor.id == FTLLaneRate.vendorId)
+                .outerjoin(FTLVehicleTypeMaster, FTLVehicleTypeMaster.id == FTLLaneRate.vehicleTypeId)
+                .where(
+                    tuple_(FTLLaneRate.originKey, FTLLaneRate.destinationKey).in_(chunk),
+                    FTLLaneRate.isActive == True,
+                    FTLLaneRate.validFrom <= now,
+                    or_(FTLLaneRate.validTo.is_(None), FTLLaneRate.validTo >= now),
+                )
+                .order_by(FTLLaneRate.baseRate)
+            )
+            company_clause = self._company_clause(FTLLaneRate.companyId)
+            if company_clause is not None:
+                query = query.where(company_clause)
+            if vehicle_type_id:
+                query = query.where(FTLLaneRate.vehicleTypeId == vehicle_type_id)
+
+            for lr, vendor_name, vendor_code, reliability, vt_name, vt_code, capacity in self.session.exec(query).all():
+                total_rate = (
+                    _num(lr.baseRate) + _num(lr.loadingCharges)
+                    + _num(lr.unloadingCharges) + _num(lr.tollCharges)
+                )
+                result[(lr.originKey, lr.destinationKey)].append({
+                    "laneRateId": str(lr.id),
+                    "vendorId": str(lr.vendorId),
+                    "vendorName": vendor_name or "Unknown",
+                    "vendorCode": vendor_code or "N/A",
+                    "vehicleTypeId": str(lr.vehicleTypeId),
+                    "vehicleTypeCode": vt_code,
+                    "vehicleTypeName": vt_name or "Unknown",
+                    "capacityKg": capacity or 0,
+                    "baseRate": _num(lr.baseRate),
+                    "loadingCharges": _num(lr.loadingCharges),
+                    "unloadingCharges": _num(lr.unloadingCharges),
+                    "tollCharges": _num(lr.tollCharges),
+                    "totalRate": round(total_rate, 2),
+                    "transitDays": lr.transitDays,
+                    "reliabilityScore": float(reliability) if reliability else None,
+                })
+        return result
+
+    def compare_ftl(
+        self, origin_city: str, destination_city: str, vehicle_type_id: Optional[UUID] = None
+    ) -> List[dict]:
+        """FTL options for one lane, lowest base rate first."""
+        rates = self.ftl_lane_rates([(origin_city, destination_city)], vehicle_type_id)
+        return rates[(city_key(origin_city), city_key(destination_city))]
+
+    def compare_ftl_bulk(self, lanes: List[Tuple[str, str, Optional[str]]]) -> List[dict]:
+        """
+        Cheapest and fastest FTL option per (origin, destination, vehicle type
+        code or name; empty = any vehicle), in input order.
+        """
+        rates = self.ftl_lane_rates((o, d) for o, d, _ in lanes)
+        results = []
+        for origin, destination, vehicle_type in lanes:
+            options = rates[(city_key(origin), city_key(destination))]
+            if vehicle_type:
+                wanted = vehicle_type.strip().lower()
+                options = [
+                    o for o in options
+                    if wanted in ((o["vehicleTypeCode"] or "").lower(), o["vehicleTypeName"].lower())
+                ]
+            options = sorted(options, key=lambda x: x["totalRate"])
+            results.append(_summarize(
+                {"originCity": origin, "destinationCity": destination, "vehicleType": vehicle_type or ""},
+                options, cost_field="totalRate", name_field="vendorName",
+            ))
+        return results
+
+
+def _summarize(lane: dict, options: List[dict], cost_field: str, name_field: str) -> dict:
+    """Bulk result row: cheapest and fastest of a lane's options (sorted by cost)."""
+    cheapest = options[0] if options else None
+    timed = [o for o in options if o.get("transitDays") is not None]
+    fastest = min(timed, key=lambda o: (o["transitDays"], o[cost_field])) if timed else None
+    return {
+        **lane,
+        "options": len(options),
+        "cheapest": cheapest[name_field] if cheapest else None,
+        "cheapestCost": cheapest[cost_field] if cheapest else None,
+        "cheapestTransitDays": cheapest.get("transitDays") if cheapest else None,
+        "fastest": fastest[name_field] if fastest else None,
+        "fastestCost": fastest[cost_field] if fastest else None,
+        "fastestTransitDays": fastest["transitDays"] if fastest else None,
+    }
+
+
+# ============================================================================
+# Bulk CSV
+# ============================================================================
+
+def parse_lane_csv(content: bytes, columns: List[str], required: List[str]) -> Tuple[List[dict], List[str]]:
+    """
+    Read lane rows from an uploaded CSV (header row, case-insensitive
+    column names). Returns (rows with `columns` keys, errors).
+    """
+    try:
+        reader = csv.DictReader(io.StringIO(content.decode("utf-8-sig")))
+    except UnicodeDecodeError:
+        return [], ["File must be UTF-8 encoded"]
+
+    header = {(h or "").strip().lower(): h for h in (reader.fieldnames or [])}
+    missing = [c for c in required if c not in header]
+    if missing:
+        return [], [f"Missing column(s): {', '.join(missing)}"]
+
+    rows, errors = [], []
+    for line_no, raw in enumerate(reader, start=2):
+        row = {c: (raw.get(header[c]) or "").strip() if c in header else "" for c in columns}
+        empty = [c for c in required if not row[c]]
+        if empty:
+            errors.append(f"Row {line_no}: missing {', '.join(empty)}")
+            continue
+        rows.append(row)
+        if len(rows) > BULK_LANE_LIMIT:
+            return [], [f"At most {BULK_LANE_LIMIT} lanes per file"]
+    return rows, errors
+
+
+def lanes_to_csv(results: List[dict]) -> str:
+    """Bulk comparison results as CSV (columns from the first row)."""
+    output = io.StringIO()
+    if results:
+        writer = csv.DictWriter(output, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+    return output.getvalue()
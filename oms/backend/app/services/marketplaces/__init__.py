@@ -5,9 +5,11 @@ Omni-channel OMS marketplace integration services
 from .base_adapter import MarketplaceAdapter, MarketplaceCredentials, MarketplaceConfig
 from .adapter_factory import AdapterFactory, get_adapter
 from .token_manager import TokenManager
+from .sku_mapping_cache import SkuMapping, resolve_sku_mappings, invalidate_sku_mappings
 from .order_pipeline import OrderPipeline
+from .inventory_availability import InventoryAvailabilityCalculator
 from .webhook_processor import WebhookEventProcessor
-from .sync_coordinator import SyncCoordinator
+from .sync_coordinator import SyncCoordinator, advance_last_sync
 
 __all__ = [
     "MarketplaceAdapter",
@@ -16,7 +18,12 @@ __all__ = [
     "AdapterFactory",
     "get_adapter",
     "TokenManager",
+    "SkuMapping",
+    "resolve_sku_mappings",
+    "invalidate_sku_mappings",
     "OrderPipeline",
+    "InventoryAvailabilityCalculator",
     "WebhookEventProcessor",
     "SyncCoordinator",
+    "advance_last_sync",
 ]
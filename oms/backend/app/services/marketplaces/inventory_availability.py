@@ -0,0 +1,110 @@
+"""
+Inventory Availability — Sellable quantity of every mapped SKU of a
+marketplace channel, computed in bulk for SyncCoordinator.push_inventory.
+
+Two queries per connection, whatever the catalogue size:
+- stock (quantity - reservedQty) per SKU and location, for the SKUs with
+  sync-enabled mappings on the channel
+- active ChannelInventoryRules of the channel for those SKUs
+A location with a rule for the channel contributes at most the rule's
+allocatedQty; locations without one contribute all their stock.
+"""
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlmodel import Session, select, func
+
+from app.models import Inventory, ChannelInventoryRule, MarketplaceSkuMapping
+from .base_adapter import InventoryUpdate
+
+logger = logging.getLogger(__name__)
+
+
+class InventoryAvailabilityCalculator:
+    """
+    Bulk channel availability.
+
+    Usage:
+        calculator = InventoryAvailabilityCalculator(session)
+        updates = calculator.build_updates(company_id, "AMAZON", mappings)
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def available_by_sku(
+        self,
+        company_id: UUID,
+        channel: str,
+        sku_ids: Optional[List[UUID]] = None,
+    ) -> Dict[UUID, int]:
+        """Sellable quantity on `channel` per mapped SKU (SKUs without stock are left out)."""
+        started = time.perf_counter()
+
+        mapped = select(MarketplaceSkuMapping.skuId).where(
+            MarketplaceSkuMapping.companyId == company_id,
+            MarketplaceSkuMapping.channel == channel,
+            MarketplaceSkuMapping.syncEnabled == True,
+        )
+        if sku_ids:
+            mapped = mapped.where(MarketplaceSkuMapping.skuId.in_(sku_ids))
+
+        stock = self.session.exec(
+            select(
+                Inventory.skuId,
+                Inventory.locationId,
+                func.sum(Inventory.quantity - Inventory.reservedQty),
+            )
+            .where(Inventory.companyId == company_id)
+            .where(Inventory.skuId.in_(mapped))
+            .group_by(Inventory.skuId, Inventory.locationId)
+        ).all()
+
+        caps: Dict[Tuple[UUID, UUID], int] = {}
+        for sku_id, location_id, allocated_qty in self.session.exec(
+            select(
+                ChannelInventoryRule.skuId,
+                ChannelInventoryRule.locationId,
+                ChannelInventoryRule.allocatedQty,
+            )
+            .where(ChannelInventoryRule.companyId == company_id)
+            .where(ChannelInventoryRule.channel == channel)
+            .where(ChannelInventoryRule.isActive == True)
+            .where(ChannelInventoryRule.skuId.in_(mapped))
+        ).all():
+            caps[(sku_id, location_id)] = allocated_qty or 0
+
+        available: Dict[UUID, int] = {}
+        for sku_id, location_id, qty in stock:
+            qty = max(0, int(qty or 0))
+            cap = caps.get((sku_id, location_id))
+            if cap is not None:
+                qty = min(qty, cap)
+            available[sku_id] = available.get(sku_id, 0) + qty
+
+        logger.info(
+            f"Computed {channel} availability of {len(available)} SKUs "
+            f"({len(stock)} stock rows, {len(caps)} rules) in "
+            f"{(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+        return available
+
+    def build_updates(
+        self,
+        company_id: UUID,
+        channel: str,
+        mappings: List[MarketplaceSkuMapping],
+        sku_ids: Optional[List[UUID]] = None,
+    ) -> List[InventoryUpdate]:
+        """One InventoryUpdate per mapping, quantities from available_by_sku."""
+        available = self.available_by_sku(company_id, channel, sku_ids)
+        return [
+            InventoryUpdate(
+                marketplace_sku=mapping.marketplaceSku,
+                quantity=available.get(mapping.skuId, 0),
+                sku_id=mapping.skuId,
+            )
+            for mapping in mappings
+        ]
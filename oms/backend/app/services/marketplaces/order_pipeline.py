@@ -3,8 +3,11 @@ Order Processing Pipeline
 Converts marketplace orders into OMS Order + OrderItem + Delivery records.
 
 Pipeline: Dedup -> Normalize -> Validate -> Create -> Reserve Inventory -> Link
+
+process_order handles one order (webhooks); process_batch runs the same
+pipeline for a page of orders from a scheduled or manual sync.
 """
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Set
 from datetime import datetime
 from decimal import Decimal
 from uuid import UUID, uuid4
@@ -17,11 +20,9 @@ from app.models import (
     OrderItem,
     Delivery,
     Inventory,
-    SKU,
     Location,
     MarketplaceConnection,
     MarketplaceOrderSync,
-    MarketplaceSkuMapping,
     ImportStatus,
 )
 from app.models.enums import (
@@ -32,7 +33,10 @@ from app.models.enums import (
     ItemStatus,
     DeliveryStatus,
 )
+from app.services.document_sequence import DocumentSequenceService
+from app.services.inventory_reservation import InventoryReservationService
 from .base_adapter import MarketplaceOrder
+from .sku_mapping_cache import SkuMapping, resolve_sku_mappings
 
 logger = logging.getLogger(__name__)
 
@@ -98,14 +102,7 @@ class OrderPipeline:
         Returns:
             Result dict with status, order_id, order_no, and any warnings/errors.
         """
-        result = {
-            "status": "created",
-            "marketplace_order_id": marketplace_order.marketplace_order_id,
-            "order_id": None,
-            "order_no": None,
-            "warnings": [],
-            "errors": [],
-        }
+        result = self._new_result(marketplace_order)
 
         try:
             # ------------------------------------------------------------------
@@ -136,7 +133,7 @@ class OrderPipeline:
 
             if unmapped_skus and not mapped_items:
                 # All SKUs are unmapped - cannot create order
-                await self._create_or_update_sync_record(
+                self._create_or_update_sync_record(
                     company_id=company_id,
                     connection=connection,
                     marketplace_order=marketplace_order,
@@ -165,111 +162,35 @@ class OrderPipeline:
                 result["warnings"].extend(validation_errors)
 
             # ------------------------------------------------------------------
-            # Step 4: Determine channel and generate order number
+            # Step 4: Generate order number
             # ------------------------------------------------------------------
-            channel = self._map_channel(marketplace_order.marketplace)
             order_no = self._generate_order_no(company_id, marketplace_order.marketplace)
-            payment_mode = self._map_payment_mode(marketplace_order)
 
             # ------------------------------------------------------------------
             # Step 5: Get a locationId for the order
             # ------------------------------------------------------------------
-            location_id = await self._get_default_location(company_id)
+            location_id = self._get_default_location(company_id)
             if not location_id:
                 result["status"] = "failed"
                 result["errors"].append("No active location found for company")
                 return result
 
             # ------------------------------------------------------------------
-            # Step 6: Create Order record
+            # Step 6-8: Create Order, OrderItem and Delivery records
             # ------------------------------------------------------------------
-            order = Order(
-                id=uuid4(),
-                orderNo=order_no,
-                externalOrderNo=marketplace_order.marketplace_order_id,
-                channel=channel,
-                orderType=OrderType.B2C,
-                paymentMode=payment_mode,
-                status=OrderStatus.CREATED,
-                customerName=marketplace_order.customer_name or "Unknown",
-                customerPhone=marketplace_order.customer_phone or "",
-                customerEmail=marketplace_order.customer_email,
-                shippingAddress=marketplace_order.shipping_address or {},
-                billingAddress=marketplace_order.billing_address or None,
-                subtotal=Decimal(str(marketplace_order.subtotal)),
-                taxAmount=Decimal(str(marketplace_order.tax_amount)),
-                shippingCharges=Decimal(str(marketplace_order.shipping_amount)),
-                discount=Decimal(str(marketplace_order.discount_amount)),
-                codCharges=Decimal("0"),
-                totalAmount=Decimal(str(marketplace_order.total_amount)),
-                orderDate=marketplace_order.order_date or datetime.utcnow(),
-                shipByDate=marketplace_order.ship_by_date,
-                promisedDate=marketplace_order.promised_delivery_date,
-                priority=0,
-                tags=[f"marketplace:{marketplace_order.marketplace.lower()}"],
-                remarks=None,
-                dataSourceType="MARKETPLACE",
-                locationId=location_id,
-                companyId=company_id,
+            order, order_items, delivery = self._build_order(
+                company_id, marketplace_order, mapped_items, order_no, location_id
             )
-
             self.session.add(order)
             self.session.flush()  # flush to get order.id without committing
-
-            # ------------------------------------------------------------------
-            # Step 7: Create OrderItem records for each mapped line item
-            # ------------------------------------------------------------------
-            order_items = []
-            for item_data in mapped_items:
-                sku_id = item_data["internal_sku_id"]
-                quantity = int(item_data.get("quantity", 1))
-                unit_price = Decimal(str(item_data.get("unit_price", 0)))
-                tax_amount = Decimal(str(item_data.get("tax_amount", 0)))
-                discount_amt = Decimal(str(item_data.get("discount_amount", 0)))
-                total_price = Decimal(str(item_data.get("total_price", 0)))
-
-                # If total_price was not provided, compute it
-                if total_price == Decimal("0") and unit_price > 0:
-                    total_price = (unit_price * quantity) + tax_amount - discount_amt
-
-                order_item = OrderItem(
-                    id=uuid4(),
-                    orderId=order.id,
-                    skuId=sku_id,
-                    externalItemId=item_data.get("marketplace_line_id"),
-                    quantity=quantity,
-                    allocatedQty=0,
-                    pickedQty=0,
-                    packedQty=0,
-                    shippedQty=0,
-                    unitPrice=unit_price,
-                    taxAmount=tax_amount,
-                    discount=discount_amt,
-                    totalPrice=total_price,
-                    status=ItemStatus.PENDING,
-                )
-                self.session.add(order_item)
-                order_items.append(order_item)
-
-            # ------------------------------------------------------------------
-            # Step 8: Create Delivery record
-            # ------------------------------------------------------------------
-            delivery_no = f"DLV-{order_no}"
-            delivery = Delivery(
-                id=uuid4(),
-                deliveryNo=delivery_no,
-                orderId=order.id,
-                companyId=company_id,
-                status=DeliveryStatus.PENDING,
-                boxes=1,
-            )
+            self.session.add_all(order_items)
             self.session.add(delivery)
 
             # ------------------------------------------------------------------
             # Step 9: Reserve inventory for each order item
             # ------------------------------------------------------------------
             for order_item in order_items:
-                reserved = await self._reserve_inventory(
+                reserved = self._reserve_inventory(
                     company_id, order_item.skuId, order_item.quantity, order.id
                 )
                 if not reserved:
@@ -281,7 +202,7 @@ class OrderPipeline:
             # ------------------------------------------------------------------
             # Step 10: Create/update MarketplaceOrderSync record
             # ------------------------------------------------------------------
-            await self._create_or_update_sync_record(
+            self._create_or_update_sync_record(
                 company_id=company_id,
                 connection=connection,
                 marketplace_order=marketplace_order,
@@ -320,28 +241,321 @@ class OrderPipeline:
             result["errors"].append(str(e))
             return result
 
+    def process_batch(
+        self,
+        company_id: UUID,
+        connection: MarketplaceConnection,
+        marketplace_orders: List[MarketplaceOrder],
+    ) -> List[Dict[str, Any]]:
+        """
+        process_order for a whole page of orders: dedup, SKU mapping and
+        stock checks take one query each, all new rows go out in one flush
+        and the page commits once.
+
+        Not async: it only talks to the database, so the sync coordinator
+        runs it in a worker thread while it fetches the next page. Any
+        database error rolls the whole page back and is re-raised, so the
+        caller can retry the page order by order.
+
+        Returns:
+            One result dict (as process_order) per order in the page.
+        """
+        results: List[Dict[str, Any]] = []
+
+        # ------------------------------------------------------------------
+        # Dedup - within the page, then against MarketplaceOrderSync
+        # ------------------------------------------------------------------
+        unique: Dict[str, MarketplaceOrder] = {}
+        for marketplace_order in marketplace_orders:
+            if marketplace_order.marketplace_order_id in unique:
+                result = self._new_result(marketplace_order)
+                result["status"] = "skipped"
+                result["warnings"].append("Duplicate order in page")
+                results.append(result)
+            else:
+                unique[marketplace_order.marketplace_order_id] = marketplace_order
+
+        if not unique:
+            return results
+
+        existing: Dict[str, MarketplaceOrderSync] = {}
+        for sync in self.session.exec(
+            select(MarketplaceOrderSync)
+            .where(MarketplaceOrderSync.companyId == company_id)
+            .where(MarketplaceOrderSync.marketplaceOrderId.in_(list(unique)))
+        ).all():
+            # Prefer the record that already links an OMS order
+            current = existing.get(sync.marketplaceOrderId)
+            if current is None or (sync.orderId and not current.orderId):
+                existing[sync.marketplaceOrderId] = sync
+
+        pending = []
+        for marketplace_order_id, marketplace_order in unique.items():
+            existing_sync = existing.get(marketplace_order_id)
+            if existing_sync and existing_sync.orderId:
+                result = self._new_result(marketplace_order)
+                result["status"] = "skipped"
+                result["order_id"] = str(existing_sync.orderId)
+                result["order_no"] = existing_sync.orderNo
+                result["warnings"].append("Order already exists in OMS")
+                results.append(result)
+            else:
+                pending.append((marketplace_order, existing_sync))
+
+        if not pending:
+            return results
+
+        try:
+            # ------------------------------------------------------------------
+            # Map SKUs, validate and pick a location for the whole page
+            # ------------------------------------------------------------------
+            mappings = self._load_sku_mappings(
+                company_id,
+                connection,
+                {self._item_sku(item) for order, _ in pending for item in order.items},
+            )
+            location_id = self._get_default_location(company_id)
+
+            to_create = []
+            for marketplace_order, existing_sync in pending:
+                result = self._new_result(marketplace_order)
+                results.append(result)
+
+                mapped_items, unmapped_skus = self._resolve_skus(marketplace_order, mappings)
+                if unmapped_skus and not mapped_items:
+                    self._create_or_update_sync_record(
+                        company_id=company_id,
+                        connection=connection,
+                        marketplace_order=marketplace_order,
+                        existing_sync=existing_sync,
+                        sync_status=ImportStatus.FAILED,
+                        error_message=f"All SKUs unmapped: {unmapped_skus}",
+                        order_id=None,
+                        order_no=None,
+                    )
+                    result["status"] = "failed"
+                    result["errors"].append(f"Unmapped SKUs: {unmapped_skus}")
+                    continue
+
+                if unmapped_skus:
+                    result["warnings"].append(
+                        f"Some SKUs unmapped (skipped): {unmapped_skus}"
+                    )
+
+                if not location_id:
+                    result["status"] = "failed"
+                    result["errors"].append("No active location found for company")
+                    continue
+
+                to_create.append((marketplace_order, existing_sync, mapped_items, unmapped_skus, result))
+
+            # Stock snapshot for validation warnings, drawn down as the page
+            # claims it so later orders in the page see what is left
+            available = self._available_qty(
+                company_id,
+                {item["internal_sku_id"] for _, _, mapped_items, _, _ in to_create for item in mapped_items},
+            )
+
+            # ------------------------------------------------------------------
+            # Order numbers, one sequence claim per channel prefix
+            # ------------------------------------------------------------------
+            prefix_counts: Dict[str, int] = {}
+            for marketplace_order, *_ in to_create:
+                prefix = self._order_prefix(marketplace_order.marketplace)
+                prefix_counts[prefix] = prefix_counts.get(prefix, 0) + 1
+            sequence = DocumentSequenceService(self.session)
+            order_numbers = {
+                prefix: iter(sequence.marketplace_order_numbers(company_id, prefix, count))
+                for prefix, count in prefix_counts.items()
+            }
+
+            # ------------------------------------------------------------------
+            # Build all rows, flush them together
+            # ------------------------------------------------------------------
+            new_rows = []
+            reservations = []
+            for marketplace_order, existing_sync, mapped_items, unmapped_skus, result in to_create:
+                result["warnings"].extend(self._order_warnings(marketplace_order))
+                for item in mapped_items:
+                    sku_id = item["internal_sku_id"]
+                    qty = int(item.get("quantity", 1))
+                    if available.get(sku_id, 0) < qty:
+                        sku_label = item.get("marketplace_sku", str(sku_id))
+                        result["warnings"].append(
+                            f"Insufficient inventory for {sku_label} (need {qty})"
+                        )
+                    available[sku_id] = available.get(sku_id, 0) - qty
+
+                order_no = next(order_numbers[self._order_prefix(marketplace_order.marketplace)])
+                order, order_items, delivery = self._build_order(
+                    company_id, marketplace_order, mapped_items, order_no, location_id
+                )
+                new_rows.append(order)
+                new_rows.extend(order_items)
+                new_rows.append(delivery)
+                reservations.extend((order_item, order.id, result) for order_item in order_items)
+
+                self._create_or_update_sync_record(
+                    company_id=company_id,
+                    connection=connection,
+                    marketplace_order=marketplace_order,
+                    existing_sync=existing_sync,
+                    sync_status=ImportStatus.COMPLETED,
+                    error_message=(
+                        f"Unmapped SKUs: {unmapped_skus}" if unmapped_skus else None
+                    ),
+                    order_id=order.id,
+                    order_no=order_no,
+                )
+                result["order_id"] = str(order.id)
+                result["order_no"] = order_no
+
+            self.session.add_all(new_rows)
+            self.session.flush()
+
+            # ------------------------------------------------------------------
+            # Reserve inventory, in SKU order so concurrent pages lock
+            # Inventory rows in the same order
+            # ------------------------------------------------------------------
+            for order_item, order_id, result in sorted(
+                reservations, key=lambda r: str(r[0].skuId)
+            ):
+                if not self._reserve_inventory(
+                    company_id, order_item.skuId, order_item.quantity, order_id
+                ):
+                    result["warnings"].append(
+                        f"Insufficient inventory for SKU {order_item.skuId} "
+                        f"(qty: {order_item.quantity})"
+                    )
+
+            self.session.commit()
+
+        except Exception:
+            self.session.rollback()
+            raise
+
+        logger.info(
+            f"OrderPipeline: Created {len(to_create)} OMS orders from a page of "
+            f"{len(marketplace_orders)} marketplace orders (company: {company_id})"
+        )
+        return results
+
     # =========================================================================
     # Internal Helper Methods
     # =========================================================================
 
+    def _new_result(self, marketplace_order: MarketplaceOrder) -> Dict[str, Any]:
+        return {
+            "status": "created",
+            "marketplace_order_id": marketplace_order.marketplace_order_id,
+            "order_id": None,
+            "order_no": None,
+            "warnings": [],
+            "errors": [],
+        }
+
+    def _build_order(
+        self,
+        company_id: UUID,
+        marketplace_order: MarketplaceOrder,
+        mapped_items: List[Dict[str, Any]],
+        order_no: str,
+        location_id: UUID,
+    ) -> tuple:
+        """
+        Build (not add) the Order, its OrderItems and its Delivery.
+
+        Returns:
+            Tuple of (order, order_items, delivery)
+        """
+        channel = self._map_channel(marketplace_order.marketplace)
+        payment_mode = self._map_payment_mode(marketplace_order)
+
+        order = Order(
+            id=uuid4(),
+            orderNo=order_no,
+            externalOrderNo=marketplace_order.marketplace_order_id,
+            channel=channel,
+            orderType=OrderType.B2C,
+            paymentMode=payment_mode,
+            status=OrderStatus.CREATED,
+            customerName=marketplace_order.customer_name or "Unknown",
+            customerPhone=marketplace_order.customer_phone or "",
+            customerEmail=marketplace_order.customer_email,
+            shippingAddress=marketplace_order.shipping_address or {},
+            billingAddress=marketplace_order.billing_address or None,
+            subtotal=Decimal(str(marketplace_order.subtotal)),
+            taxAmount=Decimal(str(marketplace_order.tax_amount)),
+            shippingCharges=Decimal(str(marketplace_order.shipping_amount)),
+            discount=Decimal(str(marketplace_order.discount_amount)),
+            codCharges=Decimal("0"),
+            totalAmount=Decimal(str(marketplace_order.total_amount)),
+            orderDate=marketplace_order.order_date or datetime.utcnow(),
+            shipByDate=marketplace_order.ship_by_date,
+            promisedDate=marketplace_order.promised_delivery_date,
+            priority=0,
+            tags=[f"marketplace:{marketplace_order.marketplace.lower()}"],
+            remarks=None,
+            dataSourceType="MARKETPLACE",
+            locationId=location_id,
+            companyId=company_id,
+        )
+
+        order_items = []
+        for item_data in mapped_items:
+            sku_id = item_data["internal_sku_id"]
+            quantity = int(item_data.get("quantity", 1))
+            unit_price = Decimal(str(item_data.get("unit_price", 0)))
+            tax_amount = Decimal(str(item_data.get("tax_amount", 0)))
+            discount_amt = Decimal(str(item_data.get("discount_amount", 0)))
+            total_price = Decimal(str(item_data.get("total_price", 0)))
+
+            # If total_price was not provided, compute it
+            if total_price == Decimal("0") and unit_price > 0:
+                total_price = (unit_price * quantity) + tax_amount - discount_amt
+
+            order_item = OrderItem(
+                id=uuid4(),
+                orderId=order.id,
+                skuId=sku_id,
+                externalItemId=item_data.get("marketplace_line_id"),
+                quantity=quantity,
+                allocatedQty=0,
+                pickedQty=0,
+                packedQty=0,
+                shippedQty=0,
+                unitPrice=unit_price,
+                taxAmount=tax_amount,
+                discount=discount_amt,
+                totalPrice=total_price,
+                status=ItemStatus.PENDING,
+            )
+            order_items.append(order_item)
+
+        delivery_no = f"DLV-{order_no}"
+        delivery = Delivery(
+            id=uuid4(),
+            deliveryNo=delivery_no,
+            orderId=order.id,
+            companyId=company_id,
+            status=DeliveryStatus.PENDING,
+            boxes=1,
+        )
+
+        return order, order_items, delivery
+
     def _generate_order_no(self, company_id: UUID, marketplace: str) -> str:
         """
         Generate unique order number like SHP-00001, AMZ-00001, FLK-00001.
 
-        Uses a count of existing orders with the same prefix to determine
-        the next sequence number.
+        Numbers come from a per-company, per-prefix document sequence.
         """
-        prefix = CHANNEL_PREFIX_MAP.get(marketplace.upper(), "MKT")
-
-        # Count existing orders with this prefix for this company
-        count = self.session.exec(
-            select(func.count(Order.id))
-            .where(Order.companyId == company_id)
-            .where(Order.orderNo.startswith(f"{prefix}-"))
-        ).one()
+        return DocumentSequenceService(self.session).marketplace_order_number(
+            company_id, self._order_prefix(marketplace)
+        )
 
-        sequence = (count or 0) + 1
-        return f"{prefix}-{sequence:05d}"
+    def _order_prefix(self, marketplace: str) -> str:
+        return CHANNEL_PREFIX_MAP.get(marketplace.upper(), "MKT")
 
     def _map_channel(self, marketplace: str) -> Channel:
         """Map marketplace name to Channel enum."""
@@ -373,6 +587,43 @@ class OrderPipeline:
         """
         Map marketplace SKUs to internal SKU IDs via MarketplaceSkuMapping.
 
+        Returns:
+            Tuple of (mapped_items_list, unmapped_skus_list)
+        """
+        mappings = self._load_sku_mappings(
+            company_id,
+            connection,
+            {self._item_sku(item) for item in marketplace_order.items},
+        )
+        return self._resolve_skus(marketplace_order, mappings)
+
+    def _item_sku(self, item: Dict[str, Any]) -> str:
+        return (
+            item.get("marketplace_sku")
+            or item.get("sku")
+            or item.get("seller_sku")
+            or ""
+        )
+
+    def _load_sku_mappings(
+        self,
+        company_id: UUID,
+        connection: MarketplaceConnection,
+        marketplace_skus: Set[str],
+    ) -> Dict[str, SkuMapping]:
+        """MarketplaceSkuMappings for a set of marketplace SKUs (cached)."""
+        return resolve_sku_mappings(
+            self.session, company_id, connection.marketplace.value, marketplace_skus
+        )
+
+    def _resolve_skus(
+        self,
+        marketplace_order: MarketplaceOrder,
+        mappings: Dict[str, SkuMapping],
+    ) -> tuple:
+        """
+        Split an order's line items into mapped and unmapped ones.
+
         Returns:
             Tuple of (mapped_items_list, unmapped_skus_list)
         """
@@ -380,42 +631,22 @@ class OrderPipeline:
         unmapped_skus: List[str] = []
 
         for item in marketplace_order.items:
-            marketplace_sku = (
-                item.get("marketplace_sku")
-                or item.get("sku")
-                or item.get("seller_sku")
-                or ""
-            )
+            marketplace_sku = self._item_sku(item)
 
             if not marketplace_sku:
                 unmapped_skus.append("(empty SKU)")
                 continue
 
-            # Look up the mapping
-            mapping = self.session.exec(
-                select(MarketplaceSkuMapping)
-                .where(MarketplaceSkuMapping.companyId == company_id)
-                .where(
-                    MarketplaceSkuMapping.channel
-                    == connection.marketplace.value
-                )
-                .where(MarketplaceSkuMapping.marketplaceSku == marketplace_sku)
-            ).first()
-
-            if mapping and mapping.skuId:
-                # Verify the SKU actually exists
-                sku_exists = self.session.exec(
-                    select(SKU.id).where(SKU.id == mapping.skuId)
-                ).first()
-
-                if sku_exists:
+            mapping = mappings.get(marketplace_sku)
+            if mapping:
+                if mapping.sku_exists:
                     enriched_item = dict(item)
-                    enriched_item["internal_sku_id"] = mapping.skuId
-                    enriched_item["mapping_id"] = mapping.id
+                    enriched_item["internal_sku_id"] = mapping.sku_id
+                    enriched_item["mapping_id"] = mapping.mapping_id
                     mapped_items.append(enriched_item)
                 else:
                     unmapped_skus.append(
-                        f"{marketplace_sku} (SKU ID {mapping.skuId} not found)"
+                        f"{marketplace_sku} (SKU ID {mapping.sku_id} not found)"
                     )
             else:
                 unmapped_skus.append(marketplace_sku)
@@ -432,6 +663,23 @@ class OrderPipeline:
         Validate order data before creation.
         Returns list of validation warnings (non-blocking).
         """
+        warnings = self._order_warnings(marketplace_order)
+
+        # Check inventory availability for each mapped item
+        for item in mapped_items:
+            sku_id = item["internal_sku_id"]
+            qty = int(item.get("quantity", 1))
+            has_inventory = await self._check_inventory(company_id, sku_id, qty)
+            if not has_inventory:
+                sku_label = item.get("marketplace_sku", str(sku_id))
+                warnings.append(
+                    f"Insufficient inventory for {sku_label} (need {qty})"
+                )
+
+        return warnings
+
+    def _order_warnings(self, marketplace_order: MarketplaceOrder) -> List[str]:
+        """Validation warnings about the order data itself."""
         warnings = []
 
         # Check customer info
@@ -449,17 +697,6 @@ class OrderPipeline:
         if marketplace_order.total_amount <= 0:
             warnings.append("Total amount is zero or negative")
 
-        # Check inventory availability for each mapped item
-        for item in mapped_items:
-            sku_id = item["internal_sku_id"]
-            qty = int(item.get("quantity", 1))
-            has_inventory = await self._check_inventory(company_id, sku_id, qty)
-            if not has_inventory:
-                sku_label = item.get("marketplace_sku", str(sku_id))
-                warnings.append(
-                    f"Insufficient inventory for {sku_label} (need {qty})"
-                )
-
         return warnings
 
     async def _check_inventory(
@@ -477,36 +714,35 @@ class OrderPipeline:
         available = total_available or 0
         return available >= qty
 
-    async def _reserve_inventory(
+    def _available_qty(self, company_id: UUID, sku_ids: Set[UUID]) -> Dict[UUID, int]:
+        """Available (quantity - reservedQty) per SKU, in one grouped query."""
+        if not sku_ids:
+            return {}
+        rows = self.session.exec(
+            select(
+                Inventory.skuId,
+                func.sum(Inventory.quantity) - func.sum(Inventory.reservedQty),
+            )
+            .where(Inventory.skuId.in_(list(sku_ids)))
+            .where(Inventory.companyId == company_id)
+            .group_by(Inventory.skuId)
+        ).all()
+        return {sku_id: int(available or 0) for sku_id, available in rows}
+
+    def _reserve_inventory(
         self, company_id: UUID, sku_id: UUID, qty: int, order_id: UUID
     ) -> bool:
         """
         Reserve inventory for the order by incrementing reservedQty
-        on Inventory records (FIFO order).
+        on Inventory records (FIFO order), using row-locked reservation
+        so concurrent pipelines/waves can't over-reserve the same bin.
 
         Returns True if full quantity was reserved, False otherwise.
         """
-        remaining = qty
-
-        # Get inventory records ordered by FIFO sequence
-        inventory_records = self.session.exec(
-            select(Inventory)
-            .where(Inventory.skuId == sku_id)
-            .where(Inventory.companyId == company_id)
-            .where(Inventory.quantity > Inventory.reservedQty)
-            .order_by(Inventory.fifoSequence.asc().nulls_last())
-        ).all()
-
-        for inv in inventory_records:
-            if remaining <= 0:
-                break
-
-            available = inv.quantity - inv.reservedQty
-            reserve_amount = min(available, remaining)
-
-            inv.reservedQty += reserve_amount
-            self.session.add(inv)
-            remaining -= reserve_amount
+        reserved = InventoryReservationService(self.session).reserve(
+            sku_id, qty, company_id=company_id, valuation_method="FIFO"
+        )
+        remaining = qty - reserved
 
         if remaining > 0:
             logger.warning(
@@ -517,7 +753,7 @@ class OrderPipeline:
 
         return True
 
-    async def _get_default_location(self, company_id: UUID) -> Optional[UUID]:
+    def _get_default_location(self, company_id: UUID) -> Optional[UUID]:
         """Get the default (first active) location for a company."""
         location = self.session.exec(
             select(Location.id)
@@ -528,7 +764,7 @@ class OrderPipeline:
 
         return location
 
-    async def _create_or_update_sync_record(
+    def _create_or_update_sync_record(
         self,
         company_id: UUID,
         connection: MarketplaceConnection,
@@ -0,0 +1,174 @@
+"""
+SKU Mapping Cache — Resolves marketplace SKUs to internal SKUs without a
+query per order line.
+
+MarketplaceSkuMapping rows are cached per (company, channel), the scope a
+marketplace connection resolves against, as
+marketplaceSku -> SkuMapping(sku_id, mapping_id, sku_exists):
+- Filled lazily: resolve_sku_mappings() takes a whole page worth of SKUs
+  and loads all misses in one query (mapping joined to SKU), so a page of
+  50 orders x 5 lines costs one query cold and none warm
+- Unmapped SKUs are cached too, so an unmapped bestseller doesn't go to the
+  database on every order
+- Each (company, channel) table is an LRU capped at SKU_MAPPING_CACHE_SIZE
+  SKUs, and is dropped after SKU_MAPPING_CACHE_TTL_SECONDS (changes made by
+  other processes)
+- Any MarketplaceSkuMapping insert/update/delete in this process (the
+  sku_mappings API, bulk uploads) drops the company's tables
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session as SASession, object_session
+from sqlmodel import Session, select
+
+from app.models import MarketplaceSkuMapping, SKU
+
+logger = logging.getLogger(__name__)
+
+
+SKU_MAPPING_CACHE_SIZE = 50000  # SKUs per (company, channel)
+SKU_MAPPING_CACHE_TTL_SECONDS = 600
+SKU_MAPPING_LOAD_CHUNK = 1000  # SKUs per IN (...) query
+
+
+@dataclass(frozen=True)
+class SkuMapping:
+    sku_id: UUID
+    mapping_id: UUID
+    sku_exists: bool = True  # False if the mapped SKU row is gone
+
+
+@dataclass
+class _ChannelTable:
+    """Cached mappings of one (company, channel); None marks an unmapped SKU."""
+    entries: "OrderedDict[str, Optional[SkuMapping]]" = field(default_factory=OrderedDict)
+    expires_at: float = field(
+        default_factory=lambda: time.monotonic() + SKU_MAPPING_CACHE_TTL_SECONDS
+    )
+
+
+# ── Process cache ──────────────────────────────────────────────────────
+_tables: Dict[Tuple[UUID, str], _ChannelTable] = {}
+_tables_lock = threading.Lock()
+
+
+def invalidate_sku_mappings(company_id: Optional[UUID] = None):
+    """Drop cached mappings of one company, or of all companies."""
+    with _tables_lock:
+        if company_id is None:
+            _tables.clear()
+        else:
+            for key in [key for key in _tables if key[0] == company_id]:
+                del _tables[key]
+
+
+def _on_mapping_change(mapper, connection, target):
+    """Invalidate now, and again after commit (a concurrent load may have
+    read the old rows between flush and commit)."""
+    invalidate_sku_mappings(target.companyId)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("sku_mapping_invalidate", set()).add(target.companyId)
+
+
+def _on_commit(session):
+    for company_id in session.info.pop("sku_mapping_invalidate", ()):
+        invalidate_sku_mappings(company_id)
+
+
+for _event_name in ("after_insert", "after_update", "after_delete"):
+    event.listen(MarketplaceSkuMapping, _event_name, _on_mapping_change)
+event.listen(SASession, "after_commit", _on_commit)
+
+
+def resolve_sku_mappings(
+    session: Session,
+    company_id: UUID,
+    channel: str,
+    marketplace_skus: Iterable[str],
+) -> Dict[str, SkuMapping]:
+    """
+    Mappings for a batch of marketplace SKUs of one company and channel.
+    Unmapped SKUs are left out of the result.
+    """
+    skus = {sku for sku in marketplace_skus if sku}
+    if not skus:
+        return {}
+
+    key = (company_id, channel)
+    found: Dict[str, SkuMapping] = {}
+    misses: List[str] = []
+
+    with _tables_lock:
+        table = _tables.get(key)
+        if table is None or table.expires_at <= time.monotonic():
+            table = _tables[key] = _ChannelTable()
+        for sku in skus:
+            if sku in table.entries:
+                table.entries.move_to_end(sku)
+                mapping = table.entries[sku]
+                if mapping is not None:
+                    found[sku] = mapping
+            else:
+                misses.append(sku)
+
+    if misses:
+        loaded = _load(session, company_id, channel, misses)
+        found.update(loaded)
+        with _tables_lock:
+            # Skip the fill if the table was invalidated while loading
+            if _tables.get(key) is table:
+                for sku in misses:
+                    table.entries[sku] = loaded.get(sku)
+                while len(table.entries) > SKU_MAPPING_CACHE_SIZE:
+                    table.entries.popitem(last=False)
+
+    return found
+
+
+def resolve_sku_mapping(
+    session: Session,
+    company_id: UUID,
+    channel: str,
+    marketplace_sku: str,
+) -> Optional[SkuMapping]:
+    """Mapping of a single marketplace SKU, or None if unmapped."""
+    return resolve_sku_mappings(session, company_id, channel, [marketplace_sku]).get(marketplace_sku)
+
+
+def _load(
+    session: Session,
+    company_id: UUID,
+    channel: str,
+    marketplace_skus: List[str],
+) -> Dict[str, SkuMapping]:
+    loaded: Dict[str, SkuMapping] = {}
+    for i in range(0, len(marketplace_skus), SKU_MAPPING_LOAD_CHUNK):
+        chunk = marketplace_skus[i:i + SKU_MAPPING_LOAD_CHUNK]
+        for mapping_id, marketplace_sku, sku_id, existing_sku_id in session.exec(
+            select(
+                MarketplaceSkuMapping.id,
+                MarketplaceSkuMapping.marketplaceSku,
+                MarketplaceSkuMapping.skuId,
+                SKU.id,
+            )
+            .outerjoin(SKU, SKU.id == MarketplaceSkuMapping.skuId)
+            .where(MarketplaceSkuMapping.companyId == company_id)
+            .where(MarketplaceSkuMapping.channel == channel)
+            .where(MarketplaceSkuMapping.marketplaceSku.in_(chunk))
+            .order_by(MarketplaceSkuMapping.createdAt)
+        ).all():
+            if sku_id and marketplace_sku not in loaded:
+                loaded[marketplace_sku] = SkuMapping(
+                    sku_id=sku_id,
+                    mapping_id=mapping_id,
+                    sku_exists=existing_sku_id is not None,
+                )
+    return loaded
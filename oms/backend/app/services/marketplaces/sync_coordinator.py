@@ -3,12 +3,13 @@ Sync Coordinator
 Orchestrates synchronization operations across marketplaces
 """
 from typing import Optional, List, Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from uuid import UUID
 import logging
 import asyncio
+import time
 
-from sqlmodel import Session, select, func
+from sqlmodel import Session, select
 
 from app.models import (
     MarketplaceConnection,
@@ -29,11 +30,42 @@ from app.core.database import get_session_context
 from .adapter_factory import AdapterFactory, get_adapter
 from .token_manager import TokenManager
 from .order_pipeline import OrderPipeline
-from .base_adapter import MarketplaceOrder, InventoryUpdate, InventoryUpdateResult
+from .inventory_availability import InventoryAvailabilityCalculator
+from .base_adapter import MarketplaceOrder, InventoryUpdateResult
 
 logger = logging.getLogger(__name__)
 
 
+# Orders requested per fetch_orders page
+ORDER_PAGE_SIZE = 50
+
+# Minimum gap between in-flight progress writes to a sync job
+SYNC_PROGRESS_INTERVAL_SECONDS = 5.0
+
+# Re-read window before lastSyncAt, for orders the marketplace indexes late
+ORDER_SYNC_OVERLAP = timedelta(minutes=10)
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """lastSyncAt is stored as naive UTC; callers may pass aware datetimes."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def advance_last_sync(connection, synced_to: datetime) -> bool:
+    """
+    Move the connection's lastSyncAt cursor to `synced_to`, the end of a
+    completely fetched window. It only moves forward: a sync of an older
+    window that finishes late must not drag the cursor back.
+    """
+    synced_to = _naive_utc(synced_to)
+    if connection.lastSyncAt is not None and synced_to <= connection.lastSyncAt:
+        return False
+    connection.lastSyncAt = synced_to
+    return True
+
+
 class SyncCoordinator:
     """
     Coordinates synchronization operations across marketplaces.
@@ -165,6 +197,28 @@ class SyncCoordinator:
         session.add(job)
         session.commit()
 
+    def _queued_job(
+        self,
+        session: Session,
+        job_id: Optional[UUID],
+        sync_from_date: Optional[datetime] = None,
+        sync_to_date: Optional[datetime] = None
+    ) -> Optional[MarketplaceSyncJob]:
+        """Load a pre-created job and stamp the sync window on it."""
+        if not job_id:
+            return None
+        job = session.get(MarketplaceSyncJob, job_id)
+        if not job:
+            logger.warning(f"Job not found: {job_id}")
+            return None
+        if sync_from_date is not None:
+            job.syncFromDate = sync_from_date
+        if sync_to_date is not None:
+            job.syncToDate = sync_to_date
+        session.add(job)
+        session.commit()
+        return job
+
     # =========================================================================
     # Order Sync
     # =========================================================================
@@ -175,7 +229,8 @@ class SyncCoordinator:
         from_date: Optional[datetime] = None,
         to_date: Optional[datetime] = None,
         triggered_by: str = "MANUAL",
-        triggered_by_id: Optional[UUID] = None
+        triggered_by_id: Optional[UUID] = None,
+        job_id: Optional[UUID] = None
     ) -> Dict[str, Any]:
         """
         Sync orders from a marketplace.
@@ -186,6 +241,7 @@ class SyncCoordinator:
             to_date: End date for order fetch
             triggered_by: What triggered the sync
             triggered_by_id: User ID if manually triggered
+            job_id: Existing (queued) sync job to run under instead of creating one
 
         Returns:
             Sync result summary
@@ -204,22 +260,28 @@ class SyncCoordinator:
         if connection.status != ConnectionStatus.CONNECTED:
             return {"success": False, "error": f"Connection status: {connection.status}"}
 
-        # Default date range: last 24 hours
+        # Default date range: from the end of the last synced window (with
+        # some overlap; duplicates are skipped), else the last 24 hours
         if not from_date:
-            from_date = connection.lastSyncAt or (datetime.utcnow() - timedelta(hours=24))
+            if connection.lastSyncAt:
+                from_date = connection.lastSyncAt - ORDER_SYNC_OVERLAP
+            else:
+                from_date = datetime.utcnow() - timedelta(hours=24)
         if not to_date:
             to_date = datetime.utcnow()
 
-        # Create sync job
-        job = await self.create_sync_job(
-            company_id=connection.companyId,
-            connection_id=connection_id,
-            job_type=SyncJobType.ORDER_PULL,
-            triggered_by=triggered_by,
-            triggered_by_id=triggered_by_id,
-            sync_from_date=from_date,
-            sync_to_date=to_date
-        )
+        # Create sync job (or take over the one queued by the sync scheduler)
+        job = self._queued_job(session, job_id, from_date, to_date)
+        if not job:
+            job = await self.create_sync_job(
+                company_id=connection.companyId,
+                connection_id=connection_id,
+                job_type=SyncJobType.ORDER_PULL,
+                triggered_by=triggered_by,
+                triggered_by_id=triggered_by_id,
+                sync_from_date=from_date,
+                sync_to_date=to_date
+            )
 
         try:
             # Get adapter
@@ -230,61 +292,73 @@ class SyncCoordinator:
 
             await self.update_job_status(job.id, SyncJobStatus.IN_PROGRESS)
 
-            # Fetch orders with pagination
-            orders_created = 0
-            orders_updated = 0
-            orders_skipped = 0
+            # Fetch and process pages as a two-stage pipeline: page N+1 is
+            # fetched while page N is written (in a worker thread, so the
+            # event loop stays free for the fetch)
+            pipeline = OrderPipeline(session)
+            counts = {"created": 0, "updated": 0, "skipped": 0}
             errors = []
-            cursor = None
+            fetch_failed = False
             total_fetched = 0
+            last_progress = time.monotonic()
+
+            async def fetch_page(cursor):
+                return await adapter.fetch_orders(
+                    from_date=from_date,
+                    to_date=to_date,
+                    cursor=cursor,
+                    limit=ORDER_PAGE_SIZE
+                )
 
-            while True:
-                try:
-                    orders, next_cursor = await adapter.fetch_orders(
-                        from_date=from_date,
-                        to_date=to_date,
-                        cursor=cursor,
-                        limit=50
-                    )
-                except Exception as e:
-                    logger.error(f"Failed to fetch orders: {e}")
-                    errors.append({"type": "fetch_error", "message": str(e)})
-                    break
-
-                total_fetched += len(orders)
-
-                for order in orders:
+            next_page = asyncio.create_task(fetch_page(None))
+            try:
+                while next_page is not None:
                     try:
-                        result = await self._process_marketplace_order(
-                            session, connection, order
-                        )
-                        if result == "created":
-                            orders_created += 1
-                        elif result == "updated":
-                            orders_updated += 1
-                        else:
-                            orders_skipped += 1
+                        orders, next_cursor = await next_page
                     except Exception as e:
-                        logger.error(f"Failed to process order {order.marketplace_order_id}: {e}")
-                        errors.append({
-                            "order_id": order.marketplace_order_id,
-                            "error": str(e)
-                        })
-
-                # Update progress
-                await self.update_job_status(
-                    job.id,
-                    SyncJobStatus.IN_PROGRESS,
-                    records_processed=total_fetched
-                )
-
-                if not next_cursor:
-                    break
-                cursor = next_cursor
+                        logger.error(f"Failed to fetch orders: {e}")
+                        errors.append({"type": "fetch_error", "message": str(e)})
+                        fetch_failed = True
+                        next_page = None
+                        break
+
+                    next_page = (
+                        asyncio.create_task(fetch_page(next_cursor)) if next_cursor else None
+                    )
+                    total_fetched += len(orders)
 
-            # Update connection last sync time
-            connection.lastSyncAt = datetime.utcnow()
-            session.add(connection)
+                    for outcome in await self._process_order_page(
+                        session, pipeline, connection, orders
+                    ):
+                        if outcome in counts:
+                            counts[outcome] += 1
+                        else:
+                            errors.append(outcome)
+
+                    # Update progress (throttled)
+                    if next_page is not None and (
+                        time.monotonic() - last_progress >= SYNC_PROGRESS_INTERVAL_SECONDS
+                    ):
+                        await self.update_job_status(
+                            job.id,
+                            SyncJobStatus.IN_PROGRESS,
+                            records_processed=total_fetched
+                        )
+                        last_progress = time.monotonic()
+            finally:
+                if next_page is not None:
+                    next_page.cancel()
+
+            orders_created = counts["created"]
+            orders_updated = counts["updated"]
+            orders_skipped = counts["skipped"]
+
+            # Advance the cursor to the end of the fetched window, not to the
+            # completion time: orders placed while the sync ran fall after
+            # to_date and are picked up next run. An incomplete fetch leaves
+            # it alone so the next run retries the window.
+            if not fetch_failed and advance_last_sync(connection, to_date):
+                session.add(connection)
             session.commit()
 
             # Finalize job
@@ -327,6 +401,54 @@ class SyncCoordinator:
             )
             return {"success": False, "error": str(e), "job_id": str(job.id)}
 
+    async def _process_order_page(
+        self,
+        session: Session,
+        pipeline: OrderPipeline,
+        connection: MarketplaceConnection,
+        orders: List[MarketplaceOrder]
+    ) -> List[Any]:
+        """
+        Run one page of orders through OrderPipeline.process_batch. If the
+        page can't be written as a batch, it is retried order by order so
+        one bad order doesn't cost the rest of the page.
+
+        Returns: per order "created", "updated", "skipped" or an error dict
+        """
+        if not orders:
+            return []
+
+        batch = asyncio.ensure_future(asyncio.to_thread(
+            pipeline.process_batch, connection.companyId, connection, orders
+        ))
+        try:
+            try:
+                results = await asyncio.shield(batch)
+            except asyncio.CancelledError:
+                # The worker thread can't be interrupted: let it finish with
+                # the session before the caller goes on to use or close it
+                await asyncio.wait([batch])
+                raise
+            return [self._pipeline_outcome(result) for result in results]
+        except Exception as e:
+            logger.warning(
+                f"Batch write of {len(orders)} orders failed, retrying one by one: {e}"
+            )
+
+        outcomes = []
+        for order in orders:
+            try:
+                outcomes.append(
+                    await self._process_marketplace_order(session, connection, order)
+                )
+            except Exception as e:
+                logger.error(f"Failed to process order {order.marketplace_order_id}: {e}")
+                outcomes.append({
+                    "order_id": order.marketplace_order_id,
+                    "error": str(e)
+                })
+        return outcomes
+
     async def _process_marketplace_order(
         self,
         session: Session,
@@ -348,13 +470,17 @@ class SyncCoordinator:
             connection=connection,
             marketplace_order=order,
         )
+        return self._pipeline_outcome(result)
 
+    def _pipeline_outcome(self, result: Dict[str, Any]) -> str:
+        """Map an OrderPipeline result to "created", "updated" or "skipped"."""
         status = result.get("status", "failed")
+        marketplace_order_id = result.get("marketplace_order_id")
 
         if status == "created":
             logger.info(
                 f"Order pipeline created OMS order {result.get('order_no')} "
-                f"for marketplace order {order.marketplace_order_id}"
+                f"for marketplace order {marketplace_order_id}"
             )
             return "created"
         elif status == "skipped":
@@ -363,7 +489,7 @@ class SyncCoordinator:
             errors = result.get("errors", [])
             if errors:
                 logger.warning(
-                    f"Order pipeline failed for {order.marketplace_order_id}: "
+                    f"Order pipeline failed for {marketplace_order_id}: "
                     f"{errors}"
                 )
             return "skipped"
@@ -380,7 +506,8 @@ class SyncCoordinator:
         sku_ids: Optional[List[UUID]] = None,
         full_sync: bool = False,
         triggered_by: str = "MANUAL",
-        triggered_by_id: Optional[UUID] = None
+        triggered_by_id: Optional[UUID] = None,
+        job_id: Optional[UUID] = None
     ) -> Dict[str, Any]:
         """
         Push inventory to marketplace.
@@ -391,6 +518,7 @@ class SyncCoordinator:
             full_sync: Whether to sync all SKUs
             triggered_by: What triggered the sync
             triggered_by_id: User ID if manually triggered
+            job_id: Existing (queued) sync job to run under instead of creating one
 
         Returns:
             Sync result summary
@@ -409,14 +537,16 @@ class SyncCoordinator:
         if connection.status != ConnectionStatus.CONNECTED:
             return {"success": False, "error": f"Connection status: {connection.status}"}
 
-        # Create sync job
-        job = await self.create_sync_job(
-            company_id=connection.companyId,
-            connection_id=connection_id,
-            job_type=SyncJobType.INVENTORY_PUSH,
-            triggered_by=triggered_by,
-            triggered_by_id=triggered_by_id
-        )
+        # Create sync job (or take over the one queued by the sync scheduler)
+        job = self._queued_job(session, job_id)
+        if not job:
+            job = await self.create_sync_job(
+                company_id=connection.companyId,
+                connection_id=connection_id,
+                job_type=SyncJobType.INVENTORY_PUSH,
+                triggered_by=triggered_by,
+                triggered_by_id=triggered_by_id
+            )
 
         try:
             # Get adapter
@@ -452,22 +582,20 @@ class SyncCoordinator:
                     "message": "No SKU mappings found"
                 }
 
-            # Build inventory updates
-            updates = []
-            for mapping in mappings:
-                # Get available inventory for this SKU
-                qty = await self._get_available_qty(session, mapping)
-                updates.append(InventoryUpdate(
-                    marketplace_sku=mapping.marketplaceSku,
-                    quantity=qty,
-                    sku_id=mapping.skuId
-                ))
+            # Build inventory updates (stock and channel rules in two queries)
+            updates = InventoryAvailabilityCalculator(session).build_updates(
+                connection.companyId,
+                connection.marketplace.value,
+                mappings,
+                sku_ids=sku_ids
+            )
 
             # Push to marketplace in batches
             batch_size = 50
             success_count = 0
             failed_count = 0
             errors = []
+            last_progress = time.monotonic()
 
             for i in range(0, len(updates), batch_size):
                 batch = updates[i:i + batch_size]
@@ -490,14 +618,16 @@ class SyncCoordinator:
                     failed_count += len(batch)
                     errors.append({"batch": i, "error": str(e)})
 
-                # Update progress
-                await self.update_job_status(
-                    job.id,
-                    SyncJobStatus.IN_PROGRESS,
-                    records_processed=i + len(batch),
-                    records_success=success_count,
-                    records_failed=failed_count
-                )
+                # Update progress (throttled)
+                if time.monotonic() - last_progress >= SYNC_PROGRESS_INTERVAL_SECONDS:
+                    await self.update_job_status(
+                        job.id,
+                        SyncJobStatus.IN_PROGRESS,
+                        records_processed=i + len(batch),
+                        records_success=success_count,
+                        records_failed=failed_count
+                    )
+                    last_progress = time.monotonic()
 
             # Finalize job
             final_status = SyncJobStatus.COMPLETED
@@ -538,53 +668,6 @@ class SyncCoordinator:
             )
             return {"success": False, "error": str(e), "job_id": str(job.id)}
 
-    async def _get_available_qty(
-        self,
-        session: Session,
-        mapping: MarketplaceSkuMapping
-    ) -> int:
-        """
-        Calculate available quantity for a SKU mapping.
-
-        Considers:
-        - Total inventory
-        - Allocated inventory
-        - Channel-specific allocation rules
-        - Buffer/safety stock
-        """
-        from app.models import Inventory, ChannelInventoryRule
-
-        # Get total inventory
-        total_qty = session.exec(
-            select(func.sum(Inventory.availableQty))
-            .where(Inventory.skuId == mapping.skuId)
-            .where(Inventory.companyId == mapping.companyId)
-        ).first() or 0
-
-        # Get channel allocation rule
-        rule = session.exec(
-            select(ChannelInventoryRule)
-            .where(ChannelInventoryRule.skuId == mapping.skuId)
-            .where(ChannelInventoryRule.companyId == mapping.companyId)
-            .where(ChannelInventoryRule.channel == mapping.channel)
-        ).first()
-
-        if rule:
-            if rule.allocationType == "PERCENTAGE":
-                allocated_qty = int(total_qty * (rule.allocationValue / 100))
-            elif rule.allocationType == "FIXED":
-                allocated_qty = min(int(rule.allocationValue), total_qty)
-            else:
-                allocated_qty = total_qty
-
-            # Apply buffer
-            buffer = getattr(rule, 'buffer_qty', 0) or 0
-            allocated_qty = max(0, allocated_qty - buffer)
-
-            return allocated_qty
-
-        return max(0, total_qty)
-
     # =========================================================================
     # Status and Monitoring
     # =========================================================================
@@ -18,12 +18,12 @@ from app.models import (
     MarketplaceOrderSync,
     Order,
     OrderItem,
-    Inventory,
     WebhookEventStatus,
     ConnectionStatus,
     ImportStatus,
 )
 from app.models.enums import OrderStatus, ItemStatus
+from app.services.inventory_reservation import InventoryReservationService
 from .order_pipeline import OrderPipeline
 from .base_adapter import MarketplaceOrder, FulfillmentType
 
@@ -1007,25 +1007,12 @@ class WebhookEventProcessor:
     ):
         """
         Release reserved inventory by decrementing reservedQty on Inventory records.
+        Decrements happen in SQL under row locks (newest stock first).
         """
-        remaining = qty
-
-        inventory_records = self.session.exec(
-            select(Inventory)
-            .where(Inventory.skuId == sku_id)
-            .where(Inventory.companyId == company_id)
-            .where(Inventory.reservedQty > 0)
-            .order_by(Inventory.fifoSequence.desc().nulls_last())
-        ).all()
-
-        for inv in inventory_records:
-            if remaining <= 0:
-                break
-
-            release_amount = min(inv.reservedQty, remaining)
-            inv.reservedQty -= release_amount
-            self.session.add(inv)
-            remaining -= release_amount
+        released = InventoryReservationService(self.session).release(
+            sku_id, qty, company_id=company_id
+        )
+        remaining = qty - released
 
         if remaining > 0:
             logger.warning(
@@ -1,13 +1,31 @@
 """
 Duplicate Detector
 Prevents duplicate order imports from marketplaces
+
+Marketplace order IDs (Order.externalOrderNo) of each company are kept in a
+process-wide Bloom filter:
+- Built once per company and process with one streaming query, then kept
+  up to date incrementally: orders inserted in this process are added as
+  they flush, and each check first pulls in orders created (by any
+  process) since the last refresh, with DUPLICATE_INDEX_OVERLAP of slack
+  for late commits
+- A batch of IDs is checked against the filter in memory; only the
+  possible hits are confirmed, with one WHERE externalOrderNo IN (...)
+  query, so a sync run costs O(batch), not O(order history)
+- A Bloom filter has no false negatives, so an ID it rejects is new; a
+  false positive only costs its row in the confirmation query
+- When a company outgrows the filter's capacity it is rebuilt, twice as
+  large, on next use
 """
+import hashlib
 import logging
+import math
+import threading
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 from uuid import UUID
-import hashlib
 
+from sqlalchemy import event
 from sqlmodel import Session, select, func
 
 from app.models import Order
@@ -15,102 +33,183 @@ from app.models import Order
 logger = logging.getLogger(__name__)
 
 
-class DuplicateDetector:
-    """
-    Detects and prevents duplicate orders from being imported.
+DUPLICATE_INDEX_ERROR_RATE = 0.001  # Bloom filter false positive rate at capacity
+DUPLICATE_INDEX_MIN_CAPACITY = 100_000  # IDs per company
+DUPLICATE_INDEX_OVERLAP = timedelta(minutes=10)  # Re-read window for late commits
+DUPLICATE_CONFIRM_CHUNK = 1000  # IDs per IN (...) query
 
-    Uses multiple strategies:
-    1. Marketplace order ID check (primary)
-    2. Order fingerprint check (secondary)
-    3. Fuzzy matching for edge cases
-    """
 
-    def __init__(self, session: Session, company_id: UUID):
-        self.session = session
-        self.company_id = company_id
-        self._existing_orders_cache: Set[str] = set()
-        self._cache_loaded = False
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on blake2b)."""
 
-    def _load_cache(self, channel: Optional[str] = None, days: int = 30):
-        """Load recent marketplace order IDs into cache."""
-        if self._cache_loaded:
-            return
+    def __init__(self, capacity: int, error_rate: float = DUPLICATE_INDEX_ERROR_RATE):
+        self.capacity = capacity
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
 
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, value: str):
+        added = False
+        for pos in self._positions(value):
+            byte, bit = pos >> 3, 1 << (pos & 7)
+            if not self.bits[byte] & bit:
+                self.bits[byte] |= bit
+                added = True
+        # Re-adding a value (overlapping refreshes) doesn't use up capacity
+        if added:
+            self.count += 1
 
-        query = select(Order.marketplaceOrderId).where(
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+    @property
+    def full(self) -> bool:
+        return self.count > self.capacity
+
+
+class CompanyOrderIndex:
+    """Bloom filter of one company's marketplace order IDs."""
+
+    def __init__(self, company_id: UUID, capacity: int):
+        self.company_id = company_id
+        self.filter = BloomFilter(capacity)
+        self.refreshed_to: Optional[datetime] = None  # newest Order.createdAt read
+        self.lock = threading.Lock()
+
+    def add(self, marketplace_order_id: str):
+        with self.lock:
+            self.filter.add(marketplace_order_id)
+
+    def possible(self, marketplace_order_ids: Iterable[str]) -> List[str]:
+        """The IDs that may already exist (the rest certainly don't)."""
+        with self.lock:
+            return [mid for mid in marketplace_order_ids if mid in self.filter]
+
+    def load(self, session: Session, since: Optional[datetime] = None) -> int:
+        """Add order IDs created since `since` (all of them if None)."""
+        query = select(Order.externalOrderNo, Order.createdAt).where(
             Order.companyId == self.company_id,
-            Order.marketplaceOrderId.isnot(None),
-            Order.createdAt >= cutoff_date
+            Order.externalOrderNo.isnot(None),
         )
+        if since is not None:
+            query = query.where(Order.createdAt >= since - DUPLICATE_INDEX_OVERLAP)
+
+        loaded = 0
+        newest = self.refreshed_to
+        for external_no, created_at in session.exec(
+            query.execution_options(yield_per=5000)
+        ):
+            self.add(external_no)
+            loaded += 1
+            if created_at and (newest is None or created_at > newest):
+                newest = created_at
+        self.refreshed_to = newest or datetime.utcnow()
+        return loaded
+
+
+# ── Process-wide indexes ───────────────────────────────────────────────
+_indexes: Dict[UUID, CompanyOrderIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _get_index(session: Session, company_id: UUID) -> CompanyOrderIndex:
+    """The company's index, built on first use and refreshed on every use."""
+    with _indexes_lock:
+        index = _indexes.get(company_id)
+        if index is not None and index.filter.full:
+            index = None
+
+    if index is None:
+        total = session.exec(
+            select(func.count(Order.id)).where(
+                Order.companyId == company_id,
+                Order.externalOrderNo.isnot(None),
+            )
+        ).one() or 0
+        index = CompanyOrderIndex(company_id, max(DUPLICATE_INDEX_MIN_CAPACITY, total * 2))
+        loaded = index.load(session)
+        logger.info(f"Built duplicate index for company {company_id}: {loaded} order IDs")
+        with _indexes_lock:
+            _indexes[company_id] = index
+    else:
+        index.load(session, since=index.refreshed_to)
+    return index
+
+
+def invalidate_duplicate_index(company_id: Optional[UUID] = None):
+    """Drop the index of one company, or of all companies."""
+    with _indexes_lock:
+        if company_id is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(company_id, None)
+
+
+def _on_order_insert(mapper, connection, target):
+    if not target.externalOrderNo:
+        return
+    with _indexes_lock:
+        index = _indexes.get(target.companyId)
+    if index is not None:
+        # A rolled back insert just leaves a false positive behind
+        index.add(target.externalOrderNo)
 
-        if channel:
-            query = query.where(Order.channel == channel)
 
-        results = self.session.exec(query).all()
-        self._existing_orders_cache = {r for r in results if r}
-        self._cache_loaded = True
+event.listen(Order, "after_insert", _on_order_insert)
 
-        logger.debug(f"Loaded {len(self._existing_orders_cache)} order IDs into cache")
 
-    def is_duplicate(
+class DuplicateDetector:
+    """
+    Detects and prevents duplicate orders from being imported.
+
+    Checks marketplace order IDs against the company's duplicate index
+    (see module docstring), within a batch as well as against the database.
+    """
+
+    def __init__(self, session: Session, company_id: UUID):
+        self.session = session
+        self.company_id = company_id
+
+    def find_existing(
         self,
-        marketplace_order_id: str,
-        channel: str,
-        order_data: Optional[dict] = None
-    ) -> Tuple[bool, Optional[str]]:
+        marketplace_order_ids: Iterable[str],
+        channel: Optional[str] = None
+    ) -> Dict[str, str]:
         """
-        Check if an order is a duplicate.
-
-        Args:
-            marketplace_order_id: The marketplace's order ID
-            channel: The marketplace channel
-            order_data: Optional order data for fingerprint matching
+        Existing orders for a batch of marketplace order IDs.
 
         Returns:
-            Tuple of (is_duplicate, existing_order_id)
+            Dict of marketplace order ID -> OMS order ID, for the IDs that exist
         """
-        # Load cache if not loaded
-        self._load_cache(channel)
-
-        # Primary check: marketplace order ID
-        if marketplace_order_id in self._existing_orders_cache:
-            logger.debug(f"Duplicate found by marketplace ID: {marketplace_order_id}")
-            return True, marketplace_order_id
-
-        # Secondary check: database lookup
-        existing = self.session.exec(
-            select(Order).where(
+        ids = {str(mid) for mid in marketplace_order_ids if mid}
+        if not ids:
+            return {}
+
+        possible = _get_index(self.session, self.company_id).possible(ids)
+        existing: Dict[str, str] = {}
+        for i in range(0, len(possible), DUPLICATE_CONFIRM_CHUNK):
+            query = select(Order.externalOrderNo, Order.id).where(
                 Order.companyId == self.company_id,
-                Order.channel == channel,
-                Order.marketplaceOrderId == marketplace_order_id
+                Order.externalOrderNo.in_(possible[i:i + DUPLICATE_CONFIRM_CHUNK]),
             )
-        ).first()
-
-        if existing:
-            self._existing_orders_cache.add(marketplace_order_id)
-            logger.debug(f"Duplicate found in DB: {marketplace_order_id}")
-            return True, str(existing.id)
-
-        # Tertiary check: fingerprint matching (if order data provided)
-        if order_data:
-            fingerprint = self._generate_fingerprint(order_data)
-            existing_by_fingerprint = self.session.exec(
-                select(Order).where(
-                    Order.companyId == self.company_id,
-                    Order.channel == channel,
-                    Order.orderFingerprint == fingerprint
-                )
-            ).first()
-
-            if existing_by_fingerprint:
-                logger.warning(
-                    f"Duplicate found by fingerprint: {marketplace_order_id} "
-                    f"matches {existing_by_fingerprint.orderNo}"
-                )
-                return True, str(existing_by_fingerprint.id)
-
-        return False, None
+            if channel:
+                query = query.where(Order.channel == channel)
+            for external_no, order_id in self.session.exec(query).all():
+                existing.setdefault(external_no, str(order_id))
+
+        logger.debug(
+            f"Duplicate check: {len(ids)} IDs, {len(possible)} possible, "
+            f"{len(existing)} confirmed"
+        )
+        return existing
 
     def filter_duplicates(
         self,
@@ -127,30 +226,32 @@ class DuplicateDetector:
         Returns:
             Tuple of (new_orders, duplicate_orders)
         """
-        self._load_cache(channel)
+        def marketplace_id(order: dict):
+            return order.get("marketplaceOrderId") or order.get("order_id") or order.get("id")
+
+        existing = self.find_existing((marketplace_id(order) for order in orders), channel)
 
         new_orders = []
         duplicates = []
+        seen = set()
 
         for order in orders:
-            marketplace_id = order.get("marketplaceOrderId") or order.get("order_id") or order.get("id")
+            mid = marketplace_id(order)
 
-            if not marketplace_id:
+            if not mid:
                 logger.warning("Order missing marketplace ID, skipping duplicate check")
                 new_orders.append(order)
                 continue
 
-            is_dup, existing_id = self.is_duplicate(str(marketplace_id), channel, order)
-
-            if is_dup:
-                duplicates.append({
-                    **order,
-                    "_duplicate_of": existing_id
-                })
+            mid = str(mid)
+            if mid in existing:
+                duplicates.append({**order, "_duplicate_of": existing[mid]})
+            elif mid in seen:
+                # Repeated within the same batch
+                duplicates.append({**order, "_duplicate_of": mid})
             else:
                 new_orders.append(order)
-                # Add to cache to prevent duplicates within same batch
-                self._existing_orders_cache.add(str(marketplace_id))
+                seen.add(mid)
 
         logger.info(
             f"Duplicate check complete: {len(new_orders)} new, {len(duplicates)} duplicates"
@@ -158,33 +259,6 @@ class DuplicateDetector:
 
         return new_orders, duplicates
 
-    def _generate_fingerprint(self, order_data: dict) -> str:
-        """
-        Generate a fingerprint for an order based on key fields.
-
-        This helps catch duplicates that might have different marketplace IDs
-        but are essentially the same order.
-        """
-        # Extract key identifying fields
-        customer_phone = order_data.get("customerPhone", "")
-        customer_email = order_data.get("customerEmail", "")
-        total = str(order_data.get("totalAmount", "0"))
-        order_date = order_data.get("orderDate", "")
-
-        # Extract item information
-        items = order_data.get("items", [])
-        item_fingerprints = []
-        for item in items:
-            item_fp = f"{item.get('skuId', item.get('marketplaceSku', ''))}:{item.get('quantity', 1)}"
-            item_fingerprints.append(item_fp)
-        items_str = "|".join(sorted(item_fingerprints))
-
-        # Combine into fingerprint string
-        fingerprint_source = f"{customer_phone}:{customer_email}:{total}:{order_date}:{items_str}"
-
-        # Generate hash
-        return hashlib.sha256(fingerprint_source.encode()).hexdigest()[:32]
-
     def get_duplicate_summary(
         self,
         channel: Optional[str] = None,
@@ -218,21 +292,28 @@ class DuplicateDetector:
         for ch, count in results:
             channel_counts[ch] = count
 
+        with _indexes_lock:
+            index = _indexes.get(self.company_id)
+
         return {
             "period_days": days,
             "total_orders": total_count,
             "by_channel": channel_counts,
-            "cache_size": len(self._existing_orders_cache),
+            "cache_size": index.filter.count if index else 0,
         }
 
     def mark_as_processed(self, marketplace_order_id: str):
         """
-        Mark an order ID as processed in the cache.
+        Mark an order ID as processed in the index.
         Call this after successfully creating an order.
         """
-        self._existing_orders_cache.add(marketplace_order_id)
+        if not marketplace_order_id:
+            return
+        with _indexes_lock:
+            index = _indexes.get(self.company_id)
+        if index is not None:
+            index.add(str(marketplace_order_id))
 
     def clear_cache(self):
-        """Clear the duplicate detection cache."""
-        self._existing_orders_cache.clear()
-        self._cache_loaded = False
+        """Drop this company's duplicate index (rebuilt on next use)."""
+        invalidate_duplicate_index(self.company_id)
@@ -4,20 +4,30 @@ Transforms marketplace orders to OMS internal format
 """
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import List, Optional, Any
 from uuid import UUID, uuid4
 from decimal import Decimal
 
-from sqlmodel import Session, select
+from sqlmodel import Session
 
-from app.models import (
-    MarketplaceSkuMapping,
-    SKU,
+from app.services.marketplaces.sku_mapping_cache import (
+    resolve_sku_mapping,
+    resolve_sku_mappings,
 )
 
 logger = logging.getLogger(__name__)
 
 
+# Line items key and SKU field of each channel's raw order
+ITEM_SKU_FIELDS = {
+    "AMAZON": ("OrderItems", "ASIN"),
+    "FLIPKART": ("order_items", "fsn"),
+    "SHOPIFY": ("line_items", "sku"),
+    "MYNTRA": ("items", "styleId"),
+    "MEESHO": ("products", "sku"),
+}
+
+
 class OrderTransformer:
     """
     Transforms orders from various marketplace formats to OMS internal format.
@@ -27,7 +37,6 @@ class OrderTransformer:
     def __init__(self, session: Session, company_id: UUID):
         self.session = session
         self.company_id = company_id
-        self._sku_mapping_cache: Dict[str, UUID] = {}
 
     def transform_marketplace_order(
         self,
@@ -57,6 +66,26 @@ class OrderTransformer:
         transformer = transformer_map.get(channel, self._transform_generic_order)
         return transformer(raw_order, connection_id)
 
+    def preload_skus(self, raw_orders: List[dict], channel: str):
+        """
+        Resolve the SKUs of a whole batch of raw orders in one query, so
+        transforming them afterwards doesn't query per line item.
+        """
+        fields = ITEM_SKU_FIELDS.get(channel)
+        if not fields:
+            return
+        items_key, sku_key = fields
+        resolve_sku_mappings(
+            self.session,
+            self.company_id,
+            channel,
+            {
+                item.get(sku_key)
+                for raw_order in raw_orders
+                for item in raw_order.get(items_key, [])
+            },
+        )
+
     def _transform_amazon_order(self, raw_order: dict, connection_id: UUID) -> dict:
         """Transform Amazon SP-API order to OMS format."""
         # Extract shipping address
@@ -390,27 +419,14 @@ class OrderTransformer:
     def _resolve_sku(self, marketplace_sku: Optional[str], channel: str) -> Optional[str]:
         """
         Resolve marketplace SKU to internal SKU ID.
-        Uses cache for performance.
+        Uses the shared SKU mapping cache (see preload_skus).
         """
         if not marketplace_sku:
             return None
 
-        cache_key = f"{channel}:{marketplace_sku}"
-        if cache_key in self._sku_mapping_cache:
-            return str(self._sku_mapping_cache[cache_key])
-
-        # Look up in database
-        mapping = self.session.exec(
-            select(MarketplaceSkuMapping).where(
-                MarketplaceSkuMapping.companyId == self.company_id,
-                MarketplaceSkuMapping.channel == channel,
-                MarketplaceSkuMapping.marketplaceSku == marketplace_sku
-            )
-        ).first()
-
+        mapping = resolve_sku_mapping(self.session, self.company_id, channel, marketplace_sku)
         if mapping:
-            self._sku_mapping_cache[cache_key] = mapping.skuId
-            return str(mapping.skuId)
+            return str(mapping.sku_id)
 
         logger.warning(f"SKU mapping not found: {channel}:{marketplace_sku}")
         return None
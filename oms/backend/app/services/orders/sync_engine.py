@@ -18,7 +18,7 @@ from app.models import (
     SyncJobStatus,
     ConnectionStatus,
 )
-from app.services.marketplaces import AdapterFactory, SyncCoordinator
+from app.services.marketplaces import AdapterFactory, SyncCoordinator, advance_last_sync
 from .order_transformer import OrderTransformer
 from .duplicate_detector import DuplicateDetector
 
@@ -130,6 +130,9 @@ class OrderSyncEngine:
             )
             result["orders_duplicate"] = len(duplicates)
 
+            # Resolve every SKU of the batch up front (one query)
+            transformer.preload_skus(new_orders, connection.marketplace.value)
+
             # Transform and create orders
             orders_created = 0
             orders_failed = 0
@@ -179,9 +182,11 @@ class OrderSyncEngine:
 
             self.session.add(sync_job)
 
-            # Update connection last sync time
-            connection.lastSyncAt = datetime.utcnow()
-            self.session.add(connection)
+            # Advance the connection's cursor to the end of the fetched
+            # window (orders placed during the sync come after it), never
+            # back: a failed fetch raised above and leaves it alone
+            if advance_last_sync(connection, to_date):
+                self.session.add(connection)
 
             self.session.commit()
 
@@ -228,7 +233,7 @@ class OrderSyncEngine:
                 companyId=UUID(order_data["companyId"]),
                 orderNo=order_data.get("orderNo"),
                 channel=order_data.get("channel"),
-                marketplaceOrderId=order_data.get("marketplaceOrderId"),
+                externalOrderNo=order_data.get("marketplaceOrderId"),
                 connectionId=UUID(order_data["connectionId"]) if order_data.get("connectionId") else None,
                 orderDate=order_data.get("orderDate") or datetime.utcnow(),
                 status=order_data.get("status", "PENDING"),
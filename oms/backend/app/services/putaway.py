@@ -13,6 +13,7 @@ from app.models import (
     GoodsReceipt, GoodsReceiptItem,
     SKU, Bin, Zone, Inventory, Location,
 )
+from app.services.document_sequence import DocumentSequenceService
 
 
 class PutawayService:
@@ -22,27 +23,8 @@ class PutawayService:
         self.session = session
 
     def generate_task_no(self, company_id: UUID) -> str:
-        """Generate unique task number."""
-        # Get max task number for today
-        today = datetime.utcnow().strftime("%Y%m%d")
-        prefix = f"PUT-{today}-"
-
-        # Find existing tasks with this prefix
-        max_num = self.session.exec(
-            select(func.max(PutawayTask.taskNo))
-            .where(PutawayTask.taskNo.like(f"{prefix}%"))
-            .where(PutawayTask.companyId == company_id)
-        ).first()
-
-        if max_num:
-            try:
-                num = int(max_num.split("-")[-1]) + 1
-            except (ValueError, IndexError):
-                num = 1
-        else:
-            num = 1
-
-        return f"{prefix}{num:04d}"
+        """Generate unique task number (PUT-YYYYMMDD-NNNN, per company per day)."""
+        return DocumentSequenceService(self.session).putaway_task_number(company_id)
 
     def suggest_bin(
         self,
@@ -3,13 +3,15 @@ Scheduler Service - APScheduler for automated background jobs
 Runs detection engine every 15 minutes for proactive monitoring
 """
 import logging
-from datetime import datetime
-from typing import Optional
-from uuid import uuid4
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from uuid import UUID, uuid4
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
+from sqlalchemy import false, or_, update
+from sqlalchemy import types as sa_types
 from sqlmodel import Session, select, func
 
 from app.core.database import engine
@@ -183,6 +185,292 @@ def get_entity_identifier(entity, entity_type: str) -> str:
     return str(entity.id)
 
 
+# =============================================================================
+# DETECTION ENGINE: SQL PREDICATE COMPILATION
+# =============================================================================
+
+# Operators whose result depends on the clock, not only on the row
+AGE_OPERATORS = ("AGE_HOURS", "AGE_DAYS")
+
+# Max identifiers per IN (...) list
+IN_CHUNK_SIZE = 1000
+
+# The next incremental scan re-reads this far behind the last one: a row
+# stamped before the scan but committed after it would otherwise be skipped
+DETECTION_SCAN_OVERLAP = timedelta(minutes=10)
+
+
+def _column_kind(column) -> str:
+    """Classify a column as string / numeric / datetime / other."""
+    column_type = column.type
+    if isinstance(column_type, sa_types.TypeDecorator):
+        column_type = column_type.impl_instance
+    if isinstance(column_type, (sa_types.String, sa_types.Enum)):
+        return "string"
+    if isinstance(column_type, (sa_types.Integer, sa_types.Numeric, sa_types.Float)):
+        return "numeric"
+    if isinstance(column_type, (sa_types.DateTime, sa_types.Date)):
+        return "datetime"
+    return "other"
+
+
+def age_cutoff(operator: str, value, now: datetime) -> datetime:
+    """
+    Latest field value that satisfies an AGE_* condition at `now`.
+    AGE_HOURS: field <= now - N hours
+    AGE_DAYS:  field.date() <= today - N days, i.e. field < start of (today - N + 1)
+    """
+    if operator == "AGE_HOURS":
+        return now - timedelta(hours=float(value))
+    day = now.date() - timedelta(days=int(value) - 1)
+    return datetime.combine(day, datetime.min.time())
+
+
+def compile_condition(Model, condition: dict, now: datetime):
+    """
+    Compile one rule condition into a SQL clause with the same result as
+    evaluate_condition. Returns None when the condition can only be
+    evaluated in Python (computed attribute, non-string equality, ...).
+    """
+    field = condition.get("field")
+    operator = condition.get("operator")
+    value = condition.get("value")
+
+    if not field or not hasattr(Model, field):
+        return false()  # evaluate_condition never matches unknown fields
+    if field not in Model.__table__.c:
+        return None
+
+    column = getattr(Model, field)
+    kind = _column_kind(Model.__table__.c[field])
+
+    try:
+        if operator == "IS_NULL":
+            return column.is_(None)
+        if operator == "IS_NOT_NULL":
+            return column.is_not(None)
+
+        if kind == "string":
+            if operator == "=":
+                return column == str(value)
+            if operator == "!=":
+                return or_(column.is_(None), column != str(value))
+            if operator in ("IN", "NOT_IN") and isinstance(value, list) \
+                    and all(isinstance(v, str) for v in value):
+                if operator == "IN":
+                    return column.in_(value)
+                return or_(column.is_(None), column.notin_(value))
+
+        if kind == "numeric" and operator in (">", "<", ">=", "<="):
+            threshold = float(value)
+            coalesced = func.coalesce(column, 0)
+            return {
+                ">": coalesced > threshold,
+                "<": coalesced < threshold,
+                ">=": coalesced >= threshold,
+                "<=": coalesced <= threshold,
+            }[operator]
+
+        if kind == "datetime" and operator in AGE_OPERATORS:
+            cutoff = age_cutoff(operator, value, now)
+            if operator == "AGE_HOURS":
+                return column <= cutoff
+            return column < cutoff
+    except (ValueError, TypeError):
+        return false()  # evaluate_condition treats bad values as no match
+
+    return None
+
+
+def compile_conditions(Model, conditions: list, now: datetime) -> Tuple[list, list]:
+    """
+    Split rule conditions into (SQL clauses, residual Python conditions).
+    Residual conditions are still checked with evaluate_condition.
+    """
+    clauses = []
+    residual = []
+    for condition in conditions:
+        clause = compile_condition(Model, condition, now)
+        if clause is None:
+            residual.append(condition)
+        else:
+            clauses.append(clause)
+    return clauses, residual
+
+
+def change_window(Model, conditions: list, since: datetime, now: datetime):
+    """
+    Clause selecting rows that may have started matching in (since, now]:
+    rows updated since the watermark, plus rows whose AGE_* field crossed
+    its threshold since then (ageing doesn't touch updatedAt).
+    """
+    window = [Model.updatedAt > since]
+    for condition in conditions:
+        operator = condition.get("operator")
+        field = condition.get("field")
+        if operator in AGE_OPERATORS and field in Model.__table__.c:
+            try:
+                window.append(
+                    getattr(Model, field) > age_cutoff(operator, condition.get("value"), since)
+                    if operator == "AGE_HOURS"
+                    else getattr(Model, field) >= age_cutoff(operator, condition.get("value"), since)
+                )
+            except (ValueError, TypeError):
+                continue
+    return or_(*window)
+
+
+def is_incremental(Model, residual: list) -> bool:
+    """
+    A rule can scan only its change window if the table tracks updatedAt
+    and no clock-dependent condition was left for Python evaluation.
+    """
+    return "updatedAt" in Model.__table__.c and not any(
+        c.get("operator") in AGE_OPERATORS for c in residual
+    )
+
+
+def get_identifier_column(Model, entity_type: str):
+    """Column holding get_entity_identifier's value, plus str -> column value parser."""
+    column_name = {
+        "Order": "orderNo",
+        "Delivery": "deliveryNo",
+        "NDR": "ndrCode",
+        "Return": "returnNo",
+        "Inventory": "skuId",
+    }.get(entity_type, "id")
+    if not hasattr(Model, column_name):
+        column_name = "id"
+    if column_name in ("id", "skuId"):
+        return getattr(Model, column_name), UUID
+    return getattr(Model, column_name), str
+
+
+def chunked(items: list, size: int = IN_CHUNK_SIZE):
+    """Yield successive slices of `items`."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# =============================================================================
+# DETECTION ENGINE: BULK AUTO-RESOLVE
+# =============================================================================
+
+NDR_EXCEPTION_TYPES = (
+    "NDR_AGING", "NDR_MULTI_ATTEMPT", "NDR_NO_RESPONSE", "NDR_HIGH_VALUE",
+    "NDR_COD_RISK", "NDR_ADDRESS_ISSUE", "NDR_RTO_CANDIDATE", "NDR_ESCALATION",
+)
+
+# Exception type -> entity statuses that mean the issue has been addressed
+AUTO_RESOLVE_STATUSES = {
+    # Order/Delivery rules
+    "SLA_BREACH": ("DELIVERED",),
+    "CARRIER_DELAY": ("DELIVERED", "OUT_FOR_DELIVERY"),
+    # NDR-specific rules - resolve when NDR is resolved/closed/RTO
+    **{exc_type: ("RESOLVED", "RTO", "CLOSED") for exc_type in NDR_EXCEPTION_TYPES},
+    # Return rules
+    "RETURN_AGING": ("COMPLETED", "REFUNDED", "REJECTED"),
+}
+
+AUTO_RESOLUTION_NOTE = "Auto-resolved by scheduler: Issue has been addressed"
+
+
+def should_auto_resolve(exception_type: str, status) -> bool:
+    """Resolution table: is the exception's issue fixed given its entity's status?"""
+    if exception_type == "STUCK_ORDER":
+        return status != "CREATED"
+    return status in AUTO_RESOLVE_STATUSES.get(exception_type, ())
+
+
+def _fetch_entity_statuses(session: Session, Model, key_column, keys: list) -> Dict:
+    """key -> status for the entities whose `key_column` is in `keys`."""
+    status_column = getattr(Model, "status", None)
+    statuses = {}
+    for chunk in chunked(keys):
+        if status_column is None:
+            rows = [(key, None) for key in session.exec(
+                select(key_column).where(key_column.in_(chunk))
+            ).all()]
+        else:
+            rows = session.exec(
+                select(key_column, status_column).where(key_column.in_(chunk))
+            ).all()
+        for key, status in rows:
+            statuses[key] = status.value if hasattr(status, "value") else status
+    return statuses
+
+
+def auto_resolve_exceptions(session: Session, now: datetime) -> int:
+    """
+    Resolve OPEN autoResolvable exceptions whose entity reached a resolving
+    status. Entity statuses are fetched with one IN query per entity type,
+    and matches are closed with a bulk UPDATE. Returns the number resolved.
+    """
+    open_exceptions = session.exec(
+        select(
+            ExceptionModel.id, ExceptionModel.type, ExceptionModel.entityType,
+            ExceptionModel.entityId, ExceptionModel.orderId,
+        ).where(
+            ExceptionModel.status == "OPEN",
+            ExceptionModel.autoResolvable == True
+        )
+    ).all()
+
+    # entityType -> lookup column -> exceptions referencing an entity by it
+    grouped: Dict[str, Dict[str, list]] = {}
+    for exc in open_exceptions:
+        if exc.type != "STUCK_ORDER" and exc.type not in AUTO_RESOLVE_STATUSES:
+            continue
+        if exc.entityType == "Order" and exc.orderId:
+            grouped.setdefault("Order", {}).setdefault("id", []).append((exc, exc.orderId))
+            continue
+        id_field = {
+            "Order": "orderNo",
+            "Delivery": "deliveryNo",
+            "NDR": "ndrCode"
+        }.get(exc.entityType, "id")
+        key = exc.entityId
+        if id_field == "id":
+            try:
+                key = UUID(str(exc.entityId))
+            except ValueError:
+                continue
+        grouped.setdefault(exc.entityType, {}).setdefault(id_field, []).append((exc, key))
+
+    resolved_ids = []
+    for entity_type, by_field in grouped.items():
+        Model = get_entity_model(entity_type)
+        if not Model:
+            continue
+        for id_field, refs in by_field.items():
+            if not hasattr(Model, id_field):
+                continue
+            statuses = _fetch_entity_statuses(
+                session, Model, getattr(Model, id_field), list({key for _, key in refs})
+            )
+            for exc, key in refs:
+                if key in statuses and should_auto_resolve(exc.type, statuses[key]):
+                    resolved_ids.append(exc.id)
+
+    resolved = 0
+    for ids in chunked(resolved_ids):
+        resolved += session.execute(
+            update(ExceptionModel)
+            .where(ExceptionModel.id.in_(ids), ExceptionModel.status == "OPEN")
+            .values(
+                status="RESOLVED",
+                resolution=AUTO_RESOLUTION_NOTE,
+                resolvedAt=now,
+                resolvedBy="SCHEDULER",
+                updatedAt=now,
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    # Rows another worker closed in the meantime aren't counted
+    return resolved
+
+
 # =============================================================================
 # SCHEDULED JOB: RUN DETECTION ENGINE
 # =============================================================================
@@ -233,113 +521,159 @@ def run_detection_engine():
                         logger.warning(f"Unknown entity type: {rule.entityType}")
                         continue
 
-                    # Get all entities of this type
-                    entities = session.exec(select(Model)).all()
                     conditions = rule.conditions if isinstance(rule.conditions, list) else []
+                    if not conditions:
+                        # A rule without conditions never matches
+                        continue
+                    clauses, residual = compile_conditions(Model, conditions, now)
+
+                    # Incremental scan: only rows that changed or aged into the
+                    # rule since its last scan. First scan covers everything.
+                    query = select(Model).where(*clauses)
+                    watermark = rule.scanWatermark
+                    incremental = watermark is not None and is_incremental(Model, residual)
+                    if incremental:
+                        query = query.where(change_window(Model, conditions, watermark, now))
+                    entities = session.exec(query).all()
+
+                    logger.info(
+                        f"Rule {rule.ruleCode}: Scanning {len(entities)} {rule.entityType} entities "
+                        f"({'incremental' if incremental else 'full'}, {len(residual)} Python conditions)"
+                    )
 
-                    logger.info(f"Rule {rule.ruleCode}: Scanning {len(entities)} {rule.entityType} entities")
+                    # Prefetch open exceptions for this rule, keyed by entity identifier
+                    open_by_entity: Dict[str, ExceptionModel] = {
+                        exc.entityId: exc
+                        for exc in session.exec(
+                            select(ExceptionModel).where(
+                                ExceptionModel.entityType == rule.entityType,
+                                ExceptionModel.type == rule.ruleType,
+                                ExceptionModel.status.in_(["OPEN", "IN_PROGRESS"])
+                            )
+                        ).all()
+                    }
+                    refreshed = set()
 
                     for entity in entities:
-                        if evaluate_conditions(entity, conditions, now):
-                            entity_id = get_entity_identifier(entity, rule.entityType)
-                            severity = calculate_severity(entity, rule, now)
-
-                            # Check if exception already exists
-                            existing = session.exec(
-                                select(ExceptionModel).where(
-                                    ExceptionModel.entityType == rule.entityType,
-                                    ExceptionModel.entityId == entity_id,
-                                    ExceptionModel.type == rule.ruleType,
-                                    ExceptionModel.status.in_(["OPEN", "IN_PROGRESS"])
-                                )
-                            ).first()
-
-                            if not existing:
-                                # Create new exception
-                                order_id = None
-                                if hasattr(entity, 'id') and rule.entityType == "Order":
-                                    order_id = entity.id
-                                elif hasattr(entity, 'orderId'):
-                                    order_id = entity.orderId
-
-                                exception = ExceptionModel(
+                        if residual and not evaluate_conditions(entity, residual, now):
+                            continue
+
+                        entity_id = get_entity_identifier(entity, rule.entityType)
+                        severity = calculate_severity(entity, rule, now)
+                        existing = open_by_entity.get(entity_id)
+
+                        if not existing:
+                            # Create new exception
+                            order_id = None
+                            if hasattr(entity, 'id') and rule.entityType == "Order":
+                                order_id = entity.id
+                            elif hasattr(entity, 'orderId'):
+                                order_id = entity.orderId
+
+                            exception = ExceptionModel(
+                                id=uuid4(),
+                                exceptionCode=f"EXC-{rule.ruleType[:3]}-{str(uuid4())[:8].upper()}",
+                                type=rule.ruleType,
+                                source="SCHEDULER",
+                                severity=severity,
+                                entityType=rule.entityType,
+                                entityId=entity_id,
+                                orderId=order_id,
+                                title=f"{rule.name}: {entity_id}",
+                                description=f"Auto-detected by scheduler using rule '{rule.ruleCode}'",
+                                autoResolvable=rule.autoResolveEnabled,
+                                status="OPEN",
+                                priority=get_priority(severity),
+                                companyId=getattr(entity, 'companyId', None),
+                                createdAt=now,
+                                updatedAt=now
+                            )
+                            session.add(exception)
+                            open_by_entity[entity_id] = exception
+                            refreshed.add(entity_id)
+                            exceptions_created += 1
+
+                            # Dispatch exception.created event for alerts
+                            from app.services.event_dispatcher import dispatch_sync
+                            dispatch_sync("exception.created", {
+                                "exceptionId": str(exception.id),
+                                "exceptionCode": exception.exceptionCode,
+                                "type": rule.ruleType,
+                                "severity": severity,
+                                "entityType": rule.entityType,
+                                "entityId": entity_id,
+                                "orderId": str(order_id) if order_id else "",
+                                "companyId": str(getattr(entity, 'companyId', "")) if getattr(entity, 'companyId', None) else "",
+                                "title": exception.title,
+                                "description": exception.description,
+                            })
+
+                            # Create AI Action if enabled (map rule action types to DB enum values)
+                            if rule.aiActionEnabled and rule.aiActionType:
+                                # Map detection rule action types to database enum values
+                                action_type_map = {
+                                    "RECOMMEND": "NDR_CLASSIFICATION",
+                                    "AUTO_CLASSIFY": "NDR_CLASSIFICATION",
+                                    "AUTO_OUTREACH": "NDR_RESOLUTION",
+                                    "AUTO_ESCALATE": "NDR_RESOLUTION",
+                                    "AUTO_RESOLVE": "NDR_RESOLUTION",
+                                    "PREDICT": "DEMAND_FORECAST",
+                                }
+                                mapped_action_type = action_type_map.get(rule.aiActionType, "NDR_CLASSIFICATION")
+
+                                ai_action = AIActionLog(
                                     id=uuid4(),
-                                    exceptionCode=f"EXC-{rule.ruleType[:3]}-{str(uuid4())[:8].upper()}",
-                                    type=rule.ruleType,
-                                    source="SCHEDULER",
-                                    severity=severity,
+                                    actionType=mapped_action_type,
                                     entityType=rule.entityType,
                                     entityId=entity_id,
-                                    orderId=order_id,
-                                    title=f"{rule.name}: {entity_id}",
-                                    description=f"Auto-detected by scheduler using rule '{rule.ruleCode}'",
-                                    autoResolvable=rule.autoResolveEnabled,
-                                    status="OPEN",
-                                    priority=get_priority(severity),
                                     companyId=getattr(entity, 'companyId', None),
+                                    ndrId=entity.id if rule.entityType == "NDR" else None,
+                                    decision=f"Auto-triggered by scheduler rule: {rule.ruleCode} ({rule.aiActionType})",
+                                    reasoning=f"Rule '{rule.name}' detected an issue requiring {rule.aiActionType}",
+                                    confidence=0.85,
+                                    riskLevel=severity,
+                                    status="PENDING_APPROVAL",
+                                    approvalRequired=True,
+                                    recommendations=rule.aiActionConfig,
                                     createdAt=now,
                                     updatedAt=now
                                 )
-                                session.add(exception)
-                                exceptions_created += 1
-
-                                # Dispatch exception.created event for alerts
-                                from app.services.event_dispatcher import dispatch_sync
-                                dispatch_sync("exception.created", {
-                                    "exceptionId": str(exception.id),
-                                    "exceptionCode": exception.exceptionCode,
-                                    "type": rule.ruleType,
-                                    "severity": severity,
-                                    "entityType": rule.entityType,
-                                    "entityId": entity_id,
-                                    "orderId": str(order_id) if order_id else "",
-                                    "companyId": str(getattr(entity, 'companyId', "")) if getattr(entity, 'companyId', None) else "",
-                                    "title": exception.title,
-                                    "description": exception.description,
-                                })
-
-                                # Create AI Action if enabled (map rule action types to DB enum values)
-                                if rule.aiActionEnabled and rule.aiActionType:
-                                    # Map detection rule action types to database enum values
-                                    action_type_map = {
-                                        "RECOMMEND": "NDR_CLASSIFICATION",
-                                        "AUTO_CLASSIFY": "NDR_CLASSIFICATION",
-                                        "AUTO_OUTREACH": "NDR_RESOLUTION",
-                                        "AUTO_ESCALATE": "NDR_RESOLUTION",
-                                        "AUTO_RESOLVE": "NDR_RESOLUTION",
-                                        "PREDICT": "DEMAND_FORECAST",
-                                    }
-                                    mapped_action_type = action_type_map.get(rule.aiActionType, "NDR_CLASSIFICATION")
-
-                                    ai_action = AIActionLog(
-                                        id=uuid4(),
-                                        actionType=mapped_action_type,
-                                        entityType=rule.entityType,
-                                        entityId=entity_id,
-                                        companyId=getattr(entity, 'companyId', None),
-                                        ndrId=entity.id if rule.entityType == "NDR" else None,
-                                        decision=f"Auto-triggered by scheduler rule: {rule.ruleCode} ({rule.aiActionType})",
-                                        reasoning=f"Rule '{rule.name}' detected an issue requiring {rule.aiActionType}",
-                                        confidence=0.85,
-                                        riskLevel=severity,
-                                        status="PENDING_APPROVAL",
-                                        approvalRequired=True,
-                                        recommendations=rule.aiActionConfig,
-                                        createdAt=now,
-                                        updatedAt=now
-                                    )
-                                    session.add(ai_action)
-                            else:
-                                # Update severity if changed
-                                if existing.severity != severity:
-                                    existing.severity = severity
-                                    existing.priority = get_priority(severity)
-                                    existing.updatedAt = now
-                                    session.add(existing)
-                                    exceptions_updated += 1
+                                session.add(ai_action)
+                        else:
+                            refreshed.add(entity_id)
+                            if existing.severity != severity:
+                                existing.severity = severity
+                                existing.priority = get_priority(severity)
+                                existing.updatedAt = now
+                                session.add(existing)
+                                exceptions_updated += 1
+
+                    # Severity grows with age: refresh exceptions whose entity
+                    # wasn't in the change window. Cost follows open exceptions.
+                    stale = [key for key in open_by_entity if key not in refreshed]
+                    id_column, parse_id = get_identifier_column(Model, rule.entityType)
+                    for keys in chunked(stale):
+                        try:
+                            ids = [parse_id(key) for key in keys]
+                        except (ValueError, TypeError):
+                            continue
+                        for entity in session.exec(
+                            select(Model).where(id_column.in_(ids), *clauses)
+                        ).all():
+                            if residual and not evaluate_conditions(entity, residual, now):
+                                continue
+                            existing = open_by_entity[get_entity_identifier(entity, rule.entityType)]
+                            severity = calculate_severity(entity, rule, now)
+                            if existing.severity != severity:
+                                existing.severity = severity
+                                existing.priority = get_priority(severity)
+                                existing.updatedAt = now
+                                session.add(existing)
+                                exceptions_updated += 1
 
                     # Update rule execution stats
                     rule.lastExecutedAt = now
+                    rule.scanWatermark = now - DETECTION_SCAN_OVERLAP
                     rule.executionCount = (rule.executionCount or 0) + 1
                     session.add(rule)
                     rules_executed += 1
@@ -349,64 +683,7 @@ def run_detection_engine():
                     continue
 
             # Auto-resolve exceptions where underlying issue is fixed
-            open_exceptions = session.exec(
-                select(ExceptionModel).where(
-                    ExceptionModel.status == "OPEN",
-                    ExceptionModel.autoResolvable == True
-                )
-            ).all()
-
-            for exc in open_exceptions:
-                Model = get_entity_model(exc.entityType)
-                if not Model:
-                    continue
-
-                # Find the entity
-                entity = None
-                if exc.entityType == "Order" and exc.orderId:
-                    entity = session.get(Model, exc.orderId)
-                else:
-                    id_field = {
-                        'Order': 'orderNo',
-                        'Delivery': 'deliveryNo',
-                        'NDR': 'ndrCode'
-                    }.get(exc.entityType, 'id')
-
-                    if hasattr(Model, id_field):
-                        entity = session.exec(
-                            select(Model).where(getattr(Model, id_field) == exc.entityId)
-                        ).first()
-
-                if entity:
-                    status = getattr(entity, 'status', None)
-                    if hasattr(status, 'value'):
-                        status = status.value
-
-                    should_resolve = False
-                    # Order/Delivery rules
-                    if exc.type == "STUCK_ORDER" and status != "CREATED":
-                        should_resolve = True
-                    elif exc.type == "SLA_BREACH" and status == "DELIVERED":
-                        should_resolve = True
-                    elif exc.type == "CARRIER_DELAY" and status in ["DELIVERED", "OUT_FOR_DELIVERY"]:
-                        should_resolve = True
-                    # NDR-specific rules - resolve when NDR is resolved/closed/RTO
-                    elif exc.type in ["NDR_AGING", "NDR_MULTI_ATTEMPT", "NDR_NO_RESPONSE",
-                                      "NDR_HIGH_VALUE", "NDR_COD_RISK", "NDR_ADDRESS_ISSUE",
-                                      "NDR_RTO_CANDIDATE", "NDR_ESCALATION"] and status in ["RESOLVED", "RTO", "CLOSED"]:
-                        should_resolve = True
-                    # Return rules
-                    elif exc.type == "RETURN_AGING" and status in ["COMPLETED", "REFUNDED", "REJECTED"]:
-                        should_resolve = True
-
-                    if should_resolve:
-                        exc.status = "RESOLVED"
-                        exc.resolution = "Auto-resolved by scheduler: Issue has been addressed"
-                        exc.resolvedAt = now
-                        exc.resolvedBy = "SCHEDULER"
-                        exc.updatedAt = now
-                        session.add(exc)
-                        auto_resolved += 1
+            auto_resolved = auto_resolve_exceptions(session, now)
 
             session.commit()
 
@@ -567,6 +844,46 @@ def start_scheduler():
     )
     logger.info("Scheduled contract expiry check job: daily at 8 AM UTC")
 
+    # ── Event outbox relay ────────────────────────────────────────────
+    # Only with EVENT_OUTBOX_ENABLED (needs migrations/event_outbox.sql)
+    from app.core.config import settings
+    if settings.EVENT_OUTBOX_ENABLED:
+        from app.services.event_dispatcher import relay_outbox
+        scheduler.add_job(
+            relay_outbox,
+            trigger=IntervalTrigger(minutes=1),
+            id="event_outbox_relay",
+            name="Event Outbox Relay (Every Minute)",
+            replace_existing=True,
+            max_instances=1,
+        )
+        logger.info("Scheduled event outbox relay job: every minute")
+
+    # ── Shared rate quote cache cleanup ───────────────────────────────
+    if settings.RATE_CACHE_SHARED:
+        from app.services.carriers.rate_cache import purge_expired_rate_quotes
+        scheduler.add_job(
+            purge_expired_rate_quotes,
+            trigger=IntervalTrigger(hours=1),
+            id="rate_quote_cache_purge",
+            name="Rate Quote Cache Purge (Hourly)",
+            replace_existing=True,
+            max_instances=1,
+        )
+        logger.info("Scheduled rate quote cache purge job: every hour")
+
+    # ── AWB pool reservation cleanup ─────────────────────────────────
+    from app.services.carriers.awb_pool import reclaim_stale_awb_reservations
+    scheduler.add_job(
+        reclaim_stale_awb_reservations,
+        trigger=IntervalTrigger(hours=1),
+        id="awb_reservation_reclaim",
+        name="AWB Pool Reservation Reclaim (Hourly)",
+        replace_existing=True,
+        max_instances=1,
+    )
+    logger.info("Scheduled AWB reservation reclaim job: every hour")
+
     scheduler.start()
     logger.info("Scheduler started with Detection Engine job (every 15 minutes)")
 
@@ -0,0 +1,740 @@
+"""
+Shipping Allocation Engine — Picks a carrier per order.
+
+A company's active ShippingAllocationRules are compiled once (cached per
+company for ALLOCATION_ENGINE_TTL_SECONDS, dropped as soon as a rule, CSR
+config or TransporterConfig of the company changes in this process):
+- rules are bucketed by shipment type and channel, priority order kept,
+  so an order only walks the rules that can apply to it
+- each rule's JSON conditions become a tuple of predicates over the
+  order's pre-extracted facts
+- the company's active carriers and their latest CarrierPerformance scores
+  are loaded with the rules
+
+Orders are evaluated in bulk: facts for all orders come from a handful of
+queries, PincodePerformance is loaded once for the batch's destination
+pincodes, serviceability comes from the in-memory index and rates from the
+compiled rate cards, so choosing a carrier does no I/O. AllocationAudit
+rows are written in batches.
+
+Rule actions: a fixed transporterId (then fallbackTransporterId) if it
+serves the destination, or CSR scoring (rule's csrConfigId, else the
+company default) over all serviceable carriers. Orders no rule matches are
+CSR-scored with the default config, if there is one.
+
+Supported condition keys (ShippingAllocationRule.conditions):
+    channel, paymentMode, orderType     value or list of values
+    destPincodes, destPincodePrefixes   list
+    destStates, destCities              list (case-insensitive)
+    originLocationIds                   list of Location ids
+    weightMin, weightMax                grams, inclusive
+    orderValueMin, orderValueMax        order totalAmount, inclusive
+    tags                                list, matches if the order has any
+A rule with any other key never matches (logged when it is compiled).
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import bindparam, event, func, insert, update
+from sqlalchemy.orm import Session as SASession, object_session
+from sqlmodel import Session, select
+
+from app.models import (
+    AllocationAudit, CarrierPerformance, CSRScoreConfig, Delivery, Location,
+    Order, OrderItem, PincodePerformance, ShippingAllocationRule, SKU,
+    Transporter, TransporterConfig,
+)
+from app.models.enums import AllocationDecisionReason, AllocationMode, ShipmentType
+from app.services.carriers.rate_engine import RateCardEngine
+from app.services.carriers.serviceability import get_serviceability_index
+
+logger = logging.getLogger(__name__)
+
+
+ALLOCATION_ENGINE_TTL_SECONDS = 600
+ALLOCATION_CHUNK_SIZE = 1000
+DEFAULT_WEIGHT_GRAMS = 500
+NEUTRAL_SCORE = 50.0  # Used when a carrier has no performance data yet
+
+
+def _num(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def _as_set(value) -> frozenset:
+    values = value if isinstance(value, (list, tuple, set)) else [value]
+    return frozenset(str(v).strip().upper() for v in values if v is not None)
+
+
+def _chunks(values: list, size: int = ALLOCATION_CHUNK_SIZE):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+# ============================================================================
+# Order facts and decisions
+# ============================================================================
+
+@dataclass
+class OrderFacts:
+    """Everything a rule or the scorer looks at, extracted once per order."""
+    order_id: UUID
+    company_id: UUID
+    channel: str
+    payment_mode: str
+    order_type: str
+    location_id: Optional[UUID]
+    origin_pincode: str
+    dest_pincode: str
+    dest_state: str
+    dest_city: str
+    weight_grams: int
+    order_value: float
+    tags: frozenset = frozenset()
+    delivery_id: Optional[UUID] = None
+
+    @property
+    def service_mode(self) -> str:
+        """Payment mode as carriers see it (credit orders ship prepaid)."""
+        return "COD" if self.payment_mode == "COD" else "PREPAID"
+
+    @property
+    def cod_amount(self) -> float:
+        return self.order_value if self.payment_mode == "COD" else 0
+
+
+@dataclass
+class Candidate:
+    transporter_id: UUID
+    code: str
+    rate: Optional[float]
+    cost_score: float = 0
+    speed_score: float = 0
+    reliability_score: float = 0
+    overall_score: float = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "transporterId": str(self.transporter_id),
+            "code": self.code,
+            "rate": self.rate,
+            "costScore": round(self.cost_score, 2),
+            "speedScore": round(self.speed_score, 2),
+            "reliabilityScore": round(self.reliability_score, 2),
+            "overallScore": round(self.overall_score, 2),
+        }
+
+
+@dataclass
+class AllocationDecision:
+    order_id: UUID
+    delivery_id: Optional[UUID] = None
+    transporter_id: Optional[UUID] = None
+    transporter_code: Optional[str] = None
+    reason: Optional[AllocationDecisionReason] = None
+    mode: str = AllocationMode.AUTO.value
+    rule_id: Optional[UUID] = None
+    rate: Optional[float] = None
+    selected: Optional[Candidate] = None
+    candidates: List[Candidate] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def allocated(self) -> bool:
+        return self.transporter_id is not None
+
+    def as_dict(self) -> dict:
+        return {
+            "orderId": str(self.order_id),
+            "transporterId": str(self.transporter_id) if self.transporter_id else None,
+            "transporterCode": self.transporter_code,
+            "reason": self.reason.value if self.reason else None,
+            "ruleId": str(self.rule_id) if self.rule_id else None,
+            "rate": self.rate,
+            "overallScore": round(self.selected.overall_score, 2) if self.selected else None,
+            "error": self.error,
+        }
+
+
+# ============================================================================
+# Compiled rules
+# ============================================================================
+
+Predicate = Callable[[OrderFacts], bool]
+
+
+def _compile_conditions(conditions: Optional[Dict[str, Any]]) -> Optional[Tuple[Predicate, ...]]:
+    """Predicates for a rule's conditions; None if a key isn't supported."""
+    checks: List[Predicate] = []
+    for key, value in (conditions or {}).items():
+        if value is None or value == [] or value == "":
+            continue
+        if key in ("channel", "paymentMode", "orderType"):
+            allowed = _as_set(value)
+            attr = {"channel": "channel", "paymentMode": "payment_mode", "orderType": "order_type"}[key]
+            checks.append(lambda f, a=attr, s=allowed: getattr(f, a) in s)
+        elif key == "destPincodes":
+            pincodes = frozenset(str(v).strip() for v in value)
+            checks.append(lambda f, s=pincodes: f.dest_pincode in s)
+        elif key == "destPincodePrefixes":
+            prefixes = tuple(str(v).strip() for v in value)
+            checks.append(lambda f, p=prefixes: f.dest_pincode.startswith(p))
+        elif key in ("destStates", "destCities"):
+            allowed = _as_set(value)
+            attr = "dest_state" if key == "destStates" else "dest_city"
+            checks.append(lambda f, a=attr, s=allowed: getattr(f, a) in s)
+        elif key == "originLocationIds":
+            ids = frozenset(str(v) for v in value)
+            checks.append(lambda f, s=ids: str(f.location_id) in s)
+        elif key in ("weightMin", "orderValueMin"):
+            bound = float(value)
+            attr = "weight_grams" if key == "weightMin" else "order_value"
+            checks.append(lambda f, a=attr, b=bound: getattr(f, a) >= b)
+        elif key in ("weightMax", "orderValueMax"):
+            bound = float(value)
+            attr = "weight_grams" if key == "weightMax" else "order_value"
+            checks.append(lambda f, a=attr, b=bound: getattr(f, a) <= b)
+        elif key == "tags":
+            tags = _as_set(value)
+            checks.append(lambda f, s=tags: not s.isdisjoint(f.tags))
+        else:
+            return None
+    return tuple(checks)
+
+
+@dataclass(frozen=True)
+class CompiledCSR:
+    config_id: UUID
+    cost_weight: float
+    speed_weight: float
+    reliability_weight: float
+    min_reliability: Optional[float]
+    max_cost: Optional[float]
+    mode: str
+
+    @classmethod
+    def from_config(cls, config: CSRScoreConfig) -> "CompiledCSR":
+        mode = config.defaultMode
+        return cls(
+            config_id=config.id,
+            cost_weight=float(config.costWeight or 0),
+            speed_weight=float(config.speedWeight or 0),
+            reliability_weight=float(config.reliabilityWeight or 0),
+            min_reliability=_num(config.minReliabilityScore),
+            max_cost=_num(config.maxCostThreshold),
+            mode=mode.value if hasattr(mode, "value") else str(mode or AllocationMode.AUTO.value),
+        )
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    rule_id: UUID
+    code: str
+    checks: Tuple[Predicate, ...]
+    channels: Optional[frozenset]  # None = any channel
+    transporter_id: Optional[UUID]
+    fallback_transporter_id: Optional[UUID]
+    csr: Optional[CompiledCSR]     # set for useCSRScoring rules (None = company default)
+    use_csr: bool
+
+    def matches(self, facts: OrderFacts) -> bool:
+        for check in self.checks:
+            if not check(facts):
+                return False
+        return True
+
+
+@dataclass(frozen=True)
+class CarrierScores:
+    speed: Optional[float]
+    reliability: Optional[float]
+    cost: Optional[float]
+
+
+@dataclass
+class CompanyAllocation:
+    """Compiled allocation setup of one company."""
+    # shipment type -> channel (None = channels no rule names) -> rules in priority order
+    dispatch: Dict[str, Dict[Optional[str], List[CompiledRule]]]
+    default_csr: Dict[Optional[str], CompiledCSR]               # shipment type (None = any)
+    carriers: Dict[UUID, str]                                   # active transporterId -> code
+    performance: Dict[str, Dict[UUID, CarrierScores]]           # shipment type -> carrier scores
+    expires_at: float
+
+    def rules_for(self, shipment_type: str, channel: str) -> List[CompiledRule]:
+        table = self.dispatch.get(shipment_type)
+        if not table:
+            return []
+        return table.get(channel, table[None])
+
+
+# ── Compiled cache ─────────────────────────────────────────────────────
+_compiled: Dict[UUID, CompanyAllocation] = {}
+_compiled_lock = threading.Lock()
+
+
+def invalidate_allocation_engine(company_id: Optional[UUID] = None):
+    """Drop compiled allocation setup for one company, or for all companies."""
+    with _compiled_lock:
+        if company_id is None:
+            _compiled.clear()
+        else:
+            _compiled.pop(company_id, None)
+
+
+def _on_setup_change(mapper, connection, target):
+    company_id = getattr(target, "companyId", None)
+    invalidate_allocation_engine(company_id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("allocation_engine_invalidate", set()).add(company_id)
+
+
+def _on_commit(session):
+    for company_id in session.info.pop("allocation_engine_invalidate", ()):
+        invalidate_allocation_engine(company_id)
+
+
+for _model in (ShippingAllocationRule, CSRScoreConfig, TransporterConfig):
+    for _event_name in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event_name, _on_setup_change)
+event.listen(SASession, "after_commit", _on_commit)
+
+
+# ============================================================================
+# Engine
+# ============================================================================
+
+class ShippingAllocationEngine:
+    """
+    Bulk carrier allocation.
+
+    Usage:
+        engine = ShippingAllocationEngine(session)
+        facts = engine.load_order_facts(company_id, order_ids)
+        decisions = engine.allocate(company_id, facts)
+        engine.write_audit(company_id, decisions)
+        session.commit()
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+        self.rate_engine = RateCardEngine(session)
+
+    # ── Allocation ───────────────────────────────────────────────────────
+
+    def allocate(
+        self,
+        company_id: UUID,
+        orders: List[OrderFacts],
+        shipment_type: ShipmentType = ShipmentType.B2C,
+    ) -> List[AllocationDecision]:
+        """One decision per order, in input order."""
+        started = time.perf_counter()
+        setup = self._setup(company_id)
+        shipment_type = shipment_type.value if hasattr(shipment_type, "value") else str(shipment_type)
+        index = get_serviceability_index(self.session)
+        pincode_scores = self._pincode_performance(company_id, {o.dest_pincode for o in orders})
+        carrier_scores = setup.performance.get(shipment_type, {})
+        default_csr = setup.default_csr.get(shipment_type) or setup.default_csr.get(None)
+
+        decisions = []
+        for facts in orders:
+            decision = None
+            for rule in setup.rules_for(shipment_type, facts.channel):
+                if not rule.matches(facts):
+                    continue
+                if rule.use_csr:
+                    csr = rule.csr or default_csr
+                    if csr is None:
+                        continue
+                    decision = self._score(facts, setup, csr, index, carrier_scores, pincode_scores)
+                else:
+                    decision = self._fixed(facts, setup, rule, index)
+                if decision is not None:
+                    decision.rule_id = rule.rule_id
+                    break
+
+            if decision is None and default_csr is not None:
+                decision = self._score(facts, setup, default_csr, index, carrier_scores, pincode_scores)
+            if decision is None:
+                decision = AllocationDecision(
+                    order_id=facts.order_id, error="No matching rule or serviceable carrier"
+                )
+            decision.delivery_id = facts.delivery_id
+            decisions.append(decision)
+
+        elapsed = (time.perf_counter() - started) * 1000
+        logger.info(
+            f"Allocated {sum(d.allocated for d in decisions)}/{len(orders)} orders for company "
+            f"{company_id} in {elapsed:.0f}ms ({elapsed / max(1, len(orders)):.3f}ms/order)"
+        )
+        return decisions
+
+    def _serviceable(self, index, transporter_id: UUID, facts: OrderFacts) -> bool:
+        # Carriers without loaded pincodes are assumed serviceable
+        return index.is_serviceable(transporter_id, facts.dest_pincode, facts.service_mode) is not False
+
+    def _quote(self, transporter_id: UUID, facts: OrderFacts) -> Tuple[bool, Optional[float]]:
+        """(serviceable per rate card, rate if the card prices it)."""
+        quotes = self.rate_engine.quote(
+            facts.company_id, transporter_id, facts.origin_pincode, facts.dest_pincode,
+            facts.weight_grams, facts.service_mode, facts.cod_amount,
+        )
+        if quotes is None:
+            return True, None
+        if not quotes:
+            return False, None
+        return True, min(q.rate + q.cod_charges for q in quotes)
+
+    def _fixed(self, facts: OrderFacts, setup: CompanyAllocation, rule: CompiledRule, index) -> Optional[AllocationDecision]:
+        for transporter_id, reason in (
+            (rule.transporter_id, AllocationDecisionReason.RULE_MATCHED),
+            (rule.fallback_transporter_id, AllocationDecisionReason.FALLBACK),
+        ):
+            if not transporter_id or transporter_id not in setup.carriers:
+                continue
+            if not self._serviceable(index, transporter_id, facts):
+                continue
+            serviceable, rate = self._quote(transporter_id, facts)
+            if not serviceable:
+                continue
+            return AllocationDecision(
+                order_id=facts.order_id,
+                transporter_id=transporter_id,
+                transporter_code=setup.carriers[transporter_id],
+                reason=reason,
+                rate=rate,
+            )
+        return None
+
+    def _score(
+        self,
+        facts: OrderFacts,
+        setup: CompanyAllocation,
+        csr: CompiledCSR,
+        index,
+        carrier_scores: Dict[UUID, CarrierScores],
+        pincode_scores: Dict[Tuple[str, UUID], CarrierScores],
+    ) -> Optional[AllocationDecision]:
+        """CSR-score every serviceable carrier; None if none qualifies."""
+        candidates: List[Candidate] = []
+        for transporter_id, code in setup.carriers.items():
+            if not self._serviceable(index, transporter_id, facts):
+                continue
+            serviceable, rate = self._quote(transporter_id, facts)
+            if not serviceable:
+                continue
+            if csr.max_cost is not None and rate is not None and rate > csr.max_cost:
+                continue
+
+            scores = pincode_scores.get((facts.dest_pincode, transporter_id)) or carrier_scores.get(transporter_id)
+            reliability = scores.reliability if scores and scores.reliability is not None else NEUTRAL_SCORE
+            if csr.min_reliability is not None and reliability < csr.min_reliability:
+                continue
+            candidates.append(Candidate(
+                transporter_id=transporter_id,
+                code=code,
+                rate=rate,
+                cost_score=scores.cost if scores and scores.cost is not None else NEUTRAL_SCORE,
+                speed_score=scores.speed if scores and scores.speed is not None else NEUTRAL_SCORE,
+                reliability_score=reliability,
+            ))
+        if not candidates:
+            return None
+
+        # Cost: relative to the cheapest priced candidate when rates are known
+        rates = [c.rate for c in candidates if c.rate]
+        cheapest = min(rates) if rates else None
+        for c in candidates:
+            if cheapest and c.rate:
+                c.cost_score = 100 * cheapest / c.rate
+            c.overall_score = (
+                csr.cost_weight * c.cost_score
+                + csr.speed_weight * c.speed_score
+                + csr.reliability_weight * c.reliability_score
+            )
+
+        candidates.sort(key=lambda c: (-c.overall_score, c.rate if c.rate is not None else float("inf")))
+        best = candidates[0]
+        return AllocationDecision(
+            order_id=facts.order_id,
+            transporter_id=best.transporter_id,
+            transporter_code=best.code,
+            reason=(
+                AllocationDecisionReason.ONLY_SERVICEABLE if len(candidates) == 1
+                else AllocationDecisionReason.BEST_CSR_SCORE
+            ),
+            mode=csr.mode,
+            rate=best.rate,
+            selected=best,
+            candidates=candidates,
+        )
+
+    # ── Compilation ──────────────────────────────────────────────────────
+
+    def _setup(self, company_id: UUID) -> CompanyAllocation:
+        with _compiled_lock:
+            setup = _compiled.get(company_id)
+        if setup is not None and setup.expires_at > time.monotonic():
+            return setup
+
+        setup = self._compile(company_id)
+        with _compiled_lock:
+            _compiled[company_id] = setup
+        return setup
+
+    def _compile(self, company_id: UUID) -> CompanyAllocation:
+        started = time.perf_counter()
+
+        csr_configs = {
+            c.id: c for c in self.session.exec(
+                select(CSRScoreConfig).where(CSRScoreConfig.companyId == company_id)
+            ).all()
+        }
+        default_csr: Dict[Optional[str], CompiledCSR] = {}
+        for config in sorted(csr_configs.values(), key=lambda c: c.createdAt, reverse=True):
+            if config.isDefault:
+                key = config.shipmentType.value if hasattr(config.shipmentType, "value") else config.shipmentType
+                default_csr.setdefault(key, CompiledCSR.from_config(config))
+
+        rules = self.session.exec(
+            select(ShippingAllocationRule)
+            .where(
+                ShippingAllocationRule.companyId == company_id,
+                ShippingAllocationRule.isActive == True,
+            )
+            .order_by(ShippingAllocationRule.priority, ShippingAllocationRule.createdAt)
+        ).all()
+
+        compiled: List[Tuple[Optional[str], CompiledRule]] = []
+        for rule in rules:
+            checks = _compile_conditions(rule.conditions)
+            if checks is None:
+                logger.warning(
+                    f"Allocation rule {rule.code} has unsupported conditions "
+                    f"{sorted(rule.conditions)}; it will not match"
+                )
+                continue
+            channels = (rule.conditions or {}).get("channel")
+            shipment_type = rule.shipmentType.value if hasattr(rule.shipmentType, "value") else rule.shipmentType
+            compiled.append((shipment_type, CompiledRule(
+                rule_id=rule.id,
+                code=rule.code,
+                checks=checks,
+                channels=_as_set(channels) if channels else None,
+                transporter_id=rule.transporterId,
+                fallback_transporter_id=rule.fallbackTransporterId,
+                csr=(
+                    CompiledCSR.from_config(csr_configs[rule.csrConfigId])
+                    if rule.useCSRScoring and rule.csrConfigId in csr_configs else None
+                ),
+                use_csr=rule.useCSRScoring,
+            )))
+
+        # Decision table: for each shipment type and channel, the rules that can apply
+        named_channels = set()
+        for _, rule in compiled:
+            named_channels |= rule.channels or set()
+        dispatch: Dict[str, Dict[Optional[str], List[CompiledRule]]] = {}
+        for shipment_type in ShipmentType:
+            table: Dict[Optional[str], List[CompiledRule]] = {}
+            for channel in [None, *named_channels]:
+                table[channel] = [
+                    rule for rule_type, rule in compiled
+                    if rule_type in (None, shipment_type.value)
+                    and (rule.channels is None or (channel is not None and channel in rule.channels))
+                ]
+            dispatch[shipment_type.value] = table
+
+        carriers = {
+            row.id: row.code
+            for row in self.session.exec(
+                select(Transporter.id, Transporter.code)
+                .join(TransporterConfig, TransporterConfig.transporterId == Transporter.id)
+                .where(
+                    TransporterConfig.companyId == company_id,
+                    TransporterConfig.isActive == True,
+                    Transporter.isActive == True,
+                )
+            ).all()
+        }
+
+        # Latest period per (shipment type, carrier)
+        performance: Dict[str, Dict[UUID, CarrierScores]] = defaultdict(dict)
+        for perf in self.session.exec(
+            select(CarrierPerformance)
+            .where(CarrierPerformance.companyId == company_id)
+            .order_by(CarrierPerformance.periodEnd.desc())
+        ).all():
+            key = perf.shipmentType.value if hasattr(perf.shipmentType, "value") else perf.shipmentType
+            performance[key].setdefault(perf.transporterId, CarrierScores(
+                speed=_num(perf.speedScore),
+                reliability=_num(perf.reliabilityScore),
+                cost=_num(perf.costScore),
+            ))
+
+        logger.info(
+            f"Compiled {len(compiled)} allocation rules and {len(carriers)} carriers for "
+            f"company {company_id} in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+        return CompanyAllocation(
+            dispatch=dispatch,
+            default_csr=default_csr,
+            carriers=carriers,
+            performance=dict(performance),
+            expires_at=time.monotonic() + ALLOCATION_ENGINE_TTL_SECONDS,
+        )
+
+    def _pincode_performance(
+        self, company_id: UUID, pincodes: Iterable[str]
+    ) -> Dict[Tuple[str, UUID], CarrierScores]:
+        """Latest PincodePerformance per (pincode, carrier) for the batch's destinations."""
+        scores: Dict[Tuple[str, UUID], CarrierScores] = {}
+        for chunk in _chunks(sorted(p for p in pincodes if p)):
+            for perf in self.session.exec(
+                select(
+                    PincodePerformance.pincode, PincodePerformance.transporterId,
+                    PincodePerformance.speedScore, PincodePerformance.reliabilityScore,
+                    PincodePerformance.costScore,
+                )
+                .where(
+                    PincodePerformance.companyId == company_id,
+                    PincodePerformance.pincode.in_(chunk),
+                )
+                .order_by(PincodePerformance.periodEnd.desc())
+            ).all():
+                scores.setdefault((perf.pincode, perf.transporterId), CarrierScores(
+                    speed=_num(perf.speedScore),
+                    reliability=_num(perf.reliabilityScore),
+                    cost=_num(perf.costScore),
+                ))
+        return scores
+
+    # ── Order facts ──────────────────────────────────────────────────────
+
+    def load_order_facts(self, company_id: UUID, order_ids: List[UUID]) -> List[OrderFacts]:
+        """Facts for the company's orders (unknown ids are skipped), in input order."""
+        by_id: Dict[UUID, OrderFacts] = {}
+        for chunk in _chunks(list(dict.fromkeys(order_ids))):
+            orders = self.session.exec(
+                select(Order).where(Order.id.in_(chunk), Order.companyId == company_id)
+            ).all()
+            if not orders:
+                continue
+
+            location_ids = {o.locationId for o in orders if o.locationId}
+            origin = {
+                row.id: (row.address or {}) if isinstance(row.address, dict) else {}
+                for row in self.session.exec(
+                    select(Location.id, Location.address).where(Location.id.in_(location_ids))
+                ).all()
+            } if location_ids else {}
+
+            # Open delivery (no AWB yet) and its packed weight (kg), newest first
+            deliveries: Dict[UUID, Tuple[UUID, Optional[Decimal]]] = {}
+            for row in self.session.exec(
+                select(Delivery.orderId, Delivery.id, Delivery.weight)
+                .where(Delivery.orderId.in_(chunk), Delivery.awbNo.is_(None))
+                .order_by(Delivery.createdAt.desc())
+            ).all():
+                deliveries.setdefault(row.orderId, (row.id, row.weight))
+
+            # Catalogue weight (kg) for orders that haven't been packed
+            item_weights = dict(self.session.exec(
+                select(OrderItem.orderId, func.sum(OrderItem.quantity * SKU.weight))
+                .join(SKU, SKU.id == OrderItem.skuId)
+                .where(OrderItem.orderId.in_(chunk))
+                .group_by(OrderItem.orderId)
+            ).all())
+
+            for order in orders:
+                ship_addr = order.shippingAddress or {}
+                delivery_id, packed_kg = deliveries.get(order.id, (None, None))
+                weight_kg = packed_kg or item_weights.get(order.id)
+                by_id[order.id] = OrderFacts(
+                    order_id=order.id,
+                    company_id=order.companyId,
+                    channel=str(getattr(order.channel, "value", order.channel)).upper(),
+                    payment_mode=str(getattr(order.paymentMode, "value", order.paymentMode)).upper(),
+                    order_type=str(getattr(order.orderType, "value", order.orderType) or "").upper(),
+                    location_id=order.locationId,
+                    origin_pincode=str(origin.get(order.locationId, {}).get("pincode", "")).strip(),
+                    dest_pincode=str(ship_addr.get("pincode", "")).strip(),
+                    dest_state=str(ship_addr.get("state", "")).strip().upper(),
+                    dest_city=str(ship_addr.get("city", "")).strip().upper(),
+                    weight_grams=int(float(weight_kg) * 1000) if weight_kg else DEFAULT_WEIGHT_GRAMS,
+                    order_value=float(order.totalAmount or 0),
+                    tags=_as_set(order.tags or []),
+                    delivery_id=delivery_id,
+                )
+
+        return [by_id[i] for i in order_ids if i in by_id]
+
+    # ── Writes ───────────────────────────────────────────────────────────
+
+    def write_audit(
+        self,
+        company_id: UUID,
+        decisions: List[AllocationDecision],
+        shipment_type: ShipmentType = ShipmentType.B2C,
+        allocated_by: Optional[UUID] = None,
+    ) -> int:
+        """Insert one AllocationAudit row per allocated order, in batches."""
+        now = datetime.utcnow()
+        shipment_type = shipment_type.value if hasattr(shipment_type, "value") else str(shipment_type)
+        rows = []
+        for d in decisions:
+            if not d.allocated:
+                continue
+            rows.append({
+                "id": uuid4(),
+                "companyId": company_id,
+                "shipmentType": shipment_type,
+                "orderId": d.order_id,
+                "deliveryId": d.delivery_id,
+                "ftlIndentId": None,
+                "allocationMode": d.mode,
+                "selectedTransporterId": d.transporter_id,
+                "decisionReason": d.reason.value,
+                "costScore": round(d.selected.cost_score, 2) if d.selected else None,
+                "speedScore": round(d.selected.speed_score, 2) if d.selected else None,
+                "reliabilityScore": round(d.selected.reliability_score, 2) if d.selected else None,
+                "overallScore": round(d.selected.overall_score, 2) if d.selected else None,
+                "calculatedRate": d.rate,
+                "candidatesConsidered": (
+                    {"candidates": [c.as_dict() for c in d.candidates]} if d.candidates else None
+                ),
+                "matchedRuleId": d.rule_id,
+                "allocatedById": allocated_by,
+                "overrideReason": None,
+                "createdAt": now,
+                "updatedAt": now,
+            })
+        for chunk in _chunks(rows):
+            self.session.execute(insert(AllocationAudit), chunk)
+        return len(rows)
+
+    def assign_deliveries(self, decisions: List[AllocationDecision]) -> int:
+        """Set transporterId on open deliveries (no AWB yet) of allocated orders."""
+        params = [
+            {"b_id": d.delivery_id, "b_transporter": d.transporter_id}
+            for d in decisions if d.allocated and d.delivery_id
+        ]
+        if not params:
+            return 0
+        table = Delivery.__table__
+        self.session.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"), table.c.awbNo.is_(None))
+            .values(transporterId=bindparam("b_transporter"), updatedAt=datetime.utcnow()),
+            params,
+        )
+        return len(params)
@@ -4,6 +4,7 @@ Wires existing carrier adapters into the order fulfillment flow.
 """
 import asyncio
 import logging
+import threading
 from datetime import datetime
 from decimal import Decimal
 from typing import Any, Dict, List, Optional
@@ -16,6 +17,7 @@ from app.models import (
     OrderStatus, DeliveryStatus,
 )
 from app.models.transporter import Transporter, TransporterConfig, Manifest, ManifestStatus
+from app.services.carriers.awb_pool import AWBAllocator, replenish_in_background
 from app.services.carriers.base import (
     Address, ShipmentRequest, PackageItem,
     ShipmentResponse, TrackingResponse, RateResponse, RateQuote,
@@ -23,9 +25,93 @@ from app.services.carriers.base import (
 from app.services.carriers.factory import (
     get_carrier_adapter, get_carrier_for_company, CARRIER_REGISTRY,
 )
+from app.services.carriers.rate_cache import RateCache, cod_slab, lane_key, weight_slab
+from app.services.carriers.rate_engine import RateCardEngine
 
 logger = logging.getLogger(__name__)
 
+# Background rate refreshes / AWB top-ups run on a long-lived loop of their
+# own thread: callers often drive ShippingService through asyncio.run(),
+# whose loop closes (cancelling its tasks) as soon as the call returns.
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_lock = threading.Lock()
+# Jobs in flight (keeps them referenced until done)
+_background_jobs: set = set()
+
+
+def _run_in_background(coro):
+    """Run `coro` to completion on the background loop (fire-and-forget)."""
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_background_loop.run_forever, name="shipping-background", daemon=True,
+            ).start()
+        future = asyncio.run_coroutine_threadsafe(coro, _background_loop)
+    _background_jobs.add(future)
+    future.add_done_callback(_background_jobs.discard)
+    return future
+
+
+# Order statuses that can be handed to a carrier
+SHIPPABLE_STATUSES = [
+    OrderStatus.PACKED, OrderStatus.INVOICED, OrderStatus.MANIFESTED,
+]
+
+
+def build_shipment_request(
+    order: Order,
+    location: Location,
+    company_id: UUID,
+    weight_grams: int = 500,
+    length_cm: float = 10,
+    breadth_cm: float = 10,
+    height_cm: float = 10,
+    awb_number: str = "",
+) -> ShipmentRequest:
+    """Carrier-agnostic shipment request for an order shipped from `location`."""
+    # Build addresses
+    loc_addr = location.address if isinstance(location.address, dict) else {}
+    pickup = Address(
+        name=loc_addr.get("name", location.name),
+        phone=loc_addr.get("phone", ""),
+        address_line1=loc_addr.get("line1", loc_addr.get("address", "")),
+        city=loc_addr.get("city", ""),
+        state=loc_addr.get("state", ""),
+        pincode=loc_addr.get("pincode", ""),
+    )
+
+    ship_addr = order.shippingAddress or {}
+    delivery_addr = Address(
+        name=ship_addr.get("name", order.customerName),
+        phone=order.customerPhone,
+        address_line1=ship_addr.get("line1", ""),
+        city=ship_addr.get("city", ""),
+        state=ship_addr.get("state", ""),
+        pincode=ship_addr.get("pincode", ""),
+        email=order.customerEmail or "",
+    )
+
+    payment_mode = order.paymentMode.value if hasattr(order.paymentMode, "value") else str(order.paymentMode)
+    cod_amount = float(order.totalAmount) if payment_mode == "COD" else 0
+
+    return ShipmentRequest(
+        order_id=str(order.id),
+        company_id=str(company_id),
+        pickup=pickup,
+        delivery=delivery_addr,
+        weight_grams=weight_grams,
+        length_cm=length_cm,
+        breadth_cm=breadth_cm,
+        height_cm=height_cm,
+        payment_mode=payment_mode,
+        cod_amount=cod_amount,
+        invoice_value=float(order.totalAmount),
+        product_description=f"Order {order.orderNo}",
+        awb_number=awb_number,
+    )
+
 
 class ShippingService:
     """Encapsulates all carrier interaction logic for shipping orders."""
@@ -55,10 +141,7 @@ class ShippingService:
             return {"success": False, "error": "Order not found"}
 
         # Validate order status
-        shippable = [
-            OrderStatus.PACKED, OrderStatus.INVOICED, OrderStatus.MANIFESTED,
-        ]
-        if order.status not in shippable:
+        if order.status not in SHIPPABLE_STATUSES:
             return {
                 "success": False,
                 "error": f"Order in {order.status.value} status cannot be shipped. Must be PACKED/INVOICED/MANIFESTED.",
@@ -79,62 +162,66 @@ class ShippingService:
         if not location:
             return {"success": False, "error": "Order location not found"}
 
-        # Build addresses
-        loc_addr = location.address if isinstance(location.address, dict) else {}
-        pickup = Address(
-            name=loc_addr.get("name", location.name),
-            phone=loc_addr.get("phone", ""),
-            address_line1=loc_addr.get("line1", loc_addr.get("address", "")),
-            city=loc_addr.get("city", ""),
-            state=loc_addr.get("state", ""),
-            pincode=loc_addr.get("pincode", ""),
-        )
+        # Find transporter record
+        transporter = self.session.exec(
+            select(Transporter).where(Transporter.code == carrier_code.upper())
+        ).first()
 
-        ship_addr = order.shippingAddress or {}
-        delivery_addr = Address(
-            name=ship_addr.get("name", order.customerName),
-            phone=order.customerPhone,
-            address_line1=ship_addr.get("line1", ""),
-            city=ship_addr.get("city", ""),
-            state=ship_addr.get("state", ""),
-            pincode=ship_addr.get("pincode", ""),
-            email=order.customerEmail or "",
-        )
+        # Pre-assigned AWB from the pool (carriers that take one)
+        allocator = AWBAllocator(self.session)
+        pooled_awb = None
+        if transporter and adapter.uses_awb_pool:
+            pooled_awb = allocator.take(company_id, transporter.id)
+            if allocator.needs_replenishment(company_id, transporter.id):
+                _run_in_background(
+                    replenish_in_background(company_id, transporter.id, carrier_code)
+                )
 
         # Build shipment request
-        payment_mode = order.paymentMode.value if hasattr(order.paymentMode, "value") else str(order.paymentMode)
-        cod_amount = float(order.totalAmount) if payment_mode == "COD" else 0
-
-        request = ShipmentRequest(
-            order_id=str(order.id),
-            company_id=str(company_id),
-            pickup=pickup,
-            delivery=delivery_addr,
-            weight_grams=weight_grams,
-            length_cm=length_cm,
-            breadth_cm=breadth_cm,
-            height_cm=height_cm,
-            payment_mode=payment_mode,
-            cod_amount=cod_amount,
-            invoice_value=float(order.totalAmount),
-            product_description=f"Order {order.orderNo}",
-        )
+        try:
+            request = build_shipment_request(
+                order, location, company_id,
+                weight_grams=weight_grams,
+                length_cm=length_cm,
+                breadth_cm=breadth_cm,
+                height_cm=height_cm,
+                awb_number=pooled_awb or "",
+            )
+        except Exception:
+            # The carrier never saw the AWB, so it can go back to the pool
+            if pooled_awb:
+                allocator.release(company_id, transporter.id, pooled_awb)
+            raise
+
+        if pooled_awb:
+            try:
+                while pooled_awb and allocator.mark_sent([(pooled_awb, order.orderNo)]):
+                    # Reservation reclaimed under us: the number may be someone else's now
+                    pooled_awb = allocator.take(company_id, transporter.id)
+                    request.awb_number = pooled_awb or ""
+            except Exception:
+                if pooled_awb:
+                    allocator.release(company_id, transporter.id, pooled_awb)
+                raise
 
         # Call carrier API
         try:
             response: ShipmentResponse = await adapter.create_shipment(request)
         except Exception as e:
             logger.error(f"Carrier API error for {carrier_code}: {e}")
-            return {"success": False, "error": f"Carrier API error: {str(e)}"}
+            response = ShipmentResponse(success=False, error=f"Carrier API error: {str(e)}")
+
+        if pooled_awb:
+            if response.success and response.awb_number == pooled_awb:
+                allocator.record(pooled_awb, used_for=order.orderNo)
+            else:
+                # Rejections and timeouts alike: the carrier may have booked
+                # or burnt the number, so it must not be handed out again
+                allocator.quarantine([pooled_awb], order.orderNo)
 
         if not response.success:
             return {"success": False, "error": response.error or "Carrier rejected shipment"}
 
-        # Find transporter record
-        transporter = self.session.exec(
-            select(Transporter).where(Transporter.code == carrier_code.upper())
-        ).first()
-
         # Generate delivery number
         now = datetime.utcnow()
         delivery_no = f"DLV-{now.strftime('%Y%m%d%H%M%S')}-{str(uuid4())[:4].upper()}"
@@ -196,9 +283,13 @@ class ShippingService:
         weight_grams: int,
         payment_mode: str = "PREPAID",
         cod_amount: float = 0,
+        live: bool = False,
     ) -> Dict[str, Any]:
         """
         Get rate quotes from all active carriers in parallel.
+        Carriers with an active rate card are priced locally (rate_engine.py)
+        unless `live` is set; the rest are served from the lane cache where
+        possible (rate_cache.py).
         Returns sorted quotes (cheapest first).
         """
         # Get all active carrier configs for this company
@@ -215,22 +306,64 @@ class ShippingService:
         if not configs:
             return {"success": True, "quotes": [], "message": "No active carriers configured"}
 
-        # Call get_rates on all carriers in parallel
-        async def fetch_rate(config_pair):
-            config, transporter = config_pair
+        # Quote each carrier from the lane cache, calling its API on a miss.
+        # Carriers are asked for the top of the weight / COD slab so the
+        # answer is valid for every parcel that shares the lane key.
+        engine = RateCardEngine(self.session)
+        cache = RateCache(self.session)
+        quote_weight = weight_slab(weight_grams)
+        quote_cod = cod_slab(payment_mode, cod_amount)
+
+        async def call_carrier(adapter, carrier_code: str) -> Optional[List[RateQuote]]:
             try:
-                adapter = get_carrier_adapter(transporter.code, config.credentials or {})
-                if not adapter:
-                    return None
                 rate_resp: RateResponse = await adapter.get_rates(
-                    origin_pincode, dest_pincode, weight_grams, payment_mode, cod_amount,
+                    origin_pincode, dest_pincode, quote_weight, payment_mode, quote_cod,
                 )
                 if rate_resp.success:
                     return rate_resp.quotes
+                logger.warning(f"Rate check failed for {carrier_code}: {rate_resp.error}")
             except Exception as e:
-                logger.warning(f"Rate check failed for {transporter.code}: {e}")
+                logger.warning(f"Rate check failed for {carrier_code}: {e}")
             return None
 
+        async def refresh(adapter, carrier_code: str, key: str):
+            try:
+                cache.put(key, company_id, carrier_code, await call_carrier(adapter, carrier_code))
+            finally:
+                cache.release_refresh(key)
+
+        async def fetch_rate(config_pair):
+            config, transporter = config_pair
+            if not live:
+                local = engine.quote(
+                    company_id, transporter.id, origin_pincode, dest_pincode,
+                    weight_grams, payment_mode, cod_amount,
+                )
+                if local is not None:
+                    return local
+
+            key = lane_key(
+                company_id, transporter.code, origin_pincode, dest_pincode,
+                weight_grams, payment_mode, cod_amount,
+            )
+            cached = cache.get(key)
+            if cached and cached.is_fresh:
+                return cached.quotes
+
+            adapter = get_carrier_adapter(transporter.code, config.credentials or {})
+            if not adapter:
+                return None
+
+            # Stale-while-revalidate: answer now, refresh once in the background
+            if cached:
+                if cache.claim_refresh(key):
+                    _run_in_background(refresh(adapter, transporter.code, key))
+                return cached.quotes
+
+            quotes = await call_carrier(adapter, transporter.code)
+            cache.put(key, company_id, transporter.code, quotes)
+            return quotes
+
         results = await asyncio.gather(
             *[fetch_rate(c) for c in configs],
             return_exceptions=True,
@@ -256,6 +389,7 @@ class ShippingService:
                     "codCharges": q.cod_charges,
                     "estimatedDays": q.estimated_days,
                     "serviceType": q.service_type,
+                    "source": q.source,
                 }
                 for q in all_quotes
             ],
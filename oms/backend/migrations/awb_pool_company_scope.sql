@@ -0,0 +1,18 @@
+-- ============================================================================
+-- Feature: Company-scoped AWB Pool
+-- Date: 2026-10-16
+-- Description: AWBs fetched from a carrier's waybill API belong to the
+--              carrier account (company) that fetched them. "companyId" ties
+--              them to it, so app/services/carriers/awb_pool.py never hands
+--              one company's waybills to another company's shipments. Rows
+--              without a company (uploaded stock) stay shared.
+-- ============================================================================
+
+ALTER TABLE "AWB" ADD COLUMN IF NOT EXISTS "companyId" UUID REFERENCES "Company"(id);
+
+CREATE INDEX IF NOT EXISTS "AWB_companyId_idx" ON "AWB" ("companyId");
+
+DROP INDEX IF EXISTS "AWB_unused_idx";
+CREATE INDEX IF NOT EXISTS "AWB_unused_idx"
+    ON "AWB" ("transporterId", "companyId", "createdAt")
+    WHERE "isUsed" = false;
@@ -0,0 +1,17 @@
+-- ============================================================================
+-- Feature: Atomic AWB Pool Allocation
+-- Date: 2026-10-16
+-- Description: Indexes for app/services/carriers/awb_pool.py. Block claims
+--              pick the oldest unused AWBs of a transporter
+--              (FOR UPDATE SKIP LOCKED) and count what is left; the partial
+--              index keeps both to a scan of unused rows only. The reclaim
+--              job looks up stale "POOL:" reservations by usedAt.
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS "AWB_unused_idx"
+    ON "AWB" ("transporterId", "createdAt")
+    WHERE "isUsed" = false;
+
+CREATE INDEX IF NOT EXISTS "AWB_pool_reservation_idx"
+    ON "AWB" ("usedAt")
+    WHERE "usedFor" LIKE 'POOL:%';
@@ -0,0 +1,47 @@
+-- ============================================================================
+-- Feature: Bulk Shipment Booking
+-- Date: 2026-10-16
+-- Description: One BulkShipJob row per bulk ship request and one
+--              BulkShipJobItem per order. Items are inserted as each carrier
+--              batch commits; "seq" lets clients stream results after the
+--              last item they have seen.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS "BulkShipJob" (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    "companyId" UUID NOT NULL REFERENCES "Company"(id),
+    status VARCHAR NOT NULL DEFAULT 'RUNNING',
+    total INTEGER NOT NULL DEFAULT 0,
+    shipped INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    "createManifests" BOOLEAN NOT NULL DEFAULT false,
+    "fetchLabels" BOOLEAN NOT NULL DEFAULT true,
+    "manifestIds" JSON,
+    "lastError" VARCHAR,
+    "createdById" UUID REFERENCES "User"(id),
+    "startedAt" TIMESTAMP,
+    "completedAt" TIMESTAMP,
+    "createdAt" TIMESTAMP NOT NULL DEFAULT now(),
+    "updatedAt" TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_bulk_ship_job_company ON "BulkShipJob"("companyId");
+CREATE INDEX IF NOT EXISTS idx_bulk_ship_job_status ON "BulkShipJob"(status);
+
+CREATE TABLE IF NOT EXISTS "BulkShipJobItem" (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    "jobId" UUID NOT NULL REFERENCES "BulkShipJob"(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    "orderId" UUID NOT NULL,
+    "orderNo" VARCHAR,
+    "carrierCode" VARCHAR,
+    success BOOLEAN NOT NULL DEFAULT false,
+    "awbNo" VARCHAR,
+    "deliveryId" UUID,
+    "labelUrl" VARCHAR,
+    error VARCHAR,
+    "createdAt" TIMESTAMP NOT NULL DEFAULT now(),
+    "updatedAt" TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_bulk_ship_job_item_job_seq ON "BulkShipJobItem"("jobId", seq);
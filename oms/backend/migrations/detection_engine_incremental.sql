@@ -0,0 +1,22 @@
+-- ============================================================================
+-- Feature: Incremental Detection Engine
+-- Date: 2026-10-16
+-- Description: The scheduled detection engine now pushes rule conditions into
+--              SQL and only scans rows changed since the rule's last scan.
+--              Adds the per-rule scan watermark and updatedAt indexes on the
+--              scanned entity tables.
+-- ============================================================================
+
+-- Per-rule incremental scan position (NULL = next scan is a full scan)
+ALTER TABLE "DetectionRule" ADD COLUMN IF NOT EXISTS "scanWatermark" TIMESTAMP;
+
+-- Change-window indexes for the scanned entity tables
+CREATE INDEX IF NOT EXISTS idx_order_updated_at ON "Order"("updatedAt");
+CREATE INDEX IF NOT EXISTS idx_delivery_updated_at ON "Delivery"("updatedAt");
+CREATE INDEX IF NOT EXISTS idx_ndr_updated_at ON "NDR"("updatedAt");
+CREATE INDEX IF NOT EXISTS idx_return_updated_at ON "Return"("updatedAt");
+CREATE INDEX IF NOT EXISTS idx_inventory_updated_at ON "Inventory"("updatedAt");
+
+-- Open-exception lookup used once per rule per scan
+CREATE INDEX IF NOT EXISTS idx_exception_entity_type_status
+    ON "Exception"("entityType", "type", "status");
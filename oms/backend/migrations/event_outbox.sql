@@ -0,0 +1,24 @@
+-- ============================================================================
+-- Feature: Event Dispatcher Outbox
+-- Date: 2026-10-16
+-- Description: Durable queue for the in-process event dispatcher. With
+--              EVENT_OUTBOX_ENABLED=true every handler delivery is recorded
+--              here before it runs and deleted once it succeeds, so events
+--              survive restarts. FAILED rows are kept for inspection.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS "EventOutbox" (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    "eventType" VARCHAR NOT NULL,
+    handler VARCHAR NOT NULL,
+    payload JSON,
+    status VARCHAR NOT NULL DEFAULT 'PENDING',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    "nextAttemptAt" TIMESTAMP NOT NULL DEFAULT now(),
+    "lastError" VARCHAR,
+    "createdAt" TIMESTAMP NOT NULL DEFAULT now(),
+    "updatedAt" TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_event_outbox_event_type ON "EventOutbox"("eventType");
+CREATE INDEX IF NOT EXISTS idx_event_outbox_status_next ON "EventOutbox"(status, "nextAttemptAt");
@@ -0,0 +1,61 @@
+-- ============================================================================
+-- Feature: Normalized Lane Keys for PTL / FTL Rate Comparison
+-- Date: 2026-10-16
+-- Description: originKey / destinationKey on PTLRateMatrix, PTLTATMatrix and
+--              FTLLaneRate, so rate comparison matches lanes with an index
+--              lookup instead of leading-wildcard ILIKE scans. New rows get
+--              their keys from the ORM (app/services/lane_rates.py city_key);
+--              this backfills existing rows with the same normalization:
+--              lowercase, runs of non-alphanumerics -> one space, trimmed,
+--              then CITY_ALIASES.
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION pg_temp.city_key(city TEXT) RETURNS TEXT AS $$
+    SELECT CASE k
+        WHEN 'bangalore' THEN 'bengaluru'
+        WHEN 'bombay' THEN 'mumbai'
+        WHEN 'new bombay' THEN 'navi mumbai'
+        WHEN 'calcutta' THEN 'kolkata'
+        WHEN 'madras' THEN 'chennai'
+        WHEN 'gurgaon' THEN 'gurugram'
+        WHEN 'new delhi' THEN 'delhi'
+        WHEN 'poona' THEN 'pune'
+        WHEN 'baroda' THEN 'vadodara'
+        WHEN 'mysore' THEN 'mysuru'
+        WHEN 'mangalore' THEN 'mangaluru'
+        WHEN 'trivandrum' THEN 'thiruvananthapuram'
+        WHEN 'cochin' THEN 'kochi'
+        WHEN 'vizag' THEN 'visakhapatnam'
+        WHEN 'pondicherry' THEN 'puducherry'
+        WHEN 'allahabad' THEN 'prayagraj'
+        ELSE k
+    END
+    FROM (SELECT btrim(regexp_replace(lower(coalesce(city, '')), '[^a-z0-9]+', ' ', 'g')) AS k) t
+$$ LANGUAGE SQL IMMUTABLE;
+
+-- PTLRateMatrix
+ALTER TABLE "PTLRateMatrix" ADD COLUMN IF NOT EXISTS "originKey" VARCHAR(100);
+ALTER TABLE "PTLRateMatrix" ADD COLUMN IF NOT EXISTS "destinationKey" VARCHAR(100);
+UPDATE "PTLRateMatrix"
+SET "originKey" = pg_temp.city_key("originCity"),
+    "destinationKey" = pg_temp.city_key("destinationCity");
+CREATE INDEX IF NOT EXISTS "ix_ptl_rate_matrix_lane_key"
+    ON "PTLRateMatrix"("originKey", "destinationKey");
+
+-- PTLTATMatrix
+ALTER TABLE "PTLTATMatrix" ADD COLUMN IF NOT EXISTS "originKey" VARCHAR(100);
+ALTER TABLE "PTLTATMatrix" ADD COLUMN IF NOT EXISTS "destinationKey" VARCHAR(100);
+UPDATE "PTLTATMatrix"
+SET "originKey" = pg_temp.city_key("originCity"),
+    "destinationKey" = pg_temp.city_key("destinationCity");
+CREATE INDEX IF NOT EXISTS "ix_ptl_tat_matrix_lane_key"
+    ON "PTLTATMatrix"("originKey", "destinationKey");
+
+-- FTLLaneRate
+ALTER TABLE "FTLLaneRate" ADD COLUMN IF NOT EXISTS "originKey" VARCHAR(100);
+ALTER TABLE "FTLLaneRate" ADD COLUMN IF NOT EXISTS "destinationKey" VARCHAR(100);
+UPDATE "FTLLaneRate"
+SET "originKey" = pg_temp.city_key("originCity"),
+    "destinationKey" = pg_temp.city_key("destinationCity");
+CREATE INDEX IF NOT EXISTS "ix_ftl_lane_rate_lane_key"
+    ON "FTLLaneRate"("originKey", "destinationKey");
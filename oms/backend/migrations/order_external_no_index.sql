@@ -0,0 +1,16 @@
+-- ============================================================================
+-- Feature: Duplicate Order Index
+-- Date: 2026-10-16
+-- Description: Index for app/services/orders/duplicate_detector.py. Each
+--              sync batch confirms its possible duplicates with one
+--              WHERE "companyId" = ? AND "externalOrderNo" IN (...) query,
+--              and the per-company index is refreshed from orders created
+--              since its last read.
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS "Order_companyId_externalOrderNo_idx"
+    ON "Order" ("companyId", "externalOrderNo")
+    WHERE "externalOrderNo" IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS "Order_companyId_createdAt_idx"
+    ON "Order" ("companyId", "createdAt");
@@ -0,0 +1,27 @@
+-- ============================================================================
+-- Feature: Carrier Rate Quote Cache (shared tier)
+-- Date: 2026-10-16
+-- Description: Lane-level carrier rate quotes shared by all API workers when
+--              RATE_CACHE_SHARED=true. One row per (company, carrier, lane,
+--              weight slab, payment mode, COD slab) key; empty quotes mark an
+--              unserviceable lane.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS "RateQuoteCache" (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    "cacheKey" VARCHAR NOT NULL UNIQUE,
+    "companyId" UUID NOT NULL REFERENCES "Company"(id),
+    "carrierCode" VARCHAR NOT NULL,
+    quotes JSON,
+    "expiresAt" TIMESTAMPTZ NOT NULL,
+    "staleUntil" TIMESTAMPTZ NOT NULL,
+    "createdAt" TIMESTAMPTZ NOT NULL DEFAULT now(),
+    "updatedAt" TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Tables created by the first version of this script had naive timestamps
+ALTER TABLE "RateQuoteCache" ALTER COLUMN "createdAt" TYPE TIMESTAMPTZ USING "createdAt" AT TIME ZONE 'UTC';
+ALTER TABLE "RateQuoteCache" ALTER COLUMN "updatedAt" TYPE TIMESTAMPTZ USING "updatedAt" AT TIME ZONE 'UTC';
+
+CREATE INDEX IF NOT EXISTS idx_rate_quote_cache_company ON "RateQuoteCache"("companyId");
+CREATE INDEX IF NOT EXISTS idx_rate_quote_cache_stale_until ON "RateQuoteCache"("staleUntil");
@@ -0,0 +1,11 @@
+-- ============================================================================
+-- Feature: Tracking Event Dedup & Ordering
+-- Date: 2026-10-16
+-- Description: Carrier timestamp and fingerprint of the last tracking event
+--              applied to each delivery. Repeated events (webhook retries,
+--              re-polled latest scan) and events older than the last applied
+--              one are dropped before they reach the status pipeline.
+-- ============================================================================
+
+ALTER TABLE "Delivery" ADD COLUMN IF NOT EXISTS "lastEventAt" TIMESTAMPTZ;
+ALTER TABLE "Delivery" ADD COLUMN IF NOT EXISTS "lastEventFingerprint" VARCHAR;
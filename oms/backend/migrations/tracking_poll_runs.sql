@@ -0,0 +1,31 @@
+-- ============================================================================
+-- Feature: Resumable Bulk Tracking Poll
+-- Date: 2026-10-16
+-- Description: One row per bulk tracking poll. Deliveries are polled in id
+--              order and "cursor" holds the last Delivery.id whose result was
+--              committed, so an interrupted poll resumes where it stopped.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS "TrackingPollRun" (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    "companyId" UUID REFERENCES "Company"(id),
+    "carrierCode" VARCHAR,
+    "statusFilter" VARCHAR,
+    "maxDeliveries" INTEGER NOT NULL DEFAULT 100,
+    status VARCHAR NOT NULL DEFAULT 'RUNNING',
+    cursor UUID,
+    scanned INTEGER NOT NULL DEFAULT 0,
+    processed INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    "lastError" VARCHAR,
+    "startedAt" TIMESTAMP,
+    "completedAt" TIMESTAMP,
+    "createdAt" TIMESTAMP NOT NULL DEFAULT now(),
+    "updatedAt" TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_tracking_poll_run_company ON "TrackingPollRun"("companyId");
+CREATE INDEX IF NOT EXISTS idx_tracking_poll_run_status ON "TrackingPollRun"(status);
+
+-- Cursor paging over active deliveries
+CREATE INDEX IF NOT EXISTS idx_delivery_status_id ON "Delivery"(status, id) WHERE "awbNo" IS NOT NULL;
@@ -0,0 +1,74 @@
+"""
+Shared fixtures: a throwaway SQLite database with the tables the service
+tests touch. Postgres-only column types are mapped to SQLite equivalents,
+and savepoints are made to work on pysqlite.
+"""
+import json
+import sqlite3
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.types import NullType
+from sqlmodel import Session
+
+from app.models import (
+    AWB, Bin, ChannelInventory, DetectionRule, Inventory, InventoryAllocation,
+    Location, Order, PTLRateMatrix, PTLTATMatrix, SKU, Sequence, ServicePincode,
+    TrackingPollRun, Transporter, TransporterConfig,
+)
+
+
+@compiles(JSONB, "sqlite")
+@compiles(ARRAY, "sqlite")
+def _compile_json(type_, compiler, **kw):
+    return "JSON"
+
+
+@compiles(NullType, "sqlite")
+def _compile_untyped(type_, compiler, **kw):
+    return ""
+
+
+# ARRAY columns (stored as JSON above) bind plain lists
+sqlite3.register_adapter(list, json.dumps)
+
+
+TABLES = (
+    AWB, Bin, ChannelInventory, DetectionRule, Inventory, InventoryAllocation,
+    Location, Order, PTLRateMatrix, PTLTATMatrix, SKU, Sequence, ServicePincode,
+    TrackingPollRun, Transporter, TransporterConfig,
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'oms.db'}",
+        connect_args={"check_same_thread": False, "timeout": 5},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        # Let SQLAlchemy drive transactions so SAVEPOINT works
+        dbapi_connection.isolation_level = None
+        dbapi_connection.create_function("gen_random_uuid", 0, lambda: uuid.uuid4().hex)
+        dbapi_connection.create_function("greatest", 2, max)
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        # Take the write lock up front, the closest SQLite gets to row locks
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    for model in TABLES:
+        model.__table__.create(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield session
@@ -0,0 +1,232 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.models import AWB
+from app.services.carriers import awb_pool
+from app.services.carriers.awb_pool import (
+    AWB_POOL_HOLD_SECONDS, AWB_RESERVATION_TIMEOUT_HOURS, AWBAllocator, _reservation_tag,
+    reclaim_stale_awb_reservations,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_pool(monkeypatch):
+    monkeypatch.setattr(awb_pool, "_pool", {})
+    monkeypatch.setattr(awb_pool, "_empty_until", {})
+    monkeypatch.setattr(awb_pool, "_low_stock", set())
+    monkeypatch.setattr(awb_pool, "_replenish_after", {})
+
+
+@pytest.fixture
+def alerts(monkeypatch):
+    alerts = []
+    monkeypatch.setattr(
+        "app.services.event_dispatcher.dispatch",
+        lambda event_type, payload: alerts.append((event_type, payload)),
+    )
+    return alerts
+
+
+@pytest.fixture
+def pool(session, alerts):
+    """10 AWBs of the company, 5 shared ones and 5 of another company."""
+    company_id, other_company_id, transporter_id = uuid4(), uuid4(), uuid4()
+    created = datetime.utcnow() - timedelta(hours=1)
+    numbers = [
+        (f"{prefix}{i:03d}", owner)
+        for prefix, owner, count in (
+            ("OWN", company_id, 10), ("SHARED", None, 5), ("OTHER", other_company_id, 5),
+        )
+        for i in range(count)
+    ]
+    session.add_all(
+        AWB(awbNo=awb_no, transporterId=transporter_id, companyId=owner,
+            createdAt=created + timedelta(seconds=n))
+        for n, (awb_no, owner) in enumerate(numbers)
+    )
+    session.commit()
+    return company_id, transporter_id
+
+
+def awb_states(engine):
+    with Session(engine) as session:
+        return {
+            awb.awbNo: (awb.isUsed, awb.usedFor)
+            for awb in session.exec(select(AWB)).all()
+        }
+
+
+def test_take_claims_a_block_and_serves_it_from_memory(session, engine, pool, monkeypatch):
+    company_id, transporter_id = pool
+    monkeypatch.setattr(awb_pool, "AWB_BLOCK_SIZE", 4)
+    allocator = AWBAllocator(session)
+
+    taken = [allocator.take(company_id, transporter_id) for _ in range(4)]
+
+    assert taken == ["OWN000", "OWN001", "OWN002", "OWN003"]
+    states = awb_states(engine)
+    assert [awb for awb, (used, _) in states.items() if used] == taken
+    assert all(states[awb] == (True, _reservation_tag) for awb in taken)
+    assert awb_pool.pooled_count(company_id, transporter_id) == 0
+
+    allocator.take(company_id, transporter_id)
+    assert awb_pool.pooled_count(company_id, transporter_id) == 3
+
+
+def test_take_uses_own_and_shared_stock_only(session, engine, pool, alerts, monkeypatch):
+    company_id, transporter_id = pool
+    monkeypatch.setattr(awb_pool, "AWB_BLOCK_SIZE", 50)
+    allocator = AWBAllocator(session)
+
+    taken = [allocator.take(company_id, transporter_id) for _ in range(16)]
+
+    assert taken[-1] is None
+    assert sorted(taken[:-1]) == sorted(
+        [f"OWN{i:03d}" for i in range(10)] + [f"SHARED{i:03d}" for i in range(5)]
+    )
+    assert not any(used for awb, (used, _) in awb_states(engine).items() if awb.startswith("OTHER"))
+    # Below the watermark: one alert per pool, not one per claim
+    assert [event for event, _ in alerts] == ["awb.stock_low"]
+
+
+def test_concurrent_takers_never_share_an_awb(engine, pool):
+    company_id, transporter_id = pool
+    taken, errors = [], []
+
+    def worker():
+        try:
+            with Session(engine) as session:
+                allocator = AWBAllocator(session)
+                for _ in range(3):
+                    taken.extend(allocator.take_many(company_id, transporter_id, 1))
+        except Exception as e:  # pragma: no cover - surfaced by the assert below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(taken) == 15
+    assert len(set(taken)) == 15
+
+
+def test_sent_and_recorded_awb_is_tied_to_the_shipment(session, engine, pool):
+    company_id, transporter_id = pool
+    allocator = AWBAllocator(session)
+    awb_no = allocator.take(company_id, transporter_id)
+
+    allocator.mark_sent([(awb_no, "ORD-1")])
+    assert awb_states(engine)[awb_no] == (True, "SENT:ORD-1")
+
+    allocator.record(awb_no, used_for="ORD-1")
+    session.commit()
+    assert awb_states(engine)[awb_no] == (True, "ORD-1")
+
+
+def test_unconfirmed_booking_is_quarantined_not_released(session, engine, pool):
+    company_id, transporter_id = pool
+    allocator = AWBAllocator(session)
+    sent, unsent, booked = (allocator.take(company_id, transporter_id) for _ in range(3))
+    allocator.record(booked, used_for="ORD-3")
+    session.commit()
+
+    allocator.mark_sent([(sent, "ORD-1")])
+    allocator.quarantine([sent, booked], "ORD-1")
+    allocator.release(company_id, transporter_id, unsent)
+
+    states = awb_states(engine)
+    assert states[sent] == (True, "QUARANTINE:ORD-1")
+    assert states[booked] == (True, "ORD-3")  # recorded AWBs are never quarantined
+    assert allocator.take(company_id, transporter_id) == unsent
+
+
+def test_mark_sent_ignores_awbs_this_process_does_not_hold(session, engine, pool):
+    company_id, transporter_id = pool
+    allocator = AWBAllocator(session)
+    awb_no = allocator.take(company_id, transporter_id)
+    allocator.record(awb_no, used_for="ORD-1")
+    session.commit()
+
+    lost = allocator.mark_sent([(awb_no, "ORD-2"), ("OTHER000", "ORD-2")])
+
+    assert lost == [awb_no, "OTHER000"]
+    states = awb_states(engine)
+    assert states[awb_no] == (True, "ORD-1")
+    assert states["OTHER000"] == (False, None)
+
+
+def test_take_many_hands_back_an_expired_block(session, engine, pool, monkeypatch):
+    company_id, transporter_id = pool
+    monkeypatch.setattr(awb_pool, "AWB_BLOCK_SIZE", 4)
+    allocator = AWBAllocator(session)
+    allocator.take(company_id, transporter_id)
+    block = awb_pool._pool[(company_id, transporter_id)]
+    block.claimed_at = time.monotonic() - AWB_POOL_HOLD_SECONDS - 1
+
+    taken = allocator.take_many(company_id, transporter_id, 2)
+
+    # The expired numbers may have been reclaimed and claimed elsewhere
+    assert taken == ["OWN001", "OWN002"]
+    assert not block.numbers
+    states = awb_states(engine)
+    assert states["OWN003"] == (False, None)
+    assert all(states[awb] == (True, _reservation_tag) for awb in taken)
+
+
+def test_record_only_applies_to_awbs_still_held(session, engine, pool):
+    company_id, transporter_id = pool
+    allocator = AWBAllocator(session)
+    mine, sent, reclaimed, reclaimed_sent = allocator.take_many(company_id, transporter_id, 4)
+    assert allocator.mark_sent([(sent, "ORD-2"), (reclaimed_sent, "ORD-4")]) == []
+    # Reclaimed by the cleanup job and claimed by another process since
+    session.execute(
+        update(AWB.__table__)
+        .where(AWB.awbNo.in_([reclaimed, reclaimed_sent]))
+        .values(usedFor="POOL:other-host:1")
+    )
+    session.commit()
+
+    assert allocator.record(mine, used_for="ORD-1")
+    assert not allocator.record(reclaimed, used_for="ORD-3")
+    assert not allocator.record(sent, used_for="ORD-9")  # sent for another order
+    allocator.record_many([(sent, "ORD-2"), (reclaimed_sent, "ORD-4")])
+    session.commit()
+
+    states = awb_states(engine)
+    assert states[mine] == (True, "ORD-1")
+    assert states[sent] == (True, "ORD-2")
+    assert states[reclaimed] == states[reclaimed_sent] == (True, "POOL:other-host:1")
+
+
+def test_reclaim_frees_stale_reservations_and_quarantines_sent_awbs(
+    session, engine, pool, monkeypatch
+):
+    company_id, transporter_id = pool
+    monkeypatch.setattr("app.core.database.engine", engine)
+    allocator = AWBAllocator(session)
+    reserved, sent, fresh, booked = (allocator.take(company_id, transporter_id) for _ in range(4))
+    allocator.mark_sent([(sent, "ORD-2")])
+    allocator.record(booked, used_for="ORD-4")
+    session.commit()
+
+    stale = datetime.utcnow() - timedelta(hours=AWB_RESERVATION_TIMEOUT_HOURS, minutes=1)
+    for awb in session.exec(select(AWB).where(AWB.awbNo.in_([reserved, sent, booked]))).all():
+        awb.usedAt = stale
+    session.commit()
+
+    assert reclaim_stale_awb_reservations() == 1
+
+    states = awb_states(engine)
+    assert states[reserved] == (False, None)
+    assert states[sent] == (True, "QUARANTINE:ORD-2")
+    assert states[fresh] == (True, _reservation_tag)
+    assert states[booked] == (True, "ORD-4")
@@ -0,0 +1,28 @@
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from fastapi import BackgroundTasks, HTTPException
+from pydantic import ValidationError
+
+from app.api.v1.carrier_webhooks import BulkPollRequest, bulk_poll
+
+SUPER_ADMIN = SimpleNamespace(role="SUPER_ADMIN", companyId=None)
+
+
+def test_malformed_resume_run_id_is_a_validation_error():
+    with pytest.raises(ValidationError):
+        BulkPollRequest(resume_run_id="not-a-uuid")
+
+
+def test_unknown_resume_run_id_is_not_found(session):
+    background_tasks = BackgroundTasks()
+
+    with pytest.raises(HTTPException) as error:
+        bulk_poll(
+            BulkPollRequest(resume_run_id=str(uuid4())), background_tasks,
+            session=session, current_user=SUPER_ADMIN, _=None,
+        )
+
+    assert error.value.status_code == 404
+    assert not background_tasks.tasks
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.api.v1.detection_rules import update_detection_rule
+from app.models import DetectionRule
+from app.models.detection_rule import DetectionRuleUpdate
+
+CONDITIONS = [{"field": "status", "operator": "EQUALS", "value": "PENDING"}]
+
+
+@pytest.fixture
+def rule(session):
+    rule = DetectionRule(
+        name="Stuck orders", ruleCode="RULE-STU-0001", ruleType="STUCK_ORDER",
+        entityType="Order", conditions=CONDITIONS,
+        scanWatermark=datetime.utcnow() - timedelta(minutes=5),
+    )
+    session.add(rule)
+    session.commit()
+    return rule
+
+
+def update(session, rule, **changes):
+    update_detection_rule(
+        rule.id, DetectionRuleUpdate(**changes), session=session, _=None, current_user=None
+    )
+    return session.get(DetectionRule, rule.id)
+
+
+def test_changing_conditions_resets_scan_watermark(session, rule):
+    conditions = CONDITIONS + [{"field": "priority", "operator": "GREATER_THAN", "value": 2}]
+
+    assert update(session, rule, conditions=conditions).scanWatermark is None
+
+
+@pytest.mark.parametrize("changes", [
+    {"name": "Orders stuck in PENDING"},
+    {"defaultSeverity": "HIGH", "isActive": False},
+    {"conditions": CONDITIONS},
+])
+def test_other_edits_keep_scan_watermark(session, rule, changes):
+    watermark = rule.scanWatermark
+
+    assert update(session, rule, **changes).scanWatermark == watermark
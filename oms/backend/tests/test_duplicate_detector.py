@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app.models import Order
+from app.services.orders import duplicate_detector
+from app.services.orders.duplicate_detector import BloomFilter, DuplicateDetector
+
+
+@pytest.fixture(autouse=True)
+def reset_indexes(monkeypatch):
+    monkeypatch.setattr(duplicate_detector, "_indexes", {})
+
+
+def make_order(company_id, external_no, channel="AMAZON", created_at=None):
+    now = datetime.utcnow()
+    return Order(
+        orderNo=f"ORD-{uuid4().hex[:8]}", externalOrderNo=external_no,
+        channel=channel, paymentMode="PREPAID",
+        customerName="Test", customerPhone="9999999999", shippingAddress={},
+        subtotal=Decimal("100"), taxAmount=Decimal("0"), totalAmount=Decimal("100"),
+        orderDate=now, locationId=uuid4(), companyId=company_id,
+        createdAt=created_at or now,
+    )
+
+
+def test_bloom_filter_has_no_false_negatives_past_capacity():
+    bloom = BloomFilter(capacity=1000)
+    values = [f"AMZ-{i}" for i in range(5000)]
+    for value in values:
+        bloom.add(value)
+
+    assert all(value in bloom for value in values)
+    assert bloom.full
+
+
+def test_bloom_filter_false_positive_rate_at_capacity():
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+    for i in range(10_000):
+        bloom.add(f"FLP-{i}")
+
+    false_positives = sum(f"MYN-{i}" in bloom for i in range(10_000))
+    assert false_positives < 200
+
+
+def test_bloom_filter_readding_does_not_use_capacity():
+    bloom = BloomFilter(capacity=10)
+    for _ in range(20):
+        bloom.add("AMZ-1")
+
+    assert bloom.count == 1
+    assert not bloom.full
+
+
+def test_find_existing_confirms_hits(session):
+    company_id = uuid4()
+    session.add_all([
+        make_order(company_id, "AMZ-1"),
+        make_order(company_id, "FLP-1", channel="FLIPKART"),
+        make_order(uuid4(), "AMZ-2"),
+    ])
+    session.commit()
+    detector = DuplicateDetector(session, company_id)
+
+    existing = detector.find_existing(["AMZ-1", "AMZ-2", "FLP-1", "AMZ-3", "", None])
+
+    assert set(existing) == {"AMZ-1", "FLP-1"}
+    assert set(detector.find_existing(["AMZ-1", "FLP-1"], channel="AMAZON")) == {"AMZ-1"}
+
+
+def test_orders_created_after_the_build_are_found(session, engine):
+    company_id = uuid4()
+    session.add(make_order(company_id, "AMZ-1"))
+    session.commit()
+    detector = DuplicateDetector(session, company_id)
+    assert detector.find_existing(["AMZ-2"]) == {}
+
+    # Inserted in this process: added to the index as it flushes
+    session.add(make_order(company_id, "AMZ-2"))
+    session.commit()
+    # Committed by another process, stamped a little before the last
+    # refresh (a late commit within the overlap window)
+    index = duplicate_detector._indexes[company_id]
+    late = index.refreshed_to - timedelta(minutes=5)
+    event.remove(Order, "after_insert", duplicate_detector._on_order_insert)
+    try:
+        with Session(engine) as other:
+            other.add(make_order(company_id, "AMZ-3", created_at=late))
+            other.commit()
+    finally:
+        event.listen(Order, "after_insert", duplicate_detector._on_order_insert)
+
+    assert set(detector.find_existing(["AMZ-1", "AMZ-2", "AMZ-3", "AMZ-4"])) == {
+        "AMZ-1", "AMZ-2", "AMZ-3"
+    }
+
+
+def test_full_index_is_rebuilt_larger(session, monkeypatch):
+    monkeypatch.setattr(duplicate_detector, "DUPLICATE_INDEX_MIN_CAPACITY", 4)
+    company_id = uuid4()
+    detector = DuplicateDetector(session, company_id)
+    detector.find_existing(["AMZ-0"])
+    first = duplicate_detector._indexes[company_id]
+
+    session.add_all([make_order(company_id, f"AMZ-{i}") for i in range(10)])
+    session.commit()
+    assert first.filter.full
+
+    assert len(detector.find_existing([f"AMZ-{i}" for i in range(12)])) == 10
+    rebuilt = duplicate_detector._indexes[company_id]
+    assert rebuilt is not first
+    assert rebuilt.filter.capacity == 20
+
+
+def test_filter_duplicates_within_batch_and_against_history(session):
+    company_id = uuid4()
+    session.add(make_order(company_id, "AMZ-1"))
+    session.commit()
+    detector = DuplicateDetector(session, company_id)
+
+    new, duplicates = detector.filter_duplicates(
+        [
+            {"marketplaceOrderId": "AMZ-1"},
+            {"order_id": "AMZ-2"},
+            {"id": "AMZ-2"},
+            {"sku": "no id"},
+        ],
+        "AMAZON",
+    )
+
+    assert new == [{"order_id": "AMZ-2"}, {"sku": "no id"}]
+    assert [d.get("marketplaceOrderId") for d in duplicates] == ["AMZ-1", None]
+    assert duplicates[1] == {"id": "AMZ-2", "_duplicate_of": "AMZ-2"}
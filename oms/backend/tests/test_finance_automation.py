@@ -0,0 +1,52 @@
+from uuid import uuid4
+
+import pytest
+
+from app.core.config import settings
+from app.services import event_dispatcher
+from app.services.analytics_aggregator import AnalyticsAggregator
+from app.services.event_handlers.finance_automation import (
+    handle_guaranteed_analytics_delivered,
+)
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    submitted = []
+    monkeypatch.setattr(settings, "EVENT_OUTBOX_ENABLED", False)
+    monkeypatch.setattr(
+        event_dispatcher, "_submit",
+        lambda handler, event_type, payload, **kwargs: submitted.append((handler, payload)),
+    )
+    return submitted
+
+
+def test_every_delivery_of_a_window_is_aggregated(submitted, monkeypatch):
+    scopes, aggregated = [], []
+    monkeypatch.setattr(
+        AnalyticsAggregator, "delivery_scope",
+        lambda session, delivery_ids: scopes.append(set(delivery_ids)) or {
+            "transporter_ids": {uuid4()}, "lanes": set(), "pincodes": set(),
+        },
+    )
+    monkeypatch.setattr(
+        AnalyticsAggregator, "aggregate_all",
+        lambda session, company_id, start, end, **scope: aggregated.append(company_id),
+    )
+    company_a, company_b = uuid4(), uuid4()
+    deliveries_a = [uuid4() for _ in range(3)]
+    delivery_b = uuid4()
+
+    batcher = event_dispatcher._batchers[
+        ("delivery.delivered", handle_guaranteed_analytics_delivered)
+    ]
+    for company_id, delivery_id in [(company_a, d) for d in deliveries_a] + [(company_b, delivery_b)]:
+        batcher.add({"companyId": str(company_id), "deliveryId": str(delivery_id)})
+    batcher.flush()
+
+    [(handler, payloads)] = submitted
+    assert len(payloads) == 4
+    handler(payloads, None)
+
+    assert scopes == [set(deliveries_a), {delivery_b}]
+    assert aggregated == [company_a, company_b]
@@ -0,0 +1,161 @@
+from uuid import uuid4
+
+import pytest
+from sqlmodel import select
+
+from app.models import AllocationRequest, Inventory, InventoryAllocation
+from app.services import inventory_allocation
+from app.services.inventory_allocation import InventoryAllocationService
+from app.services.inventory_reservation import RESERVATION_RETRIES, retry_backoff
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(inventory_allocation.time, "sleep", sleeps.append)
+    return sleeps
+
+
+@pytest.fixture
+def allocator(session, monkeypatch):
+    allocator = InventoryAllocationService(session)
+    numbers = iter(range(1, 10_000))
+    # The real seed query uses the Postgres regex operator
+    monkeypatch.setattr(
+        allocator.sequences, "allocation_numbers",
+        lambda count: [f"ALLOC-{next(numbers):08d}" for _ in range(count)],
+    )
+    return allocator
+
+
+@pytest.fixture
+def stock(session):
+    """One SKU in two bins of one location, 5 units each, bin A older."""
+    sku_id, company_id, location_id = uuid4(), uuid4(), uuid4()
+    rows = [
+        Inventory(
+            skuId=sku_id, binId=uuid4(), locationId=location_id, companyId=company_id,
+            quantity=5, reservedQty=0, fifoSequence=sequence,
+        )
+        for sequence in (1, 2)
+    ]
+    session.add_all(rows)
+    session.commit()
+    return sku_id, location_id, company_id, [row.id for row in rows]
+
+
+def reserved(session, row_ids):
+    session.expire_all()
+    return [
+        session.exec(select(Inventory.reservedQty).where(Inventory.id == row_id)).one()
+        for row_id in row_ids
+    ]
+
+
+def allocated(session):
+    return {
+        (row.inventoryId, row.allocatedQty)
+        for row in session.exec(select(InventoryAllocation)).all()
+    }
+
+
+def hold_rows(monkeypatch, allocator, held_ids, rounds):
+    """Hide `held_ids` from the first `rounds` candidate locks, as if another
+    allocation worker had them locked (SKIP LOCKED)."""
+    calls = []
+    lock_candidates = allocator._lock_inventory_candidates
+
+    def locked_elsewhere(pairs, exclude_ids):
+        calls.append(1)
+        if len(calls) <= rounds:
+            exclude_ids = set(exclude_ids) | set(held_ids)
+        return lock_candidates(pairs, exclude_ids)
+
+    monkeypatch.setattr(allocator, "_lock_inventory_candidates", locked_elsewhere)
+    return calls
+
+
+def test_batch_allocate_serves_requests_in_order(session, allocator, stock, sleeps):
+    sku_id, location_id, company_id, (bin_a, bin_b) = stock
+
+    results = allocator.batch_allocate(
+        [
+            AllocationRequest(skuId=sku_id, locationId=location_id, requiredQty=6),
+            AllocationRequest(skuId=sku_id, locationId=location_id, requiredQty=6),
+        ],
+        company_id,
+    )
+
+    assert [(r.allocatedQty, r.shortfallQty) for r in results] == [(6, 0), (4, 2)]
+    assert [a.allocatedQty for a in results[0].allocations] == [5, 1]
+    assert reserved(session, [bin_a, bin_b]) == [5, 5]
+    assert allocated(session) == {(bin_a, 5), (bin_b, 1), (bin_b, 4)}
+    assert sleeps == []  # short on stock, not on locks
+
+
+def test_batch_allocate_retries_locked_stock(
+    session, allocator, stock, sleeps, monkeypatch
+):
+    sku_id, location_id, company_id, (bin_a, bin_b) = stock
+    calls = hold_rows(monkeypatch, allocator, {bin_b}, rounds=1)
+
+    [result] = allocator.batch_allocate(
+        [AllocationRequest(skuId=sku_id, locationId=location_id, requiredQty=8)],
+        company_id,
+    )
+
+    assert result.success and result.allocatedQty == 8
+    assert len(calls) == 2
+    assert sleeps == [retry_backoff(0)]
+    # Only the final pass is written
+    assert reserved(session, [bin_a, bin_b]) == [5, 3]
+    assert allocated(session) == {(bin_a, 5), (bin_b, 3)}
+
+
+def test_batch_allocate_reports_shortfall_after_retries(
+    session, allocator, stock, sleeps, monkeypatch
+):
+    sku_id, location_id, company_id, (bin_a, bin_b) = stock
+    hold_rows(monkeypatch, allocator, {bin_b}, rounds=RESERVATION_RETRIES + 1)
+
+    [result] = allocator.batch_allocate(
+        [AllocationRequest(skuId=sku_id, locationId=location_id, requiredQty=8)],
+        company_id,
+    )
+
+    assert (result.allocatedQty, result.shortfallQty) == (5, 3)
+    assert sleeps == [retry_backoff(attempt) for attempt in range(RESERVATION_RETRIES)]
+    assert reserved(session, [bin_a, bin_b]) == [5, 0]
+    assert allocated(session) == {(bin_a, 5)}
+
+
+async def test_batch_allocate_on_event_loop_does_not_sleep(
+    session, allocator, stock, sleeps, monkeypatch
+):
+    sku_id, location_id, company_id, (bin_a, bin_b) = stock
+    calls = hold_rows(monkeypatch, allocator, {bin_b}, rounds=1)
+
+    [result] = allocator.batch_allocate(
+        [AllocationRequest(skuId=sku_id, locationId=location_id, requiredQty=8)],
+        company_id,
+    )
+
+    assert result.allocatedQty == 5
+    assert len(calls) == 1
+    assert sleeps == []
+
+
+def test_batch_allocate_without_commit_leaves_it_to_the_caller(
+    session, allocator, stock, sleeps
+):
+    sku_id, location_id, company_id, (bin_a, bin_b) = stock
+
+    allocator.batch_allocate(
+        [AllocationRequest(skuId=sku_id, locationId=location_id, requiredQty=3)],
+        company_id,
+        commit=False,
+    )
+    session.rollback()
+
+    assert reserved(session, [bin_a, bin_b]) == [0, 0]
+    assert allocated(session) == set()
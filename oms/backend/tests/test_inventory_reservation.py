@@ -0,0 +1,138 @@
+from uuid import uuid4
+
+import pytest
+from sqlmodel import select
+
+from app.models import Inventory
+from app.services import inventory_reservation
+from app.services.inventory_reservation import (
+    InventoryReservationService, RESERVATION_RETRIES, retry_backoff,
+)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(inventory_reservation.time, "sleep", sleeps.append)
+    return sleeps
+
+
+@pytest.fixture
+def stock(session):
+    """One SKU in two bins, 5 units each, bin A older (FIFO first)."""
+    sku_id, company_id, location_id = uuid4(), uuid4(), uuid4()
+    rows = [
+        Inventory(
+            skuId=sku_id, binId=uuid4(), locationId=location_id, companyId=company_id,
+            quantity=5, reservedQty=0, fifoSequence=sequence,
+        )
+        for sequence in (1, 2)
+    ]
+    session.add_all(rows)
+    session.commit()
+    return sku_id, [row.id for row in rows]
+
+
+def reserved(session, row_ids):
+    session.expire_all()
+    return [
+        session.exec(select(Inventory.reservedQty).where(Inventory.id == row_id)).one()
+        for row_id in row_ids
+    ]
+
+
+def hold_rows(monkeypatch, service, held_ids, rounds):
+    """Make `held_ids` invisible to the first `rounds` locking reads, as if
+    another worker had them locked (SKIP LOCKED)."""
+    calls = []
+    lock_available = service.lock_available
+
+    def locked_elsewhere(model, *criteria, exclude_ids=None, **kwargs):
+        calls.append(1)
+        if len(calls) <= rounds:
+            exclude_ids = set(exclude_ids or ()) | set(held_ids)
+        return lock_available(model, *criteria, exclude_ids=exclude_ids, **kwargs)
+
+    monkeypatch.setattr(service, "lock_available", locked_elsewhere)
+    return calls
+
+
+def test_reserve_in_valuation_order(session, stock, sleeps):
+    sku_id, (bin_a, bin_b) = stock
+    service = InventoryReservationService(session)
+
+    assert service.reserve(sku_id, 7) == 7
+    assert reserved(session, [bin_a, bin_b]) == [5, 2]
+    assert service.reserve(sku_id, 7, valuation_method="LIFO") == 3
+    assert reserved(session, [bin_a, bin_b]) == [5, 5]
+    assert sleeps == []
+
+
+def test_reserve_retries_locked_stock_without_double_reserving(
+    session, stock, sleeps, monkeypatch
+):
+    sku_id, (bin_a, bin_b) = stock
+    service = InventoryReservationService(session)
+    calls = hold_rows(monkeypatch, service, {bin_b}, rounds=1)
+
+    assert service.reserve(sku_id, 8) == 8
+
+    # The first round's 5 units on bin A were rolled back with its savepoint
+    assert reserved(session, [bin_a, bin_b]) == [5, 3]
+    assert len(calls) == 2
+    assert sleeps == [retry_backoff(0)]
+
+
+def test_reserve_reports_shortfall_after_retries(session, stock, sleeps, monkeypatch):
+    sku_id, (bin_a, bin_b) = stock
+    service = InventoryReservationService(session)
+    hold_rows(monkeypatch, service, {bin_b}, rounds=RESERVATION_RETRIES + 1)
+
+    assert service.reserve(sku_id, 8) == 5
+
+    assert reserved(session, [bin_a, bin_b]) == [5, 0]
+    assert sleeps == [retry_backoff(attempt) for attempt in range(RESERVATION_RETRIES)]
+
+
+def test_reserve_does_not_retry_when_stock_is_just_short(session, stock, sleeps):
+    sku_id, (bin_a, bin_b) = stock
+    service = InventoryReservationService(session)
+
+    assert service.reserve(sku_id, 12) == 10
+    assert reserved(session, [bin_a, bin_b]) == [5, 5]
+    assert sleeps == []
+
+
+async def test_reserve_on_event_loop_takes_shortfall_without_sleeping(
+    session, stock, sleeps, monkeypatch
+):
+    sku_id, (bin_a, bin_b) = stock
+    service = InventoryReservationService(session)
+    calls = hold_rows(monkeypatch, service, {bin_b}, rounds=1)
+
+    assert service.reserve(sku_id, 8) == 5
+
+    assert reserved(session, [bin_a, bin_b]) == [5, 0]
+    assert len(calls) == 1
+    assert sleeps == []
+
+
+def test_adjust_reserved_refuses_lost_races(session, stock):
+    sku_id, (bin_a, _) = stock
+    service = InventoryReservationService(session)
+
+    assert service.adjust_reserved(Inventory, bin_a, 4)
+    assert not service.adjust_reserved(Inventory, bin_a, 2)   # would exceed quantity
+    assert not service.adjust_reserved(Inventory, bin_a, -5)  # would go negative
+    assert reserved(session, [bin_a]) == [4]
+
+
+def test_release_newest_stock_first(session, stock):
+    sku_id, (bin_a, bin_b) = stock
+    service = InventoryReservationService(session)
+    service.reserve(sku_id, 10)
+
+    assert service.release(sku_id, 7) == 7
+    assert reserved(session, [bin_a, bin_b]) == [3, 0]
+    assert service.release(sku_id, 7) == 3
+    assert reserved(session, [bin_a, bin_b]) == [0, 0]
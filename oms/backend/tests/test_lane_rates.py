@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from sqlmodel import select
+
+from app.models import PTLRateMatrix, PTLTATMatrix, Transporter
+from app.services.lane_rates import LaneRateService, PTLLaneRate, city_key, ptl_slab_label
+
+
+@pytest.mark.parametrize("city, expected", [
+    ("Delhi", "delhi"),
+    ("  NEW   Delhi ", "delhi"),
+    ("Bangalore", "bengaluru"),
+    ("Bengaluru", "bengaluru"),
+    ("Navi-Mumbai", "navi mumbai"),
+    ("New Bombay", "navi mumbai"),
+    ("St. Thomas Mount", "st thomas mount"),
+    ("", ""),
+    (None, ""),
+])
+def test_city_key(city, expected):
+    assert city_key(city) == expected
+
+
+@pytest.mark.parametrize("weight, label", [
+    (0.5, "0-50 kg"),
+    (50, "0-50 kg"),
+    (50.01, "50-100 kg"),
+    (250, "100-250 kg"),
+    (1000, "500-1000 kg"),
+    (1000.5, "1000+ kg"),
+])
+def test_ptl_slab_label(weight, label):
+    assert ptl_slab_label(weight) == label
+
+
+def lane_rate(rates, minimum_charge=0.0, fod=0.0, oda=0.0, transit_days=None, name="Carrier"):
+    return PTLLaneRate(
+        rate_matrix_id=uuid4(), transporter_id=uuid4(),
+        transporter_name=name, transporter_code=name.upper(),
+        rates=rates, minimum_charge=minimum_charge, fod_charge=fod, oda_charge=oda,
+        cod_percent=0.0, transit_days=transit_days,
+    )
+
+
+def test_slab_falls_through_to_next_priced_slab():
+    rate = lane_rate((10.0, None, 8.0, None, None, None))
+
+    assert rate.slab(40) == 0
+    assert rate.slab(80) == 2
+    assert rate.slab(80, strict=True) is None
+    assert rate.slab(400) is None  # no heavier slab has a rate
+    assert rate.price(80)["weightSlab"] == "100-250 kg"
+    assert rate.price(80, strict=True) is None
+
+
+def test_price_applies_charges_and_minimum():
+    rate = lane_rate((10.0, 9.0, None, None, None, 5.0), minimum_charge=600, fod=20, oda=30)
+
+    light = rate.price(40)
+    assert (light["baseCost"], light["totalCost"], light["minimumChargeApplied"]) == (
+        400, 600, True
+    )
+
+    heavy = rate.price(1200)
+    assert heavy["ratePerKg"] == 5.0
+    assert (heavy["baseCost"], heavy["totalCost"], heavy["minimumChargeApplied"]) == (
+        6000, 6050, False
+    )
+
+
+@pytest.fixture
+def lanes(session):
+    company_id = uuid4()
+    since = datetime.utcnow() - timedelta(days=1)
+    fast = Transporter(code="FAST", name="Fast Freight", type="COURIER")
+    cheap = Transporter(code="CHEAP", name="Cheap Cargo", type="COURIER")
+    session.add_all([fast, cheap])
+    session.flush()
+    session.add_all([
+        PTLRateMatrix(
+            companyId=company_id, transporterId=fast.id, validFrom=since,
+            originCity="New Delhi", destinationCity="Bangalore",
+            rate0to50=Decimal("12"), rate50to100=Decimal("11"), minimumCharge=Decimal("300"),
+        ),
+        PTLRateMatrix(
+            companyId=company_id, transporterId=cheap.id, validFrom=since,
+            originCity="DELHI", destinationCity="Bengaluru ",
+            rate50to100=Decimal("9"),
+        ),
+        PTLRateMatrix(
+            companyId=company_id, transporterId=cheap.id, validFrom=since,
+            originCity="Delhi", destinationCity="Mumbai",
+            rate0to50=Decimal("7"), isActive=False,
+        ),
+        PTLTATMatrix(
+            companyId=company_id, transporterId=fast.id,
+            originCity="delhi", destinationCity="Bengaluru", transitDays=2,
+        ),
+        PTLTATMatrix(
+            companyId=company_id, transporterId=cheap.id,
+            originCity="Delhi", destinationCity="bangalore", transitDays=5,
+        ),
+    ])
+    session.commit()
+    return company_id
+
+
+def test_rate_rows_store_lane_keys(session, lanes):
+    row = session.exec(
+        select(PTLRateMatrix).where(PTLRateMatrix.originCity == "New Delhi")
+    ).one()
+    assert (row.originKey, row.destinationKey) == ("delhi", "bengaluru")
+
+    row.destinationCity = "Bombay"
+    session.commit()
+    assert row.destinationKey == "mumbai"
+
+
+def test_compare_ptl_matches_lanes_by_key(session, lanes):
+    service = LaneRateService(session, [lanes])
+
+    options = service.compare_ptl("delhi", "BENGALURU", 60)
+
+    assert [(o["transporterName"], o["totalCost"], o["transitDays"]) for o in options] == [
+        ("Cheap Cargo", 540, 5),
+        ("Fast Freight", 660, 2),
+    ]
+    assert LaneRateService(session, [uuid4()]).compare_ptl("Delhi", "Bangalore", 60) == []
+
+
+def test_compare_ptl_bulk(session, lanes):
+    service = LaneRateService(session, [lanes])
+
+    light, heavy, inactive = service.compare_ptl_bulk([
+        ("New Delhi", "Bangalore", 20),
+        ("Delhi", "Bangalore", 90),
+        ("Delhi", "Mumbai", 20),
+    ])
+
+    # 20 kg: only Fast Freight prices the 0-50 slab (cheap falls through to 50-100)
+    assert (light["cheapest"], light["cheapestCost"]) == ("Cheap Cargo", 180)
+    assert (light["fastest"], light["fastestCost"]) == ("Fast Freight", 300)
+    assert (heavy["options"], heavy["cheapest"], heavy["fastest"]) == (
+        2, "Cheap Cargo", "Fast Freight"
+    )
+    assert (inactive["options"], inactive["cheapest"]) == (0, None)
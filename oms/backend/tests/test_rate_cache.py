@@ -0,0 +1,79 @@
+import asyncio
+import time
+from uuid import uuid4
+
+import pytest
+
+from app.core.config import settings
+from app.models import Transporter, TransporterConfig
+from app.services import shipping_service
+from app.services.carriers import rate_cache
+from app.services.carriers.base import RateQuote, RateResponse
+from app.services.carriers.rate_cache import CachedRates, RateCache, _memory_put, lane_key
+from app.services.shipping_service import ShippingService
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    rate_cache.invalidate_rate_cache()
+    monkeypatch.setattr(rate_cache, "_config_stamps", {})
+    monkeypatch.setattr(settings, "RATE_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_CACHE_SHARED", False)
+    yield
+    rate_cache.invalidate_rate_cache()
+
+
+def quote(rate, carrier_code="FASTSHIP"):
+    return RateQuote(carrier_code=carrier_code, carrier_name="Fast Ship", rate=rate)
+
+
+def test_put_uses_carrier_ttl_from_settings(session, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_CACHE_CARRIER_TTL_SECONDS", {"FASTSHIP": 60})
+    monkeypatch.setattr(settings, "RATE_CACHE_TTL_SECONDS", 3600)
+    company_id, cache, now = uuid4(), RateCache(session), time.time()
+
+    fast = cache.put("fast", company_id, "fastship", [quote(50)])
+    slow = cache.put("slow", company_id, "SLOWSHIP", [quote(40, "SLOWSHIP")])
+
+    assert fast.expires_at == pytest.approx(now + 60, abs=5)
+    assert slow.expires_at == pytest.approx(now + 3600, abs=5)
+
+
+class StubAdapter:
+    def __init__(self, rate):
+        self.rate = rate
+        self.calls = 0
+
+    async def get_rates(self, *args):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return RateResponse(success=True, quotes=[quote(self.rate)])
+
+
+def test_stale_quote_refresh_outlives_asyncio_run(session, monkeypatch):
+    company_id = uuid4()
+    transporter = Transporter(code="FASTSHIP", name="Fast Ship", type="COURIER", apiEnabled=True)
+    session.add(transporter)
+    session.flush()
+    session.add(TransporterConfig(companyId=company_id, transporterId=transporter.id))
+    session.commit()
+    # Config stamp just checked: the SQLite write lock would stall a re-read
+    rate_cache._config_stamps[str(company_id)] = (time.monotonic(), None)
+    adapter = StubAdapter(rate=80)
+    monkeypatch.setattr(shipping_service, "get_carrier_adapter", lambda code, credentials: adapter)
+
+    key = lane_key(company_id, "FASTSHIP", "110001", "560001", 750, "PREPAID", 0)
+    now = time.time()
+    _memory_put(key, CachedRates(quotes=[quote(70)], expires_at=now - 1, stale_until=now + 600))
+
+    result = asyncio.run(ShippingService(session).get_rates(
+        company_id, "110001", "560001", 750, live=True,
+    ))
+
+    # The stale quote is served at once, the refresh finishes after the loop closed
+    assert [q["rate"] for q in result["quotes"]] == [70]
+    for job in list(shipping_service._background_jobs):
+        job.result(timeout=5)
+    entry = RateCache(session).get(key)
+    assert adapter.calls == 1
+    assert entry.is_fresh and [q.rate for q in entry.quotes] == [80]
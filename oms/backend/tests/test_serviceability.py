@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from sqlmodel import select
+
+from app.models import ServicePincode
+from app.services.carriers import serviceability
+from app.services.carriers.base import PincodeCoverage
+from app.services.carriers.serviceability import (
+    FLAG_COD, FLAG_PREPAID, FLAG_SERVICEABLE, TransporterPincodes, _pin,
+    get_serviceability_index, sync_carrier_pincodes,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_index(monkeypatch):
+    monkeypatch.setattr(serviceability, "_index", None)
+    monkeypatch.setattr(serviceability, "_stale", True)
+
+
+def pincode_row(transporter_id, pincode, **values):
+    return ServicePincode(transporterId=transporter_id, pincode=pincode, **values)
+
+
+@pytest.mark.parametrize("pincode, expected", [
+    ("110001", 110001),
+    (" 560034 ", 560034),
+    (400001, 400001),
+    ("11000", None),
+    ("1100011", None),
+    ("11000A", None),
+    ("", None),
+    (None, None),
+])
+def test_pin_normalizes_six_digit_pincodes(pincode, expected):
+    assert _pin(pincode) == expected
+
+
+def test_transporter_table_lookup():
+    table = TransporterPincodes([
+        (110001, FLAG_SERVICEABLE | FLAG_COD | FLAG_PREPAID, "A", 2),
+        (400001, FLAG_SERVICEABLE | FLAG_PREPAID, "B", None),
+        (560034, 0, "A", 5),
+    ])
+
+    delhi = table.get(" 110001")
+    assert (delhi.zone, delhi.estimated_days) == ("A", 2)
+    assert delhi.allows("cod") and delhi.allows("PREPAID")
+
+    mumbai = table.get(400001)
+    assert mumbai.estimated_days is None
+    assert not mumbai.allows("COD") and mumbai.allows("PREPAID")
+
+    assert not table.get("560034").allows()
+    assert table.get("560035") is None
+    assert table.get("bad") is None
+    assert table.zone_names == [None, "A", "B"]
+
+
+def test_transporter_table_keeps_last_duplicate():
+    table = TransporterPincodes([
+        (110001, FLAG_SERVICEABLE, "A", 2),
+        (110001, 0, "C", 4),
+        (110002, FLAG_SERVICEABLE, None, 300),
+    ])
+
+    assert len(table) == 2
+    assert not table.get("110001").serviceable
+    assert table.get("110001").zone == "C"
+    assert table.get("110002").estimated_days == 254  # clamped below the NULL sentinel
+
+
+def test_index_built_from_service_pincodes(session):
+    bluedart, delhivery, unknown = uuid4(), uuid4(), uuid4()
+    old = datetime.utcnow() - timedelta(days=1)
+    session.add_all([
+        pincode_row(bluedart, "110001", codAvailable=True, prepaidAvailable=True,
+                    zoneCode="N1", estimatedDays=2, updatedAt=old),
+        # Re-uploaded later, with leading whitespace: the newer row wins
+        pincode_row(bluedart, " 110001", isServiceable=False, prepaidAvailable=True),
+        pincode_row(bluedart, "400001", codAvailable=False, prepaidAvailable=True),
+        pincode_row(bluedart, "40001", codAvailable=True, prepaidAvailable=True),
+        pincode_row(delhivery, "110001", codAvailable=True, prepaidAvailable=True),
+    ])
+    session.commit()
+
+    index = get_serviceability_index(session)
+
+    assert index.is_serviceable(bluedart, "110001") is False
+    assert index.is_serviceable(delhivery, "110001", "COD") is True
+    assert index.is_serviceable(bluedart, "400001", "COD") is False
+    assert index.is_serviceable(bluedart, "40001") is False  # invalid pincode skipped
+    assert index.is_serviceable(unknown, "110001") is None
+    assert index.check_batch(["110001 ", "400001"], payment_mode="PREPAID") == {
+        "110001": {delhivery: index.lookup(delhivery, "110001")},
+        "400001": {bluedart: index.lookup(bluedart, "400001")},
+    }
+
+
+def test_index_rebuilt_after_commit(session):
+    transporter_id = uuid4()
+    session.add(pincode_row(transporter_id, "110001", prepaidAvailable=True))
+    session.commit()
+    index = get_serviceability_index(session)
+    assert get_serviceability_index(session) is index
+
+    session.add(pincode_row(transporter_id, "400001", prepaidAvailable=True))
+    session.commit()
+
+    rebuilt = get_serviceability_index(session)
+    assert rebuilt is not index
+    assert rebuilt.is_serviceable(transporter_id, "400001") is True
+
+
+class DumpAdapter:
+    def __init__(self, coverage):
+        self.coverage = coverage
+
+    async def pincode_dump(self):
+        return self.coverage
+
+
+async def test_sync_keeps_fields_the_dump_leaves_out(session):
+    transporter_id = uuid4()
+    session.add_all([
+        pincode_row(transporter_id, "110001", zoneCode="N1", estimatedDays=2, city="Delhi"),
+        pincode_row(transporter_id, "400001", zoneCode="W1", estimatedDays=3),
+    ])
+    session.commit()
+
+    result = await sync_carrier_pincodes(session, transporter_id, DumpAdapter([
+        PincodeCoverage(pincode="110001", cod_available=True, prepaid_available=True),
+        PincodeCoverage(pincode=" 560034 ", prepaid_available=True, zone_code="S1"),
+        PincodeCoverage(pincode="5600"),
+    ]))
+    session.commit()
+
+    assert result == {"received": 3, "inserted": 1, "updated": 1, "unlisted": 1}
+    rows = {
+        row.pincode: row
+        for row in session.exec(
+            select(ServicePincode).where(ServicePincode.transporterId == transporter_id)
+        ).all()
+    }
+    assert set(rows) == {"110001", "400001", "560034"}
+    assert (rows["110001"].zoneCode, rows["110001"].estimatedDays, rows["110001"].city) == (
+        "N1", 2, "Delhi"
+    )
+    assert rows["110001"].codAvailable
+    assert not rows["400001"].isServiceable
+    assert rows["560034"].zoneCode == "S1"
+
+    index = get_serviceability_index(session)
+    assert index.is_serviceable(transporter_id, "110001", "COD") is True
+    assert index.is_serviceable(transporter_id, "400001") is False
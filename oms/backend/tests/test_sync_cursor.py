@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.services.marketplaces import advance_last_sync
+
+SYNCED = datetime(2026, 3, 1, 12, 0)
+
+
+def test_first_sync_sets_the_cursor():
+    connection = SimpleNamespace(lastSyncAt=None)
+
+    assert advance_last_sync(connection, SYNCED)
+    assert connection.lastSyncAt == SYNCED
+
+
+def test_aware_window_end_is_stored_as_naive_utc():
+    connection = SimpleNamespace(lastSyncAt=SYNCED)
+    ist = timezone(timedelta(hours=5, minutes=30))
+
+    assert advance_last_sync(connection, datetime(2026, 3, 1, 18, 0, tzinfo=ist))
+    assert connection.lastSyncAt == SYNCED + timedelta(minutes=30)
+    assert connection.lastSyncAt.tzinfo is None
+
+
+def test_cursor_never_moves_back():
+    connection = SimpleNamespace(lastSyncAt=SYNCED)
+
+    assert not advance_last_sync(connection, SYNCED - timedelta(hours=1))
+    assert not advance_last_sync(connection, SYNCED.replace(tzinfo=timezone.utc))
+    assert connection.lastSyncAt == SYNCED